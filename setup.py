@@ -49,9 +49,14 @@ def generate_long_version_py(VCS: str) -> str:
     s = io.StringIO()
     s.write(get(f"src/{VCS}/long_header.py", add_ver=True, do_strip=True))
     for piece in ["src/subprocess_helper.py",
+                  "src/pieces.py",
                   "src/from_parentdir.py",
                   f"src/{VCS}/from_keywords.py",
                   f"src/{VCS}/from_vcs.py",
+                  f"src/{VCS}/packfile.py",
+                  f"src/{VCS}/checkout.py",
+                  f"src/{VCS}/cache.py",
+                  f"src/{VCS}/from_daemon.py",
                   "src/render.py",
                   f"src/{VCS}/long_get_versions.py"]:
         s.write(get(piece, unquote=True, do_strip=True))
@@ -61,6 +66,8 @@ def generate_versioneer_py() -> bytes:
     s = io.StringIO()
     s.write(get("src/header.py", add_ver=True, do_readme=True, do_strip=True))
     s.write(get("src/subprocess_helper.py", do_strip=True))
+    s.write(get("src/subprocess_async.py", do_strip=True))
+    s.write(get("src/pieces.py", do_strip=True))
 
     for VCS in get_vcs_list():
         s.write(f"LONG_VERSION_PY['{VCS}'] = r'''\n")
@@ -70,6 +77,14 @@ def generate_versioneer_py() -> bytes:
 
         s.write(get(f"src/{VCS}/from_keywords.py", do_strip=True))
         s.write(get(f"src/{VCS}/from_vcs.py", do_strip=True))
+        s.write(get(f"src/{VCS}/from_vcs_async.py", do_strip=True))
+        s.write(get(f"src/{VCS}/packfile.py", do_strip=True))
+        s.write(get(f"src/{VCS}/checkout.py", do_strip=True))
+        s.write(get(f"src/{VCS}/from_gitdir.py", do_strip=True))
+        s.write(get(f"src/{VCS}/coprocess.py", do_strip=True))
+        s.write(get(f"src/{VCS}/cache.py", do_strip=True))
+        s.write(get(f"src/{VCS}/from_daemon.py", do_strip=True))
+        s.write(get(f"src/{VCS}/daemon.py", do_strip=True))
 
         s.write(get(f"src/{VCS}/install.py", do_strip=True))
 
@@ -113,6 +128,14 @@ class make_long_version_py_git(Command):
                      "TAG_PREFIX": "tag-",
                      "PARENTDIR_PREFIX": "parentdir_prefix",
                      "VERSIONFILE_SOURCE": "versionfile_source",
+                     "COMBINE_GIT_QUERIES": False,
+                     "VERSION_DAEMON": False,
+                     "VERSION_CACHE": False,
+                     "STATIC_VERSION_PY": False,
+                     "DIRTY_CHECK": "git",
+                     "DIRTY_SCOPE": "",
+                     "PATH_SCOPE": "",
+                     "TIME_BUDGET": 0,
                      })
 
 class my_build_py(build_py):
@@ -1,3 +1,4 @@
+import json # --STRIP DURING BUILD
 import os, sys # --STRIP DURING BUILD
 from typing import Any, ClassVar, Dict, List, Optional, Tuple # --STRIP DURING BUILD
 from .header import LONG_VERSION_PY, get_root, get_config_from_root # --STRIP DURING BUILD
@@ -156,10 +157,18 @@ def get_cmdclass(cmdclass: Optional[Dict[str, Any]] = None):
                     LONG = LONG_VERSION_PY[cfg.VCS]
                     f.write(LONG %
                             {"DOLLAR": "$",
-                             "STYLE": cfg.style,
+                             "STYLE": json.dumps(cfg.style)[1:-1],
                              "TAG_PREFIX": cfg.tag_prefix,
                              "PARENTDIR_PREFIX": cfg.parentdir_prefix,
                              "VERSIONFILE_SOURCE": cfg.versionfile_source,
+                             "COMBINE_GIT_QUERIES": bool(cfg.combine_git_queries),
+                             "VERSION_DAEMON": bool(cfg.version_daemon),
+                             "VERSION_CACHE": bool(cfg.version_cache),
+                             "STATIC_VERSION_PY": bool(cfg.static_version_py),
+                             "DIRTY_CHECK": cfg.dirty_check or "git",
+                             "DIRTY_SCOPE": cfg.dirty_scope or "",
+                             "PATH_SCOPE": cfg.path_scope or "",
+                             "TIME_BUDGET": cfg.time_budget or 0,
                              })
         cmds["build_exe"] = cmd_build_exe
         del cmds["build_py"]
@@ -185,10 +194,18 @@ def get_cmdclass(cmdclass: Optional[Dict[str, Any]] = None):
                     LONG = LONG_VERSION_PY[cfg.VCS]
                     f.write(LONG %
                             {"DOLLAR": "$",
-                             "STYLE": cfg.style,
+                             "STYLE": json.dumps(cfg.style)[1:-1],
                              "TAG_PREFIX": cfg.tag_prefix,
                              "PARENTDIR_PREFIX": cfg.parentdir_prefix,
                              "VERSIONFILE_SOURCE": cfg.versionfile_source,
+                             "COMBINE_GIT_QUERIES": bool(cfg.combine_git_queries),
+                             "VERSION_DAEMON": bool(cfg.version_daemon),
+                             "VERSION_CACHE": bool(cfg.version_cache),
+                             "STATIC_VERSION_PY": bool(cfg.static_version_py),
+                             "DIRTY_CHECK": cfg.dirty_check or "git",
+                             "DIRTY_SCOPE": cfg.dirty_scope or "",
+                             "PATH_SCOPE": cfg.path_scope or "",
+                             "TIME_BUDGET": cfg.time_budget or 0,
                              })
         cmds["py2exe"] = cmd_py2exe
 
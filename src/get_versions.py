@@ -1,19 +1,42 @@
-import os, sys # --STRIP DURING BUILD
-from typing import Any, Dict # --STRIP DURING BUILD
+import asyncio, contextvars, functools, os, sys # --STRIP DURING BUILD
+from concurrent.futures import ThreadPoolExecutor # --STRIP DURING BUILD
+from typing import AbstractSet, Any, cast, Dict, Iterable, List, Optional, Set, Tuple # --STRIP DURING BUILD
 from .header import HANDLERS, get_root, get_config_from_root # --STRIP DURING BUILD
-from .header import NotThisMethod # --STRIP DURING BUILD
+from .header import CONFIG_MEMO, NotThisMethod, VersioneerConfig # --STRIP DURING BUILD
 from .from_file import versions_from_file # --STRIP DURING BUILD
 from .from_parentdir import versions_from_parentdir # --STRIP DURING BUILD
-from .render import render # --STRIP DURING BUILD
+from .pieces import Pieces # --STRIP DURING BUILD
+from .render import render, style_fields # --STRIP DURING BUILD
+from .subprocess_helper import budget_exceeded, time_budget, trace_span # --STRIP DURING BUILD
 
 class VersioneerBadRootError(Exception):
     """The project root directory is unknown or missing key files."""
 
 
+# versions computed by get_versions(), by (root, repr of the config)
+VERSIONS_MEMO: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+def invalidate_versions(root: Optional[str] = None) -> None:
+    """Forget the versions (and configs) remembered by get_versions().
+
+    Tools that change the source tree (commit, tag, rewrite setup.cfg) while
+    setup.py is running should call this, for one root or for all of them.
+    """
+    for memo in (VERSIONS_MEMO, CONFIG_MEMO):
+        for key in list(memo):
+            if root is None or key[0] == root:
+                del memo[key]
+
+
 def get_versions(verbose: bool = False) -> Dict[str, Any]:
     """Get the project version from whatever source is available.
 
     Returns dict with two keys: 'version' and 'full'.
+
+    The result is remembered for the rest of the process, so all setup.py
+    commands share a single computation; see invalidate_versions(). Verbose
+    calls always recompute, to show where the version comes from.
     """
     if "versioneer" in sys.modules:
         # see the discussion in cmdclass.py:get_cmdclass()
@@ -21,29 +44,191 @@ def get_versions(verbose: bool = False) -> Dict[str, Any]:
 
     root = get_root()
     cfg = get_config_from_root(root)
+    key = (root, repr(sorted(vars(cfg).items())))
+    if key in VERSIONS_MEMO and not (verbose or cfg.verbose):
+        return dict(VERSIONS_MEMO[key])
+    ver = versions_from_root(root, cfg, verbose)
+    VERSIONS_MEMO[key] = ver
+    return dict(ver)
+
+
+async def get_versions_async(root: Optional[str] = None,
+                             verbose: bool = False) -> Dict[str, Any]:
+    """Get the project version like get_versions(), without blocking.
+
+    This is for tools that run inside an event loop. The git commands run
+    as asyncio subprocesses, concurrently where they don't depend on each
+    other. root defaults to get_root(). Such tools usually outlive commits
+    and tags, so unlike get_versions() this always computes the version
+    (and then shares it with get_versions()).
+    """
+    if root is None:
+        root = get_root()
+    cfg = get_config_from_root(root)
+    key = (root, repr(sorted(vars(cfg).items())))
+    ver = await versions_from_root_async(root, cfg, verbose)
+    VERSIONS_MEMO[key] = ver
+    return dict(ver)
+
+
+def get_versions_many(
+    roots: Iterable[str],
+    verbose: bool = False,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Get the versions of many projects, like get_versions() for each root.
+
+    Returns a dict mapping each of roots to its version dict. Projects in
+    the same repository which use the same tag_prefix (and git options)
+    share a single computation of the pieces, each rendered in its own
+    style. The VCS queries of the different repositories run on a pool of
+    up to max_workers threads. Like get_versions_async(), this always
+    computes the versions, and then shares them with get_versions().
+    """
+    roots = list(roots)
+    configs: Dict[str, VersioneerConfig] = {}
+    versions: Dict[str, Dict[str, Any]] = {}
+    groups: Dict[Tuple[Any, ...], List[str]] = {}
+    # realpath(), like get_root(), so that each project is computed once
+    for root in set(map(os.path.realpath, roots)):
+        cfg = configs[root] = get_config_from_root(root)
+        key = (root, repr(sorted(vars(cfg).items())))
+        ver = versions_from_version_file(root, cfg,
+                                         verbose or bool(cfg.verbose))
+        if ver is not None:
+            versions[root] = VERSIONS_MEMO[key] = ver
+            continue
+        find_repo_f = HANDLERS[cast(str, cfg.VCS)].get("find_repo")
+        repo = find_repo_f(root) if find_repo_f else None
+        group = (cfg.VCS, repo or root, cfg.tag_prefix,
+                 cfg.combine_git_queries, cfg.git_coprocess,
+                 cfg.pure_python_git, cfg.tag_index,
+                 cfg.version_cache or cfg.static_version_py,
+                 cfg.version_daemon, cfg.dirty_check,
+                 # scopes are relative to each project
+                 root if cfg.dirty_scope or cfg.path_scope else None)
+        groups.setdefault(group, []).append(root)
+
+    def group_pieces(members: List[str]) -> Tuple[Optional[Pieces], str]:
+        # compute the pieces that any of the members' styles needs, or
+        # explain why that failed
+        fields: Optional[Set[str]] = set()
+        for root in members:
+            needed = style_fields(configs[root].style)
+            fields = None if needed is None or fields is None \
+                else fields | needed
+        cfg = configs[members[0]]
+        with time_budget(cfg.time_budget):
+            try:
+                with trace_span("strategy", name="vcs", root=members[0],
+                                shared_with=members[1:]):
+                    return pieces_from_root(members[0], cfg,
+                                            verbose or bool(cfg.verbose),
+                                            fields), ""
+            except NotThisMethod:
+                return None, unknown_version_error(cfg)
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        # each in a copy of this context, for any enclosing time_budget()
+        futures = {group: pool.submit(contextvars.copy_context().run,
+                                      group_pieces, members)
+                   for group, members in groups.items()}
+        for group, members in groups.items():
+            pieces, error = futures[group].result()
+            for root in members:
+                cfg = configs[root]
+                root_verbose = verbose or bool(cfg.verbose)
+                if pieces is not None:
+                    ver = render(pieces, cfg.style)
+                    if root_verbose:
+                        print("got version from VCS %s" % ver)
+                else:
+                    ver = versions_from_fallbacks(root, cfg, root_verbose,
+                                                  error)
+                key = (root, repr(sorted(vars(cfg).items())))
+                versions[root] = VERSIONS_MEMO[key] = ver
+
+    return {root: dict(versions[os.path.realpath(root)]) for root in roots}
+
+
+def versions_from_root(root: str, cfg: VersioneerConfig,
+                       verbose: bool = False) -> Dict[str, Any]:
+    """Compute the version of the project in root, configured by cfg."""
+    verbose = verbose or bool(cfg.verbose)  # `bool()` used to avoid `None`
+
+    # extract version from first of: _version.py, VCS command (e.g. 'git
+    # describe'), parentdir. This is meant to work for developers using a
+    # source checkout, for users of a tarball created by 'setup.py sdist',
+    # and for users of a tarball/zipball created by 'git archive' or github's
+    # download-from-tag feature or the equivalent in other VCSes.
+    with time_budget(cfg.time_budget):
+        ver = versions_from_version_file(root, cfg, verbose)
+        if ver is None:
+            ver = versions_from_vcs(root, cfg, verbose)
+        if ver is None:
+            ver = versions_from_fallbacks(root, cfg, verbose,
+                                          unknown_version_error(cfg))
+    return ver
 
+
+async def versions_from_root_async(root: str, cfg: VersioneerConfig,
+                                   verbose: bool = False) -> Dict[str, Any]:
+    """Compute the version like versions_from_root(), without blocking.
+
+    The version cache, the pure-python git reader, the git coprocess,
+    combined git queries, the index dirty check and path scopes have no
+    asyncio variant, so when they are enabled the VCS step runs in a thread.
+    """
+    verbose = verbose or bool(cfg.verbose)  # `bool()` used to avoid `None`
+    with time_budget(cfg.time_budget):
+        ver = versions_from_version_file(root, cfg, verbose)
+        if ver is None:
+            handlers = HANDLERS[cast(str, cfg.VCS)]
+            from_vcs_f = handlers.get("pieces_from_vcs_async")
+            if from_vcs_f and not (cfg.version_cache or cfg.static_version_py
+                                   or cfg.pure_python_git or cfg.tag_index
+                                   or cfg.git_coprocess
+                                   or cfg.combine_git_queries
+                                   or cfg.version_daemon
+                                   or cfg.dirty_check == "index"
+                                   or cfg.path_scope):
+                try:
+                    with trace_span("strategy", name="vcs", root=root):
+                        pieces = await from_vcs_f(cfg.tag_prefix, root, verbose,
+                                                  fields=style_fields(cfg.style))
+                    ver = render(pieces, cfg.style)
+                    if verbose:
+                        print("got version from VCS %s" % ver)
+                except NotThisMethod:
+                    pass
+            else:
+                ver = await asyncio.to_thread(versions_from_vcs, root, cfg,
+                                              verbose)
+        if ver is None:
+            ver = versions_from_fallbacks(root, cfg, verbose,
+                                          unknown_version_error(cfg))
+        return ver
+
+
+def versions_from_version_file(root: str, cfg: VersioneerConfig,
+                               verbose: bool) -> Optional[Dict[str, Any]]:
+    """Get the version from the keywords or contents of _version.py."""
     assert cfg.VCS is not None, "please set [versioneer]VCS= in setup.cfg"
     handlers = HANDLERS.get(cfg.VCS)
     assert handlers, "unrecognized VCS '%s'" % cfg.VCS
-    verbose = verbose or bool(cfg.verbose)  # `bool()` used to avoid `None`
     assert cfg.versionfile_source is not None, \
         "please set versioneer.versionfile_source"
     assert cfg.tag_prefix is not None, "please set versioneer.tag_prefix"
 
     versionfile_abs = os.path.join(root, cfg.versionfile_source)
 
-    # extract version from first of: _version.py, VCS command (e.g. 'git
-    # describe'), parentdir. This is meant to work for developers using a
-    # source checkout, for users of a tarball created by 'setup.py sdist',
-    # and for users of a tarball/zipball created by 'git archive' or github's
-    # download-from-tag feature or the equivalent in other VCSes.
-
     get_keywords_f = handlers.get("get_keywords")
     from_keywords_f = handlers.get("keywords")
     if get_keywords_f and from_keywords_f:
         try:
-            keywords = get_keywords_f(versionfile_abs)
-            ver = from_keywords_f(keywords, cfg.tag_prefix, verbose)
+            with trace_span("strategy", name="keywords", root=root):
+                keywords = get_keywords_f(versionfile_abs)
+                ver = from_keywords_f(keywords, cfg.tag_prefix, verbose)
             if verbose:
                 print("got version from expanded keyword %s" % ver)
             return ver
@@ -51,27 +236,96 @@ def get_versions(verbose: bool = False) -> Dict[str, Any]:
             pass
 
     try:
-        ver = versions_from_file(versionfile_abs)
+        with trace_span("strategy", name="file", root=root):
+            ver = versions_from_file(versionfile_abs)
         if verbose:
             print("got version from file %s %s" % (versionfile_abs, ver))
         return ver
     except NotThisMethod:
         pass
 
+    return None
+
+
+def versions_from_vcs(root: str, cfg: VersioneerConfig,
+                      verbose: bool) -> Optional[Dict[str, Any]]:
+    """Get the version from the VCS command (e.g. 'git describe')."""
+    try:
+        with trace_span("strategy", name="vcs", root=root):
+            pieces = pieces_from_root(root, cfg, verbose,
+                                      style_fields(cfg.style))
+    except NotThisMethod:
+        return None
+    ver = render(pieces, cfg.style)
+    if verbose:
+        print("got version from VCS %s" % ver)
+    return ver
+
+
+def pieces_from_root(root: str, cfg: VersioneerConfig, verbose: bool,
+                     fields: Optional[AbstractSet[str]]) -> Pieces:
+    """Get the version pieces of root from the VCS command.
+
+    Raises NotThisMethod if the VCS can't provide them.
+    """
+    handlers = HANDLERS[cast(str, cfg.VCS)]
     from_vcs_f = handlers.get("pieces_from_vcs")
-    if from_vcs_f:
+    if cfg.pure_python_git or cfg.tag_index:
+        from_vcs_f = handlers.get("pieces_from_gitdir", from_vcs_f)
+    from_cache_f = handlers.get("pieces_from_cache")
+    from_daemon_f = handlers.get("pieces_from_daemon")
+    if not from_vcs_f:
+        raise NotThisMethod("no pieces_from_vcs handler")
+    scope = cfg.path_scope.split() if cfg.path_scope else None
+    # the daemon only knows versions (and dirty flags) of whole repositories
+    if (cfg.version_daemon and from_daemon_f and scope is None
+            and not cfg.dirty_scope):
         try:
-            pieces = from_vcs_f(cfg.tag_prefix, root, verbose)
-            ver = render(pieces, cfg.style)
-            if verbose:
-                print("got version from VCS %s" % ver)
-            return ver
+            return from_daemon_f(cfg.tag_prefix, root, verbose, fields=fields)
         except NotThisMethod:
             pass
+    kwargs: Dict[str, Any] = {
+        "combine_queries": bool(cfg.combine_git_queries), "fields": fields}
+    if scope is not None:
+        kwargs["scope"] = scope
+    batch_runner_f = handlers.get("batch_runner")
+    if cfg.git_coprocess and batch_runner_f:
+        kwargs["runner"] = batch_runner_f
+    if cfg.tag_index and from_vcs_f is handlers.get("pieces_from_gitdir"):
+        kwargs["tag_index"] = True
+    dirty_f = handlers.get("dirty_from_index")
+    dirty_scope = None
+    if (cfg.dirty_check == "index" or scope is not None) and dirty_f:
+        # 'git describe --dirty' can't be limited to a path scope
+        dirty_scope = cfg.dirty_scope.split() if cfg.dirty_scope else scope
+        kwargs["dirty_from"] = functools.partial(dirty_f, root,
+                                                 scope=dirty_scope)
+    if (cfg.version_cache or cfg.static_version_py) and from_cache_f:
+        return from_cache_f(cfg.tag_prefix, root, verbose, from_vcs_f,
+                            dirty_scope=dirty_scope, **kwargs)
+    return from_vcs_f(cfg.tag_prefix, root, verbose, **kwargs)
+
+
+def unknown_version_error(cfg: VersioneerConfig) -> str:
+    """Explain why the VCS didn't provide a version."""
+    if budget_exceeded():
+        return ("unable to compute version within time_budget (%gs)"
+                % cast(float, cfg.time_budget))
+    return "unable to compute version"
+
 
+def versions_from_fallbacks(
+    root: str,
+    cfg: VersioneerConfig,
+    verbose: bool,
+    error: str = "unable to compute version",
+) -> Dict[str, Any]:
+    """Get the version from parentdir, or give up with error."""
     try:
         if cfg.parentdir_prefix:
-            ver = versions_from_parentdir(cfg.parentdir_prefix, root, verbose)
+            with trace_span("strategy", name="parentdir", root=root):
+                ver = versions_from_parentdir(cfg.parentdir_prefix, root,
+                                              verbose)
             if verbose:
                 print("got version from parentdir %s" % ver)
             return ver
@@ -79,11 +333,10 @@ def get_versions(verbose: bool = False) -> Dict[str, Any]:
         pass
 
     if verbose:
-        print("unable to compute version")
+        print(error)
 
     return {"version": "0+unknown", "full-revisionid": None,
-            "dirty": None, "error": "unable to compute version",
-            "date": None}
+            "dirty": None, "error": error, "date": None}
 
 
 def get_version() -> str:
@@ -0,0 +1,156 @@
+import os  # --STRIP DURING BUILD
+from typing import Any, Callable, Dict, List, Optional  # --STRIP DURING BUILD
+from .long_header import NotThisMethod, register_vcs_handler  # --STRIP DURING BUILD
+from .checkout import GitCheckout, find_git_dir, git_index_stat  # --STRIP DURING BUILD
+from pieces import Pieces  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+VERSION_CACHE_FILE = "versioneer-cache.json"
+# version 2 stores pieces as Pieces.to_json() lists
+VERSION_CACHE_FORMAT = 2
+
+
+def git_fingerprint(repo: GitCheckout) -> List[Any]:
+    """Describe the state of a repository that version pieces depend on.
+
+    This is the target of HEAD and the stat data of the files and
+    directories holding branches and tags, i.e. a few stat() calls. The
+    index and the checked-out files only matter for the dirty flag, which
+    git_pieces_from_cache() handles separately ('git describe --dirty'
+    rewrites the index anyway).
+    """
+    with open(os.path.join(repo.git_dir, "HEAD")) as fobj:
+        fingerprint: List[Any] = [fobj.read().strip(), repo.resolve_ref("HEAD")]
+    for name in ["packed-refs", "shallow"]:
+        try:
+            st = os.stat(os.path.join(repo.git_dir, name))
+            fingerprint.append([name, st.st_mtime_ns, st.st_size])
+        except OSError:
+            fingerprint.append([name, None, None])
+    # Refs are updated by renaming a lockfile into place, which also changes
+    # the mtime of the directory they are in.
+    for top in ["refs/heads", "refs/tags"]:
+        for dirpath, _, _ in os.walk(os.path.join(repo.git_dir, top)):
+            st = os.stat(dirpath)
+            fingerprint.append([os.path.relpath(dirpath, repo.git_dir),
+                                st.st_mtime_ns, st.st_size])
+    return fingerprint
+
+
+def read_version_cache(git_dir: str) -> Dict[str, Any]:
+    """Read the cache entries stored in git_dir, or {} if there are none."""
+    import json
+    try:
+        with open(os.path.join(git_dir, VERSION_CACHE_FILE)) as fobj:
+            cache = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != VERSION_CACHE_FORMAT:
+        return {}
+    return cache.get("entries", {})
+
+
+def write_version_cache(git_dir: str, entries: Dict[str, Any]) -> None:
+    """Atomically replace the cache file in git_dir."""
+    import json
+    import threading
+    filename = os.path.join(git_dir, VERSION_CACHE_FILE)
+    # unique per thread, too: the cache is written from worker threads
+    tmp = "%s.%d.%d.tmp" % (filename, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp, "w") as fobj:
+            json.dump({"version": VERSION_CACHE_FORMAT, "entries": entries},
+                      fobj)
+        os.replace(tmp, filename)
+    except OSError:
+        # a read-only checkout just doesn't get a cache
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+@register_vcs_handler("git", "pieces_from_cache")
+def git_pieces_from_cache(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    pieces_from: Callable,
+    check_dirty: bool = True,
+    dirty_scope: Optional[List[str]] = None,
+    **kwargs: Any,
+) -> Pieces:
+    """Get version pieces from the cache in .git, or compute and store them.
+
+    pieces_from (e.g. git_pieces_from_vcs) is called with the remaining
+    arguments when the cached pieces are missing or out of date. Entries
+    remember which fields (see render.style_fields()) they were computed
+    for, and only answer calls that need no more than that.
+
+    The dirty flag of cached pieces is rechecked (and stored if it changed)
+    unless check_dirty is false, in which case a hit costs only the stat()
+    calls of git_fingerprint() and of the index, and the dirty flag is the
+    one last stored. Entries are then also out of date when the index
+    changed since they were stored, e.g. after 'git add' or 'git status'.
+    The recheck uses the dirty_from argument for pieces_from, if given;
+    dirty_scope names the paths that dirty_from limits itself to. Pieces
+    computed for a path scope or dirty scope are stored separately for each
+    root and scope.
+    """
+    import json
+    fields = kwargs.get("fields")
+    dirty_from = kwargs.get("dirty_from")
+    key = tag_prefix
+    if kwargs.get("scope") is not None or dirty_scope is not None:
+        key = json.dumps([tag_prefix, os.path.abspath(root), kwargs.get("scope"),
+                          dirty_scope])
+    found = find_git_dir(root)
+    repo: Optional[GitCheckout] = None
+    fingerprint = None
+    if found is not None:
+        try:
+            repo = GitCheckout(*found)
+            fingerprint = git_fingerprint(repo)
+        except (NotThisMethod, OSError):
+            repo = None
+
+    if repo is not None:
+        entry = read_version_cache(repo.git_dir).get(key)
+        if (entry and entry.get("fingerprint") == fingerprint
+                and (check_dirty
+                     or entry.get("index") == git_index_stat(repo.git_dir))
+                and (entry.get("fields") is None
+                     or (fields is not None
+                         and set(fields) <= set(entry["fields"])))):
+            try:
+                pieces = Pieces.from_json(entry["pieces"])
+                if check_dirty and not pieces["error"]:
+                    dirty = pieces["dirty"]
+                    pieces["dirty"] = (dirty_from or repo.is_dirty)(
+                        pieces["long"])
+                    if pieces["dirty"] != dirty:
+                        entry["pieces"] = pieces.to_json()
+                        entry["index"] = git_index_stat(repo.git_dir)
+                        entries = read_version_cache(repo.git_dir)
+                        entries[key] = entry
+                        write_version_cache(repo.git_dir, entries)
+                if verbose:
+                    print("got pieces from %s" % VERSION_CACHE_FILE)
+                return pieces
+            except (NotThisMethod, OSError, ValueError):
+                pass
+
+    pieces = pieces_from(tag_prefix, root, verbose, **kwargs)
+    if repo is not None:
+        # This uses the fingerprint taken before computing the pieces, so
+        # changes made meanwhile make the entry stale rather than wrong.
+        entries = read_version_cache(repo.git_dir)
+        # The index is stat()ed afterwards, though: 'git describe --dirty'
+        # may have refreshed it.
+        entries[key] = {
+            "fingerprint": fingerprint, "pieces": pieces.to_json(),
+            "fields": None if fields is None else sorted(fields),
+            "index": git_index_stat(repo.git_dir)}
+        write_version_cache(repo.git_dir, entries)
+    return pieces
+
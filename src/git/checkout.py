@@ -0,0 +1,582 @@
+import os  # --STRIP DURING BUILD
+import re  # --STRIP DURING BUILD
+import sys  # --STRIP DURING BUILD
+import stat  # --STRIP DURING BUILD
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple  # --STRIP DURING BUILD
+from .long_header import NotThisMethod, register_vcs_handler  # --STRIP DURING BUILD
+from .packfile import PackFile, find_packs  # --STRIP DURING BUILD
+from subprocess_helper import run_command, trace  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+@register_vcs_handler("git", "find_repo")
+def find_git_dir(root: str) -> Optional[Tuple[str, str]]:
+    """Find the .git directory (and its work tree) that root belongs to.
+
+    Like git itself, this searches root and then its parent directories.
+    Returns None if root is not inside a git checkout.
+    """
+    work_tree = os.path.abspath(root)
+    while True:
+        dot_git = os.path.join(work_tree, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git, work_tree
+        if os.path.isfile(dot_git):
+            # submodules and linked worktrees use a "gitdir: PATH" file
+            with open(dot_git) as fobj:
+                line = fobj.readline()
+            if not line.startswith("gitdir: "):
+                return None
+            git_dir = os.path.join(work_tree, line[len("gitdir: "):].strip())
+            return os.path.normpath(git_dir), work_tree
+        parent = os.path.dirname(work_tree)
+        if parent == work_tree:
+            return None
+        work_tree = parent
+
+
+def read_git_config(filename: str) -> Dict[str, str]:
+    """Read the "section.key" (or "section.subsection.key") settings we use.
+
+    This understands just enough of git's config syntax to find settings
+    like core.filemode. Keys are lowercased, the last value wins.
+    """
+    config: Dict[str, str] = {}
+    section = ""
+    try:
+        with open(filename) as fobj:
+            for line in fobj:
+                line = line.strip()
+                mo = re.match(r'\[\s*([\w.-]+)(?:\s+"(.*)")?\s*\]', line)
+                if mo:
+                    section = mo.group(1).lower()
+                    if mo.group(2) is not None:
+                        section += "." + mo.group(2)
+                    continue
+                if not line or line[0] in "#;" or not section:
+                    continue
+                key, _, value = line.partition("=")
+                value = value.split(" #")[0].split(" ;")[0].strip().strip('"')
+                config[section + "." + key.strip().lower()] = value or "true"
+    except OSError:
+        pass
+    return config
+
+
+def read_git_configs(git_dir: str) -> Dict[str, str]:
+    """Read the settings that apply to git_dir, like read_git_config().
+
+    The system, user and repository config files are read in git's order,
+    so later ones win, and GIT_CONFIG_COUNT settings in the environment
+    override them all. Include directives are not followed.
+    """
+    home = os.path.expanduser("~")
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    filenames = []
+    if not os.environ.get("GIT_CONFIG_NOSYSTEM"):
+        filenames.append(os.environ.get("GIT_CONFIG_SYSTEM", "/etc/gitconfig"))
+    if "GIT_CONFIG_GLOBAL" in os.environ:
+        filenames.append(os.environ["GIT_CONFIG_GLOBAL"])
+    else:
+        filenames += [os.path.join(xdg, "git", "config"),
+                      os.path.join(home, ".gitconfig")]
+    filenames.append(os.path.join(git_dir, "config"))
+    config: Dict[str, str] = {}
+    for filename in filenames:
+        config.update(read_git_config(filename))
+    try:
+        count = int(os.environ.get("GIT_CONFIG_COUNT", "0"))
+    except ValueError:
+        count = 0
+    for i in range(count):
+        key = os.environ.get("GIT_CONFIG_KEY_%d" % i, "")
+        section, _, name = key.rpartition(".")
+        first, dot, subsection = section.partition(".")
+        if section:
+            key = first.lower() + dot + subsection + "." + name.lower()
+            config[key] = os.environ.get("GIT_CONFIG_VALUE_%d" % i) or "true"
+    return config
+
+
+TRUE_VALUES = ("true", "yes", "on", "1")
+FALSE_VALUES = ("false", "no", "off", "0")
+
+# attributes that make git convert files between the index and the work tree
+CONVERTING_ATTRIBUTES = ("text", "eol", "crlf", "filter", "ident",
+                         "working-tree-encoding")
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode one of git's "offset" varints, returning (value, new_pos)."""
+    c = data[pos]
+    value = c & 0x7f
+    pos += 1
+    while c & 0x80:
+        c = data[pos]
+        value = ((value + 1) << 7) | (c & 0x7f)
+        pos += 1
+    return value, pos
+
+
+class IndexEntry(NamedTuple):
+    """One entry of the .git/index file."""
+
+    path: bytes
+    mode: int
+    sha: str
+    stage: int
+    skip: bool  # assume-valid or skip-worktree: don't look at the file
+    ctime: int
+    mtime: int
+    mtime_ns: int
+    size: int
+
+
+def read_git_index(filename: str) -> Tuple[List[IndexEntry], Optional[str]]:
+    """Parse a .git/index file.
+
+    Returns the entries and the tree id recorded for the whole index by the
+    cache-tree extension (None if that is missing or invalidated).
+    """
+    import struct
+    with open(filename, "rb") as fobj:
+        data = fobj.read()
+    signature, version, count = struct.unpack(">4sII", data[:12])
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise NotThisMethod("unsupported index format")
+    entries = []
+    pos = 12
+    path = b""
+    for _ in range(count):
+        (ctime, _, mtime, mtime_ns, _, _, mode, _, _, size, sha,
+         flags) = struct.unpack(">10I20sH", data[pos:pos + 62])
+        start = pos
+        pos += 62
+        skip = bool(flags & 0x8000)
+        if flags & 0x4000 and version >= 3:
+            extended, = struct.unpack(">H", data[pos:pos + 2])
+            skip = skip or bool(extended & 0x4000)
+            pos += 2
+        if version == 4:
+            # paths are prefix-compressed against the previous entry
+            strip, pos = decode_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = path[:len(path) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            pos = start + ((end - start + 8) & ~7)
+        entries.append(IndexEntry(path, mode, sha.hex(), (flags >> 12) & 3,
+                                  skip, ctime, mtime, mtime_ns, size))
+    tree = None
+    while pos + 8 <= len(data) - 20:
+        ext, ext_size = struct.unpack(">4sI", data[pos:pos + 8])
+        ext_data = data[pos + 8:pos + 8 + ext_size]
+        pos += 8 + ext_size
+        if ext in (b"link", b"sdir"):
+            raise NotThisMethod("split and sparse indexes are not supported")
+        if ext == b"TREE":
+            # the first record describes the root: "\0COUNT SUBTREES\nSHA"
+            header, _, rest = ext_data[1:].partition(b"\n")
+            if int(header.split()[0]) >= 0:
+                tree = rest[:20].hex()
+    return entries, tree
+
+
+def blob_sha(data: bytes) -> str:
+    """Compute the id git would give to a blob with the given contents."""
+    import hashlib
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+# the number of index entries is_dirty() checks per task of its thread pool
+DIRTY_CHUNK_SIZE = 256
+
+
+class DirtyCheck(NamedTuple):
+    """The checked-out files to compare with an index that matches HEAD."""
+
+    entries: List[IndexEntry]
+    index_mtime_ns: int
+    converting: bool
+
+
+def git_index_stat(git_dir: str) -> Optional[List[int]]:
+    """Get the inode, mtime and size of the index, or None if it's missing.
+
+    Git replaces the index (by renaming a new one into place) whenever it
+    changes, so this changes with it.
+    """
+    try:
+        st = os.stat(os.path.join(git_dir, "index"))
+    except OSError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+class GitCheckout:
+    """Read-only access to the refs, objects and index of a .git directory.
+
+    This is the part of GitDir that the version cache and the dirty check
+    of _version.py need. Anything it doesn't support raises NotThisMethod,
+    so the caller can fall back to running git.
+    """
+
+    def __init__(self, git_dir: str, work_tree: str) -> None:
+        """Check that we can read git_dir and set up the lookups."""
+        self.git_dir = git_dir
+        self.work_tree = work_tree
+        if os.path.exists(os.path.join(git_dir, "commondir")):
+            raise NotThisMethod("linked worktrees are not supported")
+        self.config = read_git_configs(git_dir)
+        if self.config.get("extensions.objectformat", "sha1") != "sha1":
+            raise NotThisMethod("only sha1 repositories are supported")
+        if self.config.get("extensions.refstorage", "files") != "files":
+            raise NotThisMethod("only the 'files' ref storage is supported")
+        if "core.worktree" in self.config:
+            raise NotThisMethod("core.worktree is not supported")
+        objects = os.path.join(git_dir, "objects")
+        self.object_dirs = [objects]
+        try:
+            with open(os.path.join(objects, "info", "alternates")) as fobj:
+                self.object_dirs += [os.path.join(objects, line.strip())
+                                     for line in fobj if line.strip()]
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(git_dir, "shallow")) as fobj:
+                self.shallow = {line.strip() for line in fobj}
+        except OSError:
+            self.shallow = set()
+        self.commits: Dict[str, Tuple[str, List[str], int, str]] = {}
+        self.packs: Optional[List[PackFile]] = None
+        self.packed: Optional[Dict[str, Tuple[str, Optional[str]]]] = None
+
+    def packed_refs(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Map refnames in packed-refs to (sha, peeled sha or None)."""
+        if self.packed is None:
+            self.packed = {}
+            try:
+                with open(os.path.join(self.git_dir, "packed-refs")) as fobj:
+                    lines = fobj.read().splitlines()
+            except OSError:
+                lines = []
+            if lines and lines[0].startswith("#") and " peeled" not in lines[0]:
+                raise NotThisMethod("packed-refs without peeled tags")
+            name = None
+            for line in lines:
+                if line.startswith("^") and name is not None:
+                    self.packed[name] = (self.packed[name][0], line[1:])
+                elif line and not line.startswith("#"):
+                    sha, name = line.split(" ", 1)
+                    self.packed[name] = (sha, None)
+        return self.packed
+
+    def resolve_ref(self, name: str) -> Optional[str]:
+        """Return the sha a (possibly symbolic) ref points to, or None."""
+        for _ in range(5):
+            try:
+                with open(os.path.join(self.git_dir, name)) as fobj:
+                    value = fobj.read().strip()
+            except OSError:
+                packed = self.packed_refs().get(name)
+                return packed[0] if packed else None
+            if not value.startswith("ref: "):
+                return value
+            name = value[len("ref: "):]
+        return None
+
+    def refs(self, prefix: str) -> Dict[str, str]:
+        """Map the names of all refs under prefix (e.g. refs/tags/) to shas."""
+        refs = {name: sha for name, (sha, _) in self.packed_refs().items()
+                if name.startswith(prefix)}
+        top = os.path.join(self.git_dir, prefix)
+        for dirpath, _, filenames in os.walk(top):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = prefix + os.path.relpath(path, top).replace(os.sep, "/")
+                sha = self.resolve_ref(name)
+                if sha:
+                    refs[name] = sha
+        return refs
+
+    def find_packs(self) -> List[PackFile]:
+        """List the packs of all object directories."""
+        if self.packs is None:
+            self.packs = find_packs(self.object_dirs)
+        return self.packs
+
+    def find_packed(self, sha: str) -> Optional[Tuple[PackFile, int]]:
+        """Look up the (pack, offset) of an object in the pack indexes."""
+        for pack in self.find_packs():
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack, offset
+        return None
+
+    def read_object(self, sha: str) -> Tuple[str, bytes]:
+        """Return the (type, contents) of an object."""
+        import zlib
+        for objects in self.object_dirs:
+            try:
+                with open(os.path.join(objects, sha[:2], sha[2:]), "rb") as fobj:
+                    raw = zlib.decompress(fobj.read())
+            except OSError:
+                continue
+            header, _, body = raw.partition(b"\0")
+            return header.split(b" ")[0].decode(), body
+        found = self.find_packed(sha)
+        if found is None:
+            raise NotThisMethod("object %s not found" % sha)
+        pack, offset = found
+        return pack.read(offset, self.read_object)
+
+    def read_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Return the (tree, parents, timestamp, timezone) of a commit."""
+        if sha not in self.commits:
+            self.commits[sha] = self.parse_commit(sha)
+        return self.commits[sha]
+
+    def parse_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Read the (tree, parents, timestamp, timezone) from a commit object."""
+        kind, body = self.read_object(sha)
+        if kind != "commit":
+            raise NotThisMethod("%s is a %s, not a commit" % (sha, kind))
+        headers = body.split(b"\n\n", 1)[0].decode("utf-8", "replace")
+        tree, when, tz = "", 0, "+0000"
+        parents: List[str] = []
+        for line in headers.splitlines():
+            key, _, value = line.partition(" ")
+            if key == "tree":
+                tree = value
+            elif key == "parent" and sha not in self.shallow:
+                parents.append(value)
+            elif key == "committer":
+                when_s, tz = value.rsplit(" ", 2)[1:]
+                when = int(when_s)
+        return tree, parents, when, tz
+
+    def tree_entries(self, sha: str,
+                     prefix: bytes = b"") -> Dict[bytes, Tuple[int, str]]:
+        """Recursively list a tree object as {path: (mode, sha)}."""
+        kind, data = self.read_object(sha)
+        entries = {}
+        pos = 0
+        while pos < len(data):
+            space = data.index(b" ", pos)
+            nul = data.index(b"\0", space)
+            mode = int(data[pos:space], 8)
+            path = prefix + data[space + 1:nul]
+            entry_sha = data[nul + 1:nul + 21].hex()
+            pos = nul + 21
+            if mode == 0o40000:
+                entries.update(self.tree_entries(entry_sha, path + b"/"))
+            else:
+                if stat.S_ISREG(mode):
+                    mode = 0o100755 if mode & 0o111 else 0o100644
+                entries[path] = (mode, entry_sha)
+        return entries
+
+    def converts_files(self, entries: List[IndexEntry]) -> bool:
+        """Tell whether git may convert files between the index and work tree.
+
+        With end-of-line conversion (core.autocrlf, core.eol) or one of the
+        CONVERTING_ATTRIBUTES in a .gitattributes file (among entries), in
+        .git/info/attributes or in core.attributesFile, git compares the
+        converted contents of a file with the index. Attributes that turn
+        conversion off ("-text", "!eol") don't count.
+        """
+        if (self.config.get("core.autocrlf", "false").lower() not in FALSE_VALUES
+                or "core.eol" in self.config):
+            return True
+        xdg = (os.environ.get("XDG_CONFIG_HOME")
+               or os.path.join(os.path.expanduser("~"), ".config"))
+        filenames = [
+            os.path.join(self.git_dir, "info", "attributes"),
+            os.path.expanduser(self.config.get(
+                "core.attributesfile", os.path.join(xdg, "git", "attributes"))),
+        ]
+        filenames += [os.path.join(self.work_tree, os.fsdecode(entry.path))
+                      for entry in entries if entry.path == b".gitattributes"
+                      or entry.path.endswith(b"/.gitattributes")]
+        for filename in filenames:
+            try:
+                with open(filename, "rb") as fobj:
+                    lines = fobj.read().decode("utf-8", "replace").splitlines()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                words = line.split()
+                if not words or words[0].startswith("#"):
+                    continue
+                for attr in words[1:]:
+                    if (attr[0] not in "-!"
+                            and attr.split("=")[0] in CONVERTING_ATTRIBUTES):
+                        return True
+        return False
+
+    def is_modified(self, entry: IndexEntry, index_mtime_ns: int,
+                    converting: bool = False) -> bool:
+        """Tell whether the checked-out file differs from its index entry.
+
+        With converting (see converts_files()), files that would have to
+        be compared by content raise NotThisMethod instead.
+        """
+        path = os.path.join(self.work_tree, os.fsdecode(entry.path))
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return True
+        if entry.mode == 0o120000:
+            if not stat.S_ISLNK(st.st_mode):
+                return True
+        elif not stat.S_ISREG(st.st_mode):
+            return True
+        elif (self.config.get("core.filemode", "true").lower() in TRUE_VALUES
+              and (st.st_mode ^ entry.mode) & 0o100):
+            return True
+        if st.st_size & 0xffffffff != entry.size:
+            return True
+        entry_mtime_ns = entry.mtime * 10**9 + entry.mtime_ns
+        if (st.st_mtime_ns == entry_mtime_ns and int(st.st_ctime) == entry.ctime
+                and entry_mtime_ns < index_mtime_ns):
+            return False
+        # The stat data differs, or the file was modified too close to the
+        # index being written to trust it ("racy git"): compare contents.
+        if entry.mode == 0o120000:
+            return blob_sha(os.fsencode(os.readlink(path))) != entry.sha
+        if converting:
+            raise NotThisMethod("%s may be converted by git" % path)
+        with open(path, "rb") as fobj:
+            return blob_sha(fobj.read()) != entry.sha
+
+    def index_check(self, head: str, scope: Optional[List[bytes]] = None
+                    ) -> Optional[DirtyCheck]:
+        """Compare the index with the HEAD commit, the first half of is_dirty().
+
+        Returns None if they differ (so the checkout is dirty), else what
+        files_modified() needs to compare the checked-out files. This only
+        depends on HEAD and the index, so it can be reused while neither
+        changes (see git_index_stat()).
+        """
+        index = os.path.join(self.git_dir, "index")
+        try:
+            entries, tree = read_git_index(index)
+            index_mtime_ns = os.stat(index).st_mtime_ns
+        except OSError:
+            raise NotThisMethod("unable to read %s" % index)
+        converting = self.converts_files(entries)
+
+        def in_scope(path: bytes) -> bool:
+            return scope is None or any(
+                path == prefix or path.startswith(prefix + b"/")
+                for prefix in scope)
+
+        if scope is not None:
+            entries = [entry for entry in entries if in_scope(entry.path)]
+        if any(entry.mode == 0o160000 for entry in entries):
+            raise NotThisMethod("submodules are not supported")
+        if any(entry.stage for entry in entries):
+            return None
+        head_tree = self.read_commit(head)[0]
+        if tree != head_tree:
+            indexed = {entry.path: (entry.mode, entry.sha) for entry in entries}
+            committed = {path: entry for path, entry
+                         in self.tree_entries(head_tree).items()
+                         if in_scope(path)}
+            if indexed != committed:
+                return None
+        return DirtyCheck([entry for entry in entries if not entry.skip],
+                          index_mtime_ns, converting)
+
+    def files_modified(self, check: DirtyCheck,
+                       max_workers: Optional[int] = None) -> bool:
+        """Compare the checked-out files, the second half of is_dirty().
+
+        The files of large trees are stat()ed on a pool of up to
+        max_workers threads.
+        """
+        def any_modified(chunk: List[IndexEntry]) -> bool:
+            return any(self.is_modified(entry, check.index_mtime_ns,
+                                        check.converting)
+                       for entry in chunk)
+
+        checked = check.entries
+        chunks = [checked[i:i + DIRTY_CHUNK_SIZE]
+                  for i in range(0, len(checked), DIRTY_CHUNK_SIZE)]
+        if len(chunks) <= 1 or max_workers == 1:
+            return any_modified(checked)
+        # only large trees get here, and concurrent.futures is slow to import
+        from concurrent.futures import ThreadPoolExecutor
+        # lstat() releases the GIL, so threads overlap the waits for the
+        # filesystem (which add up on network or cold filesystems)
+        pool = ThreadPoolExecutor(max_workers)
+        try:
+            return any(pool.map(any_modified, chunks))
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def is_dirty(self, head: str, scope: Optional[List[bytes]] = None,
+                 max_workers: Optional[int] = None) -> bool:
+        """Tell whether the index or work tree differ from the HEAD commit.
+
+        Files whose stat data doesn't match the index are compared by
+        content. If git would convert them first (see converts_files()),
+        this raises NotThisMethod instead, so that git decides. With
+        scope, a list of paths relative to the work tree, only files below
+        those paths are compared. The checked-out files of large trees are
+        stat()ed on a pool of up to max_workers threads.
+        """
+        check = self.index_check(head, scope)
+        return check is None or self.files_modified(check, max_workers)
+
+
+@register_vcs_handler("git", "dirty_from_index")
+def git_dirty_from_index(
+    root: str,
+    head: str,
+    scope: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    runner: Callable = run_command,
+) -> bool:
+    """Tell whether the checkout of root differs from head.
+
+    This answers like 'git describe --dirty', by comparing the stat data
+    cached in .git/index with the checked-out files instead of starting
+    git. With scope, a list of paths relative to root, only files below
+    those paths count, so that a project in a subdirectory isn't dirty
+    because of changes elsewhere in the repository. Repositories that
+    GitCheckout can't read are handed over to 'git status'.
+    """
+    import struct
+    import zlib
+    found = find_git_dir(root)
+    if found is None:
+        raise NotThisMethod("no .git directory found")
+    prefixes: Optional[List[bytes]] = None
+    if scope:
+        prefixes = []
+        for path in scope:
+            rel = os.path.relpath(os.path.join(os.path.abspath(root), path),
+                                  found[1])
+            if rel == os.curdir:
+                prefixes = None
+                break
+            prefixes.append(os.fsencode(rel.replace(os.sep, "/")))
+    try:
+        return GitCheckout(*found).is_dirty(head, prefixes, max_workers)
+    except (NotThisMethod, OSError, ValueError, IndexError, struct.error,
+            zlib.error) as e:
+        trace("fallback", name="dirty_from_index", root=root,
+              exception=type(e).__name__, message=str(e))
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+    env = os.environ.copy()
+    env.pop("GIT_DIR", None)
+    out, rc = runner(GITS, ["status", "--porcelain", "--untracked-files=no",
+                            "--"] + (scope or []), cwd=root, env=env)
+    if rc != 0 or out is None:
+        raise NotThisMethod("'git status' returned error")
+    return bool(out.strip())
+
@@ -0,0 +1,340 @@
+import os  # --STRIP DURING BUILD
+import atexit  # --STRIP DURING BUILD
+import re  # --STRIP DURING BUILD
+import subprocess  # --STRIP DURING BUILD
+import threading  # --STRIP DURING BUILD
+import time  # --STRIP DURING BUILD
+from typing import Dict, List, Optional, Set, Tuple  # --STRIP DURING BUILD
+from .long_header import register_vcs_handler  # --STRIP DURING BUILD
+from .from_gitdir import format_git_date  # --STRIP DURING BUILD
+from subprocess_helper import command_timeout, run_command, trace  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+class GitBatch:
+    """A 'git cat-file --batch' process kept running for one source tree.
+
+    Object and ref lookups are written to its stdin and answered on its
+    stdout, so they don't cost a git process each. The git directory is
+    looked up once, when the process starts.
+    """
+
+    def __init__(self, commands: List[str], root: str,
+                 env: Optional[Dict[str, str]] = None,
+                 timeout: Optional[float] = None) -> None:
+        """Start 'git cat-file --batch' in root. Raises OSError on failure."""
+        git_dir, rc = run_command(commands, ["rev-parse", "--git-dir"],
+                                  cwd=root, hide_stderr=True, env=env,
+                                  timeout=timeout)
+        if rc != 0 or git_dir is None:
+            raise OSError("%s is not in a git repository" % root)
+        self.git_dir = git_dir
+        self.git_path = os.path.join(root, git_dir)
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.process: Optional[subprocess.Popen] = None
+        for command in commands:
+            try:
+                self.process = subprocess.Popen(
+                    [command, "cat-file", "--batch"], cwd=root, env=env,
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL)
+                break
+            except FileNotFoundError:
+                continue
+        if self.process is None:
+            raise OSError("unable to find command, tried %s" % (commands,))
+        trace("subprocess", argv=[command, "cat-file", "--batch"], cwd=root,
+              coprocess=True)
+
+    def is_usable(self) -> bool:
+        """Tell whether this process can answer queries in this process.
+
+        After a fork, the child must not share the parent's pipes; it
+        starts its own coprocess instead.
+        """
+        return (self.pid == os.getpid() and self.process is not None
+                and self.process.poll() is None)
+
+    def query(self, *names: str, timeout: Optional[float] = None,
+              ) -> List[Optional[Tuple[str, str, bytes]]]:
+        """Look up objects by name (e.g. "HEAD" or "v1.0^{commit}").
+
+        All names are sent before reading the answers, so the lookups are
+        pipelined. Each answer is (id, type, contents), or None if the name
+        doesn't resolve. Like run_command(), a query that takes longer than
+        timeout seconds, or than what is left of the time_budget(), kills
+        the process. Raises OSError if the process died or was killed.
+        """
+        process = self.process
+        assert process is not None
+        assert process.stdin is not None
+        assert process.stdout is not None
+        timeout = command_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            trace("coprocess", names=list(names), duration=0, timed_out=True)
+            raise OSError("no time left to query git cat-file")
+        start = time.perf_counter()
+        answers: List[Optional[Tuple[str, str, bytes]]] = []
+        # reading blocks, so the timeout is enforced from another thread
+        expired = threading.Event()
+
+        def expire() -> None:
+            expired.set()
+            process.kill()
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+        with self.lock:
+            if timer is not None:
+                timer.start()
+            try:
+                process.stdin.write(
+                    b"".join(name.encode() + b"\n" for name in names))
+                process.stdin.flush()
+                for _ in names:
+                    header = process.stdout.readline().split()
+                    if not header:
+                        raise OSError("git cat-file %s" % (
+                            "timed out" if expired.is_set() else "exited"))
+                    if len(header) != 3:  # "NAME missing" or "NAME ambiguous"
+                        answers.append(None)
+                        continue
+                    body = process.stdout.read(int(header[2]) + 1)[:-1]
+                    answers.append((header[0].decode(), header[1].decode(),
+                                    body))
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                trace("coprocess", names=list(names),
+                      duration=time.perf_counter() - start,
+                      timed_out=expired.is_set())
+        if expired.is_set():
+            # the answers may be cut short
+            raise OSError("git cat-file timed out")
+        return answers
+
+    def read_head(self) -> Optional[str]:
+        """Read what HEAD points at: a ref name, or a commit id if detached.
+
+        Returns None if HEAD isn't a plain file we understand.
+        """
+        try:
+            with open(os.path.join(self.git_path, "HEAD")) as fobj:
+                value = fobj.read().strip()
+        except OSError:
+            return None
+        if value.startswith("ref: "):
+            value = value[len("ref: "):]
+            # HEAD of a repository with the reftable ref storage
+            return None if value == "refs/heads/.invalid" else value
+        return value if re.fullmatch(r"[0-9a-f]{40}", value) else None
+
+    def branch_names(self) -> Optional[List[str]]:
+        """List the local branches, from the loose refs and packed-refs.
+
+        Only their names are read: cat-file resolves them. Returns None if
+        the refs aren't stored as files.
+        """
+        common_dir = self.git_path
+        try:
+            with open(os.path.join(self.git_path, "commondir")) as fobj:
+                common_dir = os.path.join(self.git_path, fobj.read().strip())
+        except OSError:
+            pass
+        heads = os.path.join(common_dir, "refs", "heads")
+        if not os.path.isdir(heads):
+            return None
+        names: Set[str] = set()
+        for dirpath, _, filenames in os.walk(heads):
+            for filename in filenames:
+                if not filename.endswith(".lock"):
+                    path = os.path.relpath(os.path.join(dirpath, filename),
+                                           heads)
+                    names.add(path.replace(os.sep, "/"))
+        try:
+            with open(os.path.join(common_dir, "packed-refs")) as fobj:
+                for line in fobj:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1].startswith("refs/heads/"):
+                        names.add(parts[1][len("refs/heads/"):])
+        except OSError:
+            pass
+        return sorted(names)
+
+    def detach(self) -> None:
+        """Let go of a process started before a fork, in the child.
+
+        The child's copies of the pipes are closed, so the process still
+        sees its stdin close when the parent stops it.
+        """
+        if self.process is None:
+            return
+        for pipe in (self.process.stdin, self.process.stdout):
+            if pipe is not None:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+        self.process = None
+
+    def close(self) -> None:
+        """Stop the process, if it belongs to this process."""
+        if self.process is None or self.pid != os.getpid():
+            return
+        try:
+            assert self.process.stdin is not None
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        if self.process.stdout is not None:
+            self.process.stdout.close()
+        self.process = None
+
+
+# the running coprocesses, by source tree, git commands and environment
+GIT_BATCHES: Dict[Tuple[str, Tuple[str, ...],
+                        Optional[Tuple[Tuple[str, str], ...]]],
+                  GitBatch] = {}
+GIT_BATCHES_LOCK = threading.Lock()
+
+
+def git_batch(commands: List[str], root: str,
+              env: Optional[Dict[str, str]] = None,
+              timeout: Optional[float] = None) -> GitBatch:
+    """Get the coprocess of root, starting one if needed.
+
+    Callers running git differently (another command, or another
+    environment, e.g. GIT_DIR) get a coprocess of their own.
+    """
+    key = (os.path.realpath(root), tuple(commands),
+           None if env is None else tuple(sorted(env.items())))
+    with GIT_BATCHES_LOCK:
+        batch = GIT_BATCHES.get(key)
+        if batch is None or not batch.is_usable():
+            batch = GIT_BATCHES[key] = GitBatch(commands, root, env, timeout)
+    return batch
+
+
+@atexit.register
+def close_git_batches() -> None:
+    """Stop all coprocesses."""
+    with GIT_BATCHES_LOCK:
+        for batch in GIT_BATCHES.values():
+            batch.close()
+        GIT_BATCHES.clear()
+
+
+def forget_git_batches() -> None:
+    """Drop the coprocesses of the parent, in a forked child.
+
+    They keep serving the parent; the child starts its own when it needs
+    one. The lock is replaced, as another thread may have held it during
+    the fork.
+    """
+    global GIT_BATCHES_LOCK
+    GIT_BATCHES_LOCK = threading.Lock()
+    for batch in GIT_BATCHES.values():
+        batch.detach()
+    GIT_BATCHES.clear()
+
+
+if hasattr(os, "register_at_fork"):  # not on Windows
+    os.register_at_fork(after_in_child=forget_git_batches)
+
+
+@register_vcs_handler("git", "batch_runner")
+def git_batch_runner(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[int]]:
+    """Run git like run_command(), answering what it can from a GitBatch.
+
+    This is a runner for git_pieces_from_vcs(): the queries in
+    BATCH_QUERIES are answered by the coprocess of cwd, each with a single
+    pipelined query. The ref lookups resolve the names read from HEAD and
+    the refs directory there, so 'rev-parse --abbrev-ref HEAD' and the
+    list of branches (for a detached HEAD) cost no git process either.
+    'describe', 'branch --contains' and 'rev-list --count' still start one
+    each, since 'git cat-file' can't answer them (and describe abbreviates
+    the revision id the way 'git cat-file' can't tell). So does every
+    query if the coprocess can't be started, can't answer it, fails or runs
+    out of time (the timeout, and the time_budget(), apply to the coprocess
+    as they do to run_command()).
+    """
+    if cwd is not None and args in BATCH_QUERIES:
+        try:
+            batch = git_batch(commands, cwd, env, timeout)
+            out = git_batch_answer(batch, args, timeout)
+        except OSError as e:
+            if verbose:
+                print("unable to use git cat-file --batch: %s" % e)
+            out = None
+        if out is not None:
+            return out, 0
+    return run_command(commands, args, cwd=cwd, verbose=verbose,
+                       hide_stderr=hide_stderr, env=env, timeout=timeout)
+
+
+# the queries of git_pieces_from_vcs() that git_batch_answer() knows
+BATCH_QUERIES = [
+    ["rev-parse", "--git-dir"],
+    ["rev-parse", "HEAD"],
+    ["show", "-s", "--format=%H%n%ci", "HEAD"],
+    ["rev-parse", "--abbrev-ref", "HEAD"],
+    ["for-each-ref", "--format=%(objectname) %(refname)", "refs/heads/"],
+]
+
+
+def git_batch_answer(batch: GitBatch, args: List[str],
+                     timeout: Optional[float] = None) -> Optional[str]:
+    """Answer one of BATCH_QUERIES like git would, or return None."""
+    if args[1] == "--git-dir":
+        return batch.git_dir
+    if args[0] == "for-each-ref":
+        names = batch.branch_names()
+        if names is None:
+            return None
+        refs = ["refs/heads/" + name for name in sorted(names)]
+        if not refs:
+            return ""
+        return "\n".join("%s %s" % (tip[0], ref) for ref, tip
+                         in zip(refs, batch.query(*refs, timeout=timeout))
+                         if tip is not None)
+    if args[1] == "--abbrev-ref":
+        target = batch.read_head()
+        if target is None:
+            return None
+        if not target.startswith("refs/heads/"):
+            # detached, if HEAD holds a commit id
+            head = batch.query("HEAD", timeout=timeout)[0]
+            return "HEAD" if head is not None and head[0] == target else None
+        branch = target[len("refs/heads/"):]
+        # git abbreviates to "heads/BRANCH" if a tag or remote has the name
+        head, tag, remote = batch.query("HEAD", "refs/tags/" + branch,
+                                        "refs/remotes/" + branch,
+                                        timeout=timeout)
+        if head is None or tag is not None or remote is not None:
+            return None
+        return branch
+    head = batch.query("HEAD", timeout=timeout)[0]
+    if head is None or head[1] != "commit":
+        return None
+    sha, _, body = head
+    if args[0] == "rev-parse":
+        return sha
+    headers = body.split(b"\n\n", 1)[0].decode("utf-8", "replace")
+    for line in headers.splitlines():
+        if line.startswith("committer "):
+            when, tz = line.rsplit(" ", 2)[1:]
+            return "%s\n%s" % (sha, format_git_date(int(when), tz))
+    return None
+
@@ -0,0 +1,395 @@
+import os  # --STRIP DURING BUILD
+import ctypes  # --STRIP DURING BUILD
+import json  # --STRIP DURING BUILD
+import select  # --STRIP DURING BUILD
+import socket  # --STRIP DURING BUILD
+import socketserver  # --STRIP DURING BUILD
+import struct  # --STRIP DURING BUILD
+import threading  # --STRIP DURING BUILD
+import time  # --STRIP DURING BUILD
+from typing import Any, cast, Dict, List, NamedTuple, Optional, Tuple  # --STRIP DURING BUILD
+from .long_header import NotThisMethod  # --STRIP DURING BUILD
+from .checkout import DirtyCheck, GitCheckout, find_git_dir, git_index_stat  # --STRIP DURING BUILD
+from .from_vcs import git_pieces_from_vcs  # --STRIP DURING BUILD
+from pieces import Pieces  # --STRIP DURING BUILD
+from .from_daemon import VERSION_DAEMON_SOCKET  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+def git_common_dir(git_dir: str) -> str:
+    """Get the directory with the refs shared by the worktrees of git_dir."""
+    try:
+        with open(os.path.join(git_dir, "commondir")) as fobj:
+            return os.path.normpath(os.path.join(git_dir, fobj.read().strip()))
+    except OSError:
+        return git_dir
+
+
+def git_watch_state(git_dir: str) -> List[Any]:
+    """Get the stat data of the files that version pieces depend on.
+
+    These are HEAD, packed-refs and every directory below refs/ (refs are
+    updated by renaming a lockfile into place, which changes the mtime of
+    the directory they are in). The index is left out: it only matters to
+    the dirty flag, which VersionDaemon.dirty() checks separately, and
+    'git describe --dirty' (or 'git status') rewrites the index without
+    changing any version piece.
+    """
+    common_dir = git_common_dir(git_dir)
+    paths = [os.path.join(git_dir, "HEAD")]
+    paths += [os.path.join(common_dir, name) for name in GIT_WATCHED_NAMES
+              if name != "HEAD"]
+    for dirpath, _, _ in os.walk(os.path.join(common_dir, "refs")):
+        paths.append(dirpath)
+    state: List[Any] = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            state.append([path, st.st_ino, st.st_mtime_ns, st.st_size])
+        except OSError:
+            state.append([path, None, None, None])
+    return state
+
+
+# the files outside refs/ that version pieces depend on
+GIT_WATCHED_NAMES = ["HEAD", "packed-refs", "shallow"]
+
+# inotify(7) event masks
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+                | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+                | IN_MOVE_SELF | IN_ONLYDIR)
+
+
+class InotifyWatcher:
+    """Watch directories for changes with Linux's inotify(7).
+
+    create() returns None where inotify isn't available, and VersionDaemon
+    then polls stat data instead.
+    """
+
+    def __init__(self, libc: Any, fd: int) -> None:
+        """Use the inotify instance fd, created with libc."""
+        self.libc = libc
+        self.fd = fd
+        # watch descriptor -> watched directory
+        self.paths: Dict[int, str] = {}
+
+    @classmethod
+    def create(cls) -> Optional["InotifyWatcher"]:
+        """Create an inotify instance, or return None if we can't."""
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def watch(self, path: str) -> bool:
+        """Watch the directory path, returning False if we can't.
+
+        Watching a directory again is cheap (and keeps its watch), so this
+        can be called again for everything after directories were replaced.
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         INOTIFY_MASK)
+        if wd < 0:
+            return False
+        self.paths[wd] = path
+        return True
+
+    def changes(self) -> Optional[List[Tuple[str, str]]]:
+        """Read the pending events, as (directory, name) pairs.
+
+        Returns None if events were lost because too many were pending, in
+        which case anything may have changed.
+        """
+        changes: List[Tuple[str, str]] = []
+        lost = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+                offset += 16 + length
+                if mask & IN_Q_OVERFLOW:
+                    lost = True
+                elif mask & IN_IGNORED:
+                    self.paths.pop(wd, None)
+                elif wd in self.paths:
+                    changes.append((self.paths[wd], os.fsdecode(name)))
+        return None if lost else changes
+
+    def close(self) -> None:
+        """Stop watching."""
+        os.close(self.fd)
+
+
+class VersionEntry(NamedTuple):
+    """Version pieces remembered by a VersionDaemon."""
+
+    state: Any  # VersionDaemon.watch_state() when they were computed
+    pieces: Pieces
+
+
+class DirtyEntry(NamedTuple):
+    """A dirty flag remembered by a VersionDaemon."""
+
+    head: str
+    index_stat: Optional[List[int]]
+    check: Optional[DirtyCheck]  # None if the index differs from HEAD
+    generation: int  # VersionDaemon.tree_generation when it was checked
+    dirty: bool
+
+
+class VersionDaemon:
+    """Remember the version pieces of one repository, and serve them.
+
+    Requests are answered on a Unix socket in the .git directory, see
+    git_pieces_from_daemon(). Where inotify is available, it tells when
+    remembered pieces are out of date, and when checked-out files changed
+    since the dirty flag was last checked. Elsewhere, pieces are out of
+    date when git_watch_state() changes, and the checked-out files are
+    compared for each request. Either way, the index is only compared with
+    HEAD again after it changed.
+    """
+
+    def __init__(self, git_dir: str, work_tree: str,
+                 verbose: bool = False) -> None:
+        """Listen on the socket in git_dir."""
+        self.git_dir = git_dir
+        self.common_dir = git_common_dir(git_dir)
+        self.work_tree = work_tree
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        # (tag_prefix, root, fields) -> pieces
+        self.entries: Dict[Tuple[str, str, Optional[Tuple[str, ...]]],
+                           VersionEntry] = {}
+        self.dirty_entry: Optional[DirtyEntry] = None
+        # bumped by the inotify events for refs and for checked-out files
+        self.git_generation = 0
+        self.tree_generation = 0
+        self.tree_watched = False
+        self.watcher = InotifyWatcher.create()
+        if self.watcher is not None and not self.watch_git_dir():
+            self.watcher.close()
+            self.watcher = None
+        self.socket_path = os.path.join(git_dir, VERSION_DAEMON_SOCKET)
+        self.server = socketserver.ThreadingUnixStreamServer(
+            self.socket_path, VersionDaemonHandler)
+        self.server.daemon_threads = True
+        cast(Any, self.server).versions = self
+
+    def watch_git_dir(self) -> bool:
+        """Watch the directories of git_watch_state() with inotify."""
+        assert self.watcher is not None
+        paths = [self.git_dir, self.common_dir]
+        paths += [dirpath for dirpath, _, _
+                  in os.walk(os.path.join(self.common_dir, "refs"))]
+        return all(self.watcher.watch(path) for path in paths)
+
+    def watch_tree(self, check: DirtyCheck) -> bool:
+        """Watch the directories of the checked-out files with inotify."""
+        if self.watcher is None:
+            return False
+        dirs = {b""}
+        for entry in check.entries:
+            path = os.path.dirname(entry.path)
+            while path not in dirs:
+                dirs.add(path)
+                path = os.path.dirname(path)
+        return all(self.watcher.watch(os.path.join(self.work_tree,
+                                                   os.fsdecode(path)))
+                   for path in sorted(dirs))
+
+    def read_events(self) -> None:
+        """Bump the generations for the pending inotify events."""
+        assert self.watcher is not None
+        changes = self.watcher.changes()
+        if changes is None:
+            self.git_generation += 1
+            self.tree_generation += 1
+            self.watch_git_dir()
+            return
+        refs = os.path.join(self.common_dir, "refs")
+        for directory, name in changes:
+            if directory == refs or directory.startswith(refs + os.sep):
+                self.git_generation += 1
+                path = os.path.join(directory, name)
+                if os.path.isdir(path):
+                    self.watch_git_dir()
+            elif directory in (self.git_dir, self.common_dir):
+                if name in GIT_WATCHED_NAMES:
+                    self.git_generation += 1
+            elif name != ".git":
+                self.tree_generation += 1
+
+    def watch_state(self) -> Any:
+        """Get what changes when remembered pieces are out of date."""
+        if self.watcher is None:
+            return git_watch_state(self.git_dir)
+        self.read_events()
+        return self.git_generation
+
+    def compute(self, tag_prefix: str, root: str,
+                fields: Optional[Tuple[str, ...]]) -> Pieces:
+        """Compute and remember the pieces. Call with self.lock held."""
+        key = (tag_prefix, root, fields)
+        state = self.watch_state()
+        try:
+            pieces = git_pieces_from_vcs(
+                tag_prefix, root, self.verbose,
+                fields=None if fields is None else set(fields))
+        except NotThisMethod:
+            self.entries.pop(key, None)
+            raise
+        self.entries[key] = VersionEntry(state, pieces)
+        return pieces.copy()
+
+    def dirty(self, head: str) -> bool:
+        """Tell whether the checkout is dirty. Call with self.lock held.
+
+        The index is only compared with HEAD when either changed, and the
+        checked-out files only when inotify can't tell that none changed.
+        """
+        index_stat = git_index_stat(self.git_dir)
+        repo = GitCheckout(self.git_dir, self.work_tree)
+        entry = self.dirty_entry
+        if (entry is not None and entry.head == head
+                and entry.index_stat == index_stat):
+            if self.tree_watched and entry.generation == self.tree_generation:
+                return entry.dirty
+            check = entry.check
+        else:
+            check = repo.index_check(head)
+            self.tree_watched = check is not None and self.watch_tree(check)
+        # files changed while they are compared bump this, so they are
+        # compared again for the next request
+        generation = self.tree_generation
+        dirty = check is None or repo.files_modified(check)
+        self.dirty_entry = DirtyEntry(head, index_stat, check, generation,
+                                      dirty)
+        return dirty
+
+    def pieces(self, tag_prefix: str, root: str,
+               fields: Optional[Tuple[str, ...]]) -> Pieces:
+        """Get the pieces for a request, computing them if needed."""
+        root = os.path.realpath(root)
+        with self.lock:
+            entry = self.entries.get((tag_prefix, root, fields))
+            if entry is not None and entry.state == self.watch_state():
+                pieces = entry.pieces.copy()
+                if pieces["error"]:
+                    return pieces
+                try:
+                    pieces["dirty"] = self.dirty(pieces["long"])
+                    return pieces
+                except (NotThisMethod, OSError, ValueError):
+                    self.dirty_entry = None
+            return self.compute(tag_prefix, root, fields)
+
+    def refresh(self) -> None:
+        """Recompute the remembered pieces that are out of date."""
+        with self.lock:
+            state = self.watch_state()
+            for key, entry in list(self.entries.items()):
+                if entry.state != state:
+                    try:
+                        self.compute(*key)
+                    except NotThisMethod:
+                        pass
+
+    def close(self) -> None:
+        """Stop listening and remove the socket."""
+        self.server.server_close()
+        if self.watcher is not None:
+            self.watcher.close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+class VersionDaemonHandler(socketserver.StreamRequestHandler):
+    """Answer one JSON request for version pieces."""
+
+    def handle(self) -> None:
+        """Read the request line and write the reply line."""
+        versions: VersionDaemon = cast(Any, self.server).versions
+        reply: Dict[str, Any]
+        try:
+            request = json.loads(self.rfile.readline())
+            fields = request["fields"]
+            reply = {"pieces": versions.pieces(
+                request["tag_prefix"], request["root"],
+                None if fields is None else tuple(fields)).to_json()}
+        except (NotThisMethod, ValueError, KeyError, TypeError) as e:
+            reply = {"error": str(e)}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+def serve_versions(roots: List[str], interval: float = 1.0,
+                   verbose: bool = False) -> None:
+    """Serve the version pieces of the repositories of roots until interrupted.
+
+    Remembered pieces are recomputed when inotify reports a change in their
+    repository (or, without inotify, every interval seconds if it changed),
+    so requests rarely have to wait for git.
+    """
+    daemons: List[VersionDaemon] = []
+    for root in roots:
+        found = find_git_dir(root)
+        if found is None:
+            print("%s is not in a git repository" % root)
+            continue
+        if any(daemon.git_dir == found[0] for daemon in daemons):
+            continue
+        path = os.path.join(found[0], VERSION_DAEMON_SOCKET)
+        if os.path.exists(path):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.connect(path)
+                print("%s is already being served" % found[1])
+                continue
+            except OSError:
+                # left behind by a daemon that didn't exit cleanly
+                os.unlink(path)
+        daemons.append(VersionDaemon(found[0], found[1], verbose))
+        print("serving versions of %s on %s" % (found[1], path))
+
+    for daemon in daemons:
+        threading.Thread(target=daemon.server.serve_forever,
+                         daemon=True).start()
+    fds = [daemon.watcher.fd for daemon in daemons
+           if daemon.watcher is not None]
+    try:
+        while daemons:
+            if fds:
+                select.select(fds, [], [], interval)
+            else:
+                time.sleep(interval)
+            for daemon in daemons:
+                daemon.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for daemon in daemons:
+            daemon.server.shutdown()
+            daemon.close()
+
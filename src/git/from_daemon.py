@@ -0,0 +1,55 @@
+import os  # --STRIP DURING BUILD
+from typing import AbstractSet, Optional  # --STRIP DURING BUILD
+from .long_header import NotThisMethod, register_vcs_handler  # --STRIP DURING BUILD
+from .checkout import find_git_dir  # --STRIP DURING BUILD
+from subprocess_helper import command_timeout  # --STRIP DURING BUILD
+from pieces import Pieces  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+# the Unix socket 'versioneer serve' listens on, inside the .git directory
+VERSION_DAEMON_SOCKET = "versioneer.sock"
+
+
+@register_vcs_handler("git", "pieces_from_daemon")
+def git_pieces_from_daemon(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    fields: Optional[AbstractSet[str]] = None,
+    timeout: float = 2.0,
+) -> Pieces:
+    """Get version pieces from a running 'versioneer serve'.
+
+    Raises NotThisMethod (quickly, when there is no socket) if no daemon
+    answers for the repository of root.
+    """
+    # _version.py only needs these when the daemon is asked
+    import json
+    import socket
+    found = find_git_dir(root)
+    if found is None or not hasattr(socket, "AF_UNIX"):
+        raise NotThisMethod("no version daemon")
+    timeout = command_timeout(timeout) or 0.0
+    if timeout <= 0:
+        raise NotThisMethod("time budget exceeded")
+    request = {"root": os.path.abspath(root), "tag_prefix": tag_prefix,
+               "fields": None if fields is None else sorted(fields)}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(os.path.join(found[0], VERSION_DAEMON_SOCKET))
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as fobj:
+                reply = json.loads(fobj.readline())
+    except (OSError, ValueError) as e:
+        raise NotThisMethod("no version daemon (%s)" % e)
+    if not isinstance(reply, dict) or "pieces" not in reply:
+        raise NotThisMethod("version daemon failed: %s" % (reply,))
+    try:
+        pieces = Pieces.from_json(reply["pieces"])
+    except ValueError as e:
+        raise NotThisMethod("version daemon failed: %s" % e)
+    if verbose:
+        print("got pieces from the version daemon")
+    return pieces
+
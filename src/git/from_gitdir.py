@@ -0,0 +1,647 @@
+import os  # --STRIP DURING BUILD
+import json  # --STRIP DURING BUILD
+import mmap  # --STRIP DURING BUILD
+import zlib  # --STRIP DURING BUILD
+import heapq  # --STRIP DURING BUILD
+import struct  # --STRIP DURING BUILD
+import fnmatch  # --STRIP DURING BUILD
+import threading  # --STRIP DURING BUILD
+from datetime import datetime, timedelta, timezone  # --STRIP DURING BUILD
+from typing import AbstractSet, Any, Callable, Dict, List  # --STRIP DURING BUILD
+from typing import Optional, Set, Tuple  # --STRIP DURING BUILD
+from .long_header import NotThisMethod, register_vcs_handler  # --STRIP DURING BUILD
+from .from_vcs import git_branches_to_check, git_pick_branch, git_pieces_from_vcs  # --STRIP DURING BUILD
+from .checkout import GitCheckout, TRUE_VALUES, find_git_dir  # --STRIP DURING BUILD
+from subprocess_helper import run_command, trace  # --STRIP DURING BUILD
+from pieces import Pieces  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+def format_git_date(when: int, tz: str) -> str:
+    """Format a timestamp and "+HHMM" timezone like git's %ci does."""
+    minutes = int(tz[1:3]) * 60 + int(tz[3:5])
+    offset = timedelta(minutes=-minutes if tz[0] == "-" else minutes)
+    date = datetime.fromtimestamp(when, timezone(offset))
+    return date.strftime("%Y-%m-%d %H:%M:%S ") + tz
+
+
+TAG_INDEX_FILE = "versioneer-tags.json"
+# like git describe --candidates
+DESCRIBE_CANDIDATES = 10
+# how far GitDir.describe_linear() follows first parents
+FIRST_PARENT_BOUND = 1000
+
+
+def read_tag_index(git_dir: str) -> Dict[str, Any]:
+    """Read the tag index entries stored in git_dir, or {} if there are none."""
+    try:
+        with open(os.path.join(git_dir, TAG_INDEX_FILE)) as fobj:
+            index = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("version") != 1:
+        return {}
+    return index.get("entries", {})
+
+
+def write_tag_index(git_dir: str, entries: Dict[str, Any]) -> None:
+    """Atomically replace the tag index in git_dir."""
+    filename = os.path.join(git_dir, TAG_INDEX_FILE)
+    tmp = "%s.%d.%d.tmp" % (filename, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp, "w") as fobj:
+            json.dump({"version": 1, "entries": entries}, fobj)
+        os.replace(tmp, filename)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+# parent positions in the CDAT chunk of a commit-graph
+GRAPH_PARENT_NONE = 0x70000000
+GRAPH_EXTRA_EDGES = 0x80000000
+
+
+class CommitGraph:
+    """Read-only access to a commit-graph file (objects/info/commit-graph).
+
+    The file is mmap()ed, so looking up a commit costs a binary search and
+    a few slices instead of inflating its object. Split commit-graph chains
+    are not supported.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Map filename and find its chunks."""
+        with open(filename, "rb") as fobj:
+            self.data = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.data
+        if data[:4] != b"CGPH" or data[4] != 1 or data[5] != 1:
+            raise NotThisMethod("unsupported commit-graph %s" % filename)
+        if data[7] != 0:
+            raise NotThisMethod("split commit-graphs are not supported")
+        chunks: Dict[bytes, int] = {}
+        for i in range(data[6]):
+            pos = 8 + 12 * i
+            chunks[data[pos:pos + 4]] = struct.unpack(">Q", data[pos + 4:pos + 12])[0]
+        if not {b"OIDF", b"OIDL", b"CDAT"} <= set(chunks):
+            raise NotThisMethod("incomplete commit-graph %s" % filename)
+        self.oidl = chunks[b"OIDL"]
+        self.cdat = chunks[b"CDAT"]
+        self.edge = chunks.get(b"EDGE")
+        self.fanout = struct.unpack(">256I",
+                                    data[chunks[b"OIDF"]:chunks[b"OIDF"] + 1024])
+
+    def position(self, sha: str) -> Optional[int]:
+        """Find the position of a commit in the graph, or None."""
+        binsha = bytes.fromhex(sha)
+        lo = self.fanout[binsha[0] - 1] if binsha[0] else 0
+        hi = self.fanout[binsha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self.data[self.oidl + 20 * mid:self.oidl + 20 * mid + 20]
+            if found < binsha:
+                lo = mid + 1
+            elif found > binsha:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def commit(self, pos: int) -> Tuple[str, List[str], int, int]:
+        """Return the (tree, parents, timestamp, generation) at pos.
+
+        The generation is the commit's topological level: 1 for root
+        commits, and one more than the largest one of its parents otherwise
+        (or 0 if the graph was written without them).
+        """
+        start = self.cdat + 36 * pos
+        tree = self.data[start:start + 20].hex()
+        parent1, parent2, high, low = struct.unpack(
+            ">IIII", self.data[start + 20:start + 36])
+        positions = [] if parent1 == GRAPH_PARENT_NONE else [parent1]
+        if parent2 & GRAPH_EXTRA_EDGES:
+            if self.edge is None:
+                raise NotThisMethod("commit-graph without EDGE chunk")
+            edge = self.edge + 4 * (parent2 & ~GRAPH_EXTRA_EDGES)
+            while True:
+                value, = struct.unpack(">I", self.data[edge:edge + 4])
+                positions.append(value & ~GRAPH_EXTRA_EDGES)
+                if value & GRAPH_EXTRA_EDGES:
+                    break
+                edge += 4
+        elif parent2 != GRAPH_PARENT_NONE:
+            positions.append(parent2)
+        parents = [self.data[self.oidl + 20 * p:self.oidl + 20 * p + 20].hex()
+                   for p in positions]
+        return tree, parents, ((high & 3) << 32) | low, high >> 2
+
+
+class GitDir(GitCheckout):
+    """Read-only access to the refs, objects and history of a .git directory.
+
+    Only the parts of the repository format needed to compute version
+    pieces are supported. Everything else raises NotThisMethod, so the
+    caller can fall back to running git.
+    """
+
+    def __init__(self, git_dir: str, work_tree: str) -> None:
+        """Check that we can read git_dir and open its commit-graph."""
+        super().__init__(git_dir, work_tree)
+        self.generations: Dict[str, int] = {}
+        self.levels: Dict[str, int] = {}
+        self.graph: Optional[CommitGraph] = None
+        # git doesn't use (or write) commit-graphs in shallow repositories
+        if (not self.shallow and self.config.get("core.commitgraph", "true")
+                .lower() in TRUE_VALUES):
+            try:
+                self.graph = CommitGraph(os.path.join(
+                    self.object_dirs[0], "info", "commit-graph"))
+            except (NotThisMethod, OSError, ValueError, IndexError,
+                    struct.error):
+                pass
+
+    def read_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Return the (tree, parents, timestamp, timezone) of a commit.
+
+        Commits found in the commit-graph come without their timezone ("").
+        """
+        if sha not in self.commits:
+            pos = self.graph.position(sha) if self.graph is not None else None
+            if pos is not None:
+                assert self.graph is not None
+                tree, parents, when, generation = self.graph.commit(pos)
+                self.commits[sha] = (tree, parents, when, "")
+                self.generations[sha] = generation
+            else:
+                self.commits[sha] = self.parse_commit(sha)
+        return self.commits[sha]
+
+    def generation(self, sha: str) -> float:
+        """Return the generation of a commit, for pruning history walks.
+
+        A commit can only be reached from commits with a larger generation.
+        Commits missing from the commit-graph (or all of them, without one)
+        get infinity: the graph contains all ancestors of its commits, so
+        those can't reach them either.
+        """
+        self.read_commit(sha)
+        return self.generations.get(sha, float("inf"))
+
+    def level(self, sha: str) -> int:
+        """Return the topological level of a commit: 1 for root commits.
+
+        This is the generation from the commit-graph; commits missing from
+        it get one more than the highest level of their parents. 0 means
+        that the commit-graph was written without generation numbers.
+        """
+        todo = [sha]
+        while todo:
+            c = todo[-1]
+            if c in self.levels:
+                todo.pop()
+                continue
+            generation = self.generation(c)
+            if generation != float("inf"):
+                self.levels[c] = int(generation)
+                todo.pop()
+                continue
+            parents = self.read_commit(c)[1]
+            missing = [p for p in parents if p not in self.levels]
+            if missing:
+                todo.extend(missing)
+                continue
+            levels = [self.levels[p] for p in parents]
+            self.levels[c] = 0 if 0 in levels else max(levels, default=0) + 1
+            todo.pop()
+        return self.levels[sha]
+
+    def peel_tag(self, sha: str) -> Tuple[Optional[str], int]:
+        """Follow an annotated tag to its commit: (commit or None, tag date)."""
+        when = 0
+        kind, body = self.read_object(sha)
+        while kind == "tag":
+            target, when = "", 0
+            for line in body.split(b"\n\n", 1)[0].decode().splitlines():
+                key, _, value = line.partition(" ")
+                if key == "object":
+                    target = value
+                elif key == "tagger":
+                    when = int(value.rsplit(" ", 2)[1])
+            sha = target
+            kind, body = self.read_object(sha)
+        return (sha if kind == "commit" else None), when
+
+    def tags_stamp(self) -> List[Any]:
+        """Get the stat data of packed-refs and of the refs/tags/ directories.
+
+        Tags are created and deleted by renaming or removing files in these
+        directories (or by rewriting packed-refs), so this changes whenever
+        a tag does.
+        """
+        stamp: List[Any] = []
+        try:
+            st = os.stat(os.path.join(self.git_dir, "packed-refs"))
+            stamp.append(["packed-refs", st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamp.append(["packed-refs", None, None])
+        for dirpath, _, _ in os.walk(os.path.join(self.git_dir, "refs", "tags")):
+            st = os.stat(dirpath)
+            stamp.append([os.path.relpath(dirpath, self.git_dir),
+                          st.st_mtime_ns, st.st_size])
+        return stamp
+
+    def tag_names(self, tag_prefix: str,
+                  use_index: bool = False) -> Dict[str, Tuple[int, str]]:
+        """Map commits to the (priority, name) of the tag that describes them.
+
+        This mirrors 'git describe --tags --match PREFIX[[:digit:]]*': an
+        annotated tag (priority 2) beats a lightweight one (priority 1), the
+        newest of several annotated tags wins, and otherwise the first tag
+        in refname order is used.
+
+        With use_index, the result is kept in .git/versioneer-tags.json. It
+        is reused as long as tags_stamp() doesn't change, and otherwise
+        updated by peeling only the tags that are new or were moved.
+        """
+        known: Dict[str, List[Any]] = {}
+        stamp = None
+        if use_index:
+            stamp = self.tags_stamp()
+            entry = read_tag_index(self.git_dir).get(tag_prefix, {})
+            if entry.get("stamp") == stamp:
+                return {commit: (prio, name)
+                        for commit, (prio, name) in entry["names"].items()}
+            known = entry.get("refs", {})
+
+        names: Dict[str, Tuple[int, str]] = {}
+        # refname -> [sha, peeled commit or None, tag date (-1: not read)]
+        records: Dict[str, List[Any]] = {}
+        packed = self.packed_refs()
+        pattern = "%s[0-9]*" % tag_prefix
+        for ref, sha in sorted(self.refs("refs/tags/").items()):
+            name = ref[len("refs/tags/"):]
+            if not fnmatch.fnmatchcase(name, pattern):
+                continue
+            peeled: Optional[str]
+            if ref in known and known[ref][0] == sha:
+                peeled, when = known[ref][1], known[ref][2]
+            elif ref in packed and packed[ref][0] == sha:
+                peeled, when = packed[ref][1] or sha, 0
+                if packed[ref][1] is not None:
+                    when = -1  # annotated; read the tag date only if needed
+            else:
+                peeled, when = self.peel_tag(sha)
+                if peeled == sha:
+                    when = 0
+            records[ref] = [sha, peeled, when]
+            if peeled is None:
+                continue
+            prio = 2 if peeled != sha else 1
+            old = names.get(peeled)
+            if old is not None and (old[0] > prio or (old[0] == prio == 1)):
+                continue
+            if old is not None and old[0] == prio == 2:
+                old_record = records["refs/tags/" + old[1]]
+                if old_record[2] < 0:
+                    old_record[2] = self.peel_tag(old_record[0])[1]
+                if when < 0:
+                    when = records[ref][2] = self.peel_tag(sha)[1]
+                if old_record[2] >= when:
+                    continue
+            names[peeled] = (prio, name)
+
+        if use_index:
+            entries = read_tag_index(self.git_dir)
+            entries[tag_prefix] = {"stamp": stamp, "refs": records,
+                                   "names": names}
+            write_tag_index(self.git_dir, entries)
+        return names
+
+    def describe(self, head: str,
+                 names: Dict[str, Tuple[int, str]]) -> Tuple[Optional[str], int]:
+        """Find the closest tag and distance the way 'git describe' does.
+
+        Returns (None, number of commits) if no tag is reachable from head.
+        """
+        if head in names:
+            return names[head][1], 0
+        found = self.describe_linear(head, names)
+        if found is not None:
+            return found
+        if self.graph is not None and self.level(head):
+            found = self.describe_by_level(head, names)
+            if found is not None:
+                return found
+        max_candidates = DESCRIBE_CANDIDATES
+        # each candidate: [depth, flag, found order, name]
+        matches: List[List[Any]] = []
+        flags: Dict[str, int] = {head: 0}
+        queue: List[Tuple[int, int, str]] = []
+        counter = 0
+        heapq.heappush(queue, (-self.read_commit(head)[2], counter, head))
+        annotated = 0
+        gave_up_on = None
+        seen_commits = 0
+        while queue:
+            c = heapq.heappop(queue)[2]
+            seen_commits += 1
+            if c in names:
+                if len(matches) < max_candidates:
+                    flag = 1 << (len(matches) + 1)
+                    matches.append([seen_commits - 1, flag, len(matches), names[c][1]])
+                    flags[c] |= flag
+                    if names[c][0] == 2:
+                        annotated += 1
+                else:
+                    gave_up_on = c
+                    break
+            for t in matches:
+                if not flags[c] & t[1]:
+                    t[0] += 1
+            if annotated and not queue:
+                # stop if the last remaining path is covered by the best match
+                best_depth = min(t[0] for t in matches)
+                best_within = 0
+                for t in matches:
+                    if t[0] == best_depth:
+                        best_within |= t[1]
+                if (flags[c] & best_within) == best_within:
+                    break
+            for p in self.read_commit(c)[1]:
+                if p not in flags:
+                    flags[p] = 0
+                    counter += 1
+                    heapq.heappush(queue, (-self.read_commit(p)[2], counter, p))
+                flags[p] |= flags[c]
+        if not matches:
+            return None, seen_commits
+        matches.sort(key=lambda t: (t[0], t[2]))
+        best = matches[0]
+        if gave_up_on is not None:
+            counter += 1
+            heapq.heappush(queue, (-self.read_commit(gave_up_on)[2], counter,
+                                   gave_up_on))
+        # finish the depth computation for the best candidate
+        while queue:
+            c = heapq.heappop(queue)[2]
+            if flags[c] & best[1]:
+                if all(flags[i[2]] & best[1] for i in queue):
+                    break
+            else:
+                best[0] += 1
+            for p in self.read_commit(c)[1]:
+                if p not in flags:
+                    flags[p] = 0
+                    counter += 1
+                    heapq.heappush(queue, (-self.read_commit(p)[2], counter, p))
+                flags[p] |= flags[c]
+        return best[3], best[0]
+
+    def describe_linear(
+        self, head: str, names: Dict[str, Tuple[int, str]],
+    ) -> Optional[Tuple[Optional[str], int]]:
+        """Look up the first parents of head in names, up to a bound.
+
+        Without merges on the way, every other tag is behind the first one
+        found, so that's the one 'git describe' picks, and the distance is
+        the number of steps. Returns None on reaching a merge, or after
+        FIRST_PARENT_BOUND commits, to leave the rest to a full walk.
+        """
+        c = head
+        for distance in range(1, FIRST_PARENT_BOUND + 1):
+            parents = self.read_commit(c)[1]
+            if not parents:
+                return None, distance  # no tags at all
+            if len(parents) > 1:
+                return None
+            c = parents[0]
+            if c in names:
+                return names[c][1], distance
+        return None
+
+    def describe_by_level(
+        self, head: str, names: Dict[str, Tuple[int, str]],
+    ) -> Optional[Tuple[Optional[str], int]]:
+        """Find the closest tag by walking the history in level order.
+
+        'git describe' walks all of the history unless it finds more than
+        DESCRIBE_CANDIDATES tags, because dates can't tell it when the
+        closest tag has been found. With topological levels, a tag that
+        wasn't reached yet is further away than every commit visited at a
+        higher level, so the walk stops after the closest tag plus about
+        as many commits again. The distance of each tag is counted with a
+        walk that stops expanding commits below the tag's level as soon
+        as they are all reachable from it.
+
+        Returns None when 'git describe' might disagree: with clock skew
+        (it walks by date) or when it would give up before reaching the
+        closest tag.
+        """
+        skewed = False
+
+        def exclusive(base: str) -> Tuple[int, int]:
+            # (commits reachable from head but not from base, tags among them)
+            nonlocal skewed
+            flags = {head: 1, base: 2}  # 1: from head, 2: from base
+            queue = [(-self.level(c), c) for c in flags]
+            heapq.heapify(queue)
+            pending = 1  # queued commits only reachable from head
+            count = tags = 0
+            while pending:
+                c = heapq.heappop(queue)[1]
+                flag = flags[c]
+                if flag == 1:
+                    pending -= 1
+                    count += 1
+                    tags += c in names
+                when = self.read_commit(c)[2]
+                for p in self.read_commit(c)[1]:
+                    skewed = skewed or self.read_commit(p)[2] > when
+                    old = flags.get(p)
+                    if old is None:
+                        flags[p] = flag
+                        pending += flag == 1
+                        heapq.heappush(queue, (-self.level(p), p))
+                    elif old == 1 and flag != 1:
+                        flags[p] = 3
+                        pending -= 1
+                    else:
+                        flags[p] = old | flag
+            return count, tags
+
+        # each candidate: (distance, -date, found order, name, tags in between)
+        best: Optional[Tuple[int, int, int, str, int]] = None
+        counter = 0
+        queue = [(-self.level(head), -self.read_commit(head)[2], counter, head)]
+        seen = {head}
+        popped = 0
+        at_level: Dict[int, int] = {}
+        while queue:
+            level = -queue[0][0]
+            # the tags left can't reach the commits visited above this
+            # level, so they are at least that many commits away
+            if best is not None and best[0] < popped - at_level.get(level, 0):
+                break
+            _, date, order, c = heapq.heappop(queue)
+            if c in names and (best is None or
+                               popped - at_level.get(level, 0) <= best[0]):
+                distance, tags = exclusive(c)
+                found = (distance, date, order, names[c][1], tags)
+                if best is None or found[:3] < best[:3]:
+                    best = found
+            popped += 1
+            at_level[level] = at_level.get(level, 0) + 1
+            when = self.read_commit(c)[2]
+            for p in self.read_commit(c)[1]:
+                if p not in seen:
+                    seen.add(p)
+                    skewed = skewed or self.read_commit(p)[2] > when
+                    counter += 1
+                    heapq.heappush(queue, (-self.level(p),
+                                           -self.read_commit(p)[2], counter, p))
+        if skewed or (best is not None and best[4] >= DESCRIBE_CANDIDATES):
+            return None
+        if best is None:
+            return None, popped
+        return best[3], best[0]
+
+    def contains(self, tip: str, commit: str) -> bool:
+        """Tell whether commit is reachable from tip."""
+        target = self.generation(commit)
+        seen = {tip}
+        todo = [tip] if self.generation(tip) >= target else []
+        while todo:
+            c = todo.pop()
+            if c == commit:
+                return True
+            for p in self.read_commit(c)[1]:
+                # commits of a lower generation than commit can't reach it
+                if p not in seen and self.generation(p) >= target:
+                    seen.add(p)
+                    todo.append(p)
+        return False
+
+    def branch(self, head: str) -> Optional[str]:
+        """Find the branch HEAD is on, like git_pieces_from_vcs() does.
+
+        When HEAD is detached, only the branches whose tip isn't HEAD but
+        which could still be picked over those that are get their history
+        walked (see git_branches_to_check()).
+        """
+        with open(os.path.join(self.git_dir, "HEAD")) as fobj:
+            value = fobj.read().strip()
+        if value.startswith("ref: refs/heads/"):
+            return value[len("ref: refs/heads/"):]
+        heads = {ref[len("refs/heads/"):]: sha
+                 for ref, sha in self.refs("refs/heads/").items()}
+        tips = [name for name, sha in heads.items() if sha == head]
+        check = git_branches_to_check(list(heads), tips)
+        branches = tips + [name for name in sorted(heads if check is None
+                                                   else check)
+                           if self.contains(heads[name], head)]
+        return git_pick_branch(sorted(set(branches)))
+
+    def abbrev(self, sha: str) -> str:
+        """Shorten sha the way git does by default: 7+ unambiguous digits."""
+        count = sum(pack.count for pack in self.find_packs())
+        length = max(7, (count.bit_length() + 1) // 2)
+        while length < len(sha) and self.is_ambiguous(sha[:length]):
+            length += 1
+        return sha[:length]
+
+    def is_ambiguous(self, prefix: str) -> bool:
+        """Tell whether more than one object id starts with prefix."""
+        found: Set[str] = set()
+        for objects in self.object_dirs:
+            try:
+                names = os.listdir(os.path.join(objects, prefix[:2]))
+            except OSError:
+                continue
+            found.update(prefix[:2] + name for name in names
+                         if name.startswith(prefix[2:]))
+        first = bytes.fromhex(prefix[:2])[0]
+        for pack in self.find_packs():
+            found.update(name for name in pack.shas(first)
+                         if name.startswith(prefix))
+        return len(found) > 1
+
+    def commit_date(self, sha: str) -> str:
+        """Format a commit's date like git's %ci does."""
+        _, _, when, tz = self.read_commit(sha)
+        if not tz:
+            _, _, when, tz = self.parse_commit(sha)
+        return format_git_date(when, tz)
+
+
+@register_vcs_handler("git", "pieces_from_gitdir")
+def git_pieces_from_gitdir(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    runner: Callable = run_command,
+    combine_queries: bool = False,
+    fields: Optional[AbstractSet[str]] = None,
+    dirty_from: Optional[Callable[[str], bool]] = None,
+    scope: Optional[List[str]] = None,
+    tag_index: bool = False,
+) -> Pieces:
+    """Get version pieces by reading the .git directory directly.
+
+    This produces the same pieces as git_pieces_from_vcs() without starting
+    any git process. Repositories using features this reader doesn't
+    support (linked worktrees, submodules, SHA-256, ...), and
+    distances over a path scope, are handed over to git_pieces_from_vcs().
+    With tag_index, the tags are looked up in the index kept by
+    GitDir.tag_names().
+    """
+    found = find_git_dir(root)
+    if found is None:
+        if verbose:
+            print("Directory %s not under git control" % root)
+        raise NotThisMethod("no .git directory found")
+
+    try:
+        if scope is not None:
+            raise NotThisMethod("path scopes are not supported")
+        repo = GitDir(*found)
+        full = repo.resolve_ref("HEAD")
+        if full is None:
+            raise NotThisMethod("HEAD does not point at a commit")
+        names = repo.tag_names(tag_prefix, tag_index)
+        tag, distance = repo.describe(full, names)
+        pieces = Pieces()
+        pieces["long"] = full
+        pieces["short"] = repo.abbrev(full)
+        pieces["error"] = None
+        pieces["branch"] = None
+        if fields is None or "branch" in fields:
+            pieces["branch"] = repo.branch(full)
+        pieces["dirty"] = (dirty_from or repo.is_dirty)(full)
+        if tag is not None and not tag.startswith(tag_prefix):
+            if verbose:
+                fmt = "tag '%s' doesn't start with prefix '%s'"
+                print(fmt % (tag, tag_prefix))
+            pieces["error"] = ("tag '%s' doesn't start with prefix '%s'"
+                               % (tag, tag_prefix))
+            return pieces
+        if tag is None:
+            pieces["short"] = full[:7]
+        pieces["closest-tag"] = tag[len(tag_prefix):] if tag is not None else None
+        pieces["distance"] = distance
+        date = repo.commit_date(full)
+    except (NotThisMethod, OSError, ValueError, IndexError, struct.error,
+            zlib.error) as e:
+        # anything unexpected is left to git, too
+        trace("fallback", name="pieces_from_gitdir", root=root,
+              exception=type(e).__name__, message=str(e))
+        if verbose:
+            print("unable to read %s directly (%s), running git" % (found[0], e))
+        return git_pieces_from_vcs(tag_prefix, root, verbose, runner=runner,
+                                   combine_queries=combine_queries,
+                                   fields=fields, dirty_from=dirty_from,
+                                   scope=scope)
+    # commit date: see ISO-8601 comment in git_versions_from_keywords()
+    pieces["date"] = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+    return pieces
+
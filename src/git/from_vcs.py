@@ -1,24 +1,52 @@
 import sys  # --STRIP DURING BUILD
 import re  # --STRIP DURING BUILD
 import os  # --STRIP DURING BUILD
+import contextlib  # --STRIP DURING BUILD
 import functools  # --STRIP DURING BUILD
-from typing import Any, Callable, Dict  # --STRIP DURING BUILD
+from typing import AbstractSet, Any, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Tuple  # --STRIP DURING BUILD
 from .long_header import NotThisMethod, register_vcs_handler  # --STRIP DURING BUILD
-from subprocess_helper import run_command  # --STRIP DURING BUILD
+from subprocess_helper import run_command, run_command_lines  # --STRIP DURING BUILD
+from pieces import Pieces  # --STRIP DURING BUILD
   # --STRIP DURING BUILD
   # --STRIP DURING BUILD
+# distances counted over path scopes, by (root, tag, HEAD, scope)
+SCOPED_DISTANCE_MEMO: Dict[Tuple[str, Optional[str], str, Tuple[str, ...]],
+                           int] = {}
+# the most branches passed to 'git branch --contains --list'
+GIT_BRANCH_LIST_MAX = 100
+
+
 @register_vcs_handler("git", "pieces_from_vcs")
 def git_pieces_from_vcs(
     tag_prefix: str,
     root: str,
     verbose: bool,
-    runner: Callable = run_command
-) -> Dict[str, Any]:
+    runner: Callable = run_command,
+    combine_queries: bool = False,
+    fields: Optional[AbstractSet[str]] = None,
+    dirty_from: Optional[Callable[[str], bool]] = None,
+    scope: Optional[List[str]] = None,
+    line_runner: Optional[Callable] = None,
+) -> Pieces:
     """Get version from 'git describe' in the root of the source tree.
 
     This only gets called if the git-archive 'subst' keywords were *not*
     expanded, and _version.py hasn't already been rewritten with a short
     version string, meaning we're inside a checked out source tree.
+
+    With combine_queries, HEAD's revision id, commit date and branch are
+    read by a single 'git log' instead of one git process each. If fields
+    is given, pieces not named in it (see render.style_fields()) may be left
+    as None instead of running the git commands needed to compute them.
+    If dirty_from is given (e.g. git_dirty_from_index()), it is called with
+    HEAD's revision id to compute the dirty flag, instead of letting 'git
+    describe --dirty' refresh the index and compare every file. With
+    scope, a list of paths relative to root, the distance only counts the
+    commits since the tag which changed files below those paths.
+    line_runner (by default run_command_lines(), or the output of runner
+    split into lines if runner was given) streams the output of 'git branch
+    --contains', which is only read until it lists master. It only has to
+    look at the branches listed by git_branches_to_check().
     """
     GITS = ["git"]
     if sys.platform == "win32":
@@ -29,68 +57,245 @@ def git_pieces_from_vcs(
     # but that should not change where we get our version from.
     env = os.environ.copy()
     env.pop("GIT_DIR", None)
+    if line_runner is None:
+        if runner is run_command:
+            line_runner = run_command_lines
+        else:
+            line_runner = functools.partial(git_lines_from_runner, runner)
     runner = functools.partial(runner, env=env)
+    line_runner = functools.partial(line_runner, env=env)
 
-    _, rc = runner(GITS, ["rev-parse", "--git-dir"], cwd=root,
-                   hide_stderr=not verbose)
-    if rc != 0:
-        if verbose:
-            print("Directory %s not under git control" % root)
-        raise NotThisMethod("'git rev-parse --git-dir' returned error")
+    date: Optional[str] = None
+    if combine_queries:
+        # %D lists the refs pointing at HEAD, e.g. "HEAD -> refs/heads/master,
+        # tag: refs/tags/1.0" (or "HEAD, refs/heads/master" when detached).
+        head_out, rc = runner(GITS, [
+            "log", "-1", "--decorate=full", "--format=%H%x00%ci%x00%D", "HEAD"
+        ], cwd=root, hide_stderr=not verbose)
+        if rc != 0 or head_out is None:
+            if verbose:
+                print("Directory %s not under git control" % root)
+            raise NotThisMethod("'git log' returned error")
+        # Use only the last line.  Previous lines may contain GPG signature
+        # information.
+        full_out, date, refs = head_out.splitlines()[-1].split("\0")
+    else:
+        _, rc = runner(GITS, ["rev-parse", "--git-dir"], cwd=root,
+                       hide_stderr=not verbose)
+        if rc != 0:
+            if verbose:
+                print("Directory %s not under git control" % root)
+            raise NotThisMethod("'git rev-parse --git-dir' returned error")
 
     # if there is a tag matching tag_prefix, this yields TAG-NUM-gHEX[-dirty]
     # if there isn't one, this yields HEX[-dirty] (no NUM)
     describe_out, rc = runner(GITS, [
-        "describe", "--tags", "--dirty", "--always", "--long",
-        "--match", f"{tag_prefix}[[:digit:]]*"
+        "describe", "--tags"] + ([] if dirty_from else ["--dirty"]) + [
+        "--always", "--long", "--match", f"{tag_prefix}[[:digit:]]*"
     ], cwd=root)
     # --long was added in git-1.5.5
     if describe_out is None:
         raise NotThisMethod("'git describe' failed")
     describe_out = describe_out.strip()
-    full_out, rc = runner(GITS, ["rev-parse", "HEAD"], cwd=root)
-    if full_out is None:
-        raise NotThisMethod("'git rev-parse' failed")
+    if not combine_queries and (fields is None or "date" in fields):
+        # the revision id and the commit date, from a single git process
+        out, rc = runner(GITS, ["show", "-s", "--format=%H%n%ci", "HEAD"],
+                         cwd=root)
+        if out is None or len(out.splitlines()) < 2:
+            raise NotThisMethod("'git show' failed")
+        # Use only the last lines.  Previous lines may contain GPG signature
+        # information.
+        full_out, date = out.splitlines()[-2:]
+    elif not combine_queries:
+        full_out, rc = runner(GITS, ["rev-parse", "HEAD"], cwd=root)
+        if full_out is None:
+            raise NotThisMethod("'git rev-parse' failed")
     full_out = full_out.strip()
 
-    pieces: Dict[str, Any] = {}
+    pieces = Pieces()
     pieces["long"] = full_out
     pieces["short"] = full_out[:7]  # maybe improved later
     pieces["error"] = None
 
-    branch_name, rc = runner(GITS, ["rev-parse", "--abbrev-ref", "HEAD"],
-                             cwd=root)
-    # --abbrev-ref was added in git-1.6.3
-    if rc != 0 or branch_name is None:
-        raise NotThisMethod("'git rev-parse --abbrev-ref' returned error")
-    branch_name = branch_name.strip()
+    branch_name: Optional[str]
+    if fields is not None and "branch" not in fields:
+        branch_name = None
+    elif combine_queries:
+        branch_name = "HEAD"
+        for ref in refs.split(","):
+            if ref.strip().startswith("HEAD -> refs/heads/"):
+                branch_name = ref.strip()[len("HEAD -> refs/heads/"):]
+    else:
+        branch_name, rc = runner(GITS, ["rev-parse", "--abbrev-ref", "HEAD"],
+                                 cwd=root)
+        # --abbrev-ref was added in git-1.6.3
+        if rc != 0 or branch_name is None:
+            raise NotThisMethod("'git rev-parse --abbrev-ref' returned error")
+    if branch_name is not None:
+        branch_name = branch_name.strip()
 
     if branch_name == "HEAD":
         # If we aren't exactly on a branch, pick a branch which represents
-        # the current commit. If all else fails, we are on a branchless
-        # commit.
-        branches, rc = runner(GITS, ["branch", "--contains"], cwd=root)
-        # --contains was added in git-1.5.4
-        if rc != 0 or branches is None:
-            raise NotThisMethod("'git branch --contains' returned error")
-        branches = branches.split("\n")
-
-        # Remove the first line if we're running detached
-        if "(" in branches[0]:
-            branches.pop(0)
-
-        # Strip off the leading "* " from the list of branches.
-        branches = [branch[2:] for branch in branches]
-        if "master" in branches:
-            branch_name = "master"
-        elif not branches:
-            branch_name = None
-        else:
-            # Pick the first branch that is returned. Good or bad.
-            branch_name = branches[0]
+        # the current commit. Branches whose tip is the current commit are
+        # cheap to find, so start with those: 'git branch --contains' walks
+        # the history of every local branch it looks at. If all else fails,
+        # we are on a branchless commit.
+        tips: List[str] = []
+        if combine_queries:
+            tips = sorted(ref.strip()[len("refs/heads/"):]
+                          for ref in refs.split(",")
+                          if ref.strip().startswith("refs/heads/"))
+        names = tips
+        if not combine_queries or (tips and "master" not in tips):
+            # all the branches, to see which are sorted before the tips
+            heads, rc = runner(GITS, ["for-each-ref",
+                                      "--format=%(objectname) %(refname)",
+                                      "refs/heads/"], cwd=root)
+            names, tips = [], []
+            if rc == 0 and heads is not None:
+                names, tips = git_parse_branch_heads(heads, full_out)
+
+        branches = list(tips)
+        check = git_branches_to_check(names, tips)
+        if check != []:
+            # --contains was added in git-1.5.4
+            try:
+                with contextlib.closing(line_runner(
+                        GITS, git_branch_contains_args(check),
+                        cwd=root)) as lines:
+                    for branch in git_iter_branch_contains(lines):
+                        branches.append(branch)
+                        if branch == "master":
+                            break  # git_pick_branch() needs no others
+            except OSError:
+                raise NotThisMethod("'git branch --contains' returned error")
+        branch_name = git_pick_branch(sorted(set(branches)))
 
     pieces["branch"] = branch_name
 
+    pieces.update(git_parse_describe(describe_out, tag_prefix, verbose))
+    if dirty_from is not None:
+        pieces["dirty"] = dirty_from(full_out)
+    if pieces["error"]:
+        return pieces
+
+    if fields is not None and "distance" not in fields:
+        pass
+    elif scope is not None:
+        tag = pieces["closest-tag"]
+        key = (os.path.abspath(root), tag, full_out, tuple(scope))
+        if key not in SCOPED_DISTANCE_MEMO:
+            revs = full_out
+            if tag is not None:
+                revs = f"refs/tags/{tag_prefix}{tag}..{full_out}"
+            out, rc = runner(GITS, ["rev-list", "--count", revs, "--"] + scope,
+                             cwd=root)
+            if rc != 0 or out is None:
+                raise NotThisMethod("'git rev-list --count' returned error")
+            SCOPED_DISTANCE_MEMO[key] = int(out)
+        pieces["distance"] = SCOPED_DISTANCE_MEMO[key]
+    elif pieces["closest-tag"] is None:
+        # HEX: no tags
+        out, rc = runner(GITS, ["rev-list", "--count", "HEAD"], cwd=root)
+        # --count was added in git-1.7.2
+        if rc != 0 or out is None:
+            raise NotThisMethod("'git rev-list --count' returned error")
+        pieces["distance"] = int(out)  # total number of commits
+
+    # commit date: see ISO-8601 comment in git_versions_from_keywords()
+    if date is not None:
+        date = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+    pieces["date"] = date
+
+    return pieces
+
+
+def git_lines_from_runner(runner: Callable, commands: List[str],
+                          args: List[str],
+                          **kwargs: Any) -> Generator[str, None, None]:
+    """Stream the output of a run_command()-like runner, split into lines."""
+    out, rc = runner(commands, args, **kwargs)
+    if rc != 0 or out is None:
+        raise OSError("%s returned error" % (commands[:1] + args))
+    yield from out.split("\n")
+
+
+def git_iter_branch_contains(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the branch names listed by 'git branch --contains'."""
+    for i, line in enumerate(lines):
+        # Skip the first line if we're running detached (and the empty
+        # output of a --list that matched nothing)
+        branch = line.strip()
+        if (i == 0 and "(" in branch) or not branch:
+            continue
+        # Strip off the leading "* " (or "+ " for other worktrees) from the
+        # list of branches; the runner may have stripped the "  " already.
+        yield branch[2:] if branch[:2] in ("* ", "+ ") else branch
+
+
+def git_parse_branch_contains(out: str) -> List[str]:
+    """Get the branch names listed by 'git branch --contains'."""
+    return list(git_iter_branch_contains(out.split("\n")))
+
+
+def git_parse_branch_heads(out: str, head: str) -> Tuple[List[str], List[str]]:
+    """Get all branch names, and those whose tip is head.
+
+    out is the output of 'git for-each-ref --format="%(objectname)
+    %(refname)" refs/heads/'.
+    """
+    names, tips = [], []
+    for line in out.splitlines():
+        sha, _, ref = line.partition(" ")
+        names.append(ref[len("refs/heads/"):])
+        if sha == head:
+            tips.append(names[-1])
+    return names, tips
+
+
+def git_branches_to_check(names: List[str],
+                          tips: List[str]) -> Optional[List[str]]:
+    """Get the branches that 'git branch --contains' still has to look at.
+
+    The branches in tips point at HEAD, so they contain it, but master and
+    the branches sorted before them would be picked over them if they
+    contained HEAD too. None stands for all of the branches (without tips).
+    """
+    if not tips:
+        return None
+    if "master" in tips:
+        return []
+    first = min(tips)
+    return sorted(name for name in names if name < first or name == "master")
+
+
+def git_branch_contains_args(check: Optional[List[str]]) -> List[str]:
+    """Get the 'git branch --contains' arguments for git_branches_to_check()."""
+    if check is None or len(check) > GIT_BRANCH_LIST_MAX:
+        return ["branch", "--contains"]
+    return ["branch", "--contains", "HEAD", "--list"] + check
+
+
+def git_pick_branch(branches: List[str]) -> Optional[str]:
+    """Pick the branch which represents the current commit."""
+    if "master" in branches:
+        return "master"
+    if not branches:
+        return None
+    # Pick the first branch that is returned. Good or bad.
+    return branches[0]
+
+
+def git_parse_describe(describe_out: str, tag_prefix: str,
+                       verbose: bool) -> Dict[str, Any]:
+    """Get the pieces found in the output of 'git describe'.
+
+    This returns "dirty", "closest-tag", "distance" and "short", or "dirty"
+    and "error" if the output can't be used. For an untagged commit,
+    "closest-tag" and "distance" are None and "short" is not included.
+    """
+    pieces: Dict[str, Any] = {}
+
     # parse describe_out. It will be like TAG-NUM-gHEX[-dirty] or HEX[-dirty]
     # TAG might have hyphens.
     git_describe = describe_out
@@ -132,15 +337,7 @@ def git_pieces_from_vcs(
     else:
         # HEX: no tags
         pieces["closest-tag"] = None
-        out, rc = runner(GITS, ["rev-list", "HEAD", "--left-right"], cwd=root)
-        pieces["distance"] = len(out.split())  # total number of commits
-
-    # commit date: see ISO-8601 comment in git_versions_from_keywords()
-    date = runner(GITS, ["show", "-s", "--format=%ci", "HEAD"], cwd=root)[0].strip()
-    # Use only the last line.  Previous lines may contain GPG signature
-    # information.
-    date = date.splitlines()[-1]
-    pieces["date"] = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+        pieces["distance"] = None
 
     return pieces
 
@@ -0,0 +1,127 @@
+import sys  # --STRIP DURING BUILD
+import os  # --STRIP DURING BUILD
+import asyncio  # --STRIP DURING BUILD
+import functools  # --STRIP DURING BUILD
+from typing import AbstractSet, Awaitable, Callable, Dict, List, Optional  # --STRIP DURING BUILD
+from .long_header import NotThisMethod, register_vcs_handler  # --STRIP DURING BUILD
+from .from_vcs import git_parse_branch_contains, git_parse_describe, git_pick_branch  # --STRIP DURING BUILD
+from .from_vcs import git_branch_contains_args, git_branches_to_check, git_parse_branch_heads  # --STRIP DURING BUILD
+from subprocess_async import run_command_async  # --STRIP DURING BUILD
+from pieces import Pieces  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+@register_vcs_handler("git", "pieces_from_vcs_async")
+async def git_pieces_from_vcs_async(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    runner: Callable = run_command_async,
+    fields: Optional[AbstractSet[str]] = None,
+) -> Pieces:
+    """Get version pieces from git like git_pieces_from_vcs(), asynchronously.
+
+    The git commands that don't depend on each other run concurrently, so
+    this takes about as long as the slowest of them rather than their sum.
+    The branches are listed up front, even if HEAD turns out to be on one,
+    since that is cheaper than waiting for 'git rev-parse' first.
+    """
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+
+    # GIT_DIR can interfere with correct operation of Versioneer.
+    # It may be intended to be passed to the Versioneer-versioned project,
+    # but that should not change where we get our version from.
+    env = os.environ.copy()
+    env.pop("GIT_DIR", None)
+    runner = functools.partial(runner, env=env)
+
+    need_branch = fields is None or "branch" in fields
+    queries = [
+        runner(GITS, ["rev-parse", "--git-dir"], cwd=root,
+               hide_stderr=not verbose),
+        # if there is a tag matching tag_prefix, this yields
+        # TAG-NUM-gHEX[-dirty], if there isn't one, HEX[-dirty] (no NUM)
+        runner(GITS, ["describe", "--tags", "--dirty", "--always", "--long",
+                      "--match", f"{tag_prefix}[[:digit:]]*"], cwd=root),
+        runner(GITS, ["show", "-s", "--format=%H%n%ci", "HEAD"], cwd=root),
+    ]
+    if need_branch:
+        queries += [
+            runner(GITS, ["rev-parse", "--abbrev-ref", "HEAD"], cwd=root),
+            runner(GITS, ["for-each-ref", "--format=%(objectname) %(refname)",
+                          "refs/heads/"], cwd=root),
+        ]
+    results = await asyncio.gather(*queries)
+
+    _, rc = results[0]
+    if rc != 0:
+        if verbose:
+            print("Directory %s not under git control" % root)
+        raise NotThisMethod("'git rev-parse --git-dir' returned error")
+    describe_out, rc = results[1]
+    if describe_out is None:
+        raise NotThisMethod("'git describe' failed")
+    out, rc = results[2]
+    if out is None or len(out.splitlines()) < 2:
+        raise NotThisMethod("'git show' failed")
+    # Use only the last lines.  Previous lines may contain GPG signature
+    # information.
+    full_out, date = out.splitlines()[-2:]
+    full_out = full_out.strip()
+
+    pieces = Pieces()
+    pieces["long"] = full_out
+    pieces["short"] = full_out[:7]  # maybe improved later
+    pieces["error"] = None
+    pieces.update(git_parse_describe(describe_out.strip(), tag_prefix,
+                                     verbose))
+
+    branch_name: Optional[str] = None
+    names: List[str] = []
+    tips: List[str] = []
+    if need_branch:
+        branch_name, rc = results[3]
+        if rc != 0 or branch_name is None:
+            raise NotThisMethod("'git rev-parse --abbrev-ref' returned error")
+        branch_name = branch_name.strip()
+        heads, rc = results[4]
+        if rc == 0 and heads is not None:
+            names, tips = git_parse_branch_heads(heads, full_out)
+
+    # the commands which depend on the answers above, again concurrently
+    later: Dict[str, Awaitable] = {}
+    check = git_branches_to_check(names, tips)
+    if branch_name == "HEAD" and check != []:
+        later["contains"] = runner(GITS, git_branch_contains_args(check),
+                                   cwd=root)
+    if (not pieces["error"] and pieces["closest-tag"] is None
+            and (fields is None or "distance" in fields)):
+        later["count"] = runner(GITS, ["rev-list", "--count", "HEAD"],
+                                cwd=root)
+    answers = dict(zip(later, await asyncio.gather(*later.values())))
+
+    if branch_name == "HEAD":
+        branches = list(tips)
+        if "contains" in answers:
+            out, rc = answers["contains"]
+            if rc != 0 or out is None:
+                raise NotThisMethod("'git branch --contains' returned error")
+            branches += git_parse_branch_contains(out)
+        branch_name = git_pick_branch(sorted(set(branches)))
+    pieces["branch"] = branch_name
+
+    if pieces["error"]:
+        return pieces
+
+    if "count" in answers:
+        out, rc = answers["count"]
+        if rc != 0 or out is None:
+            raise NotThisMethod("'git rev-list --count' returned error")
+        pieces["distance"] = int(out)  # total number of commits
+
+    # commit date: see ISO-8601 comment in git_versions_from_keywords()
+    pieces["date"] = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+
+    return pieces
+
@@ -1,13 +1,37 @@
 import os # --STRIP DURING BUILD
 import sys # --STRIP DURING BUILD
-from typing import Optional # --STRIP DURING BUILD
+import shlex # --STRIP DURING BUILD
+from typing import List, Optional # --STRIP DURING BUILD
 from subprocess_helper import run_command # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
 
-def do_vcs_install(versionfile_source: str, ipy: Optional[str]) -> None:
+GIT_HOOK_MARKER = "# installed by versioneer"
+
+GIT_HOOKS = ["post-commit", "post-checkout", "post-merge", "post-rewrite"]
+
+GIT_HOOK_SCRIPT = """#!/bin/sh
+%(MARKER)s, see git_hooks in setup.cfg
+# store the project's version in .git/versioneer-cache.json
+%(SKIP)sunset GIT_DIR GIT_INDEX_FILE GIT_WORK_TREE
+# the interpreter that installed the hook may be gone (e.g. a deleted venv)
+for python in %(PYTHON)s python3 python; do
+    if command -v "$python" >/dev/null 2>&1; then
+        cd ./%(PREFIX)s && "$python" -m versioneer refresh >/dev/null
+        break
+    fi
+done
+# a failed refresh only leaves the cache stale, so don't fail the git command
+exit 0
+"""
+
+
+def do_vcs_install(versionfile_source: str, ipy: Optional[str],
+                   hooks: bool = False) -> None:
     """Git-specific installation logic for Versioneer.
 
     For Git, this means creating/changing .gitattributes to mark _version.py
-    for export-subst keyword substitution.
+    for export-subst keyword substitution, and with hooks, installing the
+    git hooks that keep the version cache up to date.
     """
     GITS = ["git"]
     if sys.platform == "win32":
@@ -39,5 +63,41 @@ def do_vcs_install(versionfile_source: str, ipy: Optional[str]) -> None:
             fobj.write(f"{versionfile_source} export-subst\n")
         files.append(".gitattributes")
     run_command(GITS, ["add", "--"] + files)
+    if hooks:
+        install_git_hooks(GITS)
+
+
+def install_git_hooks(GITS: List[str]) -> None:
+    """Install hooks that refresh the version cache when HEAD moves.
+
+    Hooks that weren't installed by Versioneer are left alone.
+    """
+    hooks_dir, rc = run_command(GITS, ["rev-parse", "--git-path", "hooks"])
+    prefix, _ = run_command(GITS, ["rev-parse", "--show-prefix"])
+    if rc != 0 or hooks_dir is None or prefix is None:
+        print(" unable to find the git hooks directory, not installing hooks")
+        return
+    os.makedirs(hooks_dir, exist_ok=True)
+    for name in GIT_HOOKS:
+        hook = os.path.join(hooks_dir, name)
+        try:
+            with open(hook, "r") as fobj:
+                if GIT_HOOK_MARKER not in fobj.read():
+                    print(" %s exists, not replacing it" % hook)
+                    continue
+        except OSError:
+            pass
+        # post-checkout also runs when checking out files rather than a
+        # branch, which doesn't move HEAD
+        skip = 'test "$3" = 0 && exit 0\n' if name == "post-checkout" else ""
+        print(" installing %s" % hook)
+        with open(hook, "w") as fobj:
+            fobj.write(GIT_HOOK_SCRIPT % {
+                "MARKER": GIT_HOOK_MARKER,
+                "PREFIX": shlex.quote(prefix) if prefix else "",
+                "SKIP": skip,
+                "PYTHON": shlex.quote(sys.executable),
+            })
+        os.chmod(hook, 0o755)
 
 
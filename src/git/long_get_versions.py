@@ -1,10 +1,15 @@
 import os # --STRIP DURING BUILD
+import functools # --STRIP DURING BUILD
 from typing import Any, Dict # --STRIP DURING BUILD
 from .long_header import get_config, get_keywords, NotThisMethod # --STRIP DURING BUILD
 from .from_keywords import git_versions_from_keywords # --STRIP DURING BUILD
 from .from_vcs import git_pieces_from_vcs # --STRIP DURING BUILD
+from .checkout import git_dirty_from_index # --STRIP DURING BUILD
+from .cache import git_pieces_from_cache # --STRIP DURING BUILD
+from .from_daemon import git_pieces_from_daemon # --STRIP DURING BUILD
 from from_parentdir import versions_from_parentdir # --STRIP DURING BUILD
-from render import render # --STRIP DURING BUILD
+from render import render, style_fields # --STRIP DURING BUILD
+from subprocess_helper import budget_exceeded, time_budget, trace_span # --STRIP DURING BUILD
 
 def get_versions() -> Dict[str, Any]:
     """Get version information or return default if unable to do so."""
@@ -17,8 +22,9 @@ def get_versions() -> Dict[str, Any]:
     verbose = cfg.verbose
 
     try:
-        return git_versions_from_keywords(get_keywords(), cfg.tag_prefix,
-                                          verbose)
+        with trace_span("strategy", name="keywords"):
+            return git_versions_from_keywords(get_keywords(), cfg.tag_prefix,
+                                              verbose)
     except NotThisMethod:
         pass
 
@@ -35,18 +41,54 @@ def get_versions() -> Dict[str, Any]:
                 "error": "unable to find root of source tree",
                 "date": None}
 
-    try:
-        pieces = git_pieces_from_vcs(cfg.tag_prefix, root, verbose)
-        return render(pieces, cfg.style)
-    except NotThisMethod:
-        pass
+    # the VCS and parentdir steps share cfg.time_budget seconds, if set
+    with time_budget(cfg.time_budget):
+        try:
+            fields = style_fields(cfg.style)
+            kwargs: Dict[str, Any] = {
+                "fields": fields,
+                "combine_queries": cfg.combine_git_queries}
+            scope = cfg.path_scope.split() or None
+            if scope is not None:
+                kwargs["scope"] = scope
+            dirty_scope = None
+            if cfg.dirty_check == "index" or scope is not None:
+                dirty_scope = cfg.dirty_scope.split() or scope
+                kwargs["dirty_from"] = functools.partial(
+                    git_dirty_from_index, root, scope=dirty_scope)
+            # the daemon only knows dirty flags of whole repositories
+            if cfg.version_daemon and scope is None and not cfg.dirty_scope:
+                try:
+                    with trace_span("strategy", name="daemon", root=root):
+                        pieces = git_pieces_from_daemon(
+                            cfg.tag_prefix, root, verbose, fields=fields)
+                    return render(pieces, cfg.style)
+                except NotThisMethod:
+                    pass
+            with trace_span("strategy", name="vcs", root=root):
+                if cfg.version_cache or cfg.static_version_py:
+                    pieces = git_pieces_from_cache(
+                        cfg.tag_prefix, root, verbose, git_pieces_from_vcs,
+                        check_dirty=not cfg.static_version_py,
+                        dirty_scope=dirty_scope, **kwargs)
+                else:
+                    pieces = git_pieces_from_vcs(cfg.tag_prefix, root,
+                                                 verbose, **kwargs)
+            return render(pieces, cfg.style)
+        except NotThisMethod:
+            pass
 
-    try:
-        if cfg.parentdir_prefix:
-            return versions_from_parentdir(cfg.parentdir_prefix, root, verbose)
-    except NotThisMethod:
-        pass
+        try:
+            if cfg.parentdir_prefix:
+                with trace_span("strategy", name="parentdir", root=root):
+                    return versions_from_parentdir(cfg.parentdir_prefix, root,
+                                                   verbose)
+        except NotThisMethod:
+            pass
+
+        error = "unable to compute version"
+        if budget_exceeded():
+            error += " within time_budget (%gs)" % cfg.time_budget
 
     return {"version": "0+unknown", "full-revisionid": None,
-            "dirty": None,
-            "error": "unable to compute version", "date": None}
+            "dirty": None, "error": error, "date": None}
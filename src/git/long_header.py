@@ -10,12 +10,17 @@
 
 """Git implementation of _version.py."""
 
+import contextlib
 import errno
 import os
 import re
+import stat
 import subprocess
 import sys
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import time
+from typing import AbstractSet, Any, Callable, Dict, FrozenSet, Generator, Iterable
+from typing import Iterator, List, Mapping, MutableMapping, NamedTuple, Optional, Set
+from typing import Tuple
 import functools
 
 
@@ -41,6 +46,14 @@ class VersioneerConfig:
     parentdir_prefix: str
     versionfile_source: str
     verbose: bool
+    combine_git_queries: bool
+    version_daemon: bool
+    version_cache: bool
+    static_version_py: bool
+    dirty_check: str
+    dirty_scope: str
+    path_scope: str
+    time_budget: float
 
 
 def get_config() -> VersioneerConfig:
@@ -54,6 +67,14 @@ def get_config() -> VersioneerConfig:
     cfg.parentdir_prefix = "%(PARENTDIR_PREFIX)s"
     cfg.versionfile_source = "%(VERSIONFILE_SOURCE)s"
     cfg.verbose = False
+    cfg.combine_git_queries = "%(COMBINE_GIT_QUERIES)s" == "True"
+    cfg.version_daemon = "%(VERSION_DAEMON)s" == "True"
+    cfg.version_cache = "%(VERSION_CACHE)s" == "True"
+    cfg.static_version_py = "%(STATIC_VERSION_PY)s" == "True"
+    cfg.dirty_check = "%(DIRTY_CHECK)s"
+    cfg.dirty_scope = "%(DIRTY_SCOPE)s"
+    cfg.path_scope = "%(PATH_SCOPE)s"
+    cfg.time_budget = float("%(TIME_BUDGET)s")
     return cfg
 
 
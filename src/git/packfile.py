@@ -0,0 +1,193 @@
+import os  # --STRIP DURING BUILD
+from typing import Callable, Dict, Iterator, List, Optional, Tuple  # --STRIP DURING BUILD
+from .long_header import NotThisMethod  # --STRIP DURING BUILD
+  # --STRIP DURING BUILD
+
+# object types in pack entry headers
+PACK_OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+PACK_OFS_DELTA = 6
+PACK_REF_DELTA = 7
+
+# how many resolved delta bases each PackFile remembers
+PACK_BASE_CACHE_SIZE = 256
+
+
+def delta_size(delta: bytes, pos: int) -> Tuple[int, int]:
+    """Decode a size in a delta header: (size, position after it)."""
+    size = shift = 0
+    while True:
+        byte = delta[pos]
+        pos += 1
+        size |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its delta base and the delta instructions."""
+    base_size, pos = delta_size(delta, 0)
+    if base_size != len(base):
+        raise NotThisMethod("delta base has the wrong size")
+    size, pos = delta_size(delta, pos)
+    out = bytearray()
+    while pos < len(delta):
+        cmd = delta[pos]
+        pos += 1
+        if cmd & 0x80:
+            # copy from the base: bits 0-3 say which offset bytes follow,
+            # bits 4-6 which length bytes
+            offset = length = 0
+            for i in range(4):
+                if cmd & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if cmd & (0x10 << i):
+                    length |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (length or 0x10000)]
+        elif cmd:
+            # insert the next cmd bytes of the delta
+            out += delta[pos:pos + cmd]
+            pos += cmd
+        else:
+            raise NotThisMethod("invalid delta instruction")
+    if len(out) != size:
+        raise NotThisMethod("delta produced the wrong size")
+    return bytes(out)
+
+
+class PackFile:
+    """Read-only access to a pack and its (version 2) .idx file.
+
+    Both files are mmap()ed: lookups binary-search the mapped index, and
+    objects are inflated straight from slices of the mapped pack, so
+    neither file is ever read as a whole.
+    """
+
+    def __init__(self, idx_filename: str) -> None:
+        """Map the index; the pack is mapped when first needed."""
+        # only needed once objects are read from packs
+        import mmap
+        import struct
+        with open(idx_filename, "rb") as fobj:
+            self.idx = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.idx[:8] != b"\377tOc\0\0\0\2":
+            raise NotThisMethod("unsupported pack index %s" % idx_filename)
+        self.fanout = struct.unpack(">256I", self.idx[8:1032])
+        self.count = self.fanout[255]
+        self.filename = idx_filename[:-len(".idx")] + ".pack"
+        self.pack: Optional[mmap.mmap] = None
+        # offset -> (type, contents) of recently resolved delta bases
+        self.bases: Dict[int, Tuple[str, bytes]] = {}
+
+    def shas(self, first: int) -> Iterator[str]:
+        """Yield the ids of the objects whose first byte is first."""
+        for i in range(self.fanout[first - 1] if first else 0,
+                       self.fanout[first]):
+            yield self.idx[1032 + 20 * i:1052 + 20 * i].hex()
+
+    def find(self, sha: str) -> Optional[int]:
+        """Look up the offset of an object in the pack, or None."""
+        binsha = bytes.fromhex(sha)
+        lo = self.fanout[binsha[0] - 1] if binsha[0] else 0
+        hi = self.fanout[binsha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self.idx[1032 + 20 * mid:1052 + 20 * mid]
+            if found < binsha:
+                lo = mid + 1
+            elif found > binsha:
+                hi = mid
+            else:
+                pos = 1032 + 24 * self.count + 4 * mid
+                offset = int.from_bytes(self.idx[pos:pos + 4], "big")
+                if offset & 0x80000000:
+                    pos = 1032 + 28 * self.count + 8 * (offset & 0x7fffffff)
+                    offset = int.from_bytes(self.idx[pos:pos + 8], "big")
+                return offset
+        return None
+
+    def inflate(self, pos: int) -> bytes:
+        """Decompress the zlib stream starting at pos."""
+        assert self.pack is not None
+        import zlib
+        inflater = zlib.decompressobj()
+        parts = []
+        with memoryview(self.pack) as view:
+            while not inflater.eof:
+                chunk = view[pos:pos + 8192]
+                if not chunk:
+                    raise NotThisMethod("truncated pack %s" % self.filename)
+                parts.append(inflater.decompress(chunk))
+                pos += 8192
+        return b"".join(parts)
+
+    def read(self, offset: int,
+             read_object: Callable[[str], Tuple[str, bytes]]) -> Tuple[str, bytes]:
+        """Return the (type, contents) of the object at offset.
+
+        Deltas are resolved against their base at an earlier offset
+        (OFS_DELTA) or, for REF_DELTA, against the object read_object()
+        returns for the base's id, which may live in another pack.
+        """
+        if self.pack is None:
+            import mmap
+            with open(self.filename, "rb") as fobj:
+                self.pack = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.pack
+        deltas: List[Tuple[int, bytes]] = []
+        while True:
+            if offset in self.bases:
+                kind, body = self.bases[offset]
+                break
+            entry = offset
+            byte = data[offset]
+            kind_id = (byte >> 4) & 7
+            while byte & 0x80:  # the object's size, which we don't need
+                offset += 1
+                byte = data[offset]
+            offset += 1
+            if kind_id in PACK_OBJECT_TYPES:
+                kind, body = PACK_OBJECT_TYPES[kind_id], self.inflate(offset)
+                break
+            if kind_id == PACK_OFS_DELTA:
+                byte = data[offset]
+                distance = byte & 0x7f
+                while byte & 0x80:
+                    offset += 1
+                    byte = data[offset]
+                    distance = ((distance + 1) << 7) | (byte & 0x7f)
+                deltas.append((entry, self.inflate(offset + 1)))
+                offset = entry - distance
+            elif kind_id == PACK_REF_DELTA:
+                base = data[offset:offset + 20].hex()
+                deltas.append((entry, self.inflate(offset + 20)))
+                kind, body = read_object(base)
+                break
+            else:
+                raise NotThisMethod("unknown object type %d in %s"
+                                    % (kind_id, self.filename))
+        for entry, delta in reversed(deltas):
+            body = apply_delta(body, delta)
+            if len(self.bases) >= PACK_BASE_CACHE_SIZE:
+                self.bases.clear()
+            self.bases[entry] = (kind, body)
+        return kind, body
+
+
+def find_packs(object_dirs: List[str]) -> List[PackFile]:
+    """Open the packs of the objects directories, in name order."""
+    packs = []
+    for objects in object_dirs:
+        pack_dir = os.path.join(objects, "pack")
+        try:
+            names = sorted(os.listdir(pack_dir))
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith(".idx"):
+                packs.append(PackFile(os.path.join(pack_dir, name)))
+    return packs
+
@@ -11,16 +11,37 @@
 # pylint:disable=too-few-public-methods,redefined-outer-name,consider-using-with
 # pylint:disable=attribute-defined-outside-init,too-many-arguments
 
+import asyncio
+import atexit
 import configparser
+import contextlib
+import contextvars
+import copy
+import ctypes
 import errno
+import fnmatch
+import heapq
 import json
+import mmap
 import os
 import re
+import select
+import shlex
+import socket
+import socketserver
+import stat
+import struct
 import subprocess
 import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, ClassVar, Callable, cast, Dict, List, Optional, Tuple, Union
-from typing import NoReturn
+from typing import AbstractSet, Any, Awaitable, ClassVar, Callable, cast, Dict
+from typing import FrozenSet, Generator, Iterable, Iterator, List, Mapping
+from typing import MutableMapping, NamedTuple, NoReturn, Optional, Set, Tuple, Union
 import functools
 
 have_tomllib = True
@@ -33,6 +54,8 @@ else:
         have_tomllib = False
 
 from .get_versions import VersioneerBadRootError # --STRIP DURING BUILD
+from .render import compile_style_template, is_style_template # --STRIP DURING BUILD
+from .subprocess_helper import trace # --STRIP DURING BUILD
 
 class VersioneerConfig:
     """Container for Versioneer configuration parameters."""
@@ -44,6 +67,20 @@ class VersioneerConfig:
     versionfile_build: Optional[str]
     parentdir_prefix: Optional[str]
     verbose: Optional[bool]
+    combine_git_queries: Optional[bool]
+    git_coprocess: Optional[bool]
+    pure_python_git: Optional[bool]
+    tag_index: Optional[bool]
+    version_cache: Optional[bool]
+    static_version_py: Optional[bool]
+    lazy_version: Optional[bool]
+    git_hooks: Optional[bool]
+    version_daemon: Optional[bool]
+    dirty_check: Optional[str]
+    dirty_scope: Optional[str]
+    path_scope: Optional[str]
+    time_budget: Optional[float]
+    styles: Optional[Dict[str, str]]
 
 
 def get_root() -> str:
@@ -96,6 +133,10 @@ def get_root() -> str:
     return root
 
 
+# configs read by get_config_from_root(), by root and config file stat data
+CONFIG_MEMO: Dict[Tuple[str, str], "VersioneerConfig"] = {}
+
+
 def get_config_from_root(root: str) -> VersioneerConfig:
     """Read the project setup.cfg file to determine Versioneer config."""
     # This might raise OSError (if setup.cfg is missing), or
@@ -105,6 +146,17 @@ def get_config_from_root(root: str) -> VersioneerConfig:
     root_pth = Path(root)
     pyproject_toml = root_pth / "pyproject.toml"
     setup_cfg = root_pth / "setup.cfg"
+    stats: List[Optional[Tuple[int, int, int]]] = []
+    for path in (pyproject_toml, setup_cfg):
+        try:
+            st = path.stat()
+            stats.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stats.append(None)
+    key = (root, repr(stats))
+    if key in CONFIG_MEMO:
+        return copy.copy(CONFIG_MEMO[key])
+    start = time.perf_counter()
     section: Union[Dict[str, Any], configparser.SectionProxy, None] = None
     if pyproject_toml.exists():
         if not have_tomllib:
@@ -148,13 +200,61 @@ def get_config_from_root(root: str) -> VersioneerConfig:
     if cfg.tag_prefix in ("''", '""', None):
         cfg.tag_prefix = ""
     cfg.parentdir_prefix = section.get("parentdir_prefix")
+    cfg.dirty_check = section.get("dirty_check")
+    cfg.dirty_scope = section.get("dirty_scope")
+    cfg.path_scope = section.get("path_scope")
+    time_budget = section.get("time_budget")
+    cfg.time_budget = float(time_budget) if time_budget is not None else None
+    styles = section.get("styles")
+    if isinstance(styles, str):
+        # setup.cfg has one "NAME = TEMPLATE" per line
+        templates = {}
+        for line in styles.splitlines():
+            name, sep, template = line.partition("=")
+            if sep:
+                templates[name.strip()] = template.strip()
+        styles = templates
+    cfg.styles = styles
+    if cfg.styles and cfg.style in cfg.styles:
+        # render() takes the template itself
+        cfg.style = cfg.styles[cfg.style]
+    # report malformed templates now, rather than when a version is rendered
+    templates = dict(cfg.styles or {})
+    if is_style_template(cfg.style):
+        templates["style"] = cfg.style
+    for name, template in templates.items():
+        try:
+            compile_style_template(template)
+        except ValueError as e:
+            raise ValueError("bad style %r in the versioneer config: %s"
+                             % (name, e))
     if isinstance(section, configparser.SectionProxy):
         # Make sure configparser translates to bool
         cfg.verbose = section.getboolean("verbose")
+        cfg.combine_git_queries = section.getboolean("combine_git_queries")
+        cfg.git_coprocess = section.getboolean("git_coprocess")
+        cfg.pure_python_git = section.getboolean("pure_python_git")
+        cfg.tag_index = section.getboolean("tag_index")
+        cfg.version_cache = section.getboolean("version_cache")
+        cfg.static_version_py = section.getboolean("static_version_py")
+        cfg.lazy_version = section.getboolean("lazy_version")
+        cfg.git_hooks = section.getboolean("git_hooks")
+        cfg.version_daemon = section.getboolean("version_daemon")
     else:
         cfg.verbose = section.get("verbose")
+        cfg.combine_git_queries = section.get("combine_git_queries")
+        cfg.git_coprocess = section.get("git_coprocess")
+        cfg.pure_python_git = section.get("pure_python_git")
+        cfg.tag_index = section.get("tag_index")
+        cfg.version_cache = section.get("version_cache")
+        cfg.static_version_py = section.get("static_version_py")
+        cfg.lazy_version = section.get("lazy_version")
+        cfg.git_hooks = section.get("git_hooks")
+        cfg.version_daemon = section.get("version_daemon")
 
-    return cfg
+    trace("config", root=root, duration=time.perf_counter() - start)
+    CONFIG_MEMO[key] = cfg
+    return copy.copy(cfg)
 
 
 class NotThisMethod(Exception):
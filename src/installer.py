@@ -13,8 +13,10 @@ VERSIONEER_PEP518 = True
 VERSIONEER = base64.b64decode(VERSIONEER_b64.encode('ASCII'))
 
 
-# Stub overwritten by exec()
+# Stubs overwritten by exec()
 def setup_command() -> NoReturn: ...  # type: ignore
+def refresh_command() -> NoReturn: ...  # type: ignore
+def serve_command() -> NoReturn: ...  # type: ignore
 
 # Make versioneer usable via import
 exec(VERSIONEER.decode(), globals())
@@ -50,7 +52,7 @@ def vendor() -> None:
 
 def main() -> NoReturn:
     usage = "Usage: versioneer install [--vendor|--no-vendor]"
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
+    if len(sys.argv) < 2 or (len(sys.argv) > 3 and sys.argv[1] != "serve"):
         print(usage)
         sys.exit(1)
 
@@ -63,6 +65,11 @@ def main() -> NoReturn:
     elif command in ("help", "-help", "--help"):
         print(usage)
         sys.exit(0)
+    elif command == "refresh":
+        # run by the git hooks installed with git_hooks
+        refresh_command()
+    elif command == "serve":
+        serve_command()
     elif command != "install" or mode not in ("--vendor", "--no-vendor"):
         print(usage)
         sys.exit(1)
@@ -0,0 +1,191 @@
+from typing import Any, Dict, Iterator, List, Mapping, MutableMapping, Optional, Tuple # --STRIP DURING BUILD
+# the keys of version pieces, in the order Pieces.to_json() stores them
+PIECES_FIELDS = ("long", "short", "error", "branch", "dirty", "closest-tag",
+                 "distance", "date")
+PIECES_SLOTS: Dict[str, str] = {name: name.replace("-", "_")
+                                for name in PIECES_FIELDS}
+
+
+class Pieces(MutableMapping[str, Any]):
+    """The parts of a version found in the VCS, which render() combines.
+
+    This reads (and is built) like the dict it replaces, e.g.
+    pieces["closest-tag"] or pieces.get("date"), but keeps each field in a
+    slot, which can also be read as an attribute (pieces.closest_tag). The
+    renderers do that, as it is as fast as a dict lookup while item access
+    goes through __getitem__(). Fields that were never set are missing, as
+    they would be from the dict. Names other than PIECES_FIELDS, which a
+    third-party handler may add, are kept in a dict of their own. Pieces
+    compare equal to dicts with the same items, and hash by their items
+    (computed once until one changes), so they shouldn't be changed while
+    used as a key.
+    """
+
+    __slots__ = tuple(PIECES_SLOTS.values()) + ("_extra", "_hash")
+    long: Any
+    short: Any
+    error: Any
+    branch: Any
+    dirty: Any
+    closest_tag: Any
+    distance: Any
+    date: Any
+    _extra: Optional[Dict[str, Any]]
+    _hash: Optional[int]
+
+    def __init__(self, items: Optional[Mapping[str, Any]] = None) -> None:
+        """Create pieces with the given items set."""
+        set_slot = object.__setattr__
+        set_slot(self, "_extra", None)
+        set_slot(self, "_hash", None)
+        if items is not None:
+            for name, value in items.items():
+                if name in PIECES_SLOTS:
+                    set_slot(self, PIECES_SLOTS[name], value)
+                else:
+                    self[name] = value
+
+    def __setattr__(self, slot: str, value: Any) -> None:
+        """Set a slot, forgetting the hash of the old items."""
+        object.__setattr__(self, slot, value)
+        if slot != "_hash":
+            object.__setattr__(self, "_hash", None)
+
+    def __delattr__(self, slot: str) -> None:
+        """Unset a slot, forgetting the hash of the old items."""
+        object.__delattr__(self, slot)
+        object.__setattr__(self, "_hash", None)
+
+    def __getitem__(self, name: str) -> Any:
+        """Return the item name, raising KeyError if it isn't set."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            if self._extra is None:
+                raise KeyError(name)
+            return self._extra[name]
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        """Set the item name."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is not None:
+            setattr(self, slot, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[name] = value
+        self._hash = None
+
+    def __delitem__(self, name: str) -> None:
+        """Unset the item name."""
+        slot = PIECES_SLOTS.get(name)
+        try:
+            if slot is not None:
+                delattr(self, slot)
+            elif self._extra is None:
+                raise KeyError(name)
+            else:
+                del self._extra[name]
+                self._hash = None
+        except (KeyError, AttributeError):
+            raise KeyError(name) from None
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the names that are set, PIECES_FIELDS first."""
+        for name in PIECES_FIELDS:
+            if hasattr(self, PIECES_SLOTS[name]):
+                yield name
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        """Count the items that are set."""
+        return sum(1 for _ in self)
+
+    def __contains__(self, name: object) -> bool:
+        """Tell whether the item name is set."""
+        if not isinstance(name, str):
+            return False
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            return self._extra is not None and name in self._extra
+        return hasattr(self, slot)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Return the item name, or default if it isn't set."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            return default if self._extra is None else self._extra.get(
+                name, default)
+        return getattr(self, slot, default)
+
+    def key(self) -> Tuple[Tuple[str, Any], ...]:
+        """Return the set items as a tuple.
+
+        PIECES_FIELDS come first, in that order, then other names, sorted.
+        """
+        fields = tuple((name, getattr(self, slot))
+                       for name, slot in PIECES_SLOTS.items()
+                       if hasattr(self, slot))
+        if not self._extra:
+            return fields
+        return fields + tuple(sorted(self._extra.items(),
+                                     key=lambda item: item[0]))
+
+    def __hash__(self) -> int:
+        """Hash the items that are set."""
+        value = self._hash
+        if value is None:
+            value = self._hash = hash(self.key())
+        return value
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with other pieces, or with a dict of items."""
+        if isinstance(other, Pieces):
+            return self.key() == other.key()
+        if isinstance(other, Mapping):
+            return dict(self.key()) == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        """Show the items that are set."""
+        return "Pieces(%r)" % (dict(self.key()),)
+
+    def copy(self) -> "Pieces":
+        """Return a shallow copy of these pieces."""
+        return Pieces(self)
+
+    def to_json(self) -> List[Any]:
+        """Return the fields as a list, in PIECES_FIELDS order.
+
+        This is how pieces are stored in caches: unlike a dict, it doesn't
+        repeat the field names. Fields that aren't set are stored as None,
+        and other names aren't stored.
+        """
+        return [self.get(name) for name in PIECES_FIELDS]
+
+    @classmethod
+    def from_json(cls, data: Any) -> "Pieces":
+        """Rebuild pieces from to_json() data, or from a dict of fields.
+
+        Raises ValueError if data is neither.
+        """
+        if isinstance(data, list) and len(data) == len(PIECES_FIELDS):
+            data = dict(zip(PIECES_FIELDS, data))
+        if not isinstance(data, dict):
+            raise ValueError("not version pieces: %r" % (data,))
+        unknown = set(data) - set(PIECES_SLOTS)
+        if unknown:
+            raise ValueError("not version pieces: %s"
+                             % ", ".join(sorted(map(repr, unknown))))
+        return cls(data)
+
+
+def as_pieces(pieces: Mapping[str, Any]) -> Pieces:
+    """Return pieces as Pieces, copying a dict of pieces into new ones."""
+    return pieces if isinstance(pieces, Pieces) else Pieces(pieces)
+
+
@@ -1,13 +1,15 @@
-from typing import Any, Dict, Optional, Tuple # --STRIP DURING BUILD
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple # --STRIP DURING BUILD
+from pieces import PIECES_SLOTS, Pieces, as_pieces # --STRIP DURING BUILD
 
-def plus_or_dot(pieces: Dict[str, Any]) -> str:
+def plus_or_dot(pieces: Mapping[str, Any]) -> str:
     """Return a + if we don't already have one, else return a ."""
-    if "+" in pieces.get("closest-tag", ""):
+    pieces = as_pieces(pieces)
+    if "+" in pieces.closest_tag:
         return "."
     return "+"
 
 
-def render_pep440(pieces: Dict[str, Any]) -> str:
+def render_pep440(pieces: Mapping[str, Any]) -> str:
     """Build up version string, with post-release "local version identifier".
 
     Our goal: TAG[+DISTANCE.gHEX[.dirty]] . Note that if you
@@ -16,23 +18,24 @@ def render_pep440(pieces: Dict[str, Any]) -> str:
     Exceptions:
     1: no tags. git_describe was just HEX. 0+untagged.DISTANCE.gHEX[.dirty]
     """
-    if pieces["closest-tag"]:
-        rendered = pieces["closest-tag"]
-        if pieces["distance"] or pieces["dirty"]:
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
             rendered += plus_or_dot(pieces)
-            rendered += "%d.g%s" % (pieces["distance"], pieces["short"])
-            if pieces["dirty"]:
+            rendered += "%d.g%s" % (pieces.distance, pieces.short)
+            if pieces.dirty:
                 rendered += ".dirty"
     else:
         # exception #1
-        rendered = "0+untagged.%d.g%s" % (pieces["distance"],
-                                          pieces["short"])
-        if pieces["dirty"]:
+        rendered = "0+untagged.%d.g%s" % (pieces.distance,
+                                          pieces.short)
+        if pieces.dirty:
             rendered += ".dirty"
     return rendered
 
 
-def render_pep440_branch(pieces: Dict[str, Any]) -> str:
+def render_pep440_branch(pieces: Mapping[str, Any]) -> str:
     """TAG[[.dev0]+DISTANCE.gHEX[.dirty]] .
 
     The ".dev0" means not master branch. Note that .dev0 sorts backwards
@@ -41,23 +44,24 @@ def render_pep440_branch(pieces: Dict[str, Any]) -> str:
     Exceptions:
     1: no tags. 0[.dev0]+untagged.DISTANCE.gHEX[.dirty]
     """
-    if pieces["closest-tag"]:
-        rendered = pieces["closest-tag"]
-        if pieces["distance"] or pieces["dirty"]:
-            if pieces["branch"] != "master":
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            if pieces.branch != "master":
                 rendered += ".dev0"
             rendered += plus_or_dot(pieces)
-            rendered += "%d.g%s" % (pieces["distance"], pieces["short"])
-            if pieces["dirty"]:
+            rendered += "%d.g%s" % (pieces.distance, pieces.short)
+            if pieces.dirty:
                 rendered += ".dirty"
     else:
         # exception #1
         rendered = "0"
-        if pieces["branch"] != "master":
+        if pieces.branch != "master":
             rendered += ".dev0"
-        rendered += "+untagged.%d.g%s" % (pieces["distance"],
-                                          pieces["short"])
-        if pieces["dirty"]:
+        rendered += "+untagged.%d.g%s" % (pieces.distance,
+                                          pieces.short)
+        if pieces.dirty:
             rendered += ".dirty"
     return rendered
 
@@ -72,31 +76,32 @@ def pep440_split_post(ver: str) -> Tuple[str, Optional[int]]:
     return vc[0], int(vc[1] or 0) if len(vc) == 2 else None
 
 
-def render_pep440_pre(pieces: Dict[str, Any]) -> str:
+def render_pep440_pre(pieces: Mapping[str, Any]) -> str:
     """TAG[.postN.devDISTANCE] -- No -dirty.
 
     Exceptions:
     1: no tags. 0.post0.devDISTANCE
     """
-    if pieces["closest-tag"]:
-        if pieces["distance"]:
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        if pieces.distance:
             # update the post release segment
-            tag_version, post_version = pep440_split_post(pieces["closest-tag"])
+            tag_version, post_version = pep440_split_post(pieces.closest_tag)
             rendered = tag_version
             if post_version is not None:
-                rendered += ".post%d.dev%d" % (post_version + 1, pieces["distance"])
+                rendered += ".post%d.dev%d" % (post_version + 1, pieces.distance)
             else:
-                rendered += ".post0.dev%d" % (pieces["distance"])
+                rendered += ".post0.dev%d" % (pieces.distance)
         else:
             # no commits, use the tag as the version
-            rendered = pieces["closest-tag"]
+            rendered = pieces.closest_tag
     else:
         # exception #1
-        rendered = "0.post0.dev%d" % pieces["distance"]
+        rendered = "0.post0.dev%d" % pieces.distance
     return rendered
 
 
-def render_pep440_post(pieces: Dict[str, Any]) -> str:
+def render_pep440_post(pieces: Mapping[str, Any]) -> str:
     """TAG[.postDISTANCE[.dev0]+gHEX] .
 
     The ".dev0" means dirty. Note that .dev0 sorts backwards
@@ -106,24 +111,25 @@ def render_pep440_post(pieces: Dict[str, Any]) -> str:
     Exceptions:
     1: no tags. 0.postDISTANCE[.dev0]
     """
-    if pieces["closest-tag"]:
-        rendered = pieces["closest-tag"]
-        if pieces["distance"] or pieces["dirty"]:
-            rendered += ".post%d" % pieces["distance"]
-            if pieces["dirty"]:
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%d" % pieces.distance
+            if pieces.dirty:
                 rendered += ".dev0"
             rendered += plus_or_dot(pieces)
-            rendered += "g%s" % pieces["short"]
+            rendered += "g%s" % pieces.short
     else:
         # exception #1
-        rendered = "0.post%d" % pieces["distance"]
-        if pieces["dirty"]:
+        rendered = "0.post%d" % pieces.distance
+        if pieces.dirty:
             rendered += ".dev0"
-        rendered += "+g%s" % pieces["short"]
+        rendered += "+g%s" % pieces.short
     return rendered
 
 
-def render_pep440_post_branch(pieces: Dict[str, Any]) -> str:
+def render_pep440_post_branch(pieces: Mapping[str, Any]) -> str:
     """TAG[.postDISTANCE[.dev0]+gHEX[.dirty]] .
 
     The ".dev0" means not master branch.
@@ -131,28 +137,29 @@ def render_pep440_post_branch(pieces: Dict[str, Any]) -> str:
     Exceptions:
     1: no tags. 0.postDISTANCE[.dev0]+gHEX[.dirty]
     """
-    if pieces["closest-tag"]:
-        rendered = pieces["closest-tag"]
-        if pieces["distance"] or pieces["dirty"]:
-            rendered += ".post%d" % pieces["distance"]
-            if pieces["branch"] != "master":
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%d" % pieces.distance
+            if pieces.branch != "master":
                 rendered += ".dev0"
             rendered += plus_or_dot(pieces)
-            rendered += "g%s" % pieces["short"]
-            if pieces["dirty"]:
+            rendered += "g%s" % pieces.short
+            if pieces.dirty:
                 rendered += ".dirty"
     else:
         # exception #1
-        rendered = "0.post%d" % pieces["distance"]
-        if pieces["branch"] != "master":
+        rendered = "0.post%d" % pieces.distance
+        if pieces.branch != "master":
             rendered += ".dev0"
-        rendered += "+g%s" % pieces["short"]
-        if pieces["dirty"]:
+        rendered += "+g%s" % pieces.short
+        if pieces.dirty:
             rendered += ".dirty"
     return rendered
 
 
-def render_pep440_old(pieces: Dict[str, Any]) -> str:
+def render_pep440_old(pieces: Mapping[str, Any]) -> str:
     """TAG[.postDISTANCE[.dev0]] .
 
     The ".dev0" means dirty.
@@ -160,21 +167,22 @@ def render_pep440_old(pieces: Dict[str, Any]) -> str:
     Exceptions:
     1: no tags. 0.postDISTANCE[.dev0]
     """
-    if pieces["closest-tag"]:
-        rendered = pieces["closest-tag"]
-        if pieces["distance"] or pieces["dirty"]:
-            rendered += ".post%d" % pieces["distance"]
-            if pieces["dirty"]:
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%d" % pieces.distance
+            if pieces.dirty:
                 rendered += ".dev0"
     else:
         # exception #1
-        rendered = "0.post%d" % pieces["distance"]
-        if pieces["dirty"]:
+        rendered = "0.post%d" % pieces.distance
+        if pieces.dirty:
             rendered += ".dev0"
     return rendered
 
 
-def render_git_describe(pieces: Dict[str, Any]) -> str:
+def render_git_describe(pieces: Mapping[str, Any]) -> str:
     """TAG[-DISTANCE-gHEX][-dirty].
 
     Like 'git describe --tags --dirty --always'.
@@ -182,19 +190,20 @@ def render_git_describe(pieces: Dict[str, Any]) -> str:
     Exceptions:
     1: no tags. HEX[-dirty]  (note: no 'g' prefix)
     """
-    if pieces["closest-tag"]:
-        rendered = pieces["closest-tag"]
-        if pieces["distance"]:
-            rendered += "-%d-g%s" % (pieces["distance"], pieces["short"])
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance:
+            rendered += "-%d-g%s" % (pieces.distance, pieces.short)
     else:
         # exception #1
-        rendered = pieces["short"]
-    if pieces["dirty"]:
+        rendered = pieces.short
+    if pieces.dirty:
         rendered += "-dirty"
     return rendered
 
 
-def render_git_describe_long(pieces: Dict[str, Any]) -> str:
+def render_git_describe_long(pieces: Mapping[str, Any]) -> str:
     """TAG-DISTANCE-gHEX[-dirty].
 
     Like 'git describe --tags --dirty --always -long'.
@@ -203,49 +212,216 @@ def render_git_describe_long(pieces: Dict[str, Any]) -> str:
     Exceptions:
     1: no tags. HEX[-dirty]  (note: no 'g' prefix)
     """
-    if pieces["closest-tag"]:
-        rendered = pieces["closest-tag"]
-        rendered += "-%d-g%s" % (pieces["distance"], pieces["short"])
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        rendered += "-%d-g%s" % (pieces.distance, pieces.short)
     else:
         # exception #1
-        rendered = pieces["short"]
-    if pieces["dirty"]:
+        rendered = pieces.short
+    if pieces.dirty:
         rendered += "-dirty"
     return rendered
 
 
-def render(pieces: Dict[str, Any], style: str) -> Dict[str, Any]:
-    """Render the given version pieces into the requested style."""
-    if pieces["error"]:
+# The renderer of each style. register_style() adds more.
+RENDERERS: Dict[str, Callable[[Pieces], str]] = {
+    "pep440": render_pep440,
+    "pep440-branch": render_pep440_branch,
+    "pep440-pre": render_pep440_pre,
+    "pep440-post": render_pep440_post,
+    "pep440-post-branch": render_pep440_post_branch,
+    "pep440-old": render_pep440_old,
+    "git-describe": render_git_describe,
+    "git-describe-long": render_git_describe_long,
+}
+
+# The pieces each style is rendered from. render() also reports "long",
+# "dirty", "error" and "date" for every style.
+STYLE_FIELDS: Dict[str, FrozenSet[str]] = {
+    "pep440": frozenset(["closest-tag", "distance", "short"]),
+    "pep440-branch": frozenset(["closest-tag", "distance", "short", "branch"]),
+    "pep440-pre": frozenset(["closest-tag", "distance"]),
+    "pep440-post": frozenset(["closest-tag", "distance", "short"]),
+    "pep440-post-branch": frozenset(["closest-tag", "distance", "short",
+                                     "branch"]),
+    "pep440-old": frozenset(["closest-tag", "distance"]),
+    "git-describe": frozenset(["closest-tag", "distance", "short"]),
+    "git-describe-long": frozenset(["closest-tag", "distance", "short"]),
+}
+
+# the pieces style templates can refer to
+TEMPLATE_FIELDS = frozenset(["closest-tag", "distance", "short", "long",
+                             "branch", "dirty", "date"])
+
+# compiled style templates, by template
+STYLE_TEMPLATE_MEMO: Dict[str, Tuple[Callable[[Mapping[str, Any]], str],
+                                     FrozenSet[str]]] = {}
+
+
+def register_style(name: str, renderer: Callable[[Pieces], str],
+                   fields: Optional[Iterable[str]] = None) -> None:
+    """Make render() support a style, rendered by renderer(pieces).
+
+    fields names the pieces renderer uses (see style_fields()); None means
+    it may use any of them.
+    """
+    RENDERERS[name] = renderer
+    if fields is None:
+        STYLE_FIELDS.pop(name, None)
+    else:
+        STYLE_FIELDS[name] = frozenset(fields)
+
+
+def is_style_template(style: str) -> bool:
+    """Tell whether a style is a template rather than the name of a style."""
+    return "{" in style
+
+
+def compile_style_template(
+    template: str,
+) -> Tuple[Callable[[Mapping[str, Any]], str], FrozenSet[str]]:
+    """Compile a style template into a renderer, and the pieces it uses.
+
+    In the template, {FIELD} is replaced by the piece FIELD (one of
+    TEMPLATE_FIELDS; None and False become ""), and a [...] group is only
+    included if each FIELD it contains is true, i.e. neither empty, zero,
+    None nor False. {?FIELD} and {!FIELD} add nothing to the text, but
+    require FIELD to be true or false, respectively, so they are only
+    allowed in a group. For example,
+    "[{closest-tag}][0{!closest-tag}][+{distance}.g{short}][.dirty{?dirty}]"
+    is close to the pep440 style. Compiled templates are remembered, so
+    compiling the same template again costs a dict lookup.
+
+    Raises ValueError if the template is malformed.
+    """
+    if template in STYLE_TEMPLATE_MEMO:
+        return STYLE_TEMPLATE_MEMO[template]
+    Part = Callable[[Pieces], str]
+    Condition = Callable[[Pieces], bool]
+    fields: Set[str] = set()
+
+    def literal(text: str) -> Part:
+        return lambda pieces: text
+
+    def field(name: str) -> Part:
+        slot = PIECES_SLOTS[name]
+
+        def render_field(pieces: Pieces) -> str:
+            value = getattr(pieces, slot, None)
+            return "" if value is None or value is False else str(value)
+        return render_field
+
+    def condition(name: str, wanted: bool) -> Condition:
+        slot = PIECES_SLOTS[name]
+        return lambda pieces: bool(getattr(pieces, slot, None)) is wanted
+
+    def group(parts: List[Part], conditions: List[Condition]) -> Part:
+        def render_group(pieces: Pieces) -> str:
+            for check in conditions:
+                if not check(pieces):
+                    return ""
+            return "".join([part(pieces) for part in parts])
+        return render_group
+
+    def parse(pos: int, in_group: bool) -> Tuple[Part, int]:
+        parts: List[Part] = []
+        conditions: List[Condition] = []
+        text: List[str] = []
+        while pos < len(template):
+            char = template[pos]
+            pos += 1
+            if char not in "{}[]":
+                text.append(char)
+                continue
+            if text:
+                parts.append(literal("".join(text)))
+                text = []
+            if char == "{":
+                end = template.find("}", pos)
+                if end < 0:
+                    raise ValueError("unclosed '{' in style template %r"
+                                     % template)
+                spec = template[pos:end]
+                pos = end + 1
+                name = spec.lstrip("?!")
+                if name not in TEMPLATE_FIELDS or len(spec) - len(name) > 1:
+                    raise ValueError("unknown field {%s} in style template %r"
+                                     % (spec, template))
+                if name != spec and not in_group:
+                    raise ValueError("{%s} outside [...] in style template %r"
+                                     % (spec, template))
+                fields.add(name)
+                conditions.append(condition(name, not spec.startswith("!")))
+                if name == spec:
+                    parts.append(field(name))
+            elif char == "[":
+                part, pos = parse(pos, True)
+                parts.append(part)
+            elif char == "]" and in_group:
+                return group(parts, conditions), pos
+            else:
+                raise ValueError("unbalanced %r in style template %r"
+                                 % (char, template))
+        if in_group:
+            raise ValueError("unclosed '[' in style template %r" % template)
+        if text:
+            parts.append(literal("".join(text)))
+        return group(parts, []), pos
+
+    render_template = parse(0, False)[0]
+
+    def renderer(pieces: Mapping[str, Any]) -> str:
+        return render_template(as_pieces(pieces))
+    STYLE_TEMPLATE_MEMO[template] = (renderer, frozenset(fields))
+    return STYLE_TEMPLATE_MEMO[template]
+
+
+def style_fields(style: str) -> Optional[FrozenSet[str]]:
+    """Return the names of the pieces render() needs for the given style.
+
+    None means all of them (for styles render() doesn't know).
+    """
+    if not style or style == "default":
+        style = "pep440"  # the default
+    if style in STYLE_FIELDS:
+        fields = STYLE_FIELDS[style]
+    elif style not in RENDERERS and is_style_template(style):
+        try:
+            fields = compile_style_template(style)[1]
+        except ValueError:
+            return None
+    else:
+        return None
+    return fields | {"long", "dirty", "error", "date"}
+
+
+def render(pieces: Mapping[str, Any], style: str) -> Dict[str, Any]:
+    """Render the given version pieces into the requested style.
+
+    The style is the name of a style in RENDERERS, or a style template (see
+    compile_style_template()). Renderers are given Pieces, so a dict of
+    pieces is copied into one first.
+    """
+    pieces = as_pieces(pieces)
+    if pieces.error:
         return {"version": "unknown",
-                "full-revisionid": pieces.get("long"),
+                "full-revisionid": getattr(pieces, "long", None),
                 "dirty": None,
-                "error": pieces["error"],
+                "error": pieces.error,
                 "date": None}
 
     if not style or style == "default":
         style = "pep440"  # the default
 
-    if style == "pep440":
-        rendered = render_pep440(pieces)
-    elif style == "pep440-branch":
-        rendered = render_pep440_branch(pieces)
-    elif style == "pep440-pre":
-        rendered = render_pep440_pre(pieces)
-    elif style == "pep440-post":
-        rendered = render_pep440_post(pieces)
-    elif style == "pep440-post-branch":
-        rendered = render_pep440_post_branch(pieces)
-    elif style == "pep440-old":
-        rendered = render_pep440_old(pieces)
-    elif style == "git-describe":
-        rendered = render_git_describe(pieces)
-    elif style == "git-describe-long":
-        rendered = render_git_describe_long(pieces)
-    else:
-        raise ValueError("unknown style '%s'" % style)
+    renderer = RENDERERS.get(style)
+    if renderer is None:
+        if not is_style_template(style):
+            raise ValueError("unknown style '%s'" % style)
+        renderer = compile_style_template(style)[0]
+    rendered = renderer(pieces)
 
-    return {"version": rendered, "full-revisionid": pieces["long"],
-            "dirty": pieces["dirty"], "error": None,
-            "date": pieces.get("date")}
+    return {"version": rendered, "full-revisionid": pieces.long,
+            "dirty": pieces.dirty, "error": None,
+            "date": getattr(pieces, "date", None)}
 
@@ -1,10 +1,15 @@
 
 import configparser # --STRIP DURING BUILD
+import json # --STRIP DURING BUILD
 import os, sys  # --STRIP DURING BUILD
 from typing import NoReturn, Optional  # --STRIP DURING BUILD
 from .header import get_config_from_root, get_root # --STRIP DURING BUILD
 from .header import LONG_VERSION_PY # --STRIP DURING BUILD
+from .header import NotThisMethod # --STRIP DURING BUILD
+from .get_versions import pieces_from_root # --STRIP DURING BUILD
+from .render import style_fields # --STRIP DURING BUILD
 from .git.install import do_vcs_install # --STRIP DURING BUILD
+from .git.daemon import serve_versions # --STRIP DURING BUILD
 
 CONFIG_ERROR = """
 setup.cfg is missing the necessary Versioneer configuration. You need
@@ -54,6 +59,17 @@ from . import {0}
 __version__ = {0}.get_versions()['version']
 """
 
+# with lazy_version: computed on first access, see PEP 562
+LAZY_INIT_PY_SNIPPET = """
+def __getattr__(name):
+    if name == "__version__":
+        global __version__
+        from . import {0}
+        __version__ = {0}.get_versions()['version']
+        return __version__
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+"""
+
 
 def do_setup() -> int:
     """Do main VCS-independent setup function for installing Versioneer."""
@@ -74,10 +90,19 @@ def do_setup() -> int:
     with open(cfg.versionfile_source, "w") as f:
         LONG = LONG_VERSION_PY[cfg.VCS]
         f.write(LONG % {"DOLLAR": "$",
-                        "STYLE": cfg.style,
+                        # escaped for the "..." string in _version.py
+                        "STYLE": json.dumps(cfg.style)[1:-1],
                         "TAG_PREFIX": cfg.tag_prefix,
                         "PARENTDIR_PREFIX": cfg.parentdir_prefix,
                         "VERSIONFILE_SOURCE": cfg.versionfile_source,
+                        "COMBINE_GIT_QUERIES": bool(cfg.combine_git_queries),
+                        "VERSION_DAEMON": bool(cfg.version_daemon),
+                        "VERSION_CACHE": bool(cfg.version_cache),
+                        "STATIC_VERSION_PY": bool(cfg.static_version_py),
+                        "DIRTY_CHECK": cfg.dirty_check or "git",
+                        "DIRTY_SCOPE": cfg.dirty_scope or "",
+                        "PATH_SCOPE": cfg.path_scope or "",
+                        "TIME_BUDGET": cfg.time_budget or 0,
                         })
 
     ipy = os.path.join(os.path.dirname(cfg.versionfile_source),
@@ -91,10 +116,14 @@ def do_setup() -> int:
             old = ""
         module = os.path.splitext(os.path.basename(cfg.versionfile_source))[0]
         snippet = INIT_PY_SNIPPET.format(module)
-        if OLD_SNIPPET in old:
+        other = LAZY_INIT_PY_SNIPPET.format(module)
+        if cfg.lazy_version:
+            snippet, other = other, snippet
+        if OLD_SNIPPET in old or other in old:
             print(" replacing boilerplate in %s" % ipy)
             with open(ipy, "w") as f:
-                f.write(old.replace(OLD_SNIPPET, snippet))
+                f.write(old.replace(OLD_SNIPPET, snippet)
+                        .replace(other, snippet))
         elif snippet not in old:
             print(" appending to %s" % ipy)
             with open(ipy, "a") as f:
@@ -108,7 +137,10 @@ def do_setup() -> int:
     # Make VCS-specific changes. For git, this means creating/changing
     # .gitattributes to mark _version.py for export-subst keyword
     # substitution.
-    do_vcs_install(cfg.versionfile_source, maybe_ipy)
+    do_vcs_install(cfg.versionfile_source, maybe_ipy, bool(cfg.git_hooks))
+    if cfg.git_hooks and not (cfg.version_cache or cfg.static_version_py):
+        print(" git_hooks only help with version_cache or static_version_py",
+              file=sys.stderr)
     return 0
 
 
@@ -156,7 +188,33 @@ def setup_command() -> NoReturn:
     sys.exit(1 if errors else 0)
 
 
+def refresh_command() -> NoReturn:
+    """Store the current version pieces in the version cache.
+
+    This is run by the git hooks installed with git_hooks, so reading the
+    version later needs no git command.
+    """
+    root = get_root()
+    cfg = get_config_from_root(root)
+    cfg.version_cache = True
+    try:
+        pieces_from_root(root, cfg, False, style_fields(cfg.style))
+    except NotThisMethod:
+        sys.exit(1)
+    sys.exit(0)
+
+
+def serve_command() -> NoReturn:
+    """Run the version daemon for the roots given as arguments."""
+    serve_versions(sys.argv[2:] or [get_root()])
+    sys.exit(0)
+
+
 if __name__ == "__main__":
     cmd = sys.argv[1]
     if cmd == "setup":
         setup_command()
+    elif cmd == "refresh":
+        refresh_command()
+    elif cmd == "serve":
+        serve_command()
@@ -0,0 +1,76 @@
+import asyncio, errno, subprocess, sys, time # --STRIP DURING BUILD
+from typing import Any, Dict, List, Optional, Tuple # --STRIP DURING BUILD
+from subprocess_helper import command_timeout, kill_process_group, trace # --STRIP DURING BUILD
+async def run_command_async(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[int]]:
+    """Call the given command(s) like run_command(), without blocking."""
+    assert isinstance(commands, list)
+    process = None
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        # This hides the console window if pythonw.exe is used
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        popen_kwargs["startupinfo"] = startupinfo
+
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            if verbose:
+                print("no time left to run %s" % (commands[:1] + args))
+            return None, None
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
+    for command in commands:
+        try:
+            dispcmd = str([command] + args)
+            # remember shell=False, so use git.cmd on windows, not just git
+            process = await asyncio.create_subprocess_exec(
+                command, *args, cwd=cwd, env=env, stdout=subprocess.PIPE,
+                stderr=(subprocess.PIPE if hide_stderr else None),
+                **popen_kwargs)
+            break
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            if verbose:
+                print("unable to run %s" % dispcmd)
+                print(e)
+            return None, None
+    else:
+        if verbose:
+            print("unable to find command, tried %s" % (commands,))
+        return None, None
+    try:
+        output = (await asyncio.wait_for(process.communicate(), timeout))[0]
+    except asyncio.TimeoutError:
+        kill_process_group(process.pid, process.kill)
+        await process.wait()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start, timed_out=True)
+        if verbose:
+            print("unable to run %s (timed out)" % dispcmd)
+        return None, None
+    trace("subprocess", argv=[command] + args, cwd=cwd,
+          duration=time.perf_counter() - start,
+          returncode=process.returncode, output_bytes=len(output))
+    stdout = output.strip().decode()
+    if process.returncode != 0:
+        if verbose:
+            print("unable to run %s (error)" % dispcmd)
+            print("stdout was %s" % stdout)
+        return None, process.returncode
+    return stdout, process.returncode
+
+
@@ -1,5 +1,61 @@
-import sys, subprocess, errno # --STRIP DURING BUILD
-from typing import Any, Dict, List, Optional, Tuple # --STRIP DURING BUILD
+import contextlib, os, sys, subprocess, errno, time # --STRIP DURING BUILD
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple # --STRIP DURING BUILD
+# callbacks given every trace event, see add_trace_hook()
+TRACE_HOOKS: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_trace_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Call hook with a dict describing each traced event.
+
+    Events have an "event" name ("config", "strategy", "subprocess", or
+    "fallback" when a faster method leaves the work to git), usually a
+    "duration" in seconds, and details such as the strategy name or the
+    subprocess argv. Setting $VERSIONEER_TRACE to a filename appends the
+    events to it as JSON lines instead.
+    """
+    TRACE_HOOKS.append(hook)
+
+
+def remove_trace_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Stop calling a hook added by add_trace_hook()."""
+    TRACE_HOOKS.remove(hook)
+
+
+def trace(event: str, **data: Any) -> None:
+    """Report an event to the trace hooks and to $VERSIONEER_TRACE."""
+    filename = os.environ.get("VERSIONEER_TRACE")
+    if not (TRACE_HOOKS or filename):
+        return
+    record = {"event": event, "pid": os.getpid(), **data}
+    for hook in list(TRACE_HOOKS):
+        hook(record)
+    if filename:
+        import json
+        try:
+            with open(filename, "a") as fobj:
+                fobj.write(json.dumps(record, default=str) + "\n")
+        except OSError:
+            pass
+
+
+@contextlib.contextmanager
+def trace_span(event: str, **data: Any) -> Iterator[Dict[str, Any]]:
+    """Trace the duration of the enclosed block, and why it failed if it did.
+
+    The block may add details to the yielded dict.
+    """
+    start = time.perf_counter()
+    try:
+        yield data
+    except Exception as e:
+        # NotThisMethod means the next strategy gets a chance
+        data["exception"] = type(e).__name__
+        data["message"] = str(e)
+        raise
+    finally:
+        trace(event, duration=time.perf_counter() - start, **data)
+
+
 def run_command(
     commands: List[str],
     args: List[str],
@@ -7,8 +63,13 @@ def run_command(
     verbose: bool = False,
     hide_stderr: bool = False,
     env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
 ) -> Tuple[Optional[str], Optional[int]]:
-    """Call the given command(s)."""
+    """Call the given command(s).
+
+    A command that runs longer than timeout seconds, or than what is left
+    of the time_budget(), is killed and treated like one that failed to run.
+    """
     assert isinstance(commands, list)
     process = None
 
@@ -19,6 +80,18 @@ def run_command(
         startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
         popen_kwargs["startupinfo"] = startupinfo
 
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            if verbose:
+                print("no time left to run %s" % (commands[:1] + args))
+            return None, None
+        # a process group of its own, so that its children die with it
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
     for command in commands:
         try:
             dispcmd = str([command] + args)
@@ -39,7 +112,20 @@ def run_command(
         if verbose:
             print("unable to find command, tried %s" % (commands,))
         return None, None
-    stdout = process.communicate()[0].strip().decode()
+    try:
+        output = process.communicate(timeout=timeout)[0]
+    except subprocess.TimeoutExpired:
+        kill_process_group(process.pid, process.kill)
+        process.communicate()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start, timed_out=True)
+        if verbose:
+            print("unable to run %s (timed out)" % dispcmd)
+        return None, None
+    trace("subprocess", argv=[command] + args, cwd=cwd,
+          duration=time.perf_counter() - start,
+          returncode=process.returncode, output_bytes=len(output))
+    stdout = output.strip().decode()
     if process.returncode != 0:
         if verbose:
             print("unable to run %s (error)" % dispcmd)
@@ -48,3 +134,175 @@ def run_command(
     return stdout, process.returncode
 
 
+def run_command_lines(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Generator[str, None, None]:
+    """Call the given command(s), yielding its output line by line.
+
+    Unlike run_command(), the output is decoded as it is read instead of
+    being buffered, and the caller may stop early: closing the iterator
+    (e.g. with contextlib.closing()) kills the command. Raises OSError if
+    the command can't be run, exits with an error or runs out of time.
+    """
+    assert isinstance(commands, list)
+    process = None
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        # This hides the console window if pythonw.exe is used
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        popen_kwargs["startupinfo"] = startupinfo
+
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            raise OSError("no time left to run %s" % (commands[:1] + args))
+        # a process group of its own, so that its children die with it
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
+    for command in commands:
+        try:
+            dispcmd = str([command] + args)
+            # remember shell=False, so use git.cmd on windows, not just git
+            process = subprocess.Popen([command] + args, cwd=cwd, env=env,
+                                       stdout=subprocess.PIPE,
+                                       stderr=(subprocess.DEVNULL if hide_stderr
+                                               else None), **popen_kwargs)
+            break
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            if verbose:
+                print("unable to run %s" % dispcmd)
+                print(e)
+            raise
+    else:
+        if verbose:
+            print("unable to find command, tried %s" % (commands,))
+        raise OSError("unable to find command, tried %s" % (commands,))
+
+    def kill() -> None:
+        assert process is not None
+        if timeout is None:
+            process.kill()
+        else:
+            kill_process_group(process.pid, process.kill)
+
+    # reading blocks, so the timeout is enforced from another thread
+    import threading
+    expired = threading.Event()
+
+    def expire() -> None:
+        expired.set()
+        kill()
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+    assert process.stdout is not None
+    lines = 0
+    finished = False
+    try:
+        for line in process.stdout:
+            lines += 1
+            yield line.rstrip(b"\r\n").decode()
+        finished = True
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if not finished:
+            kill()  # the caller has seen enough
+        process.stdout.close()
+        process.wait()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start,
+              returncode=process.returncode, lines=lines,
+              stopped=not finished, timed_out=expired.is_set())
+    if expired.is_set():
+        if verbose:
+            print("unable to run %s (timed out)" % dispcmd)
+        raise OSError("%s timed out" % dispcmd)
+    if process.returncode != 0:
+        if verbose:
+            print("unable to run %s (error)" % dispcmd)
+        raise OSError("%s returned error %d" % (dispcmd, process.returncode))
+
+
+# the ContextVar holding the time.monotonic() deadline of the enclosing
+# time_budget(), if any, created by the first budget (so _version.py only
+# imports contextvars when it has one)
+DEADLINE: Dict[str, Any] = {}
+
+
+@contextlib.contextmanager
+def time_budget(seconds: Optional[float]) -> Iterator[None]:
+    """Limit the commands run in the enclosed block to seconds in total.
+
+    A command still running when the budget runs out is killed (with its
+    process group), and commands started later fail right away, as if they
+    had failed on their own. A nested budget can only shorten the one it is
+    in. No (or a zero) budget means no limit.
+    """
+    token = None
+    if seconds:
+        import contextvars
+        var = DEADLINE.setdefault("var", contextvars.ContextVar(
+            "versioneer_deadline", default=None))
+        deadline = time.monotonic() + seconds
+        outer = var.get()
+        token = var.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        if token is not None:
+            var.reset(token)
+
+
+def budget_left() -> Optional[float]:
+    """Return the seconds left of the time budget, or None without one."""
+    deadline = DEADLINE["var"].get() if DEADLINE else None
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget_exceeded() -> bool:
+    """Tell whether the time budget has run out."""
+    left = budget_left()
+    return left is not None and left <= 0
+
+
+def command_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Shorten a command's timeout to the rest of the time budget."""
+    left = budget_left()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def kill_process_group(pid: int, fallback: Callable[[], None]) -> None:
+    """Kill a process started in a new session, and the children it started.
+
+    Where there are no process groups (Windows), fallback() kills just the
+    process.
+    """
+    if sys.platform == "win32":
+        fallback()
+        return
+    import signal
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        fallback()
+
+
@@ -0,0 +1,86 @@
+#! /usr/bin/python
+
+"""Compare ways of counting the commits in HEAD's history.
+
+When no tag matches, the distance is the number of commits reachable from
+HEAD. This builds synthetic linear histories of increasing depth and, for
+each, measures the time and peak memory (allocated by python, and the
+maximum RSS of git) used by listing every commit with 'git rev-list HEAD'
+and counting the lines, versus asking 'git rev-list --count HEAD'.
+
+usage: python test/bench/bench_distance.py [DEPTH ...]
+"""
+
+import json
+import os, sys
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+from subprocess_helper import run_command
+
+DEPTHS = [1000, 10000, 100000]
+
+
+def make_repo(path, depth):
+    subprocess.run(["git", "init", "-q", path], check=True)
+    p = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=path,
+                         stdin=subprocess.PIPE)
+    for i in range(1, depth + 1):
+        p.stdin.write(b"commit refs/heads/master\nmark :%d\n" % i)
+        p.stdin.write(b"committer A <a@example.com> %d +0000\ndata 0\n"
+                      % (1500000000 + i))
+        if i > 1:
+            p.stdin.write(b"from :%d\n" % (i - 1))
+    p.stdin.close()
+    assert p.wait() == 0
+    subprocess.run(["git", "checkout", "-q", "master"], cwd=path, check=True)
+
+
+def measure(method, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    if method == "list":
+        out, rc = run_command(["git"], ["rev-list", "HEAD", "--left-right"],
+                              cwd=path)
+        distance = len(out.split())
+    else:
+        out, rc = run_command(["git"], ["rev-list", "--count", "HEAD"],
+                              cwd=path)
+        distance = int(out)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "distance": distance,
+        "seconds": elapsed,
+        "python_peak": tracemalloc.get_traced_memory()[1] // 1024,
+        # kilobytes on linux, bytes on macOS
+        "git_maxrss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }))
+
+
+def main(depths):
+    print("%8s %6s %9s %14s %11s" % ("depth", "method", "seconds",
+                                     "python peak kB", "git maxrss"))
+    for depth in depths:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_repo(tmp, depth)
+            for method in ["list", "count"]:
+                # a fresh process per measurement, to get git's own peak RSS
+                out = subprocess.run(
+                    [sys.executable, __file__, "--measure", method, tmp],
+                    check=True, stdout=subprocess.PIPE).stdout
+                result = json.loads(out)
+                assert result["distance"] == depth, result
+                print("%8d %6s %9.3f %14d %11d" % (
+                    depth, method, result["seconds"],
+                    result["python_peak"], result["git_maxrss"]))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or DEPTHS)
@@ -0,0 +1,56 @@
+#! /usr/bin/python
+
+"""Compare rendering version pieces held in a dict and in Pieces.
+
+For the same fields, this times reading one field (by key from the dict,
+by key and by attribute from Pieces), hashing (Pieces remember their hash
+until a field changes; a dict has to be turned into a tuple of its items
+every time), and render() for every built-in style. Each number is the
+best of --repeat runs of --number calls, in microseconds per call.
+
+versioneer.py must be built first ('python setup.py make_versioneer').
+
+usage: python test/bench/bench_render.py [--repeat N] [--number N]
+"""
+
+import argparse
+import os, sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+import versioneer
+
+FIELDS = {"long": "abcdefg", "short": "abc", "error": None,
+          "branch": "master", "dirty": True, "closest-tag": "1.0",
+          "distance": 2, "date": "2016-05-31T13:02:11+0200"}
+
+
+def best(stmt, namespace, repeat, number):
+    times = timeit.repeat(stmt, globals=namespace, repeat=repeat,
+                          number=number)
+    return min(times) / number * 1e6
+
+
+def main(args):
+    namespace = {"d": dict(FIELDS), "p": versioneer.Pieces(FIELDS),
+                 "render": versioneer.render}
+    rows = [("item", 'd["closest-tag"]', 'p["closest-tag"]'),
+            ("attribute", 'd["closest-tag"]', "p.closest_tag"),
+            ("hash", "hash(tuple(d.items()))", "hash(p)")]
+    for style in versioneer.RENDERERS:
+        rows.append(("render " + style, "render(d, %r)" % style,
+                     "render(p, %r)" % style))
+    print("%-30s %10s %10s %7s" % ("operation", "dict", "Pieces", "ratio"))
+    for name, dict_stmt, pieces_stmt in rows:
+        dict_time = best(dict_stmt, namespace, args.repeat, args.number)
+        pieces_time = best(pieces_stmt, namespace, args.repeat, args.number)
+        print("%-30s %10.3f %10.3f %7.2f" % (name, dict_time, pieces_time,
+                                             pieces_time / dict_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time dict and Pieces lookups and rendering.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=100000)
+    main(parser.parse_args())
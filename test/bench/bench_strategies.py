@@ -0,0 +1,337 @@
+#! /usr/bin/python
+
+"""Time each way get_versions() can find a version, on various repositories.
+
+This generates synthetic git repositories of different shapes (number of
+commits, tags and branches, packed or loose refs, clean or dirty tree),
+each holding a project configured for Versioneer, and measures every path
+of the strategy chain:
+
+  keywords    expanded git-archive keywords in _version.py
+  file        a short _version.py written by 'setup.py build/sdist'
+  vcs         'git describe' and friends (git_pieces_from_vcs)
+  vcs-combined, vcs-gitdir, vcs-cache
+              the same with combine_git_queries, pure_python_git or
+              version_cache enabled
+  parentdir   the name of the parent directory
+  _version.py get_versions() of the generated long _version.py
+
+Each measurement runs in a fresh python process, which reports the wall
+time per call (best of --repeat), the number of subprocesses started per
+call, and the peak RSS of itself and of its children (kilobytes on linux,
+bytes on macOS). The results are printed as a table and, with --json,
+written as a JSON document so they can be compared over time.
+
+The startup cost of the generated _version.py is measured too: the time
+to import it (best of --repeat fresh processes) and the modules it
+imports. Importing one of LAZY_MODULES fails the run, since every user of
+a package imports its _version.py.
+
+versioneer.py must be built first ('python setup.py make_versioneer').
+
+usage: python test/bench/bench_strategies.py [--repeat N] [--json FILE]
+           [--shape NAME ...]
+"""
+
+import argparse
+import ast
+import compileall
+import contextlib
+import importlib.util
+import io
+import json
+import os, sys
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+import versioneer
+
+SHAPES = {
+    # name: (commits, tags, branches, packed refs, dirty)
+    "small": (100, 10, 1, False, False),
+    "small-dirty": (100, 10, 1, False, True),
+    "deep": (20000, 10, 1, False, False),
+    "many-tags": (2000, 1000, 1, False, False),
+    "many-tags-packed": (2000, 1000, 1, True, False),
+    "many-branches": (2000, 10, 500, False, False),
+    "many-branches-packed": (2000, 10, 500, True, False),
+    "untagged": (2000, 0, 1, False, False),
+}
+
+PATHS = ["keywords", "file", "vcs", "vcs-combined", "vcs-gitdir",
+         "vcs-cache", "parentdir", "_version.py"]
+
+# modules _version.py only imports when a version computation needs them
+LAZY_MODULES = ["asyncio", "concurrent.futures", "contextvars", "hashlib",
+                "json", "mmap", "socket", "struct", "zlib"]
+
+# run by a fresh python: print the import time of _version.py in argv[1]
+# and the modules it imported, without importing anything else first
+STARTUP_CODE = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+before = set(sys.modules)
+start = time.perf_counter()
+import _version
+seconds = time.perf_counter() - start
+print(repr([seconds, sorted(set(sys.modules) - before)]))
+"""
+
+SETUP_CFG = """
+[versioneer]
+VCS = git
+style = pep440
+versionfile_source = demo/_version.py
+tag_prefix = v
+parentdir_prefix = demo-
+"""
+
+OPTIONS = {
+    "vcs-combined": "combine_git_queries = true\n",
+    "vcs-gitdir": "pure_python_git = true\n",
+    "vcs-cache": "version_cache = true\n",
+}
+
+
+def git(path, *args):
+    env = dict(os.environ, GIT_AUTHOR_NAME="bench", GIT_COMMITTER_NAME="bench",
+               EMAIL="bench@example.com")
+    return subprocess.run(["git"] + list(args), cwd=path, env=env, check=True,
+                          stdout=subprocess.PIPE).stdout.decode()
+
+
+def long_version_py():
+    return versioneer.LONG_VERSION_PY["git"] % {
+        "DOLLAR": "$",
+        "STYLE": "pep440",
+        "TAG_PREFIX": "v",
+        "PARENTDIR_PREFIX": "demo-",
+        "VERSIONFILE_SOURCE": "demo/_version.py",
+        "COMBINE_GIT_QUERIES": False,
+        "VERSION_DAEMON": False,
+        "VERSION_CACHE": False,
+        "STATIC_VERSION_PY": False,
+        "DIRTY_CHECK": "git",
+        "DIRTY_SCOPE": "",
+        "PATH_SCOPE": "",
+        "TIME_BUDGET": 0,
+    }
+
+
+def make_project(path, options=""):
+    os.makedirs(os.path.join(path, "demo"))
+    open(os.path.join(path, "setup.py"), "w").close()
+    with open(os.path.join(path, "setup.cfg"), "w") as f:
+        f.write(SETUP_CFG + options)
+    with open(os.path.join(path, "demo", "_version.py"), "w") as f:
+        f.write(long_version_py())
+
+
+def make_repo(path, commits, tags, branches, packed, dirty):
+    """Build a linear history, with tags and branches spread along it."""
+    git(path, "init", "-q")
+    make_project(path)
+    p = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=path,
+                         stdin=subprocess.PIPE)
+    files = ["setup.py", "setup.cfg", "demo/_version.py"]
+    for i in range(1, commits + 1):
+        p.stdin.write(b"commit refs/heads/master\nmark :%d\n" % i)
+        p.stdin.write(b"committer A <a@example.com> %d +0000\ndata 0\n"
+                      % (1500000000 + i))
+        if i > 1:
+            p.stdin.write(b"from :%d\n" % (i - 1))
+        else:
+            for name in files:
+                with open(os.path.join(path, name), "rb") as f:
+                    data = f.read()
+                p.stdin.write(b"M 644 inline %s\ndata %d\n%s\n"
+                              % (name.encode(), len(data), data))
+    for i in range(tags):
+        mark = commits * (i + 1) // (tags + 1)
+        p.stdin.write(b"reset refs/tags/v%d.0\nfrom :%d\n\n" % (i, mark))
+    for i in range(1, branches):
+        mark = commits * i // branches
+        p.stdin.write(b"reset refs/heads/branch%d\nfrom :%d\n\n" % (i, mark))
+    p.stdin.close()
+    assert p.wait() == 0
+    git(path, "reset", "-q", "--hard", "master")
+    if packed:
+        git(path, "pack-refs", "--all")
+    if dirty:
+        with open(os.path.join(path, "setup.py"), "a") as f:
+            f.write("# dirty\n")
+
+
+def make_roots(repo, tmp):
+    """Create a project for each path, returning {path: root}."""
+    roots = {}
+    for path in ["vcs"] + list(OPTIONS):
+        if path == "vcs":
+            roots[path] = repo
+            continue
+        # an (untracked) subproject, so each option gets its own setup.cfg
+        # but they all share the repository
+        root = os.path.join(repo, path)
+        make_project(root, OPTIONS[path])
+        roots[path] = root
+
+    # outside the repository
+    keywords = os.path.join(tmp, "keywords")
+    make_project(keywords)
+    full, date = git(repo, "log", "-1", "--format=%H%n%ci").split("\n")[:2]
+    with open(os.path.join(keywords, "demo", "_version.py")) as f:
+        contents = f.read()
+    contents = contents.replace("$Format:%d$", " (HEAD -> master, tag: v1.0)")
+    contents = contents.replace("$Format:%H$", full)
+    contents = contents.replace("$Format:%ci$", date)
+    with open(os.path.join(keywords, "demo", "_version.py"), "w") as f:
+        f.write(contents)
+    roots["keywords"] = keywords
+
+    file_root = os.path.join(tmp, "file")
+    make_project(file_root)
+    # write_to_version_file() reports what it wrote, which would end up
+    # between the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        versioneer.write_to_version_file(
+            os.path.join(file_root, "demo", "_version.py"),
+            {"version": "1.0", "full-revisionid": full, "dirty": False,
+             "error": None, "date": date})
+    roots["file"] = file_root
+
+    parentdir = os.path.join(tmp, "demo-1.2")
+    make_project(parentdir)
+    os.unlink(os.path.join(parentdir, "demo", "_version.py"))
+    roots["parentdir"] = parentdir
+
+    roots["_version.py"] = repo
+    return roots
+
+
+class CountingPopen(subprocess.Popen):
+    count = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingPopen.count += 1
+        super().__init__(*args, **kwargs)
+
+
+def measure(path, root, repeat):
+    """Run in a fresh process: time one strategy, print the results."""
+    os.chdir(root)
+    if path == "_version.py":
+        spec = importlib.util.spec_from_file_location(
+            "_version", os.path.join(root, "demo", "_version.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        get_versions = module.get_versions
+    else:
+        def get_versions():
+            versioneer.invalidate_versions()
+            return versioneer.get_versions()
+    subprocess.Popen = CountingPopen
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # get_versions() warns that versioneer.py isn't in the root
+        with contextlib.redirect_stderr(io.StringIO()):
+            ver = get_versions()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(json.dumps({
+        "version": ver["version"],
+        "error": ver["error"],
+        "seconds": best,
+        "subprocesses": CountingPopen.count / repeat,
+        "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "children_maxrss":
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }))
+
+
+def measure_startup(repeat):
+    """Time importing the generated _version.py, in fresh processes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "demo-1.0")
+        make_project(root)
+        # byte-compiled, as installed packages are
+        compileall.compile_dir(os.path.join(root, "demo"), quiet=1)
+        best = None
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", STARTUP_CODE,
+                 os.path.join(root, "demo")],
+                check=True, stdout=subprocess.PIPE).stdout.decode()
+            seconds, modules = ast.literal_eval(out)
+            best = seconds if best is None else min(best, seconds)
+    return {"seconds": best, "modules": modules,
+            "lazy": [name for name in LAZY_MODULES if name in modules]}
+
+
+def main(args):
+    startup = measure_startup(args.repeat)
+    print("_version.py import: %.4f seconds, %d modules"
+          % (startup["seconds"], len(startup["modules"])))
+    if startup["lazy"]:
+        print("_version.py imports %s at startup"
+              % ", ".join(startup["lazy"]))
+    results = []
+    print("%-21s %-12s %9s %6s %8s %8s  %s" % (
+        "shape", "path", "seconds", "procs", "maxrss", "children",
+        "version"))
+    for name in args.shape or list(SHAPES):
+        commits, tags, branches, packed, dirty = SHAPES[name]
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = os.path.join(tmp, "repo")
+            os.mkdir(repo)
+            make_repo(repo, commits, tags, branches, packed, dirty)
+            roots = make_roots(repo, tmp)
+            for path in PATHS:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--measure", path, roots[path],
+                     str(args.repeat)],
+                    check=True, stdout=subprocess.PIPE).stdout.decode()
+                result = json.loads(out)
+                print("%-21s %-12s %9.4f %6.1f %8d %8d  %s" % (
+                    name, path, result["seconds"], result["subprocesses"],
+                    result["maxrss"], result["children_maxrss"],
+                    result["version"]))
+                result.update({
+                    "shape": name, "path": path, "commits": commits,
+                    "tags": tags, "branches": branches, "packed": packed,
+                    "dirty": dirty})
+                results.append(result)
+    if args.json:
+        git_version = subprocess.run(["git", "--version"], check=True,
+                                     stdout=subprocess.PIPE).stdout.decode()
+        with open(args.json, "w") as f:
+            json.dump({
+                "revision": git(ROOT, "rev-parse", "HEAD").strip(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "git": git_version.strip(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "repeat": args.repeat,
+                "startup": startup,
+                "results": results,
+            }, f, indent=1)
+    return 1 if startup["lazy"] else 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        parser = argparse.ArgumentParser(
+            description="Time the get_versions() strategies.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--json", metavar="FILE",
+                            help="also write the results to FILE")
+        parser.add_argument("--shape", action="append", choices=SHAPES,
+                            help="only measure these shapes")
+        sys.exit(main(parser.parse_args()))
@@ -1,9 +1,14 @@
 #! /usr/bin/python
 
 import os, sys
+import asyncio
+import functools
 import posixpath
 import shutil
+import subprocess
 import tarfile
+import threading
+import time
 import unittest
 import tempfile
 import re
@@ -15,7 +20,9 @@ from pkg_resources import parse_version
 sys.path.insert(0, "src")
 import common
 from render import render
-from git import from_vcs, from_keywords
+from git import from_vcs, from_vcs_async, from_keywords, from_gitdir, cache
+from git import checkout
+from git import from_daemon, daemon, coprocess
 from subprocess_helper import run_command
 
 
@@ -32,9 +39,20 @@ class ParseGitDescribe(unittest.TestCase):
         self.fakegit = os.path.join(self.fakeroot, ".git")
         os.mkdir(self.fakegit)
 
+    def branch_contains(self, args, contained):
+        # 'git branch --contains [HEAD --list NAME...]' on a detached HEAD
+        if "--list" in args:
+            listed = args[args.index("--list") + 1:]
+            return "".join("  %s\n" % name for name in contained
+                           if name in listed)
+        return "* (no branch)\n" + "".join("  %s\n" % name
+                                           for name in contained)
+
     def test_pieces(self):
         def pv(git_describe, do_error=False,
-               expect_pieces=False, branch_name="master"):
+               expect_pieces=False, branch_name="master", heads="",
+               contained=("contained-branch-1", "contained-branch-2"),
+               **kwargs):
             def fake_run_command(commands, args, cwd=None, verbose=False,
                                  hide_stderr=False, env=None):
                 if args[0] == "describe":
@@ -45,23 +63,27 @@ class ParseGitDescribe(unittest.TestCase):
                     if do_error == "rev-parse":
                         return None, 0
                     if args[1] == "--abbrev-ref":
+                        if do_error == "abbrev-ref":
+                            self.fail("branch looked up")
                         return "%s\n" % branch_name, 0
                     else:
                         return "longlong\n", 0
                 if args[0] == "rev-list":
-                    return ">hashhashhashhashhashhashhashhash\n" * 42, 0
+                    return "42\n", 0
                 if args[0] == "show":
                     if do_error == "show":
-                        return "gpg: signature\n12345\n", 0
-                    return "12345\n", 0
+                        return "gpg: signature\nlonglong\n12345\n", 0
+                    return "longlong\n12345\n", 0
+                if args[0] == "for-each-ref":
+                    return heads, 0
                 if args[0] == "branch":
-                    return "* (no branch)\n" \
-                           "  contained-branch-1\n" \
-                           "  contained-branch-2", 0
+                    if do_error == "branch":
+                        self.fail("branch --contains run")
+                    return self.branch_contains(args, contained), 0
                 self.fail("git called in weird way: %s" % (args,))
             return from_vcs.git_pieces_from_vcs(
                 "v", self.fakeroot, verbose=False,
-                runner=fake_run_command)
+                runner=fake_run_command, **kwargs)
         self.assertRaises(from_vcs.NotThisMethod,
                           pv, "ignored", do_error="describe")
         self.assertRaises(from_vcs.NotThisMethod,
@@ -129,6 +151,177 @@ class ParseGitDescribe(unittest.TestCase):
                           "short": "1f",
                           "date": "12345",
                           "branch": "contained-branch-1"})
+        self.assertEqual(pv("v1.0-1-g1f", branch_name="HEAD", do_error="branch",
+                            heads="longlong refs/heads/b\n"
+                                  "longlong refs/heads/c\n"),
+                         {"closest-tag": "1.0", "dirty": False, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "b"})
+        self.assertEqual(pv("v1.0-1-g1f", branch_name="HEAD", do_error="branch",
+                            heads="longlong refs/heads/b\n"
+                                  "longlong refs/heads/master\n"),
+                         {"closest-tag": "1.0", "dirty": False, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "master"})
+        # branches that contain HEAD are picked as if there were no tips:
+        # master first, then the first one in refname order
+        heads = ("1234 refs/heads/aaa\n1234 refs/heads/master\n"
+                 "longlong refs/heads/zzz\n")
+        for contained, branch in [(["aaa", "master", "zzz"], "master"),
+                                  (["aaa", "zzz"], "aaa"),
+                                  (["zzz"], "zzz")]:
+            self.assertEqual(pv("v1.0-1-g1f", branch_name="HEAD", heads=heads,
+                                contained=contained)["branch"], branch)
+        self.assertEqual(pv("v1.0-1-g1f", do_error="abbrev-ref",
+                            fields={"long", "dirty", "error", "date"}),
+                         {"closest-tag": "1.0", "dirty": False, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": None})
+        self.assertEqual(pv("1f", fields={"long", "dirty", "error"}),
+                         {"closest-tag": None, "dirty": False, "error": None,
+                          "distance": None,
+                          "long": "longlong",
+                          "short": "longlon",
+                          "date": None,
+                          "branch": None})
+
+    def test_pieces_combined(self):
+        def pv(git_describe, refs="HEAD -> refs/heads/master", heads="",
+               contained=("contained-branch-1", "contained-branch-2")):
+            def fake_run_command(commands, args, cwd=None, verbose=False,
+                                 hide_stderr=False, env=None):
+                if args[0] == "log":
+                    return "gpg: signature\nlonglong\x0012345\x00%s\n" % refs, 0
+                if args[0] == "describe":
+                    return git_describe+"\n", 0
+                if args[0] == "rev-list":
+                    return "42\n", 0
+                if args[0] == "for-each-ref":
+                    return heads, 0
+                if args[0] == "branch":
+                    return self.branch_contains(args, contained), 0
+                self.fail("git called in weird way: %s" % (args,))
+            return from_vcs.git_pieces_from_vcs(
+                "v", self.fakeroot, verbose=False,
+                runner=fake_run_command, combine_queries=True)
+        self.assertEqual(pv("1f"),
+                         {"closest-tag": None, "dirty": False, "error": None,
+                          "distance": 42,
+                          "long": "longlong",
+                          "short": "longlon",
+                          "date": "12345",
+                          "branch": "master"})
+        self.assertEqual(pv("v1.0-1-g1f-dirty",
+                            refs="HEAD -> refs/heads/feature, tag: refs/tags/v1"),
+                         {"closest-tag": "1.0", "dirty": True, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "feature"})
+        self.assertEqual(pv("v1.0-1-g1f", refs="HEAD"),
+                         {"closest-tag": "1.0", "dirty": False, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "contained-branch-1"})
+        self.assertEqual(pv("v1.0-1-g1f",
+                            refs="HEAD, refs/heads/zz, refs/heads/aa",
+                            heads="longlong refs/heads/aa\n"
+                                  "longlong refs/heads/zz\n"),
+                         {"closest-tag": "1.0", "dirty": False, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "aa"})
+        self.assertEqual(pv("v1.0-1-g1f", refs="HEAD, refs/heads/zz",
+                            heads="1234 refs/heads/aa\n"
+                                  "longlong refs/heads/zz\n",
+                            contained=["aa", "zz"])["branch"], "aa")
+
+    def test_pieces_async(self):
+        def pv(git_describe, branch_name="master", heads="",
+               contained=("contained-branch-1", "contained-branch-2"),
+               **kwargs):
+            running = []
+            async def fake_run_command(commands, args, cwd=None, verbose=False,
+                                       hide_stderr=False, env=None):
+                running.append(args[0])
+                await asyncio.sleep(0)
+                # the first queries are all started before any is answered
+                self.assertGreaterEqual(len(running), 3)
+                if args[0] == "describe":
+                    return git_describe+"\n", 0
+                if args[:2] == ["rev-parse", "--git-dir"]:
+                    return ".git\n", 0
+                if args[:2] == ["rev-parse", "--abbrev-ref"]:
+                    return "%s\n" % branch_name, 0
+                if args[0] == "show":
+                    return "gpg: signature\nlonglong\n12345\n", 0
+                if args[0] == "for-each-ref":
+                    return heads, 0
+                if args[0] == "rev-list":
+                    return "42\n", 0
+                if args[0] == "branch":
+                    return self.branch_contains(args, contained), 0
+                self.fail("git called in weird way: %s" % (args,))
+            return asyncio.run(from_vcs_async.git_pieces_from_vcs_async(
+                "v", self.fakeroot, verbose=False,
+                runner=fake_run_command, **kwargs))
+        self.assertEqual(pv("1f"),
+                         {"closest-tag": None, "dirty": False, "error": None,
+                          "distance": 42,
+                          "long": "longlong",
+                          "short": "longlon",
+                          "date": "12345",
+                          "branch": "master"})
+        self.assertEqual(pv("v1.0-1-g1f-dirty", branch_name="feature"),
+                         {"closest-tag": "1.0", "dirty": True, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "feature"})
+        self.assertEqual(pv("v1.0-1-g1f", branch_name="HEAD"),
+                         {"closest-tag": "1.0", "dirty": False, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "contained-branch-1"})
+        self.assertEqual(pv("v1.0-1-g1f", branch_name="HEAD",
+                            heads="longlong refs/heads/master\n"
+                                  "longlong refs/heads/zz\n"),
+                         {"closest-tag": "1.0", "dirty": False, "error": None,
+                          "distance": 1,
+                          "long": "longlong",
+                          "short": "1f",
+                          "date": "12345",
+                          "branch": "master"})
+        self.assertEqual(pv("v1.0-1-g1f", branch_name="HEAD",
+                            heads="1234 refs/heads/aa\n"
+                                  "longlong refs/heads/zz\n",
+                            contained=["aa", "zz"])["branch"], "aa")
+        self.assertEqual(pv("1f", fields={"long", "dirty", "error", "date"}),
+                         {"closest-tag": None, "dirty": False, "error": None,
+                          "distance": None,
+                          "long": "longlong",
+                          "short": "longlon",
+                          "date": "12345",
+                          "branch": None})
+        self.assertEqual(pv("x1.0-1-g1f")["error"],
+                         "tag 'x1.0' doesn't start with prefix 'v'")
 
     def tearDown(self):
         os.rmdir(self.fakegit)
@@ -366,6 +559,648 @@ class RenderPieces(unittest.TestCase):
                                  (pieces, key, got[key], expected[key]))
 
 
+class QueryModes(common.Common, unittest.TestCase):
+    # Compare the pieces computed by the optional query modes of
+    # git_pieces_from_vcs, and by the other pieces handlers, against the
+    # default mode on a real repository.
+
+    def setUp(self):
+        self.testdir = tempfile.mkdtemp()
+        self.gitdir = self.projdir = self.subpath("demoapp")
+        os.mkdir(self.gitdir)
+        self.git("init")
+        with open(self.project_file("file.txt"), "w") as f:
+            f.write("1\n")
+        self.git("add", "file.txt")
+        self.git("commit", "-m", "first")
+
+    def tearDown(self):
+        self.rmtree(self.testdir)
+
+    def check_modes(self, pieces_from=from_vcs.git_pieces_from_vcs, **kwargs):
+        expected = from_vcs.git_pieces_from_vcs("v", self.gitdir, False)
+        got = pieces_from("v", self.gitdir, False, **kwargs)
+        self.assertEqual(got, expected)
+
+    def check_states(self, **kwargs):
+        self.check_modes(**kwargs)  # untagged
+        self.git("tag", "v1.0")
+        self.check_modes(**kwargs)  # tagged
+        self.git("commit", "--allow-empty", "-m", "second")
+        self.git("branch", "feature")
+        self.git("checkout", "feature")
+        self.check_modes(**kwargs)  # on a feature branch
+        self.git("checkout", "--detach")
+        self.check_modes(**kwargs)  # detached
+        with open(self.project_file("file.txt"), "a") as f:
+            f.write("2\n")
+        self.check_modes(**kwargs)  # dirty
+
+    def no_git(self, *args, **kwargs):
+        self.fail("git was run: %s" % (args,))
+
+    def test_combine_queries(self):
+        self.check_states(combine_queries=True)
+
+    def test_async(self):
+        def pieces_from(*args, **kwargs):
+            return asyncio.run(
+                from_vcs_async.git_pieces_from_vcs_async(*args, **kwargs))
+        self.check_states(pieces_from=pieces_from)
+
+    def test_coprocess(self):
+        self.addCleanup(coprocess.close_git_batches)
+        self.check_states(runner=coprocess.git_batch_runner)
+        [batch] = coprocess.GIT_BATCHES.values()
+        # detached, so the branches pointing at HEAD are looked up too
+        with mock.patch.object(coprocess, "run_command",
+                               wraps=run_command) as m:
+            self.check_modes(runner=coprocess.git_batch_runner)
+            queries = [call.args[1][:2] for call in m.call_args_list]
+        self.assertNotIn(["rev-parse", "--git-dir"], queries)
+        self.assertNotIn(["show", "-s"], queries)
+        self.assertNotIn(["rev-parse", "--abbrev-ref"], queries)
+        self.assertNotIn(["for-each-ref", "--format=%(objectname) %(refname)"],
+                         queries)
+        self.assertEqual(list(coprocess.GIT_BATCHES.values()), [batch])
+        # a forked child starts its own process
+        with mock.patch.object(os, "getpid", return_value=-1):
+            self.check_modes(runner=coprocess.git_batch_runner)
+            [child] = coprocess.GIT_BATCHES.values()
+            self.assertIsNot(child, batch)
+            sha, kind, body = child.query("HEAD", "no-such-ref")[0]
+            self.assertEqual(kind, "commit")
+            self.assertIsNone(child.query("no-such-ref")[0])
+            child.close()
+        batch.close()
+        self.assertIsNone(batch.process)
+
+    def test_coprocess_refs(self):
+        self.addCleanup(coprocess.close_git_batches)
+        batch = coprocess.git_batch(common.GITS, self.gitdir)
+
+        def check(args, answered=True):
+            expected = run_command(common.GITS, args, cwd=self.gitdir)[0]
+            got = coprocess.git_batch_answer(batch, args)
+            self.assertEqual(got, expected if answered else None)
+
+        abbrev_ref, heads = coprocess.BATCH_QUERIES[3:]
+        check(abbrev_ref)
+        check(heads)
+        self.git("branch", "packed")
+        self.git("pack-refs", "--all")
+        self.git("branch", "loose/tip")
+        self.git("checkout", "-q", "--detach")
+        check(abbrev_ref)
+        check(heads)
+        self.git("checkout", "-q", "packed")
+        check(abbrev_ref)
+        # git answers "heads/packed", so the batch leaves it to git
+        self.git("tag", "packed")
+        check(abbrev_ref, answered=False)
+        self.assertEqual(coprocess.git_batch_runner(
+            common.GITS, abbrev_ref, cwd=self.gitdir), ("heads/packed", 0))
+
+        # another environment gets its own process
+        env = dict(os.environ, GIT_DIR=os.path.join(self.gitdir, ".git"))
+        self.assertIsNot(coprocess.git_batch(common.GITS, self.gitdir, env),
+                         batch)
+        self.assertIs(coprocess.git_batch(common.GITS, self.gitdir), batch)
+
+    def test_coprocess_timeout(self):
+        self.addCleanup(coprocess.close_git_batches)
+        sha = run_command(common.GITS, ["rev-parse", "HEAD"], cwd=self.gitdir)[0]
+        batch = coprocess.git_batch(common.GITS, self.gitdir)
+        # a process that never answers stands in for a stuck git
+        batch.close()
+        batch.process = subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(60)"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        start = time.monotonic()
+        self.assertEqual(coprocess.git_batch_runner(
+            common.GITS, ["rev-parse", "HEAD"], cwd=self.gitdir, timeout=0.5),
+            (sha, 0))
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIsNotNone(batch.process.poll())
+        # the next query starts a new process
+        self.assertIsNot(coprocess.git_batch(common.GITS, self.gitdir), batch)
+        batch.close()
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork()")
+    def test_coprocess_fork(self):
+        self.addCleanup(coprocess.close_git_batches)
+        batch = coprocess.git_batch(common.GITS, self.gitdir)
+        pid = os.fork()
+        if pid == 0:
+            # the child lets go of the parent's coprocess
+            os._exit(0 if not coprocess.GIT_BATCHES
+                     and batch.process is None else 1)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+        self.assertIsNotNone(batch.process)
+        self.assertEqual(batch.query("HEAD")[0][1], "commit")
+
+    def test_detached_branches(self):
+        # a branch pointing at a detached HEAD doesn't win over master or
+        # over one sorted before it which contains HEAD too, just like
+        # when the branches are all found by 'git branch --contains'
+        self.addCleanup(coprocess.close_git_batches)
+        modes = [{}, {"combine_queries": True},
+                 {"runner": coprocess.git_batch_runner},
+                 {"pieces_from": from_gitdir.git_pieces_from_gitdir,
+                  "runner": self.no_git}]
+
+        def check(branch):
+            def pick():
+                out = self.git("branch", "--contains")
+                return from_vcs.git_pick_branch(
+                    from_vcs.git_parse_branch_contains(out))
+            self.assertEqual(pick(), branch)
+            for kwargs in modes:
+                self.check_modes(**kwargs)
+                pieces_from = kwargs.get("pieces_from",
+                                         from_vcs.git_pieces_from_vcs)
+                kwargs = {k: v for k, v in kwargs.items() if k != "pieces_from"}
+                self.assertEqual(
+                    pieces_from("v", self.gitdir, False, **kwargs)["branch"],
+                    branch)
+            self.assertEqual(asyncio.run(
+                from_vcs_async.git_pieces_from_vcs_async(
+                    "v", self.gitdir, False))["branch"], branch)
+
+        self.git("branch", "zzz")
+        self.git("checkout", "-q", "-b", "aaa")
+        self.git("commit", "--allow-empty", "-m", "ahead")
+        self.git("checkout", "-q", "--detach", "zzz")
+        check("master")
+        self.git("branch", "-m", "master", "other")
+        check("aaa")
+        self.git("branch", "-D", "aaa", "other")
+        check("zzz")
+
+    def test_gitdir(self):
+        self.check_states(pieces_from=from_gitdir.git_pieces_from_gitdir,
+                          runner=self.no_git)
+
+    def test_gitdir_history(self):
+        # merges, annotated tags and packs
+        check = functools.partial(
+            self.check_modes, pieces_from=from_gitdir.git_pieces_from_gitdir,
+            runner=self.no_git)
+        self.git("tag", "-a", "v1.0", "-m", "one")
+        self.git("checkout", "-b", "side")
+        self.git("commit", "--allow-empty", "-m", "side")
+        self.git("tag", "v1.1")
+        self.git("checkout", "master")
+        self.git("commit", "--allow-empty", "-m", "main")
+        self.git("merge", "--no-ff", "-m", "merge", "side")
+        check()
+        self.git("tag", "-a", "v2.0", "-m", "two", "HEAD~1")
+        self.git("tag", "-a", "v2.1", "-m", "two", "HEAD~1")
+        check()
+        self.git("repack", "-a", "-d", "--window=0")
+        self.git("pack-refs", "--all")
+        check()
+        os.unlink(self.project_file("file.txt"))
+        check()  # deleted file
+        self.git("checkout", "file.txt")
+        with open(self.project_file("new.txt"), "w") as f:
+            f.write("new\n")
+        check()  # untracked files don't count
+        self.git("add", "new.txt")
+        check()  # staged
+
+    def test_gitdir_deltas(self):
+        message = "".join("line %d of a long commit message\n" % i
+                          for i in range(200))
+        for i in range(20):
+            self.git("commit", "--allow-empty", "-m", "%d\n\n%s" % (i, message))
+            if i == 10:
+                self.git("tag", "v1.0")
+        for offsets in ["true", "false"]:  # OFS_DELTA and REF_DELTA
+            self.git("-c", "repack.useDeltaBaseOffset=" + offsets,
+                     "repack", "-a", "-d", "-f", "--window=50", "--depth=50")
+            pack, = Path(self.gitdir, ".git", "objects", "pack").glob("*.pack")
+            verify = self.git("verify-pack", "-v", str(pack))
+            self.assertRegex(verify, r"commit .* [0-9a-f]{40}\n")  # deltified
+            repo = from_gitdir.GitDir(os.path.join(self.gitdir, ".git"),
+                                      self.gitdir)
+            for sha in self.git("rev-list", "HEAD").split():
+                self.assertEqual(repo.read_object(sha)[1].decode().strip(),
+                                 self.git("cat-file", "commit", sha))
+            self.check_modes(pieces_from=from_gitdir.git_pieces_from_gitdir,
+                             runner=self.no_git)
+
+    def test_tag_index(self):
+        indexed = functools.partial(from_gitdir.git_pieces_from_gitdir,
+                                    runner=self.no_git, tag_index=True)
+        self.check_states(pieces_from=indexed)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.gitdir, ".git", from_gitdir.TAG_INDEX_FILE)))
+        self.git("tag", "-a", "v2.0", "-m", "two")
+        self.git("tag", "-a", "v2.1", "-m", "two.one")
+        self.check_modes(pieces_from=indexed)
+        self.git("pack-refs", "--all")
+        self.git("tag", "v3.0", "HEAD^")
+        with mock.patch.object(from_gitdir.GitDir, "peel_tag",
+                               autospec=True,
+                               side_effect=from_gitdir.GitDir.peel_tag) as m:
+            self.check_modes(pieces_from=indexed)
+            # only the new tag is read, the packed ones are still known
+            self.assertEqual(len(m.call_args_list), 1)
+            m.reset_mock()
+            self.check_modes(pieces_from=indexed)
+            self.assertFalse(m.called)
+        self.git("tag", "-d", "v2.1")
+        self.check_modes(pieces_from=indexed)
+
+    def test_first_parent_walk(self):
+        indexed = functools.partial(from_gitdir.git_pieces_from_gitdir,
+                                    runner=self.no_git, tag_index=True)
+        for i in range(30):
+            self.git("commit", "--allow-empty", "-m", "%d" % i)
+            if i in (10, 20):
+                self.git("tag", "v1.%d" % i)
+        repo = from_gitdir.GitDir(os.path.join(self.gitdir, ".git"),
+                                  self.gitdir)
+        head = repo.resolve_ref("HEAD")
+        self.assertEqual(repo.describe(head, repo.tag_names("v")), ("v1.20", 9))
+        self.assertEqual(len(repo.commits), 9)  # only the commits above the tag
+        self.check_modes(pieces_from=indexed)
+        # a merge on the way needs the full walk
+        self.git("checkout", "-b", "side", "v1.20")
+        self.git("commit", "--allow-empty", "-m", "side")
+        self.git("tag", "v1.21")
+        self.git("checkout", "master")
+        self.git("merge", "--no-ff", "-m", "merge", "side")
+        repo = from_gitdir.GitDir(os.path.join(self.gitdir, ".git"),
+                                  self.gitdir)
+        self.assertIsNone(repo.describe_linear(repo.resolve_ref("HEAD"),
+                                               repo.tag_names("v")))
+        self.check_modes(pieces_from=indexed)
+        with mock.patch.object(from_gitdir, "FIRST_PARENT_BOUND", 3):
+            self.git("reset", "--hard", "-q", "HEAD^")
+            self.check_modes(pieces_from=indexed)  # too far for the bound
+
+    def test_commit_graph(self):
+        check = functools.partial(
+            self.check_modes, pieces_from=from_gitdir.git_pieces_from_gitdir,
+            runner=self.no_git)
+        self.git("tag", "-a", "v1.0", "-m", "one")
+        self.git("checkout", "-b", "side")
+        self.git("commit", "--allow-empty", "-m", "side")
+        self.git("checkout", "master")
+        for i in range(3):
+            self.git("commit", "--allow-empty", "-m", "octopus %d" % i)
+            self.git("branch", "octopus%d" % i)
+            self.git("reset", "--hard", "-q", "v1.0")
+        self.git("merge", "--no-edit", "octopus0", "octopus1", "octopus2",
+                 "side")
+        self.git("commit-graph", "write", "--reachable")
+        self.git("commit", "--allow-empty", "-m", "after the graph")
+        repo = from_gitdir.GitDir(os.path.join(self.gitdir, ".git"),
+                                  self.gitdir)
+        self.assertIsNotNone(repo.graph)
+        head = repo.resolve_ref("HEAD")
+        merge = repo.read_commit(head)[1][0]
+        self.assertEqual(len(repo.read_commit(merge)[1]), 4)  # after fast-forwarding to octopus0
+        self.assertEqual(repo.read_commit(merge)[:3],
+                         repo.parse_commit(merge)[:3])
+        self.assertEqual(repo.generation(merge), 3)
+        self.assertEqual(repo.generation(head), float("inf"))
+        self.assertTrue(repo.contains(head, repo.resolve_ref("refs/heads/side")))
+        self.assertFalse(repo.contains(repo.resolve_ref("refs/heads/side"),
+                                       head))
+        check()
+        self.git("checkout", "--detach", "side")
+        check()  # the branches containing HEAD
+
+    def test_commit_graph_walk(self):
+        # with levels from the commit-graph, describe stops soon after the
+        # closest tag instead of walking all of the history
+        for i in range(60):
+            self.git("commit", "--allow-empty", "-m", "%d" % i)
+            if i in (5, 50):
+                self.git("tag", "v1.%d" % i)
+        self.git("checkout", "-b", "side", "HEAD~3")
+        self.git("commit", "--allow-empty", "-m", "side")
+        self.git("checkout", "master")
+        self.git("merge", "--no-ff", "-m", "merge", "side")
+        git_describe = self.git("describe", "--tags", "--long")
+        visited = {}
+        for graph in [False, True]:
+            if graph:
+                self.git("commit-graph", "write", "--reachable")
+            repo = from_gitdir.GitDir(os.path.join(self.gitdir, ".git"),
+                                      self.gitdir)
+            self.assertEqual(repo.graph is not None, graph)
+            head = repo.resolve_ref("HEAD")
+            tag, distance = repo.describe(head, repo.tag_names("v"))
+            self.assertEqual("%s-%d-g%s" % (tag, distance, repo.abbrev(head)),
+                             git_describe)
+            visited[graph] = len(repo.commits)
+        self.assertGreater(visited[False], 60)
+        self.assertLess(visited[True], 30)
+        self.check_modes(pieces_from=from_gitdir.git_pieces_from_gitdir,
+                         runner=self.no_git)
+
+    def test_gitdir_fallback(self):
+        self.git("worktree", "add", "../wt")
+        self.gitdir = self.subpath("wt")
+        calls = []
+
+        def runner(*args, **kwargs):
+            calls.append(args)
+            return run_command(*args, **kwargs)
+        self.check_modes(pieces_from=from_gitdir.git_pieces_from_gitdir,
+                         runner=runner)
+        self.assertTrue(calls)  # linked worktrees are left to git
+
+    def test_cache(self):
+        calls = []
+
+        def pieces_from(*args, **kwargs):
+            calls.append(args)
+            return from_vcs.git_pieces_from_vcs(*args, **kwargs)
+        cached = functools.partial(cache.git_pieces_from_cache,
+                                   pieces_from=pieces_from)
+        self.check_states(pieces_from=cached)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.gitdir, ".git", cache.VERSION_CACHE_FILE)))
+        count = len(calls)
+        self.check_modes(pieces_from=cached)
+        with open(self.project_file("file.txt"), "w") as f:
+            f.write("1\n")
+        self.check_modes(pieces_from=cached)  # clean again
+        self.assertEqual(len(calls), count)
+        self.git("tag", "v2.0")
+        self.check_modes(pieces_from=cached)
+        self.assertEqual(len(calls), count + 1)
+        self.git("commit", "--allow-empty", "-m", "third")
+        self.check_modes(pieces_from=cached)
+        self.assertEqual(len(calls), count + 2)
+
+    def test_cache_threads(self):
+        # concurrent writers each use their own temporary file
+        git_dir = os.path.join(self.gitdir, ".git")
+
+        def write(n):
+            for i in range(20):
+                cache.write_version_cache(git_dir, {"writer": [n, i]})
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(cache.read_version_cache(git_dir)["writer"][1], 19)
+        self.assertEqual([name for name in os.listdir(git_dir)
+                          if name.endswith(".tmp")], [])
+
+    def test_cache_static(self):
+        def pieces_from(*args, **kwargs):
+            self.fail("git was run")
+        static = functools.partial(cache.git_pieces_from_cache,
+                                   pieces_from=pieces_from, check_dirty=False)
+        cached = functools.partial(cache.git_pieces_from_cache,
+                                   pieces_from=from_vcs.git_pieces_from_vcs)
+
+        def settle():
+            # git rewrites the index on every refresh while a file was
+            # changed in the same second as the index was written
+            past = time.time() - 10
+            os.utime(self.project_file("file.txt"), (past, past))
+            self.git("update-index", "-q", "--refresh")
+
+        settle()
+        self.check_modes(pieces_from=cached)
+        self.check_modes(pieces_from=static)
+        with open(self.project_file("file.txt"), "a") as f:
+            f.write("2\n")
+        # the dirty flag is the one stored by the last full check
+        self.assertFalse(static("v", self.gitdir, False)["dirty"])
+        # until the index changes, e.g. when the change is staged
+        settle()
+        self.git("add", "file.txt")
+        self.assertTrue(cache.git_pieces_from_cache(
+            "v", self.gitdir, False, check_dirty=False,
+            pieces_from=from_vcs.git_pieces_from_vcs)["dirty"])
+        self.check_modes(pieces_from=static)
+        self.check_modes(pieces_from=cached)
+        self.check_modes(pieces_from=static)
+        self.assertTrue(static("v", self.gitdir, False)["dirty"])
+
+        # a dirty flag limited to a scope is stored apart from the others
+        os.mkdir(self.project_file("sub"))
+        dirty_from = functools.partial(checkout.git_dirty_from_index,
+                                       self.gitdir, scope=["sub"])
+        pieces = cached("v", self.gitdir, False, dirty_from=dirty_from,
+                        dirty_scope=["sub"])
+        self.assertFalse(pieces["dirty"])
+        self.assertTrue(static("v", self.gitdir, False)["dirty"])
+        self.assertFalse(static("v", self.gitdir, False,
+                                dirty_scope=["sub"])["dirty"])
+
+    def test_daemon(self):
+        self.assertRaises(from_vcs.NotThisMethod,
+                          from_daemon.git_pieces_from_daemon,
+                          "v", self.gitdir, False)
+        server = daemon.VersionDaemon(os.path.join(self.gitdir, ".git"),
+                                      self.gitdir)
+        threading.Thread(target=server.server.serve_forever).start()
+        self.addCleanup(server.close)
+        self.addCleanup(server.server.shutdown)
+        with mock.patch.object(daemon, "git_pieces_from_vcs",
+                               wraps=from_vcs.git_pieces_from_vcs) as m:
+            self.check_states(pieces_from=from_daemon.git_pieces_from_daemon)
+            count = m.call_count
+            self.check_modes(pieces_from=from_daemon.git_pieces_from_daemon)
+            with open(self.project_file("file.txt"), "w") as f:
+                f.write("1\n")
+            self.check_modes(pieces_from=from_daemon.git_pieces_from_daemon)
+            self.assertEqual(m.call_count, count)
+            self.git("commit", "--allow-empty", "-m", "third")
+            server.refresh()
+            self.assertEqual(m.call_count, count + 1)
+            self.check_modes(pieces_from=from_daemon.git_pieces_from_daemon)
+            self.assertEqual(m.call_count, count + 1)
+
+    def check_daemon_dirty(self, watched):
+        server = daemon.VersionDaemon(os.path.join(self.gitdir, ".git"),
+                                      self.gitdir)
+        self.addCleanup(server.close)
+        self.assertEqual(server.watcher is not None, watched)
+        GitCheckout = checkout.GitCheckout
+        with mock.patch.object(GitCheckout, "index_check", autospec=True,
+                               side_effect=GitCheckout.index_check) as index, \
+             mock.patch.object(GitCheckout, "files_modified", autospec=True,
+                               side_effect=GitCheckout.files_modified) as files:
+            def check(dirty, index_checks, files_checks):
+                pieces = server.pieces("v", self.gitdir, None)
+                self.assertIs(pieces["dirty"], dirty)
+                self.assertEqual(index.call_count, index_checks)
+                self.assertEqual(files.call_count, files_checks)
+
+            check(False, 0, 0)  # computed by git
+            check(False, 1, 1)
+            # the index is only compared with HEAD again after it changed,
+            # and the files only if inotify can't tell they didn't
+            check(False, 1, 1 if watched else 2)
+            with open(self.project_file("file.txt"), "a") as f:
+                f.write("2\n")
+            check(True, 1, 2 if watched else 3)
+            check(True, 1, 2 if watched else 4)
+            self.git("add", "file.txt")
+            check(True, 2, 2 if watched else 4)
+            self.git("commit", "-m", "second")
+            check(False, 2, 2 if watched else 4)  # computed by git
+            check(False, 3, 3 if watched else 5)
+
+        # requests for other roots are remembered separately
+        server.pieces("v", os.path.join(self.gitdir, "."), None)
+        os.mkdir(self.project_file("sub"))
+        server.pieces("v", self.project_file("sub"), None)
+        gitdir = os.path.realpath(self.gitdir)
+        self.assertEqual(sorted(root for _, root, _ in server.entries),
+                         [gitdir, os.path.join(gitdir, "sub")])
+
+    def test_daemon_dirty(self):
+        if daemon.InotifyWatcher.create() is None:
+            self.skipTest("inotify is not available")
+        self.check_daemon_dirty(watched=True)
+
+    def test_daemon_dirty_polling(self):
+        with mock.patch.object(daemon.InotifyWatcher, "create",
+                               return_value=None):
+            self.check_daemon_dirty(watched=False)
+
+    def test_dirty_from_index(self):
+        def pieces_from(tag_prefix, root, verbose, **kwargs):
+            dirty_from = functools.partial(checkout.git_dirty_from_index,
+                                           root, max_workers=2)
+            return from_vcs.git_pieces_from_vcs(tag_prefix, root, verbose,
+                                                dirty_from=dirty_from,
+                                                **kwargs)
+        with mock.patch.object(checkout, "DIRTY_CHUNK_SIZE", 1):
+            self.check_states(pieces_from=pieces_from)
+
+    def test_dirty_scope(self):
+        os.mkdir(self.project_file("sub"))
+        with open(self.project_file("sub", "a.txt"), "w") as f:
+            f.write("a\n")
+        self.git("add", "sub")
+        self.git("commit", "-m", "sub")
+        dirty = functools.partial(checkout.git_dirty_from_index,
+                                  self.subpath("demoapp/sub"), runner=self.no_git)
+        head = self.git("rev-parse", "HEAD").strip()
+        with open(self.project_file("file.txt"), "a") as f:
+            f.write("2\n")
+        self.assertTrue(dirty(head))
+        self.assertFalse(dirty(head, scope=["."]))
+        self.assertTrue(dirty(head, scope=[".."]))
+        with open(self.project_file("sub", "a.txt"), "a") as f:
+            f.write("b\n")
+        self.assertTrue(dirty(head, scope=["."]))
+        self.git("checkout", "sub")
+        self.git("rm", "-q", "--cached", "sub/a.txt")
+        self.assertTrue(dirty(head, scope=["."]))  # staged
+
+        # linked worktrees are left to 'git status'
+        self.git("worktree", "add", "../wt")
+        wt = self.subpath("wt")
+        head = run_command(["git"], ["rev-parse", "HEAD"], cwd=wt)[0]
+        self.assertFalse(checkout.git_dirty_from_index(wt, head))
+        with open(os.path.join(wt, "sub", "a.txt"), "a") as f:
+            f.write("b\n")
+        self.assertTrue(checkout.git_dirty_from_index(wt, head))
+        self.assertFalse(checkout.git_dirty_from_index(wt, head,
+                                                          scope=["missing"]))
+
+    def test_dirty_autocrlf(self):
+        self.git("config", "core.autocrlf", "input")
+        with open(self.project_file("crlf.txt"), "wb") as f:
+            f.write(b"a\r\nb\r\n")
+        self.git("add", "crlf.txt")
+        self.git("commit", "-m", "crlf")
+        st = os.stat(self.project_file("crlf.txt"))
+        os.utime(self.project_file("crlf.txt"),
+                 ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        head = self.git("rev-parse", "HEAD").strip()
+        repo = checkout.GitCheckout(os.path.join(self.gitdir, ".git"),
+                                    self.gitdir)
+        with self.assertRaises(from_gitdir.NotThisMethod):
+            repo.is_dirty(head)
+        # which leaves it to 'git status', like 'git describe --dirty'
+        self.assertFalse(checkout.git_dirty_from_index(self.gitdir, head))
+        self.check_modes(pieces_from=from_gitdir.git_pieces_from_gitdir)
+
+        self.git("config", "core.autocrlf", "false")
+        with open(self.project_file(".gitattributes"), "w") as f:
+            f.write("*.txt text\n*.png -text\n")
+        self.git("add", ".gitattributes")
+        self.git("commit", "-m", "attributes")
+        repo = checkout.GitCheckout(os.path.join(self.gitdir, ".git"),
+                                    self.gitdir)
+        entries = checkout.read_git_index(repo.git_dir + "/index")[0]
+        self.assertTrue(repo.converts_files(entries))
+        with open(self.project_file(".gitattributes"), "w") as f:
+            f.write("*.png -text binary\n")
+        self.assertFalse(repo.converts_files(entries))
+
+    def test_path_scope(self):
+        sub = self.project_file("sub")
+        os.mkdir(sub)
+        self.git("tag", "v1.0")
+        self.git("commit", "--allow-empty", "-m", "elsewhere")
+
+        def scoped(pieces_from=from_vcs.git_pieces_from_vcs, **kwargs):
+            return pieces_from("v", sub, False, scope=["."], **kwargs)
+        pieces = scoped()
+        self.assertEqual((pieces["closest-tag"], pieces["distance"]),
+                         ("1.0", 0))
+        with open(os.path.join(sub, "a.txt"), "w") as f:
+            f.write("a\n")
+        self.git("add", "sub")
+        self.git("commit", "-m", "sub")
+        self.git("commit", "--allow-empty", "-m", "elsewhere")
+        self.assertEqual(scoped()["distance"], 1)
+        self.assertEqual(from_vcs.git_pieces_from_vcs(
+            "v", sub, False)["distance"], 3)
+        self.assertEqual(scoped(), scoped(
+            pieces_from=from_gitdir.git_pieces_from_gitdir))
+        cached = functools.partial(cache.git_pieces_from_cache,
+                                   pieces_from=from_vcs.git_pieces_from_vcs)
+        self.assertEqual(scoped(pieces_from=cached), scoped())
+        self.assertEqual(cached("v", sub, False)["distance"], 3)
+        self.assertEqual(scoped(pieces_from=cached)["distance"], 1)
+
+        self.git("tag", "-d", "v1.0")
+        with mock.patch.dict(from_vcs.SCOPED_DISTANCE_MEMO, clear=True):
+            self.assertEqual(scoped()["distance"], 1)  # all commits
+            self.assertEqual(len(from_vcs.SCOPED_DISTANCE_MEMO), 1)
+
+    def test_fields(self):
+        fields = {"long", "dirty", "error", "date"}
+        for pieces_from in (from_vcs.git_pieces_from_vcs,
+                            from_gitdir.git_pieces_from_gitdir):
+            pieces = pieces_from("v", self.gitdir, False, fields=fields)
+            self.assertEqual(pieces["branch"], None)
+        calls = []
+
+        def pieces_from(*args, **kwargs):
+            calls.append(args)
+            return from_vcs.git_pieces_from_vcs(*args, **kwargs)
+        cached = functools.partial(cache.git_pieces_from_cache,
+                                   pieces_from=pieces_from)
+        cached("v", self.gitdir, False, fields=fields)
+        pieces = cached("v", self.gitdir, False, fields=fields | {"branch"})
+        self.assertEqual(pieces["branch"], "master")
+        self.assertEqual(len(calls), 2)
+        cached("v", self.gitdir, False, fields=fields)
+        cached("v", self.gitdir, False, fields=fields | {"branch"})
+        self.assertEqual(len(calls), 2)
+        cached("v", self.gitdir, False)
+        self.assertEqual(len(calls), 3)
+
+
 VERBOSE = False
 
 class Repo(common.Common, unittest.TestCase):
@@ -31,6 +31,47 @@ class Parser(unittest.TestCase):
         self.assertEqual(cfg.parentdir_prefix, "petmail-")
         self.assertEqual(cfg.verbose, None)
 
+    # (option, value in setup.cfg, parsed value)
+    options = [
+        ("combine_git_queries", "true", True),
+        ("pure_python_git", "yes", True),
+        ("version_cache", "true", True),
+        ("static_version_py", "true", True),
+        ("lazy_version", "true", True),
+        ("git_hooks", "true", True),
+        ("version_daemon", "true", True),
+        ("dirty_check", "index", "index"),
+        ("dirty_scope", "src docs", "src docs"),
+        ("path_scope", ". ../shared", ". ../shared"),
+        ("tag_index", "true", True),
+        ("git_coprocess", "true", True),
+        ("time_budget", "2.5", 2.5),
+        ("styles", "\n    house = {closest-tag}[.dev{distance}]"
+                   "\n    short = {short}",
+         {"house": "{closest-tag}[.dev{distance}]", "short": "{short}"}),
+    ]
+
+    def test_options(self):
+        unset = self.parse("[versioneer]\nVCS=git\n")
+        for option, value, expected in self.options:
+            with self.subTest(option=option):
+                self.assertEqual(getattr(unset, option), None)
+                cfg = self.parse("[versioneer]\nVCS=git\n%s = %s\n"
+                                 % (option, value))
+                self.assertEqual(getattr(cfg, option), expected)
+
+    def test_style_from_styles(self):
+        cfg = self.parse("[versioneer]\nVCS=git\nstyle=house\n"
+                         "styles =\n"
+                         "    house = {closest-tag}[.dev{distance}]\n")
+        self.assertEqual(cfg.style, "{closest-tag}[.dev{distance}]")
+
+    def test_bad_style_template(self):
+        for options in ["style = {tag}\n",
+                        "styles =\n    house = [{short}\n"]:
+            with self.assertRaisesRegex(ValueError, "style template"):
+                self.parse("[versioneer]\nVCS=git\n" + options)
+
     def test_empty(self):
         self.assertRaises(configparser.NoSectionError,
                           self.parse, "")
@@ -0,0 +1,289 @@
+import asyncio
+import contextlib
+import io
+import json
+import os, shutil, subprocess, tempfile, time, unittest
+from unittest import mock
+
+import versioneer
+
+setup_cfg = """
+[versioneer]
+VCS = git
+style = pep440
+versionfile_source = petmail/_version.py
+tag_prefix = v
+parentdir_prefix = petmail-
+"""
+
+class Memo(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(os.path.realpath(self.tempdir.name),
+                                 "petmail-1.2")
+        os.mkdir(self.root)
+        open(os.path.join(self.root, "setup.py"), "w").close()
+        with open(os.path.join(self.root, "setup.cfg"), "w") as f:
+            f.write(setup_cfg)
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(self.tempdir.cleanup)
+        self.addCleanup(versioneer.invalidate_versions)
+
+    def get_versions(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            return versioneer.get_versions()
+
+    def test_config(self):
+        cfg = versioneer.get_config_from_root(self.root)
+        cfg.style = "changed"
+        cfg = versioneer.get_config_from_root(self.root)
+        self.assertEqual(cfg.style, "pep440")
+        with open(os.path.join(self.root, "setup.cfg"), "w") as f:
+            f.write(setup_cfg.replace("pep440", "pep440-old"))
+        cfg = versioneer.get_config_from_root(self.root)
+        self.assertEqual(cfg.style, "pep440-old")
+
+    def test_versions(self):
+        with mock.patch.object(versioneer, "versions_from_root",
+                               wraps=versioneer.versions_from_root) as m:
+            v = self.get_versions()
+            self.assertEqual(v["version"], "1.2")
+            v["version"] = "changed"
+            self.assertEqual(self.get_versions()["version"], "1.2")
+            self.assertEqual(m.call_count, 1)
+            versioneer.invalidate_versions(self.root)
+            self.get_versions()
+            self.assertEqual(m.call_count, 2)
+            versioneer.invalidate_versions("/elsewhere")
+            self.get_versions()
+            self.assertEqual(m.call_count, 2)
+
+    def test_async(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            v = asyncio.run(versioneer.get_versions_async(self.root))
+        self.assertEqual(v["version"], "1.2")
+        with mock.patch.object(versioneer, "versions_from_root") as m:
+            self.assertEqual(self.get_versions(), v)
+            self.assertEqual(m.call_count, 0)
+
+    def test_async_thread(self):
+        # settings without an asyncio variant are run in a thread
+        with open(os.path.join(self.root, "setup.cfg"), "a") as f:
+            f.write("combine_git_queries = true\n")
+        with mock.patch.object(versioneer, "versions_from_vcs",
+                               wraps=versioneer.versions_from_vcs) as m, \
+             contextlib.redirect_stderr(io.StringIO()):
+            v = asyncio.run(versioneer.get_versions_async(self.root))
+        self.assertEqual(v["version"], "1.2")
+        self.assertEqual(m.call_count, 1)
+        self.assertTrue(m.call_args.args[1].combine_git_queries)
+
+    def test_trace(self):
+        events = []
+        versioneer.add_trace_hook(events.append)
+        self.addCleanup(versioneer.remove_trace_hook, events.append)
+        filename = os.path.join(self.tempdir.name, "trace.json")
+        with mock.patch.dict(os.environ, {"VERSIONEER_TRACE": filename}):
+            self.get_versions()
+        with open(filename) as f:
+            self.assertEqual([json.loads(line) for line in f], events)
+        self.assertEqual(events[0]["event"], "config")
+        strategies = [(e["name"], e.get("exception"))
+                      for e in events if e["event"] == "strategy"]
+        self.assertEqual(strategies, [("keywords", "NotThisMethod"),
+                                      ("file", "NotThisMethod"),
+                                      ("vcs", "NotThisMethod"),
+                                      ("parentdir", None)])
+        git = [e for e in events if e["event"] == "subprocess"]
+        self.assertEqual(git[0]["argv"][:3], ["git", "rev-parse", "--git-dir"])
+        self.assertNotEqual(git[0]["returncode"], 0)
+        for e in events:
+            self.assertGreaterEqual(e["duration"], 0)
+
+        del events[:]
+        self.get_versions()  # remembered
+        self.assertEqual(events, [])
+
+    @unittest.skipIf(os.name != "posix", "needs sh")
+    def test_time_budget(self):
+        # the background sleep keeps stdout open unless its group is killed
+        start = time.monotonic()
+        out, rc = versioneer.run_command(["sh"], ["-c", "sleep 5 & wait"],
+                                         timeout=0.2)
+        self.assertEqual((out, rc), (None, None))
+        self.assertLess(time.monotonic() - start, 4)
+
+        with open(os.path.join(self.root, "setup.cfg"), "w") as f:
+            f.write(setup_cfg.replace("petmail-", "other-")
+                    + "time_budget = 0.05\n")
+
+        def slow_version_file(*args):
+            time.sleep(0.1)
+
+        events = []
+        versioneer.add_trace_hook(events.append)
+        self.addCleanup(versioneer.remove_trace_hook, events.append)
+        with mock.patch.object(versioneer, "versions_from_version_file",
+                               side_effect=slow_version_file):
+            v = self.get_versions()
+        self.assertEqual(v["version"], "0+unknown")
+        self.assertEqual(v["error"],
+                         "unable to compute version within time_budget (0.05s)")
+        git = [e for e in events if e["event"] == "subprocess"]
+        self.assertEqual([e["timed_out"] for e in git], [True])
+
+    @unittest.skipIf(os.name != "posix", "needs sh")
+    def test_run_command_lines(self):
+        lines = versioneer.run_command_lines(["sh"], ["-c", "echo a; echo b"])
+        self.assertEqual(list(lines), ["a", "b"])
+        # stopping early kills the command instead of waiting for it
+        start = time.monotonic()
+        with contextlib.closing(versioneer.run_command_lines(
+                ["sh"], ["-c", "echo master; exec sleep 5"])) as lines:
+            self.assertEqual(next(lines), "master")
+        self.assertLess(time.monotonic() - start, 4)
+        with self.assertRaises(OSError):
+            list(versioneer.run_command_lines(["sh"], ["-c", "echo a; exit 3"]))
+        with self.assertRaises(OSError):
+            list(versioneer.run_command_lines(["no-such-command"], []))
+        with self.assertRaises(OSError):
+            list(versioneer.run_command_lines(["sh"], ["-c", "exec sleep 5"],
+                                              timeout=0.2))
+
+
+class Many(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.addCleanup(versioneer.invalidate_versions)
+        self.repo = os.path.join(os.path.realpath(self.tempdir.name), "repo")
+        os.mkdir(self.repo)
+        self.git("init")
+        self.git("commit", "--allow-empty", "-m", "first")
+        self.git("tag", "v1.0")
+        self.git("commit", "--allow-empty", "-m", "second")
+
+    def git(self, *args):
+        env = dict(os.environ, GIT_AUTHOR_NAME="foo", GIT_COMMITTER_NAME="foo",
+                   EMAIL="foo@example.com")
+        subprocess.run(["git"] + list(args), cwd=self.repo, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+
+    def project(self, name, style="pep440", options=""):
+        root = os.path.join(self.repo, name)
+        os.mkdir(root)
+        open(os.path.join(root, "setup.py"), "w").close()
+        with open(os.path.join(root, "setup.cfg"), "w") as f:
+            f.write(setup_cfg.replace("pep440", style) + options)
+        return root
+
+    def test_many(self):
+        a = self.project("a")
+        b = self.project("b", style="git-describe")
+        elsewhere = os.path.join(os.path.realpath(self.tempdir.name),
+                                 "petmail-1.2")
+        os.mkdir(elsewhere)
+        with open(os.path.join(elsewhere, "setup.cfg"), "w") as f:
+            f.write(setup_cfg)
+        with mock.patch.object(versioneer, "pieces_from_root",
+                               wraps=versioneer.pieces_from_root) as m:
+            versions = versioneer.get_versions_many([a, b, elsewhere])
+        # a and b share one computation, elsewhere isn't in a repository
+        self.assertEqual(m.call_count, 2)
+        self.assertRegex(versions[a]["version"], r"^1\.0\+1\.g[0-9a-f]+$")
+        self.assertRegex(versions[b]["version"], r"^1\.0-1-g[0-9a-f]+$")
+        self.assertEqual(versions[a]["full-revisionid"],
+                         versions[b]["full-revisionid"])
+        self.assertEqual(versions[elsewhere]["version"], "1.2")
+
+        cwd = os.getcwd()
+        os.chdir(b)
+        self.addCleanup(os.chdir, cwd)
+        with mock.patch.object(versioneer, "versions_from_root") as m:
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(versioneer.get_versions(), versions[b])
+            self.assertEqual(m.call_count, 0)
+
+    def test_many_retag(self):
+        a = self.project("a")
+        cwd = os.getcwd()
+        os.chdir(self.repo)
+        self.addCleanup(os.chdir, cwd)
+        with mock.patch.object(versioneer, "pieces_from_root",
+                               wraps=versioneer.pieces_from_root) as m:
+            versions = versioneer.get_versions_many(["./a", a])
+            # both spellings of the root share one computation
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(versions["./a"], versions[a])
+        self.assertRegex(versions[a]["version"], r"^1\.0\+1\.g[0-9a-f]+$")
+        self.git("tag", "v2.0")
+        self.assertEqual(versioneer.get_versions_many([a])[a]["version"],
+                         "2.0")
+
+    def test_async_retag(self):
+        a = self.project("a")
+        v = asyncio.run(versioneer.get_versions_async(a))
+        self.assertRegex(v["version"], r"^1\.0\+1\.g[0-9a-f]+$")
+        self.git("tag", "v2.0")
+        v = asyncio.run(versioneer.get_versions_async(a))
+        self.assertEqual(v["version"], "2.0")
+
+    def test_daemon_scope(self):
+        a = self.project("a", options="version_daemon = true\n")
+        b = self.project("b", options="version_daemon = true\n"
+                         "dirty_check = index\ndirty_scope = .\n")
+        daemon = mock.Mock(side_effect=versioneer.NotThisMethod)
+        with mock.patch.dict(versioneer.HANDLERS["git"],
+                             {"pieces_from_daemon": daemon}):
+            versioneer.get_versions_many([a, b])
+        # the daemon checks the whole repository for changes, so it can't
+        # answer for b
+        self.assertEqual([call.args[1] for call in daemon.call_args_list], [a])
+
+    def test_git_hooks(self):
+        a = self.project("a", options="version_cache = true\n")
+        shutil.copy(versioneer.__file__, a)
+        hooks = os.path.join(self.repo, ".git", "hooks")
+        with open(os.path.join(hooks, "post-merge"), "w") as f:
+            f.write("#!/bin/sh\necho mine\n")
+        cwd = os.getcwd()
+        os.chdir(a)
+        self.addCleanup(os.chdir, cwd)
+        with contextlib.redirect_stdout(io.StringIO()):
+            versioneer.install_git_hooks(["git"])
+            versioneer.install_git_hooks(["git"])
+        for name in versioneer.GIT_HOOKS:
+            with open(os.path.join(hooks, name)) as f:
+                contents = f.read()
+            if name == "post-merge":
+                self.assertEqual(contents, "#!/bin/sh\necho mine\n")
+            else:
+                self.assertIn(versioneer.GIT_HOOK_MARKER, contents)
+                self.assertIn("cd ./a/ &&", contents)
+                self.assertTrue(os.access(os.path.join(hooks, name), os.X_OK))
+
+        self.git("commit", "--allow-empty", "-m", "third")
+        # post-commit stored the version, so no git command is needed
+        with mock.patch.object(versioneer, "run_command") as m:
+            version = versioneer.get_versions_many([a])[a]["version"]
+            self.assertEqual(m.call_count, 0)
+        self.assertRegex(version, r"^1\.0\+2\.g[0-9a-f]+$")
+
+        # without the original interpreter, the hooks use python3
+        with mock.patch.object(versioneer.sys, "executable", "/gone/python"), \
+             contextlib.redirect_stdout(io.StringIO()):
+            versioneer.install_git_hooks(["git"])
+        self.git("commit", "--allow-empty", "-m", "fourth")
+        with mock.patch.object(versioneer, "run_command") as m:
+            versioneer.invalidate_versions()
+            version = versioneer.get_versions_many([a])[a]["version"]
+            self.assertEqual(m.call_count, 0)
+        self.assertRegex(version, r"^1\.0\+3\.g[0-9a-f]+$")
+        # errors are shown, but don't fail the git command
+        os.unlink(os.path.join(a, "versioneer.py"))
+        hook = subprocess.run([os.path.join(hooks, "post-commit")],
+                              cwd=self.repo, capture_output=True, text=True)
+        self.assertEqual(hook.returncode, 0)
+        self.assertIn("versioneer", hook.stderr)
@@ -1,6 +1,9 @@
 import unittest
+from unittest import mock
 
-from versioneer import render
+from versioneer import Pieces, render, style_fields
+from versioneer import compile_style_template, register_style
+from versioneer import RENDERERS, STYLE_FIELDS, render_pep440
 
 
 class Testing_renderer_case_mixin:
@@ -26,6 +29,8 @@ class Testing_renderer_case_mixin:
         msg = ('Versions differ for {0} style with "{1}" case: expected {2}, '
                'got {3}'.format(self.style, test_case_name, expected, version))
         self.assertEqual(version, expected, msg)
+        self.assertEqual(render(Pieces(pieces), self.style),
+                         render(pieces, self.style))
 
     # Naming structure:
     # test_(un)tagged_<n>_commits_(clean|dirty)
@@ -67,6 +72,20 @@ class Testing_renderer_case_mixin:
         self.assert_rendered({'error': 'Not a git repo'},
                              'error_getting_parts')
 
+    def test_style_fields(self):
+        # rendering must only need the pieces declared for the style
+        fields = style_fields(self.style)
+        for closest_tag in ('v1.2.3', 'v1.2.3.post', None):
+            for distance in (0, 1):
+                for dirty in (False, True):
+                    for branch in (False, True):
+                        pieces = self.define_pieces(closest_tag, distance,
+                                                    dirty, branch)
+                        expected = render(pieces, self.style)
+                        pieces = {k: v for k, v in pieces.items()
+                                  if k in fields}
+                        self.assertEqual(render(pieces, self.style), expected)
+
 
 class Testing_branch_renderer_case_mixin(Testing_renderer_case_mixin):
     """
@@ -282,5 +301,145 @@ class Test_git_describe(unittest.TestCase, Testing_renderer_case_mixin):
                 }
 
 
+class Test_pieces(unittest.TestCase):
+    fields = {"long": "abcdefg", "short": "abc", "error": None,
+              "branch": "master", "dirty": False, "closest-tag": "1.0",
+              "distance": 2, "date": "2016-05-31T13:02:11+0200"}
+
+    def test_mapping(self):
+        pieces = Pieces()
+        pieces["long"] = "abcdefg"
+        pieces.update({"error": None, "closest-tag": None})
+        self.assertEqual(pieces, {"long": "abcdefg", "error": None,
+                                  "closest-tag": None})
+        self.assertEqual(list(pieces), ["long", "error", "closest-tag"])
+        self.assertEqual(len(pieces), 3)
+        self.assertNotIn("date", pieces)
+        self.assertIsNone(pieces.get("date"))
+        self.assertEqual(pieces.get("date", ""), "")
+        self.assertRaises(KeyError, lambda: pieces["date"])
+        del pieces["long"]
+        self.assertNotIn("long", pieces)
+        self.assertFalse(hasattr(pieces, "__dict__"))
+
+    def test_extra_items(self):
+        # handlers may add pieces of their own, which are kept as in a dict
+        pieces = Pieces(dict(self.fields, build="42"))
+        self.assertEqual(pieces["build"], "42")
+        self.assertEqual(list(pieces)[-1], "build")
+        self.assertEqual(pieces, dict(self.fields, build="42"))
+        self.assertNotEqual(pieces, Pieces(self.fields))
+        self.assertEqual(render(pieces, "pep440")["version"], "1.0+2.gabc")
+        del pieces["build"]
+        self.assertNotIn("build", pieces)
+        self.assertEqual(hash(pieces), hash(Pieces(self.fields)))
+        self.assertRaises(KeyError, lambda: pieces["build"])
+
+    def test_hash(self):
+        pieces = Pieces(self.fields)
+        versions = {pieces: render(pieces, "pep440")}
+        self.assertEqual(versions[Pieces(self.fields)]["version"],
+                         "1.0+2.gabc")
+        other = pieces.copy()
+        other["dirty"] = True
+        self.assertNotIn(other, versions)
+        self.assertNotEqual(other, pieces)
+        # the hash is kept until a field changes
+        self.assertEqual(hash(other), hash(other.key()))
+        del other["date"]
+        self.assertEqual(hash(other), hash(other.key()))
+        other["dirty"] = False
+        self.assertEqual(hash(other), hash(other.key()))
+
+    def test_attributes(self):
+        pieces = Pieces(self.fields)
+        self.assertEqual(pieces.closest_tag, "1.0")
+        pieces.closest_tag = "2.0"
+        self.assertEqual(pieces["closest-tag"], "2.0")
+        del pieces["date"]
+        self.assertFalse(hasattr(pieces, "date"))
+
+    def test_render_attributes(self):
+        # the renderers read attributes, which cost no more than a dict
+        # lookup, rather than going through Pieces.__getitem__()
+        with mock.patch.object(Pieces, "__getitem__") as getitem:
+            for style in list(RENDERERS) + ["{closest-tag}[+{distance}]"]:
+                render(dict(self.fields), style)
+                render(Pieces(self.fields), style)
+        getitem.assert_not_called()
+
+    def test_renderers_take_dicts(self):
+        # the render_* functions are public, and were given dicts before
+        # there were Pieces
+        for style, renderer in RENDERERS.items():
+            self.assertEqual(renderer(dict(self.fields)),
+                             renderer(Pieces(self.fields)))
+        self.assertEqual(render_pep440(dict(self.fields)), "1.0+2.gabc")
+        template = compile_style_template("{closest-tag}[+{distance}]")[0]
+        self.assertEqual(template(dict(self.fields)), "1.0+2")
+
+    def test_json(self):
+        pieces = Pieces(self.fields)
+        data = pieces.to_json()
+        self.assertEqual(data, ["abcdefg", "abc", None, "master", False,
+                                "1.0", 2, "2016-05-31T13:02:11+0200"])
+        self.assertEqual(Pieces.from_json(data), pieces)
+        self.assertEqual(Pieces.from_json(dict(self.fields)), pieces)
+        self.assertRaises(ValueError, Pieces.from_json, data[1:])
+        self.assertRaises(ValueError, Pieces.from_json, {"tag": "1.0"})
+
+
+class Test_style_templates(unittest.TestCase):
+    pep440ish = ("[{closest-tag}][0{!closest-tag}][+{distance}.g{short}]"
+                 "[.dirty{?dirty}]")
+
+    def define_pieces(self, closest_tag, distance=0, dirty=False):
+        return {"error": None, "closest-tag": closest_tag,
+                "distance": distance, "dirty": dirty, "short": "abc",
+                "long": "abcdefg", "date": None, "branch": "master"}
+
+    def test_template(self):
+        for pieces, expected in [
+                (self.define_pieces("1.0"), "1.0"),
+                (self.define_pieces("1.0", 2), "1.0+2.gabc"),
+                (self.define_pieces("1.0", 2, True), "1.0+2.gabc.dirty"),
+                (self.define_pieces(None, 3), "0+3.gabc"),
+                (self.define_pieces(None, 0, True), "0.dirty")]:
+            self.assertEqual(render(pieces, self.pep440ish)["version"],
+                             expected)
+        # outside of groups, fields are inserted unconditionally
+        self.assertEqual(render(self.define_pieces(None), "{closest-tag}-"
+                                "{distance}-{dirty}")["version"], "-0-")
+        # nested groups
+        template = "{closest-tag}[+{distance}[.{branch}]]"
+        self.assertEqual(render(self.define_pieces("1.0", 1),
+                                template)["version"], "1.0+1.master")
+
+    def test_compiled_once(self):
+        renderer, fields = compile_style_template(self.pep440ish)
+        self.assertIs(compile_style_template(self.pep440ish)[0], renderer)
+        self.assertEqual(fields, {"closest-tag", "distance", "short", "dirty"})
+        self.assertEqual(style_fields(self.pep440ish),
+                         fields | {"long", "error", "date"})
+
+    def test_bad_templates(self):
+        for template in ["{tag}", "{closest-tag", "[{short}", "{short}]",
+                         "}", "{?!dirty}", "{closest-tag}{?dirty}",
+                         "{!closest-tag}0"]:
+            self.assertRaises(ValueError, compile_style_template, template)
+        self.assertRaises(ValueError, render, self.define_pieces("1.0"),
+                          "no-such-style")
+
+    def test_register_style(self):
+        self.addCleanup(STYLE_FIELDS.pop, "upper-hash")
+        self.addCleanup(RENDERERS.pop, "upper-hash")
+        register_style("upper-hash", lambda pieces: pieces["short"].upper(),
+                       ["short"])
+        self.assertEqual(render(self.define_pieces("1.0"),
+                                "upper-hash")["version"], "ABC")
+        self.assertEqual(style_fields("upper-hash"),
+                         {"short", "long", "dirty", "error", "date"})
+
+
 if __name__ == '__main__':
     unittest.main()
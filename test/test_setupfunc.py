@@ -0,0 +1,126 @@
+import contextlib
+import importlib.util
+import io
+import os, subprocess, sys, tempfile, unittest
+from unittest import mock
+
+import versioneer
+
+setup_cfg = """
+[versioneer]
+VCS = git
+style = pep440
+versionfile_source = lazypkg/_version.py
+tag_prefix = v
+parentdir_prefix = lazypkg-
+"""
+
+class InitSnippet(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(os.path.realpath(self.tempdir.name),
+                                 "lazypkg-1.2")
+        os.makedirs(os.path.join(self.root, "lazypkg"))
+        open(os.path.join(self.root, "setup.py"), "w").close()
+        self.init_py = os.path.join(self.root, "lazypkg", "__init__.py")
+        with open(self.init_py, "w") as f:
+            f.write("import os\n" + versioneer.OLD_SNIPPET)
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        self.addCleanup(self.tempdir.cleanup)
+        self.addCleanup(versioneer.invalidate_versions)
+        for name in ["lazypkg", "lazypkg._version"]:
+            self.addCleanup(sys.modules.pop, name, None)
+
+    def do_setup(self, options="", config=setup_cfg):
+        with open(os.path.join(self.root, "setup.cfg"), "w") as f:
+            f.write(config + options)
+        with mock.patch.object(versioneer, "run_command"), \
+             contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(versioneer.do_setup(), 0)
+        with open(self.init_py) as f:
+            return f.read()
+
+    def test_lazy(self):
+        lazy = versioneer.LAZY_INIT_PY_SNIPPET.format("_version")
+        eager = versioneer.INIT_PY_SNIPPET.format("_version")
+        self.assertEqual(self.do_setup("lazy_version = true\n"),
+                         "import os\n" + lazy)
+        self.assertEqual(self.do_setup("lazy_version = true\n"),
+                         "import os\n" + lazy)
+
+        sys.path.insert(0, self.root)
+        self.addCleanup(sys.path.remove, self.root)
+        import lazypkg
+        self.assertNotIn("lazypkg._version", sys.modules)
+        self.assertEqual(lazypkg.__version__, "1.2")
+        self.assertIn("lazypkg._version", sys.modules)
+        self.assertEqual(vars(lazypkg)["__version__"], "1.2")
+        with self.assertRaises(AttributeError):
+            lazypkg.missing
+
+        self.assertEqual(self.do_setup(), "import os\n" + eager)
+
+    def test_version_py_imports(self):
+        # _version.py is imported by every user of the package, so it should
+        # leave the slow (and rarely needed) modules alone
+        self.do_setup()
+        # (subprocess imports threading and signal on its own)
+        code = ("import sys, lazypkg._version; print(sorted(set(sys.modules) & "
+                "{'asyncio', 'socket', 'mmap', 'concurrent.futures', 'zlib', "
+                "'hashlib', 'struct', 'json', 'contextvars'}))")
+        out = subprocess.check_output([sys.executable, "-c", code],
+                                      cwd=self.root, text=True)
+        self.assertEqual(out.strip(), "[]")
+
+    def test_version_py_combine_queries(self):
+        for options, combine in [("", False),
+                                 ("combine_git_queries = true\n", True)]:
+            self.do_setup(options)
+            spec = importlib.util.spec_from_file_location(
+                "lazypkg._version",
+                os.path.join(self.root, "lazypkg", "_version.py"))
+            version_py = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(version_py)
+            self.assertIs(version_py.get_config().combine_git_queries, combine)
+            with mock.patch.object(version_py, "git_pieces_from_vcs",
+                                   side_effect=version_py.NotThisMethod) as m:
+                self.assertEqual(version_py.get_versions()["version"], "1.2")
+            self.assertIs(m.call_args.kwargs["combine_queries"], combine)
+
+    def test_version_py_daemon(self):
+        for options, asked in [("", False),
+                               ("version_daemon = true\n", True),
+                               ("version_daemon = true\npath_scope = lazypkg\n",
+                                False)]:
+            self.do_setup(options)
+            spec = importlib.util.spec_from_file_location(
+                "lazypkg._version",
+                os.path.join(self.root, "lazypkg", "_version.py"))
+            version_py = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(version_py)
+            pieces = version_py.Pieces({
+                "long": "1" * 40, "short": "1111111", "error": None,
+                "closest-tag": "3.0", "distance": 0, "dirty": False,
+                "branch": None, "date": None})
+            with mock.patch.object(version_py, "git_pieces_from_daemon",
+                                   return_value=pieces) as m:
+                version = version_py.get_versions()["version"]
+            self.assertEqual(version, "3.0" if asked else "1.2")
+            self.assertEqual(m.called, asked)
+            # without a daemon, the version is computed as usual
+            with mock.patch.object(version_py, "git_pieces_from_daemon",
+                                   side_effect=version_py.NotThisMethod):
+                self.assertEqual(version_py.get_versions()["version"], "1.2")
+
+    def test_version_py_style_template(self):
+        # quotes and backslashes in a template survive into _version.py
+        template = '{closest-tag}["\\\'{distance}\\\\]'
+        self.do_setup(config=setup_cfg.replace("pep440", template))
+        spec = importlib.util.spec_from_file_location(
+            "lazypkg._version",
+            os.path.join(self.root, "lazypkg", "_version.py"))
+        version_py = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(version_py)
+        self.assertEqual(version_py.get_config().style, template)
@@ -0,0 +1,7912 @@
+
+# Version: 0+untagged.65.gfa90933.dirty
+
+"""The Versioneer - like a rocketeer, but for versions.
+
+The Versioneer
+==============
+
+* like a rocketeer, but for versions!
+* https://github.com/python-versioneer/python-versioneer
+* Brian Warner
+* License: Public Domain (Unlicense)
+* Compatible with: Python 3.9+ and pypy3
+* [![Latest Version][pypi-image]][pypi-url]
+* [![Build Status][travis-image]][travis-url]
+
+This is a tool for managing a recorded version number in setuptools-based
+python projects. The goal is to remove the tedious and error-prone "update
+the embedded version string" step from your release process. Making a new
+release should be as easy as recording a new tag in your version-control
+system, and maybe making new tarballs.
+
+
+## Quick Install
+
+Versioneer provides two installation modes. The "classic" vendored mode installs
+a copy of versioneer into your repository. The experimental build-time dependency mode
+is intended to allow you to skip this step and simplify the process of upgrading.
+
+### Vendored mode
+
+* `pip install versioneer` to somewhere in your $PATH
+   * A [conda-forge recipe](https://github.com/conda-forge/versioneer-feedstock) is
+     available, so you can also use `conda install -c conda-forge versioneer`
+* add a `[tool.versioneer]` section to your `pyproject.toml` or a
+  `[versioneer]` section to your `setup.cfg` (see [Install](INSTALL.md))
+   * Note that you will need to add `tomli; python_version < "3.11"` to your
+     build-time dependencies if you use `pyproject.toml`
+* run `versioneer install --vendor` in your source tree, commit the results
+* verify version information with `python setup.py version`
+
+### Build-time dependency mode
+
+* `pip install versioneer` to somewhere in your $PATH
+   * A [conda-forge recipe](https://github.com/conda-forge/versioneer-feedstock) is
+     available, so you can also use `conda install -c conda-forge versioneer`
+* add a `[tool.versioneer]` section to your `pyproject.toml` or a
+  `[versioneer]` section to your `setup.cfg` (see [Install](INSTALL.md))
+* add `versioneer` (with `[toml]` extra, if configuring in `pyproject.toml`)
+  to the `requires` key of the `build-system` table in `pyproject.toml`:
+  ```toml
+  [build-system]
+  requires = ["setuptools", "versioneer[toml]"]
+  build-backend = "setuptools.build_meta"
+  ```
+* run `versioneer install --no-vendor` in your source tree, commit the results
+* verify version information with `python setup.py version`
+
+## Version Identifiers
+
+Source trees come from a variety of places:
+
+* a version-control system checkout (mostly used by developers)
+* a nightly tarball, produced by build automation
+* a snapshot tarball, produced by a web-based VCS browser, like github's
+  "tarball from tag" feature
+* a release tarball, produced by "setup.py sdist", distributed through PyPI
+
+Within each source tree, the version identifier (either a string or a number,
+this tool is format-agnostic) can come from a variety of places:
+
+* ask the VCS tool itself, e.g. "git describe" (for checkouts), which knows
+  about recent "tags" and an absolute revision-id
+* the name of the directory into which the tarball was unpacked
+* an expanded VCS keyword ($Id$, etc)
+* a `_version.py` created by some earlier build step
+
+For released software, the version identifier is closely related to a VCS
+tag. Some projects use tag names that include more than just the version
+string (e.g. "myproject-1.2" instead of just "1.2"), in which case the tool
+needs to strip the tag prefix to extract the version identifier. For
+unreleased software (between tags), the version identifier should provide
+enough information to help developers recreate the same tree, while also
+giving them an idea of roughly how old the tree is (after version 1.2, before
+version 1.3). Many VCS systems can report a description that captures this,
+for example `git describe --tags --dirty --always` reports things like
+"0.7-1-g574ab98-dirty" to indicate that the checkout is one revision past the
+0.7 tag, has a unique revision id of "574ab98", and is "dirty" (it has
+uncommitted changes).
+
+The version identifier is used for multiple purposes:
+
+* to allow the module to self-identify its version: `myproject.__version__`
+* to choose a name and prefix for a 'setup.py sdist' tarball
+
+## Theory of Operation
+
+Versioneer works by adding a special `_version.py` file into your source
+tree, where your `__init__.py` can import it. This `_version.py` knows how to
+dynamically ask the VCS tool for version information at import time.
+
+`_version.py` also contains `$Revision$` markers, and the installation
+process marks `_version.py` to have this marker rewritten with a tag name
+during the `git archive` command. As a result, generated tarballs will
+contain enough information to get the proper version.
+
+To allow `setup.py` to compute a version too, a `versioneer.py` is added to
+the top level of your source tree, next to `setup.py` and the `setup.cfg`
+that configures it. This overrides several distutils/setuptools commands to
+compute the version when invoked, and changes `setup.py build` and `setup.py
+sdist` to replace `_version.py` with a small static file that contains just
+the generated version data.
+
+## Installation
+
+See [INSTALL.md](./INSTALL.md) for detailed installation instructions.
+
+## Version-String Flavors
+
+Code which uses Versioneer can learn about its version string at runtime by
+importing `_version` from your main `__init__.py` file and running the
+`get_versions()` function. From the "outside" (e.g. in `setup.py`), you can
+import the top-level `versioneer.py` and run `get_versions()`.
+
+Both functions return a dictionary with different flavors of version
+information:
+
+* `['version']`: A condensed version string, rendered using the selected
+  style. This is the most commonly used value for the project's version
+  string. The default "pep440" style yields strings like `0.11`,
+  `0.11+2.g1076c97`, or `0.11+2.g1076c97.dirty`. See the "Styles" section
+  below for alternative styles.
+
+* `['full-revisionid']`: detailed revision identifier. For Git, this is the
+  full SHA1 commit id, e.g. "1076c978a8d3cfc70f408fe5974aa6c092c949ac".
+
+* `['date']`: Date and time of the latest `HEAD` commit. For Git, it is the
+  commit date in ISO 8601 format. This will be None if the date is not
+  available.
+
+* `['dirty']`: a boolean, True if the tree has uncommitted changes. Note that
+  this is only accurate if run in a VCS checkout, otherwise it is likely to
+  be False or None
+
+* `['error']`: if the version string could not be computed, this will be set
+  to a string describing the problem, otherwise it will be None. It may be
+  useful to throw an exception in setup.py if this is set, to avoid e.g.
+  creating tarballs with a version string of "unknown".
+
+Some variants are more useful than others. Including `full-revisionid` in a
+bug report should allow developers to reconstruct the exact code being tested
+(or indicate the presence of local changes that should be shared with the
+developers). `version` is suitable for display in an "about" box or a CLI
+`--version` output: it can be easily compared against release notes and lists
+of bugs fixed in various releases.
+
+The installer adds the following text to your `__init__.py` to place a basic
+version in `YOURPROJECT.__version__`:
+
+    from ._version import get_versions
+    __version__ = get_versions()['version']
+    del get_versions
+
+## Styles
+
+The setup.cfg `style=` configuration controls how the VCS information is
+rendered into a version string.
+
+The default style, "pep440", produces a PEP440-compliant string, equal to the
+un-prefixed tag name for actual releases, and containing an additional "local
+version" section with more detail for in-between builds. For Git, this is
+TAG[+DISTANCE.gHEX[.dirty]] , using information from `git describe --tags
+--dirty --always`. For example "0.11+2.g1076c97.dirty" indicates that the
+tree is like the "1076c97" commit but has uncommitted changes (".dirty"), and
+that this commit is two revisions ("+2") beyond the "0.11" tag. For released
+software (exactly equal to a known tag), the identifier will only contain the
+stripped tag, e.g. "0.11".
+
+Other styles are available. See [details.md](details.md) in the Versioneer
+source tree for descriptions.
+
+## Debugging
+
+Versioneer tries to avoid fatal errors: if something goes wrong, it will tend
+to return a version of "0+unknown". To investigate the problem, run `setup.py
+version`, which will run the version-lookup code in a verbose mode, and will
+display the full contents of `get_versions()` (including the `error` string,
+which may help identify what went wrong).
+
+## Known Limitations
+
+Some situations are known to cause problems for Versioneer. This details the
+most significant ones. More can be found on Github
+[issues page](https://github.com/python-versioneer/python-versioneer/issues).
+
+### Subprojects
+
+Versioneer has limited support for source trees in which `setup.py` is not in
+the root directory (e.g. `setup.py` and `.git/` are *not* siblings). The are
+two common reasons why `setup.py` might not be in the root:
+
+* Source trees which contain multiple subprojects, such as
+  [Buildbot](https://github.com/buildbot/buildbot), which contains both
+  "master" and "slave" subprojects, each with their own `setup.py`,
+  `setup.cfg`, and `tox.ini`. Projects like these produce multiple PyPI
+  distributions (and upload multiple independently-installable tarballs).
+* Source trees whose main purpose is to contain a C library, but which also
+  provide bindings to Python (and perhaps other languages) in subdirectories.
+
+Versioneer will look for `.git` in parent directories, and most operations
+should get the right version string. However `pip` and `setuptools` have bugs
+and implementation details which frequently cause `pip install .` from a
+subproject directory to fail to find a correct version string (so it usually
+defaults to `0+unknown`).
+
+`pip install --editable .` should work correctly. `setup.py install` might
+work too.
+
+Pip-8.1.1 is known to have this problem, but hopefully it will get fixed in
+some later version.
+
+[Bug #38](https://github.com/python-versioneer/python-versioneer/issues/38) is tracking
+this issue. The discussion in
+[PR #61](https://github.com/python-versioneer/python-versioneer/pull/61) describes the
+issue from the Versioneer side in more detail.
+[pip PR#3176](https://github.com/pypa/pip/pull/3176) and
+[pip PR#3615](https://github.com/pypa/pip/pull/3615) contain work to improve
+pip to let Versioneer work correctly.
+
+Versioneer-0.16 and earlier only looked for a `.git` directory next to the
+`setup.cfg`, so subprojects were completely unsupported with those releases.
+
+### Editable installs with setuptools <= 18.5
+
+`setup.py develop` and `pip install --editable .` allow you to install a
+project into a virtualenv once, then continue editing the source code (and
+test) without re-installing after every change.
+
+"Entry-point scripts" (`setup(entry_points={"console_scripts": ..})`) are a
+convenient way to specify executable scripts that should be installed along
+with the python package.
+
+These both work as expected when using modern setuptools. When using
+setuptools-18.5 or earlier, however, certain operations will cause
+`pkg_resources.DistributionNotFound` errors when running the entrypoint
+script, which must be resolved by re-installing the package. This happens
+when the install happens with one version, then the egg_info data is
+regenerated while a different version is checked out. Many setup.py commands
+cause egg_info to be rebuilt (including `sdist`, `wheel`, and installing into
+a different virtualenv), so this can be surprising.
+
+[Bug #83](https://github.com/python-versioneer/python-versioneer/issues/83) describes
+this one, but upgrading to a newer version of setuptools should probably
+resolve it.
+
+
+## Updating Versioneer
+
+To upgrade your project to a new release of Versioneer, do the following:
+
+* install the new Versioneer (`pip install -U versioneer` or equivalent)
+* edit `setup.cfg` and `pyproject.toml`, if necessary,
+  to include any new configuration settings indicated by the release notes.
+  See [UPGRADING](./UPGRADING.md) for details.
+* re-run `versioneer install --[no-]vendor` in your source tree, to replace
+  `SRC/_version.py`
+* commit any changed files
+
+## Future Directions
+
+This tool is designed to make it easily extended to other version-control
+systems: all VCS-specific components are in separate directories like
+src/git/ . The top-level `versioneer.py` script is assembled from these
+components by running make-versioneer.py . In the future, make-versioneer.py
+will take a VCS name as an argument, and will construct a version of
+`versioneer.py` that is specific to the given VCS. It might also take the
+configuration arguments that are currently provided manually during
+installation by editing setup.py . Alternatively, it might go the other
+direction and include code from all supported VCS systems, reducing the
+number of intermediate scripts.
+
+## Similar projects
+
+* [setuptools_scm](https://github.com/pypa/setuptools_scm/) - a non-vendored build-time
+  dependency
+* [minver](https://github.com/jbweston/miniver) - a lightweight reimplementation of
+  versioneer
+* [versioningit](https://github.com/jwodder/versioningit) - a PEP 518-based setuptools
+  plugin
+
+## License
+
+To make Versioneer easier to embed, all its code is dedicated to the public
+domain. The `_version.py` that it creates is also in the public domain.
+Specifically, both are released under the "Unlicense", as described in
+https://unlicense.org/.
+
+[pypi-image]: https://img.shields.io/pypi/v/versioneer.svg
+[pypi-url]: https://pypi.python.org/pypi/versioneer/
+[travis-image]:
+https://img.shields.io/travis/com/python-versioneer/python-versioneer.svg
+[travis-url]: https://travis-ci.com/github/python-versioneer/python-versioneer
+
+"""
+# pylint:disable=invalid-name,import-outside-toplevel,missing-function-docstring
+# pylint:disable=missing-class-docstring,too-many-branches,too-many-statements
+# pylint:disable=raise-missing-from,too-many-lines,too-many-locals,import-error
+# pylint:disable=too-few-public-methods,redefined-outer-name,consider-using-with
+# pylint:disable=attribute-defined-outside-init,too-many-arguments
+
+import asyncio
+import atexit
+import configparser
+import contextlib
+import contextvars
+import copy
+import ctypes
+import errno
+import fnmatch
+import heapq
+import json
+import mmap
+import os
+import re
+import select
+import shlex
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AbstractSet, Any, Awaitable, ClassVar, Callable, cast, Dict
+from typing import FrozenSet, Generator, Iterable, Iterator, List, Mapping
+from typing import MutableMapping, NamedTuple, NoReturn, Optional, Set, Tuple, Union
+import functools
+
+have_tomllib = True
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        have_tomllib = False
+
+
+class VersioneerConfig:
+    """Container for Versioneer configuration parameters."""
+
+    VCS: str
+    style: str
+    tag_prefix: str
+    versionfile_source: str
+    versionfile_build: Optional[str]
+    parentdir_prefix: Optional[str]
+    verbose: Optional[bool]
+    combine_git_queries: Optional[bool]
+    git_coprocess: Optional[bool]
+    pure_python_git: Optional[bool]
+    tag_index: Optional[bool]
+    version_cache: Optional[bool]
+    static_version_py: Optional[bool]
+    lazy_version: Optional[bool]
+    git_hooks: Optional[bool]
+    version_daemon: Optional[bool]
+    dirty_check: Optional[str]
+    dirty_scope: Optional[str]
+    path_scope: Optional[str]
+    time_budget: Optional[float]
+    styles: Optional[Dict[str, str]]
+
+
+def get_root() -> str:
+    """Get the project root directory.
+
+    We require that all commands are run from the project root, i.e. the
+    directory that contains setup.py, setup.cfg, and versioneer.py .
+    """
+    root = os.path.realpath(os.path.abspath(os.getcwd()))
+    setup_py = os.path.join(root, "setup.py")
+    pyproject_toml = os.path.join(root, "pyproject.toml")
+    versioneer_py = os.path.join(root, "versioneer.py")
+    if not (
+        os.path.exists(setup_py)
+        or os.path.exists(pyproject_toml)
+        or os.path.exists(versioneer_py)
+    ):
+        # allow 'python path/to/setup.py COMMAND'
+        root = os.path.dirname(os.path.realpath(os.path.abspath(sys.argv[0])))
+        setup_py = os.path.join(root, "setup.py")
+        pyproject_toml = os.path.join(root, "pyproject.toml")
+        versioneer_py = os.path.join(root, "versioneer.py")
+    if not (
+        os.path.exists(setup_py)
+        or os.path.exists(pyproject_toml)
+        or os.path.exists(versioneer_py)
+    ):
+        err = ("Versioneer was unable to run the project root directory. "
+               "Versioneer requires setup.py to be executed from "
+               "its immediate directory (like 'python setup.py COMMAND'), "
+               "or in a way that lets it use sys.argv[0] to find the root "
+               "(like 'python path/to/setup.py COMMAND').")
+        raise VersioneerBadRootError(err)
+    try:
+        # Certain runtime workflows (setup.py install/develop in a setuptools
+        # tree) execute all dependencies in a single python process, so
+        # "versioneer" may be imported multiple times, and python's shared
+        # module-import table will cache the first one. So we can't use
+        # os.path.dirname(__file__), as that will find whichever
+        # versioneer.py was first imported, even in later projects.
+        my_path = os.path.realpath(os.path.abspath(__file__))
+        me_dir = os.path.normcase(os.path.splitext(my_path)[0])
+        vsr_dir = os.path.normcase(os.path.splitext(versioneer_py)[0])
+        if me_dir != vsr_dir and "VERSIONEER_PEP518" not in globals():
+            print("Warning: build in %s is using versioneer.py from %s"
+                  % (os.path.dirname(my_path), versioneer_py),
+                  file=sys.stderr)
+    except NameError:
+        pass
+    return root
+
+
+# configs read by get_config_from_root(), by root and config file stat data
+CONFIG_MEMO: Dict[Tuple[str, str], "VersioneerConfig"] = {}
+
+
+def get_config_from_root(root: str) -> VersioneerConfig:
+    """Read the project setup.cfg file to determine Versioneer config."""
+    # This might raise OSError (if setup.cfg is missing), or
+    # configparser.NoSectionError (if it lacks a [versioneer] section), or
+    # configparser.NoOptionError (if it lacks "VCS="). See the docstring at
+    # the top of versioneer.py for instructions on writing your setup.cfg .
+    root_pth = Path(root)
+    pyproject_toml = root_pth / "pyproject.toml"
+    setup_cfg = root_pth / "setup.cfg"
+    stats: List[Optional[Tuple[int, int, int]]] = []
+    for path in (pyproject_toml, setup_cfg):
+        try:
+            st = path.stat()
+            stats.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stats.append(None)
+    key = (root, repr(stats))
+    if key in CONFIG_MEMO:
+        return copy.copy(CONFIG_MEMO[key])
+    start = time.perf_counter()
+    section: Union[Dict[str, Any], configparser.SectionProxy, None] = None
+    if pyproject_toml.exists():
+        if not have_tomllib:
+            if 'tool.versioneer' in pyproject_toml.read_text():
+                raise RuntimeError(
+                    f"Found tool.versioneer in {pyproject_toml} "
+                    "but the required dependency 'tomli' to read that file is "
+                    "not installed")
+            else:
+                print(
+                    "No section tool.versioneer found in {pyproject_toml} "
+                    "thus we will not try to load it",
+                    file=sys.stderr)
+        else:
+            try:
+                with open(pyproject_toml, 'rb') as fobj:
+                    pp = tomllib.load(fobj)
+                section = pp['tool']['versioneer']
+            except (tomllib.TOMLDecodeError, KeyError) as e:
+                print(f"Failed to load config from {pyproject_toml}: {e}",
+                      file=sys.stderr)
+                print("Try to load it from setup.cfg", file=sys.stderr)
+    if not section:
+        parser = configparser.ConfigParser()
+        with open(setup_cfg) as cfg_file:
+            parser.read_file(cfg_file)
+        parser.get("versioneer", "VCS")  # raise error if missing
+
+        section = parser["versioneer"]
+
+    # `cast`` really shouldn't be used, but its simplest for the
+    # common VersioneerConfig users at the moment. We verify against
+    # `None` values elsewhere where it matters
+
+    cfg = VersioneerConfig()
+    cfg.VCS = section['VCS']
+    cfg.style = section.get("style", "")
+    cfg.versionfile_source = cast(str, section.get("versionfile_source"))
+    cfg.versionfile_build = section.get("versionfile_build")
+    cfg.tag_prefix = cast(str, section.get("tag_prefix"))
+    if cfg.tag_prefix in ("''", '""', None):
+        cfg.tag_prefix = ""
+    cfg.parentdir_prefix = section.get("parentdir_prefix")
+    cfg.dirty_check = section.get("dirty_check")
+    cfg.dirty_scope = section.get("dirty_scope")
+    cfg.path_scope = section.get("path_scope")
+    time_budget = section.get("time_budget")
+    cfg.time_budget = float(time_budget) if time_budget is not None else None
+    styles = section.get("styles")
+    if isinstance(styles, str):
+        # setup.cfg has one "NAME = TEMPLATE" per line
+        templates = {}
+        for line in styles.splitlines():
+            name, sep, template = line.partition("=")
+            if sep:
+                templates[name.strip()] = template.strip()
+        styles = templates
+    cfg.styles = styles
+    if cfg.styles and cfg.style in cfg.styles:
+        # render() takes the template itself
+        cfg.style = cfg.styles[cfg.style]
+    # report malformed templates now, rather than when a version is rendered
+    templates = dict(cfg.styles or {})
+    if is_style_template(cfg.style):
+        templates["style"] = cfg.style
+    for name, template in templates.items():
+        try:
+            compile_style_template(template)
+        except ValueError as e:
+            raise ValueError("bad style %r in the versioneer config: %s"
+                             % (name, e))
+    if isinstance(section, configparser.SectionProxy):
+        # Make sure configparser translates to bool
+        cfg.verbose = section.getboolean("verbose")
+        cfg.combine_git_queries = section.getboolean("combine_git_queries")
+        cfg.git_coprocess = section.getboolean("git_coprocess")
+        cfg.pure_python_git = section.getboolean("pure_python_git")
+        cfg.tag_index = section.getboolean("tag_index")
+        cfg.version_cache = section.getboolean("version_cache")
+        cfg.static_version_py = section.getboolean("static_version_py")
+        cfg.lazy_version = section.getboolean("lazy_version")
+        cfg.git_hooks = section.getboolean("git_hooks")
+        cfg.version_daemon = section.getboolean("version_daemon")
+    else:
+        cfg.verbose = section.get("verbose")
+        cfg.combine_git_queries = section.get("combine_git_queries")
+        cfg.git_coprocess = section.get("git_coprocess")
+        cfg.pure_python_git = section.get("pure_python_git")
+        cfg.tag_index = section.get("tag_index")
+        cfg.version_cache = section.get("version_cache")
+        cfg.static_version_py = section.get("static_version_py")
+        cfg.lazy_version = section.get("lazy_version")
+        cfg.git_hooks = section.get("git_hooks")
+        cfg.version_daemon = section.get("version_daemon")
+
+    trace("config", root=root, duration=time.perf_counter() - start)
+    CONFIG_MEMO[key] = cfg
+    return copy.copy(cfg)
+
+
+class NotThisMethod(Exception):
+    """Exception raised if a method is not valid for the current scenario."""
+
+
+# these dictionaries contain VCS-specific tools
+LONG_VERSION_PY: Dict[str, str] = {}
+HANDLERS: Dict[str, Dict[str, Callable]] = {}
+
+
+def register_vcs_handler(vcs: str, method: str) -> Callable:  # decorator
+    """Create decorator to mark a method as the handler of a VCS."""
+    def decorate(f: Callable) -> Callable:
+        """Store f in HANDLERS[vcs][method]."""
+        HANDLERS.setdefault(vcs, {})[method] = f
+        return f
+    return decorate
+
+
+# callbacks given every trace event, see add_trace_hook()
+TRACE_HOOKS: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_trace_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Call hook with a dict describing each traced event.
+
+    Events have an "event" name ("config", "strategy", "subprocess", or
+    "fallback" when a faster method leaves the work to git), usually a
+    "duration" in seconds, and details such as the strategy name or the
+    subprocess argv. Setting $VERSIONEER_TRACE to a filename appends the
+    events to it as JSON lines instead.
+    """
+    TRACE_HOOKS.append(hook)
+
+
+def remove_trace_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Stop calling a hook added by add_trace_hook()."""
+    TRACE_HOOKS.remove(hook)
+
+
+def trace(event: str, **data: Any) -> None:
+    """Report an event to the trace hooks and to $VERSIONEER_TRACE."""
+    filename = os.environ.get("VERSIONEER_TRACE")
+    if not (TRACE_HOOKS or filename):
+        return
+    record = {"event": event, "pid": os.getpid(), **data}
+    for hook in list(TRACE_HOOKS):
+        hook(record)
+    if filename:
+        import json
+        try:
+            with open(filename, "a") as fobj:
+                fobj.write(json.dumps(record, default=str) + "\n")
+        except OSError:
+            pass
+
+
+@contextlib.contextmanager
+def trace_span(event: str, **data: Any) -> Iterator[Dict[str, Any]]:
+    """Trace the duration of the enclosed block, and why it failed if it did.
+
+    The block may add details to the yielded dict.
+    """
+    start = time.perf_counter()
+    try:
+        yield data
+    except Exception as e:
+        # NotThisMethod means the next strategy gets a chance
+        data["exception"] = type(e).__name__
+        data["message"] = str(e)
+        raise
+    finally:
+        trace(event, duration=time.perf_counter() - start, **data)
+
+
+def run_command(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[int]]:
+    """Call the given command(s).
+
+    A command that runs longer than timeout seconds, or than what is left
+    of the time_budget(), is killed and treated like one that failed to run.
+    """
+    assert isinstance(commands, list)
+    process = None
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        # This hides the console window if pythonw.exe is used
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        popen_kwargs["startupinfo"] = startupinfo
+
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            if verbose:
+                print("no time left to run %s" % (commands[:1] + args))
+            return None, None
+        # a process group of its own, so that its children die with it
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
+    for command in commands:
+        try:
+            dispcmd = str([command] + args)
+            # remember shell=False, so use git.cmd on windows, not just git
+            process = subprocess.Popen([command] + args, cwd=cwd, env=env,
+                                       stdout=subprocess.PIPE,
+                                       stderr=(subprocess.PIPE if hide_stderr
+                                               else None), **popen_kwargs)
+            break
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            if verbose:
+                print("unable to run %s" % dispcmd)
+                print(e)
+            return None, None
+    else:
+        if verbose:
+            print("unable to find command, tried %s" % (commands,))
+        return None, None
+    try:
+        output = process.communicate(timeout=timeout)[0]
+    except subprocess.TimeoutExpired:
+        kill_process_group(process.pid, process.kill)
+        process.communicate()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start, timed_out=True)
+        if verbose:
+            print("unable to run %s (timed out)" % dispcmd)
+        return None, None
+    trace("subprocess", argv=[command] + args, cwd=cwd,
+          duration=time.perf_counter() - start,
+          returncode=process.returncode, output_bytes=len(output))
+    stdout = output.strip().decode()
+    if process.returncode != 0:
+        if verbose:
+            print("unable to run %s (error)" % dispcmd)
+            print("stdout was %s" % stdout)
+        return None, process.returncode
+    return stdout, process.returncode
+
+
+def run_command_lines(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Generator[str, None, None]:
+    """Call the given command(s), yielding its output line by line.
+
+    Unlike run_command(), the output is decoded as it is read instead of
+    being buffered, and the caller may stop early: closing the iterator
+    (e.g. with contextlib.closing()) kills the command. Raises OSError if
+    the command can't be run, exits with an error or runs out of time.
+    """
+    assert isinstance(commands, list)
+    process = None
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        # This hides the console window if pythonw.exe is used
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        popen_kwargs["startupinfo"] = startupinfo
+
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            raise OSError("no time left to run %s" % (commands[:1] + args))
+        # a process group of its own, so that its children die with it
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
+    for command in commands:
+        try:
+            dispcmd = str([command] + args)
+            # remember shell=False, so use git.cmd on windows, not just git
+            process = subprocess.Popen([command] + args, cwd=cwd, env=env,
+                                       stdout=subprocess.PIPE,
+                                       stderr=(subprocess.DEVNULL if hide_stderr
+                                               else None), **popen_kwargs)
+            break
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            if verbose:
+                print("unable to run %s" % dispcmd)
+                print(e)
+            raise
+    else:
+        if verbose:
+            print("unable to find command, tried %s" % (commands,))
+        raise OSError("unable to find command, tried %s" % (commands,))
+
+    def kill() -> None:
+        assert process is not None
+        if timeout is None:
+            process.kill()
+        else:
+            kill_process_group(process.pid, process.kill)
+
+    # reading blocks, so the timeout is enforced from another thread
+    import threading
+    expired = threading.Event()
+
+    def expire() -> None:
+        expired.set()
+        kill()
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+    assert process.stdout is not None
+    lines = 0
+    finished = False
+    try:
+        for line in process.stdout:
+            lines += 1
+            yield line.rstrip(b"\r\n").decode()
+        finished = True
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if not finished:
+            kill()  # the caller has seen enough
+        process.stdout.close()
+        process.wait()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start,
+              returncode=process.returncode, lines=lines,
+              stopped=not finished, timed_out=expired.is_set())
+    if expired.is_set():
+        if verbose:
+            print("unable to run %s (timed out)" % dispcmd)
+        raise OSError("%s timed out" % dispcmd)
+    if process.returncode != 0:
+        if verbose:
+            print("unable to run %s (error)" % dispcmd)
+        raise OSError("%s returned error %d" % (dispcmd, process.returncode))
+
+
+# the ContextVar holding the time.monotonic() deadline of the enclosing
+# time_budget(), if any, created by the first budget (so _version.py only
+# imports contextvars when it has one)
+DEADLINE: Dict[str, Any] = {}
+
+
+@contextlib.contextmanager
+def time_budget(seconds: Optional[float]) -> Iterator[None]:
+    """Limit the commands run in the enclosed block to seconds in total.
+
+    A command still running when the budget runs out is killed (with its
+    process group), and commands started later fail right away, as if they
+    had failed on their own. A nested budget can only shorten the one it is
+    in. No (or a zero) budget means no limit.
+    """
+    token = None
+    if seconds:
+        import contextvars
+        var = DEADLINE.setdefault("var", contextvars.ContextVar(
+            "versioneer_deadline", default=None))
+        deadline = time.monotonic() + seconds
+        outer = var.get()
+        token = var.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        if token is not None:
+            var.reset(token)
+
+
+def budget_left() -> Optional[float]:
+    """Return the seconds left of the time budget, or None without one."""
+    deadline = DEADLINE["var"].get() if DEADLINE else None
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget_exceeded() -> bool:
+    """Tell whether the time budget has run out."""
+    left = budget_left()
+    return left is not None and left <= 0
+
+
+def command_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Shorten a command's timeout to the rest of the time budget."""
+    left = budget_left()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def kill_process_group(pid: int, fallback: Callable[[], None]) -> None:
+    """Kill a process started in a new session, and the children it started.
+
+    Where there are no process groups (Windows), fallback() kills just the
+    process.
+    """
+    if sys.platform == "win32":
+        fallback()
+        return
+    import signal
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        fallback()
+
+
+async def run_command_async(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[int]]:
+    """Call the given command(s) like run_command(), without blocking."""
+    assert isinstance(commands, list)
+    process = None
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        # This hides the console window if pythonw.exe is used
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        popen_kwargs["startupinfo"] = startupinfo
+
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            if verbose:
+                print("no time left to run %s" % (commands[:1] + args))
+            return None, None
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
+    for command in commands:
+        try:
+            dispcmd = str([command] + args)
+            # remember shell=False, so use git.cmd on windows, not just git
+            process = await asyncio.create_subprocess_exec(
+                command, *args, cwd=cwd, env=env, stdout=subprocess.PIPE,
+                stderr=(subprocess.PIPE if hide_stderr else None),
+                **popen_kwargs)
+            break
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            if verbose:
+                print("unable to run %s" % dispcmd)
+                print(e)
+            return None, None
+    else:
+        if verbose:
+            print("unable to find command, tried %s" % (commands,))
+        return None, None
+    try:
+        output = (await asyncio.wait_for(process.communicate(), timeout))[0]
+    except asyncio.TimeoutError:
+        kill_process_group(process.pid, process.kill)
+        await process.wait()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start, timed_out=True)
+        if verbose:
+            print("unable to run %s (timed out)" % dispcmd)
+        return None, None
+    trace("subprocess", argv=[command] + args, cwd=cwd,
+          duration=time.perf_counter() - start,
+          returncode=process.returncode, output_bytes=len(output))
+    stdout = output.strip().decode()
+    if process.returncode != 0:
+        if verbose:
+            print("unable to run %s (error)" % dispcmd)
+            print("stdout was %s" % stdout)
+        return None, process.returncode
+    return stdout, process.returncode
+
+
+# the keys of version pieces, in the order Pieces.to_json() stores them
+PIECES_FIELDS = ("long", "short", "error", "branch", "dirty", "closest-tag",
+                 "distance", "date")
+PIECES_SLOTS: Dict[str, str] = {name: name.replace("-", "_")
+                                for name in PIECES_FIELDS}
+
+
+class Pieces(MutableMapping[str, Any]):
+    """The parts of a version found in the VCS, which render() combines.
+
+    This reads (and is built) like the dict it replaces, e.g.
+    pieces["closest-tag"] or pieces.get("date"), but keeps each field in a
+    slot, which can also be read as an attribute (pieces.closest_tag). The
+    renderers do that, as it is as fast as a dict lookup while item access
+    goes through __getitem__(). Fields that were never set are missing, as
+    they would be from the dict. Names other than PIECES_FIELDS, which a
+    third-party handler may add, are kept in a dict of their own. Pieces
+    compare equal to dicts with the same items, and hash by their items
+    (computed once until one changes), so they shouldn't be changed while
+    used as a key.
+    """
+
+    __slots__ = tuple(PIECES_SLOTS.values()) + ("_extra", "_hash")
+    long: Any
+    short: Any
+    error: Any
+    branch: Any
+    dirty: Any
+    closest_tag: Any
+    distance: Any
+    date: Any
+    _extra: Optional[Dict[str, Any]]
+    _hash: Optional[int]
+
+    def __init__(self, items: Optional[Mapping[str, Any]] = None) -> None:
+        """Create pieces with the given items set."""
+        set_slot = object.__setattr__
+        set_slot(self, "_extra", None)
+        set_slot(self, "_hash", None)
+        if items is not None:
+            for name, value in items.items():
+                if name in PIECES_SLOTS:
+                    set_slot(self, PIECES_SLOTS[name], value)
+                else:
+                    self[name] = value
+
+    def __setattr__(self, slot: str, value: Any) -> None:
+        """Set a slot, forgetting the hash of the old items."""
+        object.__setattr__(self, slot, value)
+        if slot != "_hash":
+            object.__setattr__(self, "_hash", None)
+
+    def __delattr__(self, slot: str) -> None:
+        """Unset a slot, forgetting the hash of the old items."""
+        object.__delattr__(self, slot)
+        object.__setattr__(self, "_hash", None)
+
+    def __getitem__(self, name: str) -> Any:
+        """Return the item name, raising KeyError if it isn't set."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            if self._extra is None:
+                raise KeyError(name)
+            return self._extra[name]
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        """Set the item name."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is not None:
+            setattr(self, slot, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[name] = value
+        self._hash = None
+
+    def __delitem__(self, name: str) -> None:
+        """Unset the item name."""
+        slot = PIECES_SLOTS.get(name)
+        try:
+            if slot is not None:
+                delattr(self, slot)
+            elif self._extra is None:
+                raise KeyError(name)
+            else:
+                del self._extra[name]
+                self._hash = None
+        except (KeyError, AttributeError):
+            raise KeyError(name) from None
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the names that are set, PIECES_FIELDS first."""
+        for name in PIECES_FIELDS:
+            if hasattr(self, PIECES_SLOTS[name]):
+                yield name
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        """Count the items that are set."""
+        return sum(1 for _ in self)
+
+    def __contains__(self, name: object) -> bool:
+        """Tell whether the item name is set."""
+        if not isinstance(name, str):
+            return False
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            return self._extra is not None and name in self._extra
+        return hasattr(self, slot)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Return the item name, or default if it isn't set."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            return default if self._extra is None else self._extra.get(
+                name, default)
+        return getattr(self, slot, default)
+
+    def key(self) -> Tuple[Tuple[str, Any], ...]:
+        """Return the set items as a tuple.
+
+        PIECES_FIELDS come first, in that order, then other names, sorted.
+        """
+        fields = tuple((name, getattr(self, slot))
+                       for name, slot in PIECES_SLOTS.items()
+                       if hasattr(self, slot))
+        if not self._extra:
+            return fields
+        return fields + tuple(sorted(self._extra.items(),
+                                     key=lambda item: item[0]))
+
+    def __hash__(self) -> int:
+        """Hash the items that are set."""
+        value = self._hash
+        if value is None:
+            value = self._hash = hash(self.key())
+        return value
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with other pieces, or with a dict of items."""
+        if isinstance(other, Pieces):
+            return self.key() == other.key()
+        if isinstance(other, Mapping):
+            return dict(self.key()) == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        """Show the items that are set."""
+        return "Pieces(%r)" % (dict(self.key()),)
+
+    def copy(self) -> "Pieces":
+        """Return a shallow copy of these pieces."""
+        return Pieces(self)
+
+    def to_json(self) -> List[Any]:
+        """Return the fields as a list, in PIECES_FIELDS order.
+
+        This is how pieces are stored in caches: unlike a dict, it doesn't
+        repeat the field names. Fields that aren't set are stored as None,
+        and other names aren't stored.
+        """
+        return [self.get(name) for name in PIECES_FIELDS]
+
+    @classmethod
+    def from_json(cls, data: Any) -> "Pieces":
+        """Rebuild pieces from to_json() data, or from a dict of fields.
+
+        Raises ValueError if data is neither.
+        """
+        if isinstance(data, list) and len(data) == len(PIECES_FIELDS):
+            data = dict(zip(PIECES_FIELDS, data))
+        if not isinstance(data, dict):
+            raise ValueError("not version pieces: %r" % (data,))
+        unknown = set(data) - set(PIECES_SLOTS)
+        if unknown:
+            raise ValueError("not version pieces: %s"
+                             % ", ".join(sorted(map(repr, unknown))))
+        return cls(data)
+
+
+def as_pieces(pieces: Mapping[str, Any]) -> Pieces:
+    """Return pieces as Pieces, copying a dict of pieces into new ones."""
+    return pieces if isinstance(pieces, Pieces) else Pieces(pieces)
+
+
+LONG_VERSION_PY['git'] = r'''
+# This file helps to compute a version number in source trees obtained from
+# git-archive tarball (such as those provided by githubs download-from-tag
+# feature). Distribution tarballs (built by setup.py sdist) and build
+# directories (produced by setup.py build) will contain a much shorter file
+# that just contains the computed version number.
+
+# This file is released into the public domain.
+# Generated by versioneer-0+untagged.65.gfa90933.dirty
+# https://github.com/python-versioneer/python-versioneer
+
+"""Git implementation of _version.py."""
+
+import contextlib
+import errno
+import os
+import re
+import stat
+import subprocess
+import sys
+import time
+from typing import AbstractSet, Any, Callable, Dict, FrozenSet, Generator, Iterable
+from typing import Iterator, List, Mapping, MutableMapping, NamedTuple, Optional, Set
+from typing import Tuple
+import functools
+
+
+def get_keywords() -> Dict[str, str]:
+    """Get the keywords needed to look up the version information."""
+    # these strings will be replaced by git during git-archive.
+    # setup.py/versioneer.py will grep for the variable names, so they must
+    # each be defined on a line of their own. _version.py will just call
+    # get_keywords().
+    git_refnames = "%(DOLLAR)sFormat:%%d%(DOLLAR)s"
+    git_full = "%(DOLLAR)sFormat:%%H%(DOLLAR)s"
+    git_date = "%(DOLLAR)sFormat:%%ci%(DOLLAR)s"
+    keywords = {"refnames": git_refnames, "full": git_full, "date": git_date}
+    return keywords
+
+
+class VersioneerConfig:
+    """Container for Versioneer configuration parameters."""
+
+    VCS: str
+    style: str
+    tag_prefix: str
+    parentdir_prefix: str
+    versionfile_source: str
+    verbose: bool
+    combine_git_queries: bool
+    version_daemon: bool
+    version_cache: bool
+    static_version_py: bool
+    dirty_check: str
+    dirty_scope: str
+    path_scope: str
+    time_budget: float
+
+
+def get_config() -> VersioneerConfig:
+    """Create, populate and return the VersioneerConfig() object."""
+    # these strings are filled in when 'setup.py versioneer' creates
+    # _version.py
+    cfg = VersioneerConfig()
+    cfg.VCS = "git"
+    cfg.style = "%(STYLE)s"
+    cfg.tag_prefix = "%(TAG_PREFIX)s"
+    cfg.parentdir_prefix = "%(PARENTDIR_PREFIX)s"
+    cfg.versionfile_source = "%(VERSIONFILE_SOURCE)s"
+    cfg.verbose = False
+    cfg.combine_git_queries = "%(COMBINE_GIT_QUERIES)s" == "True"
+    cfg.version_daemon = "%(VERSION_DAEMON)s" == "True"
+    cfg.version_cache = "%(VERSION_CACHE)s" == "True"
+    cfg.static_version_py = "%(STATIC_VERSION_PY)s" == "True"
+    cfg.dirty_check = "%(DIRTY_CHECK)s"
+    cfg.dirty_scope = "%(DIRTY_SCOPE)s"
+    cfg.path_scope = "%(PATH_SCOPE)s"
+    cfg.time_budget = float("%(TIME_BUDGET)s")
+    return cfg
+
+
+class NotThisMethod(Exception):
+    """Exception raised if a method is not valid for the current scenario."""
+
+
+LONG_VERSION_PY: Dict[str, str] = {}
+HANDLERS: Dict[str, Dict[str, Callable]] = {}
+
+
+def register_vcs_handler(vcs: str, method: str) -> Callable:  # decorator
+    """Create decorator to mark a method as the handler of a VCS."""
+    def decorate(f: Callable) -> Callable:
+        """Store f in HANDLERS[vcs][method]."""
+        if vcs not in HANDLERS:
+            HANDLERS[vcs] = {}
+        HANDLERS[vcs][method] = f
+        return f
+    return decorate
+
+
+# callbacks given every trace event, see add_trace_hook()
+TRACE_HOOKS: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_trace_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Call hook with a dict describing each traced event.
+
+    Events have an "event" name ("config", "strategy", "subprocess", or
+    "fallback" when a faster method leaves the work to git), usually a
+    "duration" in seconds, and details such as the strategy name or the
+    subprocess argv. Setting $VERSIONEER_TRACE to a filename appends the
+    events to it as JSON lines instead.
+    """
+    TRACE_HOOKS.append(hook)
+
+
+def remove_trace_hook(hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Stop calling a hook added by add_trace_hook()."""
+    TRACE_HOOKS.remove(hook)
+
+
+def trace(event: str, **data: Any) -> None:
+    """Report an event to the trace hooks and to $VERSIONEER_TRACE."""
+    filename = os.environ.get("VERSIONEER_TRACE")
+    if not (TRACE_HOOKS or filename):
+        return
+    record = {"event": event, "pid": os.getpid(), **data}
+    for hook in list(TRACE_HOOKS):
+        hook(record)
+    if filename:
+        import json
+        try:
+            with open(filename, "a") as fobj:
+                fobj.write(json.dumps(record, default=str) + "\n")
+        except OSError:
+            pass
+
+
+@contextlib.contextmanager
+def trace_span(event: str, **data: Any) -> Iterator[Dict[str, Any]]:
+    """Trace the duration of the enclosed block, and why it failed if it did.
+
+    The block may add details to the yielded dict.
+    """
+    start = time.perf_counter()
+    try:
+        yield data
+    except Exception as e:
+        # NotThisMethod means the next strategy gets a chance
+        data["exception"] = type(e).__name__
+        data["message"] = str(e)
+        raise
+    finally:
+        trace(event, duration=time.perf_counter() - start, **data)
+
+
+def run_command(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[int]]:
+    """Call the given command(s).
+
+    A command that runs longer than timeout seconds, or than what is left
+    of the time_budget(), is killed and treated like one that failed to run.
+    """
+    assert isinstance(commands, list)
+    process = None
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        # This hides the console window if pythonw.exe is used
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        popen_kwargs["startupinfo"] = startupinfo
+
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            if verbose:
+                print("no time left to run %%s" %% (commands[:1] + args))
+            return None, None
+        # a process group of its own, so that its children die with it
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
+    for command in commands:
+        try:
+            dispcmd = str([command] + args)
+            # remember shell=False, so use git.cmd on windows, not just git
+            process = subprocess.Popen([command] + args, cwd=cwd, env=env,
+                                       stdout=subprocess.PIPE,
+                                       stderr=(subprocess.PIPE if hide_stderr
+                                               else None), **popen_kwargs)
+            break
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            if verbose:
+                print("unable to run %%s" %% dispcmd)
+                print(e)
+            return None, None
+    else:
+        if verbose:
+            print("unable to find command, tried %%s" %% (commands,))
+        return None, None
+    try:
+        output = process.communicate(timeout=timeout)[0]
+    except subprocess.TimeoutExpired:
+        kill_process_group(process.pid, process.kill)
+        process.communicate()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start, timed_out=True)
+        if verbose:
+            print("unable to run %%s (timed out)" %% dispcmd)
+        return None, None
+    trace("subprocess", argv=[command] + args, cwd=cwd,
+          duration=time.perf_counter() - start,
+          returncode=process.returncode, output_bytes=len(output))
+    stdout = output.strip().decode()
+    if process.returncode != 0:
+        if verbose:
+            print("unable to run %%s (error)" %% dispcmd)
+            print("stdout was %%s" %% stdout)
+        return None, process.returncode
+    return stdout, process.returncode
+
+
+def run_command_lines(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Generator[str, None, None]:
+    """Call the given command(s), yielding its output line by line.
+
+    Unlike run_command(), the output is decoded as it is read instead of
+    being buffered, and the caller may stop early: closing the iterator
+    (e.g. with contextlib.closing()) kills the command. Raises OSError if
+    the command can't be run, exits with an error or runs out of time.
+    """
+    assert isinstance(commands, list)
+    process = None
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        # This hides the console window if pythonw.exe is used
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        popen_kwargs["startupinfo"] = startupinfo
+
+    timeout = command_timeout(timeout)
+    if timeout is not None:
+        if timeout <= 0:
+            trace("subprocess", argv=commands[:1] + args, cwd=cwd,
+                  duration=0, timed_out=True)
+            raise OSError("no time left to run %%s" %% (commands[:1] + args))
+        # a process group of its own, so that its children die with it
+        popen_kwargs["start_new_session"] = True
+
+    start = time.perf_counter()
+    for command in commands:
+        try:
+            dispcmd = str([command] + args)
+            # remember shell=False, so use git.cmd on windows, not just git
+            process = subprocess.Popen([command] + args, cwd=cwd, env=env,
+                                       stdout=subprocess.PIPE,
+                                       stderr=(subprocess.DEVNULL if hide_stderr
+                                               else None), **popen_kwargs)
+            break
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            if verbose:
+                print("unable to run %%s" %% dispcmd)
+                print(e)
+            raise
+    else:
+        if verbose:
+            print("unable to find command, tried %%s" %% (commands,))
+        raise OSError("unable to find command, tried %%s" %% (commands,))
+
+    def kill() -> None:
+        assert process is not None
+        if timeout is None:
+            process.kill()
+        else:
+            kill_process_group(process.pid, process.kill)
+
+    # reading blocks, so the timeout is enforced from another thread
+    import threading
+    expired = threading.Event()
+
+    def expire() -> None:
+        expired.set()
+        kill()
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+    assert process.stdout is not None
+    lines = 0
+    finished = False
+    try:
+        for line in process.stdout:
+            lines += 1
+            yield line.rstrip(b"\r\n").decode()
+        finished = True
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if not finished:
+            kill()  # the caller has seen enough
+        process.stdout.close()
+        process.wait()
+        trace("subprocess", argv=[command] + args, cwd=cwd,
+              duration=time.perf_counter() - start,
+              returncode=process.returncode, lines=lines,
+              stopped=not finished, timed_out=expired.is_set())
+    if expired.is_set():
+        if verbose:
+            print("unable to run %%s (timed out)" %% dispcmd)
+        raise OSError("%%s timed out" %% dispcmd)
+    if process.returncode != 0:
+        if verbose:
+            print("unable to run %%s (error)" %% dispcmd)
+        raise OSError("%%s returned error %%d" %% (dispcmd, process.returncode))
+
+
+# the ContextVar holding the time.monotonic() deadline of the enclosing
+# time_budget(), if any, created by the first budget (so _version.py only
+# imports contextvars when it has one)
+DEADLINE: Dict[str, Any] = {}
+
+
+@contextlib.contextmanager
+def time_budget(seconds: Optional[float]) -> Iterator[None]:
+    """Limit the commands run in the enclosed block to seconds in total.
+
+    A command still running when the budget runs out is killed (with its
+    process group), and commands started later fail right away, as if they
+    had failed on their own. A nested budget can only shorten the one it is
+    in. No (or a zero) budget means no limit.
+    """
+    token = None
+    if seconds:
+        import contextvars
+        var = DEADLINE.setdefault("var", contextvars.ContextVar(
+            "versioneer_deadline", default=None))
+        deadline = time.monotonic() + seconds
+        outer = var.get()
+        token = var.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        if token is not None:
+            var.reset(token)
+
+
+def budget_left() -> Optional[float]:
+    """Return the seconds left of the time budget, or None without one."""
+    deadline = DEADLINE["var"].get() if DEADLINE else None
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def budget_exceeded() -> bool:
+    """Tell whether the time budget has run out."""
+    left = budget_left()
+    return left is not None and left <= 0
+
+
+def command_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Shorten a command's timeout to the rest of the time budget."""
+    left = budget_left()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def kill_process_group(pid: int, fallback: Callable[[], None]) -> None:
+    """Kill a process started in a new session, and the children it started.
+
+    Where there are no process groups (Windows), fallback() kills just the
+    process.
+    """
+    if sys.platform == "win32":
+        fallback()
+        return
+    import signal
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        fallback()
+
+
+# the keys of version pieces, in the order Pieces.to_json() stores them
+PIECES_FIELDS = ("long", "short", "error", "branch", "dirty", "closest-tag",
+                 "distance", "date")
+PIECES_SLOTS: Dict[str, str] = {name: name.replace("-", "_")
+                                for name in PIECES_FIELDS}
+
+
+class Pieces(MutableMapping[str, Any]):
+    """The parts of a version found in the VCS, which render() combines.
+
+    This reads (and is built) like the dict it replaces, e.g.
+    pieces["closest-tag"] or pieces.get("date"), but keeps each field in a
+    slot, which can also be read as an attribute (pieces.closest_tag). The
+    renderers do that, as it is as fast as a dict lookup while item access
+    goes through __getitem__(). Fields that were never set are missing, as
+    they would be from the dict. Names other than PIECES_FIELDS, which a
+    third-party handler may add, are kept in a dict of their own. Pieces
+    compare equal to dicts with the same items, and hash by their items
+    (computed once until one changes), so they shouldn't be changed while
+    used as a key.
+    """
+
+    __slots__ = tuple(PIECES_SLOTS.values()) + ("_extra", "_hash")
+    long: Any
+    short: Any
+    error: Any
+    branch: Any
+    dirty: Any
+    closest_tag: Any
+    distance: Any
+    date: Any
+    _extra: Optional[Dict[str, Any]]
+    _hash: Optional[int]
+
+    def __init__(self, items: Optional[Mapping[str, Any]] = None) -> None:
+        """Create pieces with the given items set."""
+        set_slot = object.__setattr__
+        set_slot(self, "_extra", None)
+        set_slot(self, "_hash", None)
+        if items is not None:
+            for name, value in items.items():
+                if name in PIECES_SLOTS:
+                    set_slot(self, PIECES_SLOTS[name], value)
+                else:
+                    self[name] = value
+
+    def __setattr__(self, slot: str, value: Any) -> None:
+        """Set a slot, forgetting the hash of the old items."""
+        object.__setattr__(self, slot, value)
+        if slot != "_hash":
+            object.__setattr__(self, "_hash", None)
+
+    def __delattr__(self, slot: str) -> None:
+        """Unset a slot, forgetting the hash of the old items."""
+        object.__delattr__(self, slot)
+        object.__setattr__(self, "_hash", None)
+
+    def __getitem__(self, name: str) -> Any:
+        """Return the item name, raising KeyError if it isn't set."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            if self._extra is None:
+                raise KeyError(name)
+            return self._extra[name]
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        """Set the item name."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is not None:
+            setattr(self, slot, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[name] = value
+        self._hash = None
+
+    def __delitem__(self, name: str) -> None:
+        """Unset the item name."""
+        slot = PIECES_SLOTS.get(name)
+        try:
+            if slot is not None:
+                delattr(self, slot)
+            elif self._extra is None:
+                raise KeyError(name)
+            else:
+                del self._extra[name]
+                self._hash = None
+        except (KeyError, AttributeError):
+            raise KeyError(name) from None
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the names that are set, PIECES_FIELDS first."""
+        for name in PIECES_FIELDS:
+            if hasattr(self, PIECES_SLOTS[name]):
+                yield name
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        """Count the items that are set."""
+        return sum(1 for _ in self)
+
+    def __contains__(self, name: object) -> bool:
+        """Tell whether the item name is set."""
+        if not isinstance(name, str):
+            return False
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            return self._extra is not None and name in self._extra
+        return hasattr(self, slot)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Return the item name, or default if it isn't set."""
+        slot = PIECES_SLOTS.get(name)
+        if slot is None:
+            return default if self._extra is None else self._extra.get(
+                name, default)
+        return getattr(self, slot, default)
+
+    def key(self) -> Tuple[Tuple[str, Any], ...]:
+        """Return the set items as a tuple.
+
+        PIECES_FIELDS come first, in that order, then other names, sorted.
+        """
+        fields = tuple((name, getattr(self, slot))
+                       for name, slot in PIECES_SLOTS.items()
+                       if hasattr(self, slot))
+        if not self._extra:
+            return fields
+        return fields + tuple(sorted(self._extra.items(),
+                                     key=lambda item: item[0]))
+
+    def __hash__(self) -> int:
+        """Hash the items that are set."""
+        value = self._hash
+        if value is None:
+            value = self._hash = hash(self.key())
+        return value
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with other pieces, or with a dict of items."""
+        if isinstance(other, Pieces):
+            return self.key() == other.key()
+        if isinstance(other, Mapping):
+            return dict(self.key()) == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        """Show the items that are set."""
+        return "Pieces(%%r)" %% (dict(self.key()),)
+
+    def copy(self) -> "Pieces":
+        """Return a shallow copy of these pieces."""
+        return Pieces(self)
+
+    def to_json(self) -> List[Any]:
+        """Return the fields as a list, in PIECES_FIELDS order.
+
+        This is how pieces are stored in caches: unlike a dict, it doesn't
+        repeat the field names. Fields that aren't set are stored as None,
+        and other names aren't stored.
+        """
+        return [self.get(name) for name in PIECES_FIELDS]
+
+    @classmethod
+    def from_json(cls, data: Any) -> "Pieces":
+        """Rebuild pieces from to_json() data, or from a dict of fields.
+
+        Raises ValueError if data is neither.
+        """
+        if isinstance(data, list) and len(data) == len(PIECES_FIELDS):
+            data = dict(zip(PIECES_FIELDS, data))
+        if not isinstance(data, dict):
+            raise ValueError("not version pieces: %%r" %% (data,))
+        unknown = set(data) - set(PIECES_SLOTS)
+        if unknown:
+            raise ValueError("not version pieces: %%s"
+                             %% ", ".join(sorted(map(repr, unknown))))
+        return cls(data)
+
+
+def as_pieces(pieces: Mapping[str, Any]) -> Pieces:
+    """Return pieces as Pieces, copying a dict of pieces into new ones."""
+    return pieces if isinstance(pieces, Pieces) else Pieces(pieces)
+
+
+def versions_from_parentdir(
+    parentdir_prefix: str,
+    root: str,
+    verbose: bool,
+) -> Dict[str, Any]:
+    """Try to determine the version from the parent directory name.
+
+    Source tarballs conventionally unpack into a directory that includes both
+    the project name and a version string. We will also support searching up
+    two directory levels for an appropriately named parent directory
+    """
+    rootdirs = []
+
+    for _ in range(3):
+        dirname = os.path.basename(root)
+        if dirname.startswith(parentdir_prefix):
+            return {"version": dirname[len(parentdir_prefix):],
+                    "full-revisionid": None,
+                    "dirty": False, "error": None, "date": None}
+        rootdirs.append(root)
+        root = os.path.dirname(root)  # up a level
+
+    if verbose:
+        print("Tried directories %%s but none started with prefix %%s" %%
+              (str(rootdirs), parentdir_prefix))
+    raise NotThisMethod("rootdir doesn't start with parentdir_prefix")
+
+
+@register_vcs_handler("git", "get_keywords")
+def git_get_keywords(versionfile_abs: str) -> Dict[str, str]:
+    """Extract version information from the given file."""
+    # the code embedded in _version.py can just fetch the value of these
+    # keywords. When used from setup.py, we don't want to import _version.py,
+    # so we do it with a regexp instead. This function is not used from
+    # _version.py.
+    keywords: Dict[str, str] = {}
+    try:
+        with open(versionfile_abs, "r") as fobj:
+            for line in fobj:
+                if line.strip().startswith("git_refnames ="):
+                    mo = re.search(r'=\s*"(.*)"', line)
+                    if mo:
+                        keywords["refnames"] = mo.group(1)
+                if line.strip().startswith("git_full ="):
+                    mo = re.search(r'=\s*"(.*)"', line)
+                    if mo:
+                        keywords["full"] = mo.group(1)
+                if line.strip().startswith("git_date ="):
+                    mo = re.search(r'=\s*"(.*)"', line)
+                    if mo:
+                        keywords["date"] = mo.group(1)
+    except OSError:
+        pass
+    return keywords
+
+
+@register_vcs_handler("git", "keywords")
+def git_versions_from_keywords(
+    keywords: Dict[str, str],
+    tag_prefix: str,
+    verbose: bool,
+) -> Dict[str, Any]:
+    """Get version information from git keywords."""
+    if "refnames" not in keywords:
+        raise NotThisMethod("Short version file found")
+    date = keywords.get("date")
+    if date is not None:
+        # Use only the last line.  Previous lines may contain GPG signature
+        # information.
+        date = date.splitlines()[-1]
+
+        # git-2.2.0 added "%%cI", which expands to an ISO-8601 -compliant
+        # datestamp. However we prefer "%%ci" (which expands to an "ISO-8601
+        # -like" string, which we must then edit to make compliant), because
+        # it's been around since git-1.5.3, and it's too difficult to
+        # discover which version we're using, or to work around using an
+        # older one.
+        date = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+    refnames = keywords["refnames"].strip()
+    if refnames.startswith("$Format"):
+        if verbose:
+            print("keywords are unexpanded, not using")
+        raise NotThisMethod("unexpanded keywords, not a git-archive tarball")
+    refs = {r.strip() for r in refnames.strip("()").split(",")}
+    # starting in git-1.8.3, tags are listed as "tag: foo-1.0" instead of
+    # just "foo-1.0". If we see a "tag: " prefix, prefer those.
+    TAG = "tag: "
+    tags = {r[len(TAG):] for r in refs if r.startswith(TAG)}
+    if not tags:
+        # Either we're using git < 1.8.3, or there really are no tags. We use
+        # a heuristic: assume all version tags have a digit. The old git %%d
+        # expansion behaves like git log --decorate=short and strips out the
+        # refs/heads/ and refs/tags/ prefixes that would let us distinguish
+        # between branches and tags. By ignoring refnames without digits, we
+        # filter out many common branch names like "release" and
+        # "stabilization", as well as "HEAD" and "master".
+        tags = {r for r in refs if re.search(r'\d', r)}
+        if verbose:
+            print("discarding '%%s', no digits" %% ",".join(refs - tags))
+    if verbose:
+        print("likely tags: %%s" %% ",".join(sorted(tags)))
+    for ref in sorted(tags):
+        # sorting will prefer e.g. "2.0" over "2.0rc1"
+        if ref.startswith(tag_prefix):
+            r = ref[len(tag_prefix):]
+            # Filter out refs that exactly match prefix or that don't start
+            # with a number once the prefix is stripped (mostly a concern
+            # when prefix is '')
+            if not re.match(r'\d', r):
+                continue
+            if verbose:
+                print("picking %%s" %% r)
+            return {"version": r,
+                    "full-revisionid": keywords["full"].strip(),
+                    "dirty": False, "error": None,
+                    "date": date}
+    # no suitable tags, so version is "0+unknown", but full hex is still there
+    if verbose:
+        print("no suitable tags, using unknown + full revision id")
+    return {"version": "0+unknown",
+            "full-revisionid": keywords["full"].strip(),
+            "dirty": False, "error": "no suitable tags", "date": None}
+
+
+# distances counted over path scopes, by (root, tag, HEAD, scope)
+SCOPED_DISTANCE_MEMO: Dict[Tuple[str, Optional[str], str, Tuple[str, ...]],
+                           int] = {}
+# the most branches passed to 'git branch --contains --list'
+GIT_BRANCH_LIST_MAX = 100
+
+
+@register_vcs_handler("git", "pieces_from_vcs")
+def git_pieces_from_vcs(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    runner: Callable = run_command,
+    combine_queries: bool = False,
+    fields: Optional[AbstractSet[str]] = None,
+    dirty_from: Optional[Callable[[str], bool]] = None,
+    scope: Optional[List[str]] = None,
+    line_runner: Optional[Callable] = None,
+) -> Pieces:
+    """Get version from 'git describe' in the root of the source tree.
+
+    This only gets called if the git-archive 'subst' keywords were *not*
+    expanded, and _version.py hasn't already been rewritten with a short
+    version string, meaning we're inside a checked out source tree.
+
+    With combine_queries, HEAD's revision id, commit date and branch are
+    read by a single 'git log' instead of one git process each. If fields
+    is given, pieces not named in it (see render.style_fields()) may be left
+    as None instead of running the git commands needed to compute them.
+    If dirty_from is given (e.g. git_dirty_from_index()), it is called with
+    HEAD's revision id to compute the dirty flag, instead of letting 'git
+    describe --dirty' refresh the index and compare every file. With
+    scope, a list of paths relative to root, the distance only counts the
+    commits since the tag which changed files below those paths.
+    line_runner (by default run_command_lines(), or the output of runner
+    split into lines if runner was given) streams the output of 'git branch
+    --contains', which is only read until it lists master. It only has to
+    look at the branches listed by git_branches_to_check().
+    """
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+
+    # GIT_DIR can interfere with correct operation of Versioneer.
+    # It may be intended to be passed to the Versioneer-versioned project,
+    # but that should not change where we get our version from.
+    env = os.environ.copy()
+    env.pop("GIT_DIR", None)
+    if line_runner is None:
+        if runner is run_command:
+            line_runner = run_command_lines
+        else:
+            line_runner = functools.partial(git_lines_from_runner, runner)
+    runner = functools.partial(runner, env=env)
+    line_runner = functools.partial(line_runner, env=env)
+
+    date: Optional[str] = None
+    if combine_queries:
+        # %%D lists the refs pointing at HEAD, e.g. "HEAD -> refs/heads/master,
+        # tag: refs/tags/1.0" (or "HEAD, refs/heads/master" when detached).
+        head_out, rc = runner(GITS, [
+            "log", "-1", "--decorate=full", "--format=%%H%%x00%%ci%%x00%%D", "HEAD"
+        ], cwd=root, hide_stderr=not verbose)
+        if rc != 0 or head_out is None:
+            if verbose:
+                print("Directory %%s not under git control" %% root)
+            raise NotThisMethod("'git log' returned error")
+        # Use only the last line.  Previous lines may contain GPG signature
+        # information.
+        full_out, date, refs = head_out.splitlines()[-1].split("\0")
+    else:
+        _, rc = runner(GITS, ["rev-parse", "--git-dir"], cwd=root,
+                       hide_stderr=not verbose)
+        if rc != 0:
+            if verbose:
+                print("Directory %%s not under git control" %% root)
+            raise NotThisMethod("'git rev-parse --git-dir' returned error")
+
+    # if there is a tag matching tag_prefix, this yields TAG-NUM-gHEX[-dirty]
+    # if there isn't one, this yields HEX[-dirty] (no NUM)
+    describe_out, rc = runner(GITS, [
+        "describe", "--tags"] + ([] if dirty_from else ["--dirty"]) + [
+        "--always", "--long", "--match", f"{tag_prefix}[[:digit:]]*"
+    ], cwd=root)
+    # --long was added in git-1.5.5
+    if describe_out is None:
+        raise NotThisMethod("'git describe' failed")
+    describe_out = describe_out.strip()
+    if not combine_queries and (fields is None or "date" in fields):
+        # the revision id and the commit date, from a single git process
+        out, rc = runner(GITS, ["show", "-s", "--format=%%H%%n%%ci", "HEAD"],
+                         cwd=root)
+        if out is None or len(out.splitlines()) < 2:
+            raise NotThisMethod("'git show' failed")
+        # Use only the last lines.  Previous lines may contain GPG signature
+        # information.
+        full_out, date = out.splitlines()[-2:]
+    elif not combine_queries:
+        full_out, rc = runner(GITS, ["rev-parse", "HEAD"], cwd=root)
+        if full_out is None:
+            raise NotThisMethod("'git rev-parse' failed")
+    full_out = full_out.strip()
+
+    pieces = Pieces()
+    pieces["long"] = full_out
+    pieces["short"] = full_out[:7]  # maybe improved later
+    pieces["error"] = None
+
+    branch_name: Optional[str]
+    if fields is not None and "branch" not in fields:
+        branch_name = None
+    elif combine_queries:
+        branch_name = "HEAD"
+        for ref in refs.split(","):
+            if ref.strip().startswith("HEAD -> refs/heads/"):
+                branch_name = ref.strip()[len("HEAD -> refs/heads/"):]
+    else:
+        branch_name, rc = runner(GITS, ["rev-parse", "--abbrev-ref", "HEAD"],
+                                 cwd=root)
+        # --abbrev-ref was added in git-1.6.3
+        if rc != 0 or branch_name is None:
+            raise NotThisMethod("'git rev-parse --abbrev-ref' returned error")
+    if branch_name is not None:
+        branch_name = branch_name.strip()
+
+    if branch_name == "HEAD":
+        # If we aren't exactly on a branch, pick a branch which represents
+        # the current commit. Branches whose tip is the current commit are
+        # cheap to find, so start with those: 'git branch --contains' walks
+        # the history of every local branch it looks at. If all else fails,
+        # we are on a branchless commit.
+        tips: List[str] = []
+        if combine_queries:
+            tips = sorted(ref.strip()[len("refs/heads/"):]
+                          for ref in refs.split(",")
+                          if ref.strip().startswith("refs/heads/"))
+        names = tips
+        if not combine_queries or (tips and "master" not in tips):
+            # all the branches, to see which are sorted before the tips
+            heads, rc = runner(GITS, ["for-each-ref",
+                                      "--format=%%(objectname) %%(refname)",
+                                      "refs/heads/"], cwd=root)
+            names, tips = [], []
+            if rc == 0 and heads is not None:
+                names, tips = git_parse_branch_heads(heads, full_out)
+
+        branches = list(tips)
+        check = git_branches_to_check(names, tips)
+        if check != []:
+            # --contains was added in git-1.5.4
+            try:
+                with contextlib.closing(line_runner(
+                        GITS, git_branch_contains_args(check),
+                        cwd=root)) as lines:
+                    for branch in git_iter_branch_contains(lines):
+                        branches.append(branch)
+                        if branch == "master":
+                            break  # git_pick_branch() needs no others
+            except OSError:
+                raise NotThisMethod("'git branch --contains' returned error")
+        branch_name = git_pick_branch(sorted(set(branches)))
+
+    pieces["branch"] = branch_name
+
+    pieces.update(git_parse_describe(describe_out, tag_prefix, verbose))
+    if dirty_from is not None:
+        pieces["dirty"] = dirty_from(full_out)
+    if pieces["error"]:
+        return pieces
+
+    if fields is not None and "distance" not in fields:
+        pass
+    elif scope is not None:
+        tag = pieces["closest-tag"]
+        key = (os.path.abspath(root), tag, full_out, tuple(scope))
+        if key not in SCOPED_DISTANCE_MEMO:
+            revs = full_out
+            if tag is not None:
+                revs = f"refs/tags/{tag_prefix}{tag}..{full_out}"
+            out, rc = runner(GITS, ["rev-list", "--count", revs, "--"] + scope,
+                             cwd=root)
+            if rc != 0 or out is None:
+                raise NotThisMethod("'git rev-list --count' returned error")
+            SCOPED_DISTANCE_MEMO[key] = int(out)
+        pieces["distance"] = SCOPED_DISTANCE_MEMO[key]
+    elif pieces["closest-tag"] is None:
+        # HEX: no tags
+        out, rc = runner(GITS, ["rev-list", "--count", "HEAD"], cwd=root)
+        # --count was added in git-1.7.2
+        if rc != 0 or out is None:
+            raise NotThisMethod("'git rev-list --count' returned error")
+        pieces["distance"] = int(out)  # total number of commits
+
+    # commit date: see ISO-8601 comment in git_versions_from_keywords()
+    if date is not None:
+        date = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+    pieces["date"] = date
+
+    return pieces
+
+
+def git_lines_from_runner(runner: Callable, commands: List[str],
+                          args: List[str],
+                          **kwargs: Any) -> Generator[str, None, None]:
+    """Stream the output of a run_command()-like runner, split into lines."""
+    out, rc = runner(commands, args, **kwargs)
+    if rc != 0 or out is None:
+        raise OSError("%%s returned error" %% (commands[:1] + args))
+    yield from out.split("\n")
+
+
+def git_iter_branch_contains(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the branch names listed by 'git branch --contains'."""
+    for i, line in enumerate(lines):
+        # Skip the first line if we're running detached (and the empty
+        # output of a --list that matched nothing)
+        branch = line.strip()
+        if (i == 0 and "(" in branch) or not branch:
+            continue
+        # Strip off the leading "* " (or "+ " for other worktrees) from the
+        # list of branches; the runner may have stripped the "  " already.
+        yield branch[2:] if branch[:2] in ("* ", "+ ") else branch
+
+
+def git_parse_branch_contains(out: str) -> List[str]:
+    """Get the branch names listed by 'git branch --contains'."""
+    return list(git_iter_branch_contains(out.split("\n")))
+
+
+def git_parse_branch_heads(out: str, head: str) -> Tuple[List[str], List[str]]:
+    """Get all branch names, and those whose tip is head.
+
+    out is the output of 'git for-each-ref --format="%%(objectname)
+    %%(refname)" refs/heads/'.
+    """
+    names, tips = [], []
+    for line in out.splitlines():
+        sha, _, ref = line.partition(" ")
+        names.append(ref[len("refs/heads/"):])
+        if sha == head:
+            tips.append(names[-1])
+    return names, tips
+
+
+def git_branches_to_check(names: List[str],
+                          tips: List[str]) -> Optional[List[str]]:
+    """Get the branches that 'git branch --contains' still has to look at.
+
+    The branches in tips point at HEAD, so they contain it, but master and
+    the branches sorted before them would be picked over them if they
+    contained HEAD too. None stands for all of the branches (without tips).
+    """
+    if not tips:
+        return None
+    if "master" in tips:
+        return []
+    first = min(tips)
+    return sorted(name for name in names if name < first or name == "master")
+
+
+def git_branch_contains_args(check: Optional[List[str]]) -> List[str]:
+    """Get the 'git branch --contains' arguments for git_branches_to_check()."""
+    if check is None or len(check) > GIT_BRANCH_LIST_MAX:
+        return ["branch", "--contains"]
+    return ["branch", "--contains", "HEAD", "--list"] + check
+
+
+def git_pick_branch(branches: List[str]) -> Optional[str]:
+    """Pick the branch which represents the current commit."""
+    if "master" in branches:
+        return "master"
+    if not branches:
+        return None
+    # Pick the first branch that is returned. Good or bad.
+    return branches[0]
+
+
+def git_parse_describe(describe_out: str, tag_prefix: str,
+                       verbose: bool) -> Dict[str, Any]:
+    """Get the pieces found in the output of 'git describe'.
+
+    This returns "dirty", "closest-tag", "distance" and "short", or "dirty"
+    and "error" if the output can't be used. For an untagged commit,
+    "closest-tag" and "distance" are None and "short" is not included.
+    """
+    pieces: Dict[str, Any] = {}
+
+    # parse describe_out. It will be like TAG-NUM-gHEX[-dirty] or HEX[-dirty]
+    # TAG might have hyphens.
+    git_describe = describe_out
+
+    # look for -dirty suffix
+    dirty = git_describe.endswith("-dirty")
+    pieces["dirty"] = dirty
+    if dirty:
+        git_describe = git_describe[:git_describe.rindex("-dirty")]
+
+    # now we have TAG-NUM-gHEX or HEX
+
+    if "-" in git_describe:
+        # TAG-NUM-gHEX
+        mo = re.search(r'^(.+)-(\d+)-g([0-9a-f]+)$', git_describe)
+        if not mo:
+            # unparsable. Maybe git-describe is misbehaving?
+            pieces["error"] = ("unable to parse git-describe output: '%%s'"
+                               %% describe_out)
+            return pieces
+
+        # tag
+        full_tag = mo.group(1)
+        if not full_tag.startswith(tag_prefix):
+            if verbose:
+                fmt = "tag '%%s' doesn't start with prefix '%%s'"
+                print(fmt %% (full_tag, tag_prefix))
+            pieces["error"] = ("tag '%%s' doesn't start with prefix '%%s'"
+                               %% (full_tag, tag_prefix))
+            return pieces
+        pieces["closest-tag"] = full_tag[len(tag_prefix):]
+
+        # distance: number of commits since tag
+        pieces["distance"] = int(mo.group(2))
+
+        # commit: short hex revision ID
+        pieces["short"] = mo.group(3)
+
+    else:
+        # HEX: no tags
+        pieces["closest-tag"] = None
+        pieces["distance"] = None
+
+    return pieces
+
+
+# object types in pack entry headers
+PACK_OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+PACK_OFS_DELTA = 6
+PACK_REF_DELTA = 7
+
+# how many resolved delta bases each PackFile remembers
+PACK_BASE_CACHE_SIZE = 256
+
+
+def delta_size(delta: bytes, pos: int) -> Tuple[int, int]:
+    """Decode a size in a delta header: (size, position after it)."""
+    size = shift = 0
+    while True:
+        byte = delta[pos]
+        pos += 1
+        size |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its delta base and the delta instructions."""
+    base_size, pos = delta_size(delta, 0)
+    if base_size != len(base):
+        raise NotThisMethod("delta base has the wrong size")
+    size, pos = delta_size(delta, pos)
+    out = bytearray()
+    while pos < len(delta):
+        cmd = delta[pos]
+        pos += 1
+        if cmd & 0x80:
+            # copy from the base: bits 0-3 say which offset bytes follow,
+            # bits 4-6 which length bytes
+            offset = length = 0
+            for i in range(4):
+                if cmd & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if cmd & (0x10 << i):
+                    length |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (length or 0x10000)]
+        elif cmd:
+            # insert the next cmd bytes of the delta
+            out += delta[pos:pos + cmd]
+            pos += cmd
+        else:
+            raise NotThisMethod("invalid delta instruction")
+    if len(out) != size:
+        raise NotThisMethod("delta produced the wrong size")
+    return bytes(out)
+
+
+class PackFile:
+    """Read-only access to a pack and its (version 2) .idx file.
+
+    Both files are mmap()ed: lookups binary-search the mapped index, and
+    objects are inflated straight from slices of the mapped pack, so
+    neither file is ever read as a whole.
+    """
+
+    def __init__(self, idx_filename: str) -> None:
+        """Map the index; the pack is mapped when first needed."""
+        # only needed once objects are read from packs
+        import mmap
+        import struct
+        with open(idx_filename, "rb") as fobj:
+            self.idx = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.idx[:8] != b"\377tOc\0\0\0\2":
+            raise NotThisMethod("unsupported pack index %%s" %% idx_filename)
+        self.fanout = struct.unpack(">256I", self.idx[8:1032])
+        self.count = self.fanout[255]
+        self.filename = idx_filename[:-len(".idx")] + ".pack"
+        self.pack: Optional[mmap.mmap] = None
+        # offset -> (type, contents) of recently resolved delta bases
+        self.bases: Dict[int, Tuple[str, bytes]] = {}
+
+    def shas(self, first: int) -> Iterator[str]:
+        """Yield the ids of the objects whose first byte is first."""
+        for i in range(self.fanout[first - 1] if first else 0,
+                       self.fanout[first]):
+            yield self.idx[1032 + 20 * i:1052 + 20 * i].hex()
+
+    def find(self, sha: str) -> Optional[int]:
+        """Look up the offset of an object in the pack, or None."""
+        binsha = bytes.fromhex(sha)
+        lo = self.fanout[binsha[0] - 1] if binsha[0] else 0
+        hi = self.fanout[binsha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self.idx[1032 + 20 * mid:1052 + 20 * mid]
+            if found < binsha:
+                lo = mid + 1
+            elif found > binsha:
+                hi = mid
+            else:
+                pos = 1032 + 24 * self.count + 4 * mid
+                offset = int.from_bytes(self.idx[pos:pos + 4], "big")
+                if offset & 0x80000000:
+                    pos = 1032 + 28 * self.count + 8 * (offset & 0x7fffffff)
+                    offset = int.from_bytes(self.idx[pos:pos + 8], "big")
+                return offset
+        return None
+
+    def inflate(self, pos: int) -> bytes:
+        """Decompress the zlib stream starting at pos."""
+        assert self.pack is not None
+        import zlib
+        inflater = zlib.decompressobj()
+        parts = []
+        with memoryview(self.pack) as view:
+            while not inflater.eof:
+                chunk = view[pos:pos + 8192]
+                if not chunk:
+                    raise NotThisMethod("truncated pack %%s" %% self.filename)
+                parts.append(inflater.decompress(chunk))
+                pos += 8192
+        return b"".join(parts)
+
+    def read(self, offset: int,
+             read_object: Callable[[str], Tuple[str, bytes]]) -> Tuple[str, bytes]:
+        """Return the (type, contents) of the object at offset.
+
+        Deltas are resolved against their base at an earlier offset
+        (OFS_DELTA) or, for REF_DELTA, against the object read_object()
+        returns for the base's id, which may live in another pack.
+        """
+        if self.pack is None:
+            import mmap
+            with open(self.filename, "rb") as fobj:
+                self.pack = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.pack
+        deltas: List[Tuple[int, bytes]] = []
+        while True:
+            if offset in self.bases:
+                kind, body = self.bases[offset]
+                break
+            entry = offset
+            byte = data[offset]
+            kind_id = (byte >> 4) & 7
+            while byte & 0x80:  # the object's size, which we don't need
+                offset += 1
+                byte = data[offset]
+            offset += 1
+            if kind_id in PACK_OBJECT_TYPES:
+                kind, body = PACK_OBJECT_TYPES[kind_id], self.inflate(offset)
+                break
+            if kind_id == PACK_OFS_DELTA:
+                byte = data[offset]
+                distance = byte & 0x7f
+                while byte & 0x80:
+                    offset += 1
+                    byte = data[offset]
+                    distance = ((distance + 1) << 7) | (byte & 0x7f)
+                deltas.append((entry, self.inflate(offset + 1)))
+                offset = entry - distance
+            elif kind_id == PACK_REF_DELTA:
+                base = data[offset:offset + 20].hex()
+                deltas.append((entry, self.inflate(offset + 20)))
+                kind, body = read_object(base)
+                break
+            else:
+                raise NotThisMethod("unknown object type %%d in %%s"
+                                    %% (kind_id, self.filename))
+        for entry, delta in reversed(deltas):
+            body = apply_delta(body, delta)
+            if len(self.bases) >= PACK_BASE_CACHE_SIZE:
+                self.bases.clear()
+            self.bases[entry] = (kind, body)
+        return kind, body
+
+
+def find_packs(object_dirs: List[str]) -> List[PackFile]:
+    """Open the packs of the objects directories, in name order."""
+    packs = []
+    for objects in object_dirs:
+        pack_dir = os.path.join(objects, "pack")
+        try:
+            names = sorted(os.listdir(pack_dir))
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith(".idx"):
+                packs.append(PackFile(os.path.join(pack_dir, name)))
+    return packs
+
+
+@register_vcs_handler("git", "find_repo")
+def find_git_dir(root: str) -> Optional[Tuple[str, str]]:
+    """Find the .git directory (and its work tree) that root belongs to.
+
+    Like git itself, this searches root and then its parent directories.
+    Returns None if root is not inside a git checkout.
+    """
+    work_tree = os.path.abspath(root)
+    while True:
+        dot_git = os.path.join(work_tree, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git, work_tree
+        if os.path.isfile(dot_git):
+            # submodules and linked worktrees use a "gitdir: PATH" file
+            with open(dot_git) as fobj:
+                line = fobj.readline()
+            if not line.startswith("gitdir: "):
+                return None
+            git_dir = os.path.join(work_tree, line[len("gitdir: "):].strip())
+            return os.path.normpath(git_dir), work_tree
+        parent = os.path.dirname(work_tree)
+        if parent == work_tree:
+            return None
+        work_tree = parent
+
+
+def read_git_config(filename: str) -> Dict[str, str]:
+    """Read the "section.key" (or "section.subsection.key") settings we use.
+
+    This understands just enough of git's config syntax to find settings
+    like core.filemode. Keys are lowercased, the last value wins.
+    """
+    config: Dict[str, str] = {}
+    section = ""
+    try:
+        with open(filename) as fobj:
+            for line in fobj:
+                line = line.strip()
+                mo = re.match(r'\[\s*([\w.-]+)(?:\s+"(.*)")?\s*\]', line)
+                if mo:
+                    section = mo.group(1).lower()
+                    if mo.group(2) is not None:
+                        section += "." + mo.group(2)
+                    continue
+                if not line or line[0] in "#;" or not section:
+                    continue
+                key, _, value = line.partition("=")
+                value = value.split(" #")[0].split(" ;")[0].strip().strip('"')
+                config[section + "." + key.strip().lower()] = value or "true"
+    except OSError:
+        pass
+    return config
+
+
+def read_git_configs(git_dir: str) -> Dict[str, str]:
+    """Read the settings that apply to git_dir, like read_git_config().
+
+    The system, user and repository config files are read in git's order,
+    so later ones win, and GIT_CONFIG_COUNT settings in the environment
+    override them all. Include directives are not followed.
+    """
+    home = os.path.expanduser("~")
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    filenames = []
+    if not os.environ.get("GIT_CONFIG_NOSYSTEM"):
+        filenames.append(os.environ.get("GIT_CONFIG_SYSTEM", "/etc/gitconfig"))
+    if "GIT_CONFIG_GLOBAL" in os.environ:
+        filenames.append(os.environ["GIT_CONFIG_GLOBAL"])
+    else:
+        filenames += [os.path.join(xdg, "git", "config"),
+                      os.path.join(home, ".gitconfig")]
+    filenames.append(os.path.join(git_dir, "config"))
+    config: Dict[str, str] = {}
+    for filename in filenames:
+        config.update(read_git_config(filename))
+    try:
+        count = int(os.environ.get("GIT_CONFIG_COUNT", "0"))
+    except ValueError:
+        count = 0
+    for i in range(count):
+        key = os.environ.get("GIT_CONFIG_KEY_%%d" %% i, "")
+        section, _, name = key.rpartition(".")
+        first, dot, subsection = section.partition(".")
+        if section:
+            key = first.lower() + dot + subsection + "." + name.lower()
+            config[key] = os.environ.get("GIT_CONFIG_VALUE_%%d" %% i) or "true"
+    return config
+
+
+TRUE_VALUES = ("true", "yes", "on", "1")
+FALSE_VALUES = ("false", "no", "off", "0")
+
+# attributes that make git convert files between the index and the work tree
+CONVERTING_ATTRIBUTES = ("text", "eol", "crlf", "filter", "ident",
+                         "working-tree-encoding")
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode one of git's "offset" varints, returning (value, new_pos)."""
+    c = data[pos]
+    value = c & 0x7f
+    pos += 1
+    while c & 0x80:
+        c = data[pos]
+        value = ((value + 1) << 7) | (c & 0x7f)
+        pos += 1
+    return value, pos
+
+
+class IndexEntry(NamedTuple):
+    """One entry of the .git/index file."""
+
+    path: bytes
+    mode: int
+    sha: str
+    stage: int
+    skip: bool  # assume-valid or skip-worktree: don't look at the file
+    ctime: int
+    mtime: int
+    mtime_ns: int
+    size: int
+
+
+def read_git_index(filename: str) -> Tuple[List[IndexEntry], Optional[str]]:
+    """Parse a .git/index file.
+
+    Returns the entries and the tree id recorded for the whole index by the
+    cache-tree extension (None if that is missing or invalidated).
+    """
+    import struct
+    with open(filename, "rb") as fobj:
+        data = fobj.read()
+    signature, version, count = struct.unpack(">4sII", data[:12])
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise NotThisMethod("unsupported index format")
+    entries = []
+    pos = 12
+    path = b""
+    for _ in range(count):
+        (ctime, _, mtime, mtime_ns, _, _, mode, _, _, size, sha,
+         flags) = struct.unpack(">10I20sH", data[pos:pos + 62])
+        start = pos
+        pos += 62
+        skip = bool(flags & 0x8000)
+        if flags & 0x4000 and version >= 3:
+            extended, = struct.unpack(">H", data[pos:pos + 2])
+            skip = skip or bool(extended & 0x4000)
+            pos += 2
+        if version == 4:
+            # paths are prefix-compressed against the previous entry
+            strip, pos = decode_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = path[:len(path) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            pos = start + ((end - start + 8) & ~7)
+        entries.append(IndexEntry(path, mode, sha.hex(), (flags >> 12) & 3,
+                                  skip, ctime, mtime, mtime_ns, size))
+    tree = None
+    while pos + 8 <= len(data) - 20:
+        ext, ext_size = struct.unpack(">4sI", data[pos:pos + 8])
+        ext_data = data[pos + 8:pos + 8 + ext_size]
+        pos += 8 + ext_size
+        if ext in (b"link", b"sdir"):
+            raise NotThisMethod("split and sparse indexes are not supported")
+        if ext == b"TREE":
+            # the first record describes the root: "\0COUNT SUBTREES\nSHA"
+            header, _, rest = ext_data[1:].partition(b"\n")
+            if int(header.split()[0]) >= 0:
+                tree = rest[:20].hex()
+    return entries, tree
+
+
+def blob_sha(data: bytes) -> str:
+    """Compute the id git would give to a blob with the given contents."""
+    import hashlib
+    return hashlib.sha1(b"blob %%d\0" %% len(data) + data).hexdigest()
+
+
+# the number of index entries is_dirty() checks per task of its thread pool
+DIRTY_CHUNK_SIZE = 256
+
+
+class DirtyCheck(NamedTuple):
+    """The checked-out files to compare with an index that matches HEAD."""
+
+    entries: List[IndexEntry]
+    index_mtime_ns: int
+    converting: bool
+
+
+def git_index_stat(git_dir: str) -> Optional[List[int]]:
+    """Get the inode, mtime and size of the index, or None if it's missing.
+
+    Git replaces the index (by renaming a new one into place) whenever it
+    changes, so this changes with it.
+    """
+    try:
+        st = os.stat(os.path.join(git_dir, "index"))
+    except OSError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+class GitCheckout:
+    """Read-only access to the refs, objects and index of a .git directory.
+
+    This is the part of GitDir that the version cache and the dirty check
+    of _version.py need. Anything it doesn't support raises NotThisMethod,
+    so the caller can fall back to running git.
+    """
+
+    def __init__(self, git_dir: str, work_tree: str) -> None:
+        """Check that we can read git_dir and set up the lookups."""
+        self.git_dir = git_dir
+        self.work_tree = work_tree
+        if os.path.exists(os.path.join(git_dir, "commondir")):
+            raise NotThisMethod("linked worktrees are not supported")
+        self.config = read_git_configs(git_dir)
+        if self.config.get("extensions.objectformat", "sha1") != "sha1":
+            raise NotThisMethod("only sha1 repositories are supported")
+        if self.config.get("extensions.refstorage", "files") != "files":
+            raise NotThisMethod("only the 'files' ref storage is supported")
+        if "core.worktree" in self.config:
+            raise NotThisMethod("core.worktree is not supported")
+        objects = os.path.join(git_dir, "objects")
+        self.object_dirs = [objects]
+        try:
+            with open(os.path.join(objects, "info", "alternates")) as fobj:
+                self.object_dirs += [os.path.join(objects, line.strip())
+                                     for line in fobj if line.strip()]
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(git_dir, "shallow")) as fobj:
+                self.shallow = {line.strip() for line in fobj}
+        except OSError:
+            self.shallow = set()
+        self.commits: Dict[str, Tuple[str, List[str], int, str]] = {}
+        self.packs: Optional[List[PackFile]] = None
+        self.packed: Optional[Dict[str, Tuple[str, Optional[str]]]] = None
+
+    def packed_refs(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Map refnames in packed-refs to (sha, peeled sha or None)."""
+        if self.packed is None:
+            self.packed = {}
+            try:
+                with open(os.path.join(self.git_dir, "packed-refs")) as fobj:
+                    lines = fobj.read().splitlines()
+            except OSError:
+                lines = []
+            if lines and lines[0].startswith("#") and " peeled" not in lines[0]:
+                raise NotThisMethod("packed-refs without peeled tags")
+            name = None
+            for line in lines:
+                if line.startswith("^") and name is not None:
+                    self.packed[name] = (self.packed[name][0], line[1:])
+                elif line and not line.startswith("#"):
+                    sha, name = line.split(" ", 1)
+                    self.packed[name] = (sha, None)
+        return self.packed
+
+    def resolve_ref(self, name: str) -> Optional[str]:
+        """Return the sha a (possibly symbolic) ref points to, or None."""
+        for _ in range(5):
+            try:
+                with open(os.path.join(self.git_dir, name)) as fobj:
+                    value = fobj.read().strip()
+            except OSError:
+                packed = self.packed_refs().get(name)
+                return packed[0] if packed else None
+            if not value.startswith("ref: "):
+                return value
+            name = value[len("ref: "):]
+        return None
+
+    def refs(self, prefix: str) -> Dict[str, str]:
+        """Map the names of all refs under prefix (e.g. refs/tags/) to shas."""
+        refs = {name: sha for name, (sha, _) in self.packed_refs().items()
+                if name.startswith(prefix)}
+        top = os.path.join(self.git_dir, prefix)
+        for dirpath, _, filenames in os.walk(top):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = prefix + os.path.relpath(path, top).replace(os.sep, "/")
+                sha = self.resolve_ref(name)
+                if sha:
+                    refs[name] = sha
+        return refs
+
+    def find_packs(self) -> List[PackFile]:
+        """List the packs of all object directories."""
+        if self.packs is None:
+            self.packs = find_packs(self.object_dirs)
+        return self.packs
+
+    def find_packed(self, sha: str) -> Optional[Tuple[PackFile, int]]:
+        """Look up the (pack, offset) of an object in the pack indexes."""
+        for pack in self.find_packs():
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack, offset
+        return None
+
+    def read_object(self, sha: str) -> Tuple[str, bytes]:
+        """Return the (type, contents) of an object."""
+        import zlib
+        for objects in self.object_dirs:
+            try:
+                with open(os.path.join(objects, sha[:2], sha[2:]), "rb") as fobj:
+                    raw = zlib.decompress(fobj.read())
+            except OSError:
+                continue
+            header, _, body = raw.partition(b"\0")
+            return header.split(b" ")[0].decode(), body
+        found = self.find_packed(sha)
+        if found is None:
+            raise NotThisMethod("object %%s not found" %% sha)
+        pack, offset = found
+        return pack.read(offset, self.read_object)
+
+    def read_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Return the (tree, parents, timestamp, timezone) of a commit."""
+        if sha not in self.commits:
+            self.commits[sha] = self.parse_commit(sha)
+        return self.commits[sha]
+
+    def parse_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Read the (tree, parents, timestamp, timezone) from a commit object."""
+        kind, body = self.read_object(sha)
+        if kind != "commit":
+            raise NotThisMethod("%%s is a %%s, not a commit" %% (sha, kind))
+        headers = body.split(b"\n\n", 1)[0].decode("utf-8", "replace")
+        tree, when, tz = "", 0, "+0000"
+        parents: List[str] = []
+        for line in headers.splitlines():
+            key, _, value = line.partition(" ")
+            if key == "tree":
+                tree = value
+            elif key == "parent" and sha not in self.shallow:
+                parents.append(value)
+            elif key == "committer":
+                when_s, tz = value.rsplit(" ", 2)[1:]
+                when = int(when_s)
+        return tree, parents, when, tz
+
+    def tree_entries(self, sha: str,
+                     prefix: bytes = b"") -> Dict[bytes, Tuple[int, str]]:
+        """Recursively list a tree object as {path: (mode, sha)}."""
+        kind, data = self.read_object(sha)
+        entries = {}
+        pos = 0
+        while pos < len(data):
+            space = data.index(b" ", pos)
+            nul = data.index(b"\0", space)
+            mode = int(data[pos:space], 8)
+            path = prefix + data[space + 1:nul]
+            entry_sha = data[nul + 1:nul + 21].hex()
+            pos = nul + 21
+            if mode == 0o40000:
+                entries.update(self.tree_entries(entry_sha, path + b"/"))
+            else:
+                if stat.S_ISREG(mode):
+                    mode = 0o100755 if mode & 0o111 else 0o100644
+                entries[path] = (mode, entry_sha)
+        return entries
+
+    def converts_files(self, entries: List[IndexEntry]) -> bool:
+        """Tell whether git may convert files between the index and work tree.
+
+        With end-of-line conversion (core.autocrlf, core.eol) or one of the
+        CONVERTING_ATTRIBUTES in a .gitattributes file (among entries), in
+        .git/info/attributes or in core.attributesFile, git compares the
+        converted contents of a file with the index. Attributes that turn
+        conversion off ("-text", "!eol") don't count.
+        """
+        if (self.config.get("core.autocrlf", "false").lower() not in FALSE_VALUES
+                or "core.eol" in self.config):
+            return True
+        xdg = (os.environ.get("XDG_CONFIG_HOME")
+               or os.path.join(os.path.expanduser("~"), ".config"))
+        filenames = [
+            os.path.join(self.git_dir, "info", "attributes"),
+            os.path.expanduser(self.config.get(
+                "core.attributesfile", os.path.join(xdg, "git", "attributes"))),
+        ]
+        filenames += [os.path.join(self.work_tree, os.fsdecode(entry.path))
+                      for entry in entries if entry.path == b".gitattributes"
+                      or entry.path.endswith(b"/.gitattributes")]
+        for filename in filenames:
+            try:
+                with open(filename, "rb") as fobj:
+                    lines = fobj.read().decode("utf-8", "replace").splitlines()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                words = line.split()
+                if not words or words[0].startswith("#"):
+                    continue
+                for attr in words[1:]:
+                    if (attr[0] not in "-!"
+                            and attr.split("=")[0] in CONVERTING_ATTRIBUTES):
+                        return True
+        return False
+
+    def is_modified(self, entry: IndexEntry, index_mtime_ns: int,
+                    converting: bool = False) -> bool:
+        """Tell whether the checked-out file differs from its index entry.
+
+        With converting (see converts_files()), files that would have to
+        be compared by content raise NotThisMethod instead.
+        """
+        path = os.path.join(self.work_tree, os.fsdecode(entry.path))
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return True
+        if entry.mode == 0o120000:
+            if not stat.S_ISLNK(st.st_mode):
+                return True
+        elif not stat.S_ISREG(st.st_mode):
+            return True
+        elif (self.config.get("core.filemode", "true").lower() in TRUE_VALUES
+              and (st.st_mode ^ entry.mode) & 0o100):
+            return True
+        if st.st_size & 0xffffffff != entry.size:
+            return True
+        entry_mtime_ns = entry.mtime * 10**9 + entry.mtime_ns
+        if (st.st_mtime_ns == entry_mtime_ns and int(st.st_ctime) == entry.ctime
+                and entry_mtime_ns < index_mtime_ns):
+            return False
+        # The stat data differs, or the file was modified too close to the
+        # index being written to trust it ("racy git"): compare contents.
+        if entry.mode == 0o120000:
+            return blob_sha(os.fsencode(os.readlink(path))) != entry.sha
+        if converting:
+            raise NotThisMethod("%%s may be converted by git" %% path)
+        with open(path, "rb") as fobj:
+            return blob_sha(fobj.read()) != entry.sha
+
+    def index_check(self, head: str, scope: Optional[List[bytes]] = None
+                    ) -> Optional[DirtyCheck]:
+        """Compare the index with the HEAD commit, the first half of is_dirty().
+
+        Returns None if they differ (so the checkout is dirty), else what
+        files_modified() needs to compare the checked-out files. This only
+        depends on HEAD and the index, so it can be reused while neither
+        changes (see git_index_stat()).
+        """
+        index = os.path.join(self.git_dir, "index")
+        try:
+            entries, tree = read_git_index(index)
+            index_mtime_ns = os.stat(index).st_mtime_ns
+        except OSError:
+            raise NotThisMethod("unable to read %%s" %% index)
+        converting = self.converts_files(entries)
+
+        def in_scope(path: bytes) -> bool:
+            return scope is None or any(
+                path == prefix or path.startswith(prefix + b"/")
+                for prefix in scope)
+
+        if scope is not None:
+            entries = [entry for entry in entries if in_scope(entry.path)]
+        if any(entry.mode == 0o160000 for entry in entries):
+            raise NotThisMethod("submodules are not supported")
+        if any(entry.stage for entry in entries):
+            return None
+        head_tree = self.read_commit(head)[0]
+        if tree != head_tree:
+            indexed = {entry.path: (entry.mode, entry.sha) for entry in entries}
+            committed = {path: entry for path, entry
+                         in self.tree_entries(head_tree).items()
+                         if in_scope(path)}
+            if indexed != committed:
+                return None
+        return DirtyCheck([entry for entry in entries if not entry.skip],
+                          index_mtime_ns, converting)
+
+    def files_modified(self, check: DirtyCheck,
+                       max_workers: Optional[int] = None) -> bool:
+        """Compare the checked-out files, the second half of is_dirty().
+
+        The files of large trees are stat()ed on a pool of up to
+        max_workers threads.
+        """
+        def any_modified(chunk: List[IndexEntry]) -> bool:
+            return any(self.is_modified(entry, check.index_mtime_ns,
+                                        check.converting)
+                       for entry in chunk)
+
+        checked = check.entries
+        chunks = [checked[i:i + DIRTY_CHUNK_SIZE]
+                  for i in range(0, len(checked), DIRTY_CHUNK_SIZE)]
+        if len(chunks) <= 1 or max_workers == 1:
+            return any_modified(checked)
+        # only large trees get here, and concurrent.futures is slow to import
+        from concurrent.futures import ThreadPoolExecutor
+        # lstat() releases the GIL, so threads overlap the waits for the
+        # filesystem (which add up on network or cold filesystems)
+        pool = ThreadPoolExecutor(max_workers)
+        try:
+            return any(pool.map(any_modified, chunks))
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def is_dirty(self, head: str, scope: Optional[List[bytes]] = None,
+                 max_workers: Optional[int] = None) -> bool:
+        """Tell whether the index or work tree differ from the HEAD commit.
+
+        Files whose stat data doesn't match the index are compared by
+        content. If git would convert them first (see converts_files()),
+        this raises NotThisMethod instead, so that git decides. With
+        scope, a list of paths relative to the work tree, only files below
+        those paths are compared. The checked-out files of large trees are
+        stat()ed on a pool of up to max_workers threads.
+        """
+        check = self.index_check(head, scope)
+        return check is None or self.files_modified(check, max_workers)
+
+
+@register_vcs_handler("git", "dirty_from_index")
+def git_dirty_from_index(
+    root: str,
+    head: str,
+    scope: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    runner: Callable = run_command,
+) -> bool:
+    """Tell whether the checkout of root differs from head.
+
+    This answers like 'git describe --dirty', by comparing the stat data
+    cached in .git/index with the checked-out files instead of starting
+    git. With scope, a list of paths relative to root, only files below
+    those paths count, so that a project in a subdirectory isn't dirty
+    because of changes elsewhere in the repository. Repositories that
+    GitCheckout can't read are handed over to 'git status'.
+    """
+    import struct
+    import zlib
+    found = find_git_dir(root)
+    if found is None:
+        raise NotThisMethod("no .git directory found")
+    prefixes: Optional[List[bytes]] = None
+    if scope:
+        prefixes = []
+        for path in scope:
+            rel = os.path.relpath(os.path.join(os.path.abspath(root), path),
+                                  found[1])
+            if rel == os.curdir:
+                prefixes = None
+                break
+            prefixes.append(os.fsencode(rel.replace(os.sep, "/")))
+    try:
+        return GitCheckout(*found).is_dirty(head, prefixes, max_workers)
+    except (NotThisMethod, OSError, ValueError, IndexError, struct.error,
+            zlib.error) as e:
+        trace("fallback", name="dirty_from_index", root=root,
+              exception=type(e).__name__, message=str(e))
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+    env = os.environ.copy()
+    env.pop("GIT_DIR", None)
+    out, rc = runner(GITS, ["status", "--porcelain", "--untracked-files=no",
+                            "--"] + (scope or []), cwd=root, env=env)
+    if rc != 0 or out is None:
+        raise NotThisMethod("'git status' returned error")
+    return bool(out.strip())
+
+
+VERSION_CACHE_FILE = "versioneer-cache.json"
+# version 2 stores pieces as Pieces.to_json() lists
+VERSION_CACHE_FORMAT = 2
+
+
+def git_fingerprint(repo: GitCheckout) -> List[Any]:
+    """Describe the state of a repository that version pieces depend on.
+
+    This is the target of HEAD and the stat data of the files and
+    directories holding branches and tags, i.e. a few stat() calls. The
+    index and the checked-out files only matter for the dirty flag, which
+    git_pieces_from_cache() handles separately ('git describe --dirty'
+    rewrites the index anyway).
+    """
+    with open(os.path.join(repo.git_dir, "HEAD")) as fobj:
+        fingerprint: List[Any] = [fobj.read().strip(), repo.resolve_ref("HEAD")]
+    for name in ["packed-refs", "shallow"]:
+        try:
+            st = os.stat(os.path.join(repo.git_dir, name))
+            fingerprint.append([name, st.st_mtime_ns, st.st_size])
+        except OSError:
+            fingerprint.append([name, None, None])
+    # Refs are updated by renaming a lockfile into place, which also changes
+    # the mtime of the directory they are in.
+    for top in ["refs/heads", "refs/tags"]:
+        for dirpath, _, _ in os.walk(os.path.join(repo.git_dir, top)):
+            st = os.stat(dirpath)
+            fingerprint.append([os.path.relpath(dirpath, repo.git_dir),
+                                st.st_mtime_ns, st.st_size])
+    return fingerprint
+
+
+def read_version_cache(git_dir: str) -> Dict[str, Any]:
+    """Read the cache entries stored in git_dir, or {} if there are none."""
+    import json
+    try:
+        with open(os.path.join(git_dir, VERSION_CACHE_FILE)) as fobj:
+            cache = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != VERSION_CACHE_FORMAT:
+        return {}
+    return cache.get("entries", {})
+
+
+def write_version_cache(git_dir: str, entries: Dict[str, Any]) -> None:
+    """Atomically replace the cache file in git_dir."""
+    import json
+    import threading
+    filename = os.path.join(git_dir, VERSION_CACHE_FILE)
+    # unique per thread, too: the cache is written from worker threads
+    tmp = "%%s.%%d.%%d.tmp" %% (filename, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp, "w") as fobj:
+            json.dump({"version": VERSION_CACHE_FORMAT, "entries": entries},
+                      fobj)
+        os.replace(tmp, filename)
+    except OSError:
+        # a read-only checkout just doesn't get a cache
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+@register_vcs_handler("git", "pieces_from_cache")
+def git_pieces_from_cache(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    pieces_from: Callable,
+    check_dirty: bool = True,
+    dirty_scope: Optional[List[str]] = None,
+    **kwargs: Any,
+) -> Pieces:
+    """Get version pieces from the cache in .git, or compute and store them.
+
+    pieces_from (e.g. git_pieces_from_vcs) is called with the remaining
+    arguments when the cached pieces are missing or out of date. Entries
+    remember which fields (see render.style_fields()) they were computed
+    for, and only answer calls that need no more than that.
+
+    The dirty flag of cached pieces is rechecked (and stored if it changed)
+    unless check_dirty is false, in which case a hit costs only the stat()
+    calls of git_fingerprint() and of the index, and the dirty flag is the
+    one last stored. Entries are then also out of date when the index
+    changed since they were stored, e.g. after 'git add' or 'git status'.
+    The recheck uses the dirty_from argument for pieces_from, if given;
+    dirty_scope names the paths that dirty_from limits itself to. Pieces
+    computed for a path scope or dirty scope are stored separately for each
+    root and scope.
+    """
+    import json
+    fields = kwargs.get("fields")
+    dirty_from = kwargs.get("dirty_from")
+    key = tag_prefix
+    if kwargs.get("scope") is not None or dirty_scope is not None:
+        key = json.dumps([tag_prefix, os.path.abspath(root), kwargs.get("scope"),
+                          dirty_scope])
+    found = find_git_dir(root)
+    repo: Optional[GitCheckout] = None
+    fingerprint = None
+    if found is not None:
+        try:
+            repo = GitCheckout(*found)
+            fingerprint = git_fingerprint(repo)
+        except (NotThisMethod, OSError):
+            repo = None
+
+    if repo is not None:
+        entry = read_version_cache(repo.git_dir).get(key)
+        if (entry and entry.get("fingerprint") == fingerprint
+                and (check_dirty
+                     or entry.get("index") == git_index_stat(repo.git_dir))
+                and (entry.get("fields") is None
+                     or (fields is not None
+                         and set(fields) <= set(entry["fields"])))):
+            try:
+                pieces = Pieces.from_json(entry["pieces"])
+                if check_dirty and not pieces["error"]:
+                    dirty = pieces["dirty"]
+                    pieces["dirty"] = (dirty_from or repo.is_dirty)(
+                        pieces["long"])
+                    if pieces["dirty"] != dirty:
+                        entry["pieces"] = pieces.to_json()
+                        entry["index"] = git_index_stat(repo.git_dir)
+                        entries = read_version_cache(repo.git_dir)
+                        entries[key] = entry
+                        write_version_cache(repo.git_dir, entries)
+                if verbose:
+                    print("got pieces from %%s" %% VERSION_CACHE_FILE)
+                return pieces
+            except (NotThisMethod, OSError, ValueError):
+                pass
+
+    pieces = pieces_from(tag_prefix, root, verbose, **kwargs)
+    if repo is not None:
+        # This uses the fingerprint taken before computing the pieces, so
+        # changes made meanwhile make the entry stale rather than wrong.
+        entries = read_version_cache(repo.git_dir)
+        # The index is stat()ed afterwards, though: 'git describe --dirty'
+        # may have refreshed it.
+        entries[key] = {
+            "fingerprint": fingerprint, "pieces": pieces.to_json(),
+            "fields": None if fields is None else sorted(fields),
+            "index": git_index_stat(repo.git_dir)}
+        write_version_cache(repo.git_dir, entries)
+    return pieces
+
+
+# the Unix socket 'versioneer serve' listens on, inside the .git directory
+VERSION_DAEMON_SOCKET = "versioneer.sock"
+
+
+@register_vcs_handler("git", "pieces_from_daemon")
+def git_pieces_from_daemon(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    fields: Optional[AbstractSet[str]] = None,
+    timeout: float = 2.0,
+) -> Pieces:
+    """Get version pieces from a running 'versioneer serve'.
+
+    Raises NotThisMethod (quickly, when there is no socket) if no daemon
+    answers for the repository of root.
+    """
+    # _version.py only needs these when the daemon is asked
+    import json
+    import socket
+    found = find_git_dir(root)
+    if found is None or not hasattr(socket, "AF_UNIX"):
+        raise NotThisMethod("no version daemon")
+    timeout = command_timeout(timeout) or 0.0
+    if timeout <= 0:
+        raise NotThisMethod("time budget exceeded")
+    request = {"root": os.path.abspath(root), "tag_prefix": tag_prefix,
+               "fields": None if fields is None else sorted(fields)}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(os.path.join(found[0], VERSION_DAEMON_SOCKET))
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as fobj:
+                reply = json.loads(fobj.readline())
+    except (OSError, ValueError) as e:
+        raise NotThisMethod("no version daemon (%%s)" %% e)
+    if not isinstance(reply, dict) or "pieces" not in reply:
+        raise NotThisMethod("version daemon failed: %%s" %% (reply,))
+    try:
+        pieces = Pieces.from_json(reply["pieces"])
+    except ValueError as e:
+        raise NotThisMethod("version daemon failed: %%s" %% e)
+    if verbose:
+        print("got pieces from the version daemon")
+    return pieces
+
+
+def plus_or_dot(pieces: Mapping[str, Any]) -> str:
+    """Return a + if we don't already have one, else return a ."""
+    pieces = as_pieces(pieces)
+    if "+" in pieces.closest_tag:
+        return "."
+    return "+"
+
+
+def render_pep440(pieces: Mapping[str, Any]) -> str:
+    """Build up version string, with post-release "local version identifier".
+
+    Our goal: TAG[+DISTANCE.gHEX[.dirty]] . Note that if you
+    get a tagged build and then dirty it, you'll get TAG+0.gHEX.dirty
+
+    Exceptions:
+    1: no tags. git_describe was just HEX. 0+untagged.DISTANCE.gHEX[.dirty]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += plus_or_dot(pieces)
+            rendered += "%%d.g%%s" %% (pieces.distance, pieces.short)
+            if pieces.dirty:
+                rendered += ".dirty"
+    else:
+        # exception #1
+        rendered = "0+untagged.%%d.g%%s" %% (pieces.distance,
+                                          pieces.short)
+        if pieces.dirty:
+            rendered += ".dirty"
+    return rendered
+
+
+def render_pep440_branch(pieces: Mapping[str, Any]) -> str:
+    """TAG[[.dev0]+DISTANCE.gHEX[.dirty]] .
+
+    The ".dev0" means not master branch. Note that .dev0 sorts backwards
+    (a feature branch will appear "older" than the master branch).
+
+    Exceptions:
+    1: no tags. 0[.dev0]+untagged.DISTANCE.gHEX[.dirty]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            if pieces.branch != "master":
+                rendered += ".dev0"
+            rendered += plus_or_dot(pieces)
+            rendered += "%%d.g%%s" %% (pieces.distance, pieces.short)
+            if pieces.dirty:
+                rendered += ".dirty"
+    else:
+        # exception #1
+        rendered = "0"
+        if pieces.branch != "master":
+            rendered += ".dev0"
+        rendered += "+untagged.%%d.g%%s" %% (pieces.distance,
+                                          pieces.short)
+        if pieces.dirty:
+            rendered += ".dirty"
+    return rendered
+
+
+def pep440_split_post(ver: str) -> Tuple[str, Optional[int]]:
+    """Split pep440 version string at the post-release segment.
+
+    Returns the release segments before the post-release and the
+    post-release version number (or -1 if no post-release segment is present).
+    """
+    vc = str.split(ver, ".post")
+    return vc[0], int(vc[1] or 0) if len(vc) == 2 else None
+
+
+def render_pep440_pre(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postN.devDISTANCE] -- No -dirty.
+
+    Exceptions:
+    1: no tags. 0.post0.devDISTANCE
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        if pieces.distance:
+            # update the post release segment
+            tag_version, post_version = pep440_split_post(pieces.closest_tag)
+            rendered = tag_version
+            if post_version is not None:
+                rendered += ".post%%d.dev%%d" %% (post_version + 1, pieces.distance)
+            else:
+                rendered += ".post0.dev%%d" %% (pieces.distance)
+        else:
+            # no commits, use the tag as the version
+            rendered = pieces.closest_tag
+    else:
+        # exception #1
+        rendered = "0.post0.dev%%d" %% pieces.distance
+    return rendered
+
+
+def render_pep440_post(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postDISTANCE[.dev0]+gHEX] .
+
+    The ".dev0" means dirty. Note that .dev0 sorts backwards
+    (a dirty tree will appear "older" than the corresponding clean one),
+    but you shouldn't be releasing software with -dirty anyways.
+
+    Exceptions:
+    1: no tags. 0.postDISTANCE[.dev0]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%%d" %% pieces.distance
+            if pieces.dirty:
+                rendered += ".dev0"
+            rendered += plus_or_dot(pieces)
+            rendered += "g%%s" %% pieces.short
+    else:
+        # exception #1
+        rendered = "0.post%%d" %% pieces.distance
+        if pieces.dirty:
+            rendered += ".dev0"
+        rendered += "+g%%s" %% pieces.short
+    return rendered
+
+
+def render_pep440_post_branch(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postDISTANCE[.dev0]+gHEX[.dirty]] .
+
+    The ".dev0" means not master branch.
+
+    Exceptions:
+    1: no tags. 0.postDISTANCE[.dev0]+gHEX[.dirty]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%%d" %% pieces.distance
+            if pieces.branch != "master":
+                rendered += ".dev0"
+            rendered += plus_or_dot(pieces)
+            rendered += "g%%s" %% pieces.short
+            if pieces.dirty:
+                rendered += ".dirty"
+    else:
+        # exception #1
+        rendered = "0.post%%d" %% pieces.distance
+        if pieces.branch != "master":
+            rendered += ".dev0"
+        rendered += "+g%%s" %% pieces.short
+        if pieces.dirty:
+            rendered += ".dirty"
+    return rendered
+
+
+def render_pep440_old(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postDISTANCE[.dev0]] .
+
+    The ".dev0" means dirty.
+
+    Exceptions:
+    1: no tags. 0.postDISTANCE[.dev0]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%%d" %% pieces.distance
+            if pieces.dirty:
+                rendered += ".dev0"
+    else:
+        # exception #1
+        rendered = "0.post%%d" %% pieces.distance
+        if pieces.dirty:
+            rendered += ".dev0"
+    return rendered
+
+
+def render_git_describe(pieces: Mapping[str, Any]) -> str:
+    """TAG[-DISTANCE-gHEX][-dirty].
+
+    Like 'git describe --tags --dirty --always'.
+
+    Exceptions:
+    1: no tags. HEX[-dirty]  (note: no 'g' prefix)
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance:
+            rendered += "-%%d-g%%s" %% (pieces.distance, pieces.short)
+    else:
+        # exception #1
+        rendered = pieces.short
+    if pieces.dirty:
+        rendered += "-dirty"
+    return rendered
+
+
+def render_git_describe_long(pieces: Mapping[str, Any]) -> str:
+    """TAG-DISTANCE-gHEX[-dirty].
+
+    Like 'git describe --tags --dirty --always -long'.
+    The distance/hash is unconditional.
+
+    Exceptions:
+    1: no tags. HEX[-dirty]  (note: no 'g' prefix)
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        rendered += "-%%d-g%%s" %% (pieces.distance, pieces.short)
+    else:
+        # exception #1
+        rendered = pieces.short
+    if pieces.dirty:
+        rendered += "-dirty"
+    return rendered
+
+
+# The renderer of each style. register_style() adds more.
+RENDERERS: Dict[str, Callable[[Pieces], str]] = {
+    "pep440": render_pep440,
+    "pep440-branch": render_pep440_branch,
+    "pep440-pre": render_pep440_pre,
+    "pep440-post": render_pep440_post,
+    "pep440-post-branch": render_pep440_post_branch,
+    "pep440-old": render_pep440_old,
+    "git-describe": render_git_describe,
+    "git-describe-long": render_git_describe_long,
+}
+
+# The pieces each style is rendered from. render() also reports "long",
+# "dirty", "error" and "date" for every style.
+STYLE_FIELDS: Dict[str, FrozenSet[str]] = {
+    "pep440": frozenset(["closest-tag", "distance", "short"]),
+    "pep440-branch": frozenset(["closest-tag", "distance", "short", "branch"]),
+    "pep440-pre": frozenset(["closest-tag", "distance"]),
+    "pep440-post": frozenset(["closest-tag", "distance", "short"]),
+    "pep440-post-branch": frozenset(["closest-tag", "distance", "short",
+                                     "branch"]),
+    "pep440-old": frozenset(["closest-tag", "distance"]),
+    "git-describe": frozenset(["closest-tag", "distance", "short"]),
+    "git-describe-long": frozenset(["closest-tag", "distance", "short"]),
+}
+
+# the pieces style templates can refer to
+TEMPLATE_FIELDS = frozenset(["closest-tag", "distance", "short", "long",
+                             "branch", "dirty", "date"])
+
+# compiled style templates, by template
+STYLE_TEMPLATE_MEMO: Dict[str, Tuple[Callable[[Mapping[str, Any]], str],
+                                     FrozenSet[str]]] = {}
+
+
+def register_style(name: str, renderer: Callable[[Pieces], str],
+                   fields: Optional[Iterable[str]] = None) -> None:
+    """Make render() support a style, rendered by renderer(pieces).
+
+    fields names the pieces renderer uses (see style_fields()); None means
+    it may use any of them.
+    """
+    RENDERERS[name] = renderer
+    if fields is None:
+        STYLE_FIELDS.pop(name, None)
+    else:
+        STYLE_FIELDS[name] = frozenset(fields)
+
+
+def is_style_template(style: str) -> bool:
+    """Tell whether a style is a template rather than the name of a style."""
+    return "{" in style
+
+
+def compile_style_template(
+    template: str,
+) -> Tuple[Callable[[Mapping[str, Any]], str], FrozenSet[str]]:
+    """Compile a style template into a renderer, and the pieces it uses.
+
+    In the template, {FIELD} is replaced by the piece FIELD (one of
+    TEMPLATE_FIELDS; None and False become ""), and a [...] group is only
+    included if each FIELD it contains is true, i.e. neither empty, zero,
+    None nor False. {?FIELD} and {!FIELD} add nothing to the text, but
+    require FIELD to be true or false, respectively, so they are only
+    allowed in a group. For example,
+    "[{closest-tag}][0{!closest-tag}][+{distance}.g{short}][.dirty{?dirty}]"
+    is close to the pep440 style. Compiled templates are remembered, so
+    compiling the same template again costs a dict lookup.
+
+    Raises ValueError if the template is malformed.
+    """
+    if template in STYLE_TEMPLATE_MEMO:
+        return STYLE_TEMPLATE_MEMO[template]
+    Part = Callable[[Pieces], str]
+    Condition = Callable[[Pieces], bool]
+    fields: Set[str] = set()
+
+    def literal(text: str) -> Part:
+        return lambda pieces: text
+
+    def field(name: str) -> Part:
+        slot = PIECES_SLOTS[name]
+
+        def render_field(pieces: Pieces) -> str:
+            value = getattr(pieces, slot, None)
+            return "" if value is None or value is False else str(value)
+        return render_field
+
+    def condition(name: str, wanted: bool) -> Condition:
+        slot = PIECES_SLOTS[name]
+        return lambda pieces: bool(getattr(pieces, slot, None)) is wanted
+
+    def group(parts: List[Part], conditions: List[Condition]) -> Part:
+        def render_group(pieces: Pieces) -> str:
+            for check in conditions:
+                if not check(pieces):
+                    return ""
+            return "".join([part(pieces) for part in parts])
+        return render_group
+
+    def parse(pos: int, in_group: bool) -> Tuple[Part, int]:
+        parts: List[Part] = []
+        conditions: List[Condition] = []
+        text: List[str] = []
+        while pos < len(template):
+            char = template[pos]
+            pos += 1
+            if char not in "{}[]":
+                text.append(char)
+                continue
+            if text:
+                parts.append(literal("".join(text)))
+                text = []
+            if char == "{":
+                end = template.find("}", pos)
+                if end < 0:
+                    raise ValueError("unclosed '{' in style template %%r"
+                                     %% template)
+                spec = template[pos:end]
+                pos = end + 1
+                name = spec.lstrip("?!")
+                if name not in TEMPLATE_FIELDS or len(spec) - len(name) > 1:
+                    raise ValueError("unknown field {%%s} in style template %%r"
+                                     %% (spec, template))
+                if name != spec and not in_group:
+                    raise ValueError("{%%s} outside [...] in style template %%r"
+                                     %% (spec, template))
+                fields.add(name)
+                conditions.append(condition(name, not spec.startswith("!")))
+                if name == spec:
+                    parts.append(field(name))
+            elif char == "[":
+                part, pos = parse(pos, True)
+                parts.append(part)
+            elif char == "]" and in_group:
+                return group(parts, conditions), pos
+            else:
+                raise ValueError("unbalanced %%r in style template %%r"
+                                 %% (char, template))
+        if in_group:
+            raise ValueError("unclosed '[' in style template %%r" %% template)
+        if text:
+            parts.append(literal("".join(text)))
+        return group(parts, []), pos
+
+    render_template = parse(0, False)[0]
+
+    def renderer(pieces: Mapping[str, Any]) -> str:
+        return render_template(as_pieces(pieces))
+    STYLE_TEMPLATE_MEMO[template] = (renderer, frozenset(fields))
+    return STYLE_TEMPLATE_MEMO[template]
+
+
+def style_fields(style: str) -> Optional[FrozenSet[str]]:
+    """Return the names of the pieces render() needs for the given style.
+
+    None means all of them (for styles render() doesn't know).
+    """
+    if not style or style == "default":
+        style = "pep440"  # the default
+    if style in STYLE_FIELDS:
+        fields = STYLE_FIELDS[style]
+    elif style not in RENDERERS and is_style_template(style):
+        try:
+            fields = compile_style_template(style)[1]
+        except ValueError:
+            return None
+    else:
+        return None
+    return fields | {"long", "dirty", "error", "date"}
+
+
+def render(pieces: Mapping[str, Any], style: str) -> Dict[str, Any]:
+    """Render the given version pieces into the requested style.
+
+    The style is the name of a style in RENDERERS, or a style template (see
+    compile_style_template()). Renderers are given Pieces, so a dict of
+    pieces is copied into one first.
+    """
+    pieces = as_pieces(pieces)
+    if pieces.error:
+        return {"version": "unknown",
+                "full-revisionid": getattr(pieces, "long", None),
+                "dirty": None,
+                "error": pieces.error,
+                "date": None}
+
+    if not style or style == "default":
+        style = "pep440"  # the default
+
+    renderer = RENDERERS.get(style)
+    if renderer is None:
+        if not is_style_template(style):
+            raise ValueError("unknown style '%%s'" %% style)
+        renderer = compile_style_template(style)[0]
+    rendered = renderer(pieces)
+
+    return {"version": rendered, "full-revisionid": pieces.long,
+            "dirty": pieces.dirty, "error": None,
+            "date": getattr(pieces, "date", None)}
+
+
+def get_versions() -> Dict[str, Any]:
+    """Get version information or return default if unable to do so."""
+    # I am in _version.py, which lives at ROOT/VERSIONFILE_SOURCE. If we have
+    # __file__, we can work backwards from there to the root. Some
+    # py2exe/bbfreeze/non-CPython implementations don't do __file__, in which
+    # case we can only use expanded keywords.
+
+    cfg = get_config()
+    verbose = cfg.verbose
+
+    try:
+        with trace_span("strategy", name="keywords"):
+            return git_versions_from_keywords(get_keywords(), cfg.tag_prefix,
+                                              verbose)
+    except NotThisMethod:
+        pass
+
+    try:
+        root = os.path.realpath(__file__)
+        # versionfile_source is the relative path from the top of the source
+        # tree (where the .git directory might live) to this file. Invert
+        # this to find the root from __file__.
+        for _ in cfg.versionfile_source.split('/'):
+            root = os.path.dirname(root)
+    except NameError:
+        return {"version": "0+unknown", "full-revisionid": None,
+                "dirty": None,
+                "error": "unable to find root of source tree",
+                "date": None}
+
+    # the VCS and parentdir steps share cfg.time_budget seconds, if set
+    with time_budget(cfg.time_budget):
+        try:
+            fields = style_fields(cfg.style)
+            kwargs: Dict[str, Any] = {
+                "fields": fields,
+                "combine_queries": cfg.combine_git_queries}
+            scope = cfg.path_scope.split() or None
+            if scope is not None:
+                kwargs["scope"] = scope
+            dirty_scope = None
+            if cfg.dirty_check == "index" or scope is not None:
+                dirty_scope = cfg.dirty_scope.split() or scope
+                kwargs["dirty_from"] = functools.partial(
+                    git_dirty_from_index, root, scope=dirty_scope)
+            # the daemon only knows dirty flags of whole repositories
+            if cfg.version_daemon and scope is None and not cfg.dirty_scope:
+                try:
+                    with trace_span("strategy", name="daemon", root=root):
+                        pieces = git_pieces_from_daemon(
+                            cfg.tag_prefix, root, verbose, fields=fields)
+                    return render(pieces, cfg.style)
+                except NotThisMethod:
+                    pass
+            with trace_span("strategy", name="vcs", root=root):
+                if cfg.version_cache or cfg.static_version_py:
+                    pieces = git_pieces_from_cache(
+                        cfg.tag_prefix, root, verbose, git_pieces_from_vcs,
+                        check_dirty=not cfg.static_version_py,
+                        dirty_scope=dirty_scope, **kwargs)
+                else:
+                    pieces = git_pieces_from_vcs(cfg.tag_prefix, root,
+                                                 verbose, **kwargs)
+            return render(pieces, cfg.style)
+        except NotThisMethod:
+            pass
+
+        try:
+            if cfg.parentdir_prefix:
+                with trace_span("strategy", name="parentdir", root=root):
+                    return versions_from_parentdir(cfg.parentdir_prefix, root,
+                                                   verbose)
+        except NotThisMethod:
+            pass
+
+        error = "unable to compute version"
+        if budget_exceeded():
+            error += " within time_budget (%%gs)" %% cfg.time_budget
+
+    return {"version": "0+unknown", "full-revisionid": None,
+            "dirty": None, "error": error, "date": None}
+'''
+
+
+@register_vcs_handler("git", "get_keywords")
+def git_get_keywords(versionfile_abs: str) -> Dict[str, str]:
+    """Extract version information from the given file."""
+    # the code embedded in _version.py can just fetch the value of these
+    # keywords. When used from setup.py, we don't want to import _version.py,
+    # so we do it with a regexp instead. This function is not used from
+    # _version.py.
+    keywords: Dict[str, str] = {}
+    try:
+        with open(versionfile_abs, "r") as fobj:
+            for line in fobj:
+                if line.strip().startswith("git_refnames ="):
+                    mo = re.search(r'=\s*"(.*)"', line)
+                    if mo:
+                        keywords["refnames"] = mo.group(1)
+                if line.strip().startswith("git_full ="):
+                    mo = re.search(r'=\s*"(.*)"', line)
+                    if mo:
+                        keywords["full"] = mo.group(1)
+                if line.strip().startswith("git_date ="):
+                    mo = re.search(r'=\s*"(.*)"', line)
+                    if mo:
+                        keywords["date"] = mo.group(1)
+    except OSError:
+        pass
+    return keywords
+
+
+@register_vcs_handler("git", "keywords")
+def git_versions_from_keywords(
+    keywords: Dict[str, str],
+    tag_prefix: str,
+    verbose: bool,
+) -> Dict[str, Any]:
+    """Get version information from git keywords."""
+    if "refnames" not in keywords:
+        raise NotThisMethod("Short version file found")
+    date = keywords.get("date")
+    if date is not None:
+        # Use only the last line.  Previous lines may contain GPG signature
+        # information.
+        date = date.splitlines()[-1]
+
+        # git-2.2.0 added "%cI", which expands to an ISO-8601 -compliant
+        # datestamp. However we prefer "%ci" (which expands to an "ISO-8601
+        # -like" string, which we must then edit to make compliant), because
+        # it's been around since git-1.5.3, and it's too difficult to
+        # discover which version we're using, or to work around using an
+        # older one.
+        date = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+    refnames = keywords["refnames"].strip()
+    if refnames.startswith("$Format"):
+        if verbose:
+            print("keywords are unexpanded, not using")
+        raise NotThisMethod("unexpanded keywords, not a git-archive tarball")
+    refs = {r.strip() for r in refnames.strip("()").split(",")}
+    # starting in git-1.8.3, tags are listed as "tag: foo-1.0" instead of
+    # just "foo-1.0". If we see a "tag: " prefix, prefer those.
+    TAG = "tag: "
+    tags = {r[len(TAG):] for r in refs if r.startswith(TAG)}
+    if not tags:
+        # Either we're using git < 1.8.3, or there really are no tags. We use
+        # a heuristic: assume all version tags have a digit. The old git %d
+        # expansion behaves like git log --decorate=short and strips out the
+        # refs/heads/ and refs/tags/ prefixes that would let us distinguish
+        # between branches and tags. By ignoring refnames without digits, we
+        # filter out many common branch names like "release" and
+        # "stabilization", as well as "HEAD" and "master".
+        tags = {r for r in refs if re.search(r'\d', r)}
+        if verbose:
+            print("discarding '%s', no digits" % ",".join(refs - tags))
+    if verbose:
+        print("likely tags: %s" % ",".join(sorted(tags)))
+    for ref in sorted(tags):
+        # sorting will prefer e.g. "2.0" over "2.0rc1"
+        if ref.startswith(tag_prefix):
+            r = ref[len(tag_prefix):]
+            # Filter out refs that exactly match prefix or that don't start
+            # with a number once the prefix is stripped (mostly a concern
+            # when prefix is '')
+            if not re.match(r'\d', r):
+                continue
+            if verbose:
+                print("picking %s" % r)
+            return {"version": r,
+                    "full-revisionid": keywords["full"].strip(),
+                    "dirty": False, "error": None,
+                    "date": date}
+    # no suitable tags, so version is "0+unknown", but full hex is still there
+    if verbose:
+        print("no suitable tags, using unknown + full revision id")
+    return {"version": "0+unknown",
+            "full-revisionid": keywords["full"].strip(),
+            "dirty": False, "error": "no suitable tags", "date": None}
+
+
+# distances counted over path scopes, by (root, tag, HEAD, scope)
+SCOPED_DISTANCE_MEMO: Dict[Tuple[str, Optional[str], str, Tuple[str, ...]],
+                           int] = {}
+# the most branches passed to 'git branch --contains --list'
+GIT_BRANCH_LIST_MAX = 100
+
+
+@register_vcs_handler("git", "pieces_from_vcs")
+def git_pieces_from_vcs(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    runner: Callable = run_command,
+    combine_queries: bool = False,
+    fields: Optional[AbstractSet[str]] = None,
+    dirty_from: Optional[Callable[[str], bool]] = None,
+    scope: Optional[List[str]] = None,
+    line_runner: Optional[Callable] = None,
+) -> Pieces:
+    """Get version from 'git describe' in the root of the source tree.
+
+    This only gets called if the git-archive 'subst' keywords were *not*
+    expanded, and _version.py hasn't already been rewritten with a short
+    version string, meaning we're inside a checked out source tree.
+
+    With combine_queries, HEAD's revision id, commit date and branch are
+    read by a single 'git log' instead of one git process each. If fields
+    is given, pieces not named in it (see render.style_fields()) may be left
+    as None instead of running the git commands needed to compute them.
+    If dirty_from is given (e.g. git_dirty_from_index()), it is called with
+    HEAD's revision id to compute the dirty flag, instead of letting 'git
+    describe --dirty' refresh the index and compare every file. With
+    scope, a list of paths relative to root, the distance only counts the
+    commits since the tag which changed files below those paths.
+    line_runner (by default run_command_lines(), or the output of runner
+    split into lines if runner was given) streams the output of 'git branch
+    --contains', which is only read until it lists master. It only has to
+    look at the branches listed by git_branches_to_check().
+    """
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+
+    # GIT_DIR can interfere with correct operation of Versioneer.
+    # It may be intended to be passed to the Versioneer-versioned project,
+    # but that should not change where we get our version from.
+    env = os.environ.copy()
+    env.pop("GIT_DIR", None)
+    if line_runner is None:
+        if runner is run_command:
+            line_runner = run_command_lines
+        else:
+            line_runner = functools.partial(git_lines_from_runner, runner)
+    runner = functools.partial(runner, env=env)
+    line_runner = functools.partial(line_runner, env=env)
+
+    date: Optional[str] = None
+    if combine_queries:
+        # %D lists the refs pointing at HEAD, e.g. "HEAD -> refs/heads/master,
+        # tag: refs/tags/1.0" (or "HEAD, refs/heads/master" when detached).
+        head_out, rc = runner(GITS, [
+            "log", "-1", "--decorate=full", "--format=%H%x00%ci%x00%D", "HEAD"
+        ], cwd=root, hide_stderr=not verbose)
+        if rc != 0 or head_out is None:
+            if verbose:
+                print("Directory %s not under git control" % root)
+            raise NotThisMethod("'git log' returned error")
+        # Use only the last line.  Previous lines may contain GPG signature
+        # information.
+        full_out, date, refs = head_out.splitlines()[-1].split("\0")
+    else:
+        _, rc = runner(GITS, ["rev-parse", "--git-dir"], cwd=root,
+                       hide_stderr=not verbose)
+        if rc != 0:
+            if verbose:
+                print("Directory %s not under git control" % root)
+            raise NotThisMethod("'git rev-parse --git-dir' returned error")
+
+    # if there is a tag matching tag_prefix, this yields TAG-NUM-gHEX[-dirty]
+    # if there isn't one, this yields HEX[-dirty] (no NUM)
+    describe_out, rc = runner(GITS, [
+        "describe", "--tags"] + ([] if dirty_from else ["--dirty"]) + [
+        "--always", "--long", "--match", f"{tag_prefix}[[:digit:]]*"
+    ], cwd=root)
+    # --long was added in git-1.5.5
+    if describe_out is None:
+        raise NotThisMethod("'git describe' failed")
+    describe_out = describe_out.strip()
+    if not combine_queries and (fields is None or "date" in fields):
+        # the revision id and the commit date, from a single git process
+        out, rc = runner(GITS, ["show", "-s", "--format=%H%n%ci", "HEAD"],
+                         cwd=root)
+        if out is None or len(out.splitlines()) < 2:
+            raise NotThisMethod("'git show' failed")
+        # Use only the last lines.  Previous lines may contain GPG signature
+        # information.
+        full_out, date = out.splitlines()[-2:]
+    elif not combine_queries:
+        full_out, rc = runner(GITS, ["rev-parse", "HEAD"], cwd=root)
+        if full_out is None:
+            raise NotThisMethod("'git rev-parse' failed")
+    full_out = full_out.strip()
+
+    pieces = Pieces()
+    pieces["long"] = full_out
+    pieces["short"] = full_out[:7]  # maybe improved later
+    pieces["error"] = None
+
+    branch_name: Optional[str]
+    if fields is not None and "branch" not in fields:
+        branch_name = None
+    elif combine_queries:
+        branch_name = "HEAD"
+        for ref in refs.split(","):
+            if ref.strip().startswith("HEAD -> refs/heads/"):
+                branch_name = ref.strip()[len("HEAD -> refs/heads/"):]
+    else:
+        branch_name, rc = runner(GITS, ["rev-parse", "--abbrev-ref", "HEAD"],
+                                 cwd=root)
+        # --abbrev-ref was added in git-1.6.3
+        if rc != 0 or branch_name is None:
+            raise NotThisMethod("'git rev-parse --abbrev-ref' returned error")
+    if branch_name is not None:
+        branch_name = branch_name.strip()
+
+    if branch_name == "HEAD":
+        # If we aren't exactly on a branch, pick a branch which represents
+        # the current commit. Branches whose tip is the current commit are
+        # cheap to find, so start with those: 'git branch --contains' walks
+        # the history of every local branch it looks at. If all else fails,
+        # we are on a branchless commit.
+        tips: List[str] = []
+        if combine_queries:
+            tips = sorted(ref.strip()[len("refs/heads/"):]
+                          for ref in refs.split(",")
+                          if ref.strip().startswith("refs/heads/"))
+        names = tips
+        if not combine_queries or (tips and "master" not in tips):
+            # all the branches, to see which are sorted before the tips
+            heads, rc = runner(GITS, ["for-each-ref",
+                                      "--format=%(objectname) %(refname)",
+                                      "refs/heads/"], cwd=root)
+            names, tips = [], []
+            if rc == 0 and heads is not None:
+                names, tips = git_parse_branch_heads(heads, full_out)
+
+        branches = list(tips)
+        check = git_branches_to_check(names, tips)
+        if check != []:
+            # --contains was added in git-1.5.4
+            try:
+                with contextlib.closing(line_runner(
+                        GITS, git_branch_contains_args(check),
+                        cwd=root)) as lines:
+                    for branch in git_iter_branch_contains(lines):
+                        branches.append(branch)
+                        if branch == "master":
+                            break  # git_pick_branch() needs no others
+            except OSError:
+                raise NotThisMethod("'git branch --contains' returned error")
+        branch_name = git_pick_branch(sorted(set(branches)))
+
+    pieces["branch"] = branch_name
+
+    pieces.update(git_parse_describe(describe_out, tag_prefix, verbose))
+    if dirty_from is not None:
+        pieces["dirty"] = dirty_from(full_out)
+    if pieces["error"]:
+        return pieces
+
+    if fields is not None and "distance" not in fields:
+        pass
+    elif scope is not None:
+        tag = pieces["closest-tag"]
+        key = (os.path.abspath(root), tag, full_out, tuple(scope))
+        if key not in SCOPED_DISTANCE_MEMO:
+            revs = full_out
+            if tag is not None:
+                revs = f"refs/tags/{tag_prefix}{tag}..{full_out}"
+            out, rc = runner(GITS, ["rev-list", "--count", revs, "--"] + scope,
+                             cwd=root)
+            if rc != 0 or out is None:
+                raise NotThisMethod("'git rev-list --count' returned error")
+            SCOPED_DISTANCE_MEMO[key] = int(out)
+        pieces["distance"] = SCOPED_DISTANCE_MEMO[key]
+    elif pieces["closest-tag"] is None:
+        # HEX: no tags
+        out, rc = runner(GITS, ["rev-list", "--count", "HEAD"], cwd=root)
+        # --count was added in git-1.7.2
+        if rc != 0 or out is None:
+            raise NotThisMethod("'git rev-list --count' returned error")
+        pieces["distance"] = int(out)  # total number of commits
+
+    # commit date: see ISO-8601 comment in git_versions_from_keywords()
+    if date is not None:
+        date = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+    pieces["date"] = date
+
+    return pieces
+
+
+def git_lines_from_runner(runner: Callable, commands: List[str],
+                          args: List[str],
+                          **kwargs: Any) -> Generator[str, None, None]:
+    """Stream the output of a run_command()-like runner, split into lines."""
+    out, rc = runner(commands, args, **kwargs)
+    if rc != 0 or out is None:
+        raise OSError("%s returned error" % (commands[:1] + args))
+    yield from out.split("\n")
+
+
+def git_iter_branch_contains(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the branch names listed by 'git branch --contains'."""
+    for i, line in enumerate(lines):
+        # Skip the first line if we're running detached (and the empty
+        # output of a --list that matched nothing)
+        branch = line.strip()
+        if (i == 0 and "(" in branch) or not branch:
+            continue
+        # Strip off the leading "* " (or "+ " for other worktrees) from the
+        # list of branches; the runner may have stripped the "  " already.
+        yield branch[2:] if branch[:2] in ("* ", "+ ") else branch
+
+
+def git_parse_branch_contains(out: str) -> List[str]:
+    """Get the branch names listed by 'git branch --contains'."""
+    return list(git_iter_branch_contains(out.split("\n")))
+
+
+def git_parse_branch_heads(out: str, head: str) -> Tuple[List[str], List[str]]:
+    """Get all branch names, and those whose tip is head.
+
+    out is the output of 'git for-each-ref --format="%(objectname)
+    %(refname)" refs/heads/'.
+    """
+    names, tips = [], []
+    for line in out.splitlines():
+        sha, _, ref = line.partition(" ")
+        names.append(ref[len("refs/heads/"):])
+        if sha == head:
+            tips.append(names[-1])
+    return names, tips
+
+
+def git_branches_to_check(names: List[str],
+                          tips: List[str]) -> Optional[List[str]]:
+    """Get the branches that 'git branch --contains' still has to look at.
+
+    The branches in tips point at HEAD, so they contain it, but master and
+    the branches sorted before them would be picked over them if they
+    contained HEAD too. None stands for all of the branches (without tips).
+    """
+    if not tips:
+        return None
+    if "master" in tips:
+        return []
+    first = min(tips)
+    return sorted(name for name in names if name < first or name == "master")
+
+
+def git_branch_contains_args(check: Optional[List[str]]) -> List[str]:
+    """Get the 'git branch --contains' arguments for git_branches_to_check()."""
+    if check is None or len(check) > GIT_BRANCH_LIST_MAX:
+        return ["branch", "--contains"]
+    return ["branch", "--contains", "HEAD", "--list"] + check
+
+
+def git_pick_branch(branches: List[str]) -> Optional[str]:
+    """Pick the branch which represents the current commit."""
+    if "master" in branches:
+        return "master"
+    if not branches:
+        return None
+    # Pick the first branch that is returned. Good or bad.
+    return branches[0]
+
+
+def git_parse_describe(describe_out: str, tag_prefix: str,
+                       verbose: bool) -> Dict[str, Any]:
+    """Get the pieces found in the output of 'git describe'.
+
+    This returns "dirty", "closest-tag", "distance" and "short", or "dirty"
+    and "error" if the output can't be used. For an untagged commit,
+    "closest-tag" and "distance" are None and "short" is not included.
+    """
+    pieces: Dict[str, Any] = {}
+
+    # parse describe_out. It will be like TAG-NUM-gHEX[-dirty] or HEX[-dirty]
+    # TAG might have hyphens.
+    git_describe = describe_out
+
+    # look for -dirty suffix
+    dirty = git_describe.endswith("-dirty")
+    pieces["dirty"] = dirty
+    if dirty:
+        git_describe = git_describe[:git_describe.rindex("-dirty")]
+
+    # now we have TAG-NUM-gHEX or HEX
+
+    if "-" in git_describe:
+        # TAG-NUM-gHEX
+        mo = re.search(r'^(.+)-(\d+)-g([0-9a-f]+)$', git_describe)
+        if not mo:
+            # unparsable. Maybe git-describe is misbehaving?
+            pieces["error"] = ("unable to parse git-describe output: '%s'"
+                               % describe_out)
+            return pieces
+
+        # tag
+        full_tag = mo.group(1)
+        if not full_tag.startswith(tag_prefix):
+            if verbose:
+                fmt = "tag '%s' doesn't start with prefix '%s'"
+                print(fmt % (full_tag, tag_prefix))
+            pieces["error"] = ("tag '%s' doesn't start with prefix '%s'"
+                               % (full_tag, tag_prefix))
+            return pieces
+        pieces["closest-tag"] = full_tag[len(tag_prefix):]
+
+        # distance: number of commits since tag
+        pieces["distance"] = int(mo.group(2))
+
+        # commit: short hex revision ID
+        pieces["short"] = mo.group(3)
+
+    else:
+        # HEX: no tags
+        pieces["closest-tag"] = None
+        pieces["distance"] = None
+
+    return pieces
+
+
+@register_vcs_handler("git", "pieces_from_vcs_async")
+async def git_pieces_from_vcs_async(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    runner: Callable = run_command_async,
+    fields: Optional[AbstractSet[str]] = None,
+) -> Pieces:
+    """Get version pieces from git like git_pieces_from_vcs(), asynchronously.
+
+    The git commands that don't depend on each other run concurrently, so
+    this takes about as long as the slowest of them rather than their sum.
+    The branches are listed up front, even if HEAD turns out to be on one,
+    since that is cheaper than waiting for 'git rev-parse' first.
+    """
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+
+    # GIT_DIR can interfere with correct operation of Versioneer.
+    # It may be intended to be passed to the Versioneer-versioned project,
+    # but that should not change where we get our version from.
+    env = os.environ.copy()
+    env.pop("GIT_DIR", None)
+    runner = functools.partial(runner, env=env)
+
+    need_branch = fields is None or "branch" in fields
+    queries = [
+        runner(GITS, ["rev-parse", "--git-dir"], cwd=root,
+               hide_stderr=not verbose),
+        # if there is a tag matching tag_prefix, this yields
+        # TAG-NUM-gHEX[-dirty], if there isn't one, HEX[-dirty] (no NUM)
+        runner(GITS, ["describe", "--tags", "--dirty", "--always", "--long",
+                      "--match", f"{tag_prefix}[[:digit:]]*"], cwd=root),
+        runner(GITS, ["show", "-s", "--format=%H%n%ci", "HEAD"], cwd=root),
+    ]
+    if need_branch:
+        queries += [
+            runner(GITS, ["rev-parse", "--abbrev-ref", "HEAD"], cwd=root),
+            runner(GITS, ["for-each-ref", "--format=%(objectname) %(refname)",
+                          "refs/heads/"], cwd=root),
+        ]
+    results = await asyncio.gather(*queries)
+
+    _, rc = results[0]
+    if rc != 0:
+        if verbose:
+            print("Directory %s not under git control" % root)
+        raise NotThisMethod("'git rev-parse --git-dir' returned error")
+    describe_out, rc = results[1]
+    if describe_out is None:
+        raise NotThisMethod("'git describe' failed")
+    out, rc = results[2]
+    if out is None or len(out.splitlines()) < 2:
+        raise NotThisMethod("'git show' failed")
+    # Use only the last lines.  Previous lines may contain GPG signature
+    # information.
+    full_out, date = out.splitlines()[-2:]
+    full_out = full_out.strip()
+
+    pieces = Pieces()
+    pieces["long"] = full_out
+    pieces["short"] = full_out[:7]  # maybe improved later
+    pieces["error"] = None
+    pieces.update(git_parse_describe(describe_out.strip(), tag_prefix,
+                                     verbose))
+
+    branch_name: Optional[str] = None
+    names: List[str] = []
+    tips: List[str] = []
+    if need_branch:
+        branch_name, rc = results[3]
+        if rc != 0 or branch_name is None:
+            raise NotThisMethod("'git rev-parse --abbrev-ref' returned error")
+        branch_name = branch_name.strip()
+        heads, rc = results[4]
+        if rc == 0 and heads is not None:
+            names, tips = git_parse_branch_heads(heads, full_out)
+
+    # the commands which depend on the answers above, again concurrently
+    later: Dict[str, Awaitable] = {}
+    check = git_branches_to_check(names, tips)
+    if branch_name == "HEAD" and check != []:
+        later["contains"] = runner(GITS, git_branch_contains_args(check),
+                                   cwd=root)
+    if (not pieces["error"] and pieces["closest-tag"] is None
+            and (fields is None or "distance" in fields)):
+        later["count"] = runner(GITS, ["rev-list", "--count", "HEAD"],
+                                cwd=root)
+    answers = dict(zip(later, await asyncio.gather(*later.values())))
+
+    if branch_name == "HEAD":
+        branches = list(tips)
+        if "contains" in answers:
+            out, rc = answers["contains"]
+            if rc != 0 or out is None:
+                raise NotThisMethod("'git branch --contains' returned error")
+            branches += git_parse_branch_contains(out)
+        branch_name = git_pick_branch(sorted(set(branches)))
+    pieces["branch"] = branch_name
+
+    if pieces["error"]:
+        return pieces
+
+    if "count" in answers:
+        out, rc = answers["count"]
+        if rc != 0 or out is None:
+            raise NotThisMethod("'git rev-list --count' returned error")
+        pieces["distance"] = int(out)  # total number of commits
+
+    # commit date: see ISO-8601 comment in git_versions_from_keywords()
+    pieces["date"] = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+
+    return pieces
+
+
+# object types in pack entry headers
+PACK_OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+PACK_OFS_DELTA = 6
+PACK_REF_DELTA = 7
+
+# how many resolved delta bases each PackFile remembers
+PACK_BASE_CACHE_SIZE = 256
+
+
+def delta_size(delta: bytes, pos: int) -> Tuple[int, int]:
+    """Decode a size in a delta header: (size, position after it)."""
+    size = shift = 0
+    while True:
+        byte = delta[pos]
+        pos += 1
+        size |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return size, pos
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its delta base and the delta instructions."""
+    base_size, pos = delta_size(delta, 0)
+    if base_size != len(base):
+        raise NotThisMethod("delta base has the wrong size")
+    size, pos = delta_size(delta, pos)
+    out = bytearray()
+    while pos < len(delta):
+        cmd = delta[pos]
+        pos += 1
+        if cmd & 0x80:
+            # copy from the base: bits 0-3 say which offset bytes follow,
+            # bits 4-6 which length bytes
+            offset = length = 0
+            for i in range(4):
+                if cmd & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if cmd & (0x10 << i):
+                    length |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (length or 0x10000)]
+        elif cmd:
+            # insert the next cmd bytes of the delta
+            out += delta[pos:pos + cmd]
+            pos += cmd
+        else:
+            raise NotThisMethod("invalid delta instruction")
+    if len(out) != size:
+        raise NotThisMethod("delta produced the wrong size")
+    return bytes(out)
+
+
+class PackFile:
+    """Read-only access to a pack and its (version 2) .idx file.
+
+    Both files are mmap()ed: lookups binary-search the mapped index, and
+    objects are inflated straight from slices of the mapped pack, so
+    neither file is ever read as a whole.
+    """
+
+    def __init__(self, idx_filename: str) -> None:
+        """Map the index; the pack is mapped when first needed."""
+        # only needed once objects are read from packs
+        import mmap
+        import struct
+        with open(idx_filename, "rb") as fobj:
+            self.idx = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.idx[:8] != b"\377tOc\0\0\0\2":
+            raise NotThisMethod("unsupported pack index %s" % idx_filename)
+        self.fanout = struct.unpack(">256I", self.idx[8:1032])
+        self.count = self.fanout[255]
+        self.filename = idx_filename[:-len(".idx")] + ".pack"
+        self.pack: Optional[mmap.mmap] = None
+        # offset -> (type, contents) of recently resolved delta bases
+        self.bases: Dict[int, Tuple[str, bytes]] = {}
+
+    def shas(self, first: int) -> Iterator[str]:
+        """Yield the ids of the objects whose first byte is first."""
+        for i in range(self.fanout[first - 1] if first else 0,
+                       self.fanout[first]):
+            yield self.idx[1032 + 20 * i:1052 + 20 * i].hex()
+
+    def find(self, sha: str) -> Optional[int]:
+        """Look up the offset of an object in the pack, or None."""
+        binsha = bytes.fromhex(sha)
+        lo = self.fanout[binsha[0] - 1] if binsha[0] else 0
+        hi = self.fanout[binsha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self.idx[1032 + 20 * mid:1052 + 20 * mid]
+            if found < binsha:
+                lo = mid + 1
+            elif found > binsha:
+                hi = mid
+            else:
+                pos = 1032 + 24 * self.count + 4 * mid
+                offset = int.from_bytes(self.idx[pos:pos + 4], "big")
+                if offset & 0x80000000:
+                    pos = 1032 + 28 * self.count + 8 * (offset & 0x7fffffff)
+                    offset = int.from_bytes(self.idx[pos:pos + 8], "big")
+                return offset
+        return None
+
+    def inflate(self, pos: int) -> bytes:
+        """Decompress the zlib stream starting at pos."""
+        assert self.pack is not None
+        import zlib
+        inflater = zlib.decompressobj()
+        parts = []
+        with memoryview(self.pack) as view:
+            while not inflater.eof:
+                chunk = view[pos:pos + 8192]
+                if not chunk:
+                    raise NotThisMethod("truncated pack %s" % self.filename)
+                parts.append(inflater.decompress(chunk))
+                pos += 8192
+        return b"".join(parts)
+
+    def read(self, offset: int,
+             read_object: Callable[[str], Tuple[str, bytes]]) -> Tuple[str, bytes]:
+        """Return the (type, contents) of the object at offset.
+
+        Deltas are resolved against their base at an earlier offset
+        (OFS_DELTA) or, for REF_DELTA, against the object read_object()
+        returns for the base's id, which may live in another pack.
+        """
+        if self.pack is None:
+            import mmap
+            with open(self.filename, "rb") as fobj:
+                self.pack = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.pack
+        deltas: List[Tuple[int, bytes]] = []
+        while True:
+            if offset in self.bases:
+                kind, body = self.bases[offset]
+                break
+            entry = offset
+            byte = data[offset]
+            kind_id = (byte >> 4) & 7
+            while byte & 0x80:  # the object's size, which we don't need
+                offset += 1
+                byte = data[offset]
+            offset += 1
+            if kind_id in PACK_OBJECT_TYPES:
+                kind, body = PACK_OBJECT_TYPES[kind_id], self.inflate(offset)
+                break
+            if kind_id == PACK_OFS_DELTA:
+                byte = data[offset]
+                distance = byte & 0x7f
+                while byte & 0x80:
+                    offset += 1
+                    byte = data[offset]
+                    distance = ((distance + 1) << 7) | (byte & 0x7f)
+                deltas.append((entry, self.inflate(offset + 1)))
+                offset = entry - distance
+            elif kind_id == PACK_REF_DELTA:
+                base = data[offset:offset + 20].hex()
+                deltas.append((entry, self.inflate(offset + 20)))
+                kind, body = read_object(base)
+                break
+            else:
+                raise NotThisMethod("unknown object type %d in %s"
+                                    % (kind_id, self.filename))
+        for entry, delta in reversed(deltas):
+            body = apply_delta(body, delta)
+            if len(self.bases) >= PACK_BASE_CACHE_SIZE:
+                self.bases.clear()
+            self.bases[entry] = (kind, body)
+        return kind, body
+
+
+def find_packs(object_dirs: List[str]) -> List[PackFile]:
+    """Open the packs of the objects directories, in name order."""
+    packs = []
+    for objects in object_dirs:
+        pack_dir = os.path.join(objects, "pack")
+        try:
+            names = sorted(os.listdir(pack_dir))
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith(".idx"):
+                packs.append(PackFile(os.path.join(pack_dir, name)))
+    return packs
+
+
+@register_vcs_handler("git", "find_repo")
+def find_git_dir(root: str) -> Optional[Tuple[str, str]]:
+    """Find the .git directory (and its work tree) that root belongs to.
+
+    Like git itself, this searches root and then its parent directories.
+    Returns None if root is not inside a git checkout.
+    """
+    work_tree = os.path.abspath(root)
+    while True:
+        dot_git = os.path.join(work_tree, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git, work_tree
+        if os.path.isfile(dot_git):
+            # submodules and linked worktrees use a "gitdir: PATH" file
+            with open(dot_git) as fobj:
+                line = fobj.readline()
+            if not line.startswith("gitdir: "):
+                return None
+            git_dir = os.path.join(work_tree, line[len("gitdir: "):].strip())
+            return os.path.normpath(git_dir), work_tree
+        parent = os.path.dirname(work_tree)
+        if parent == work_tree:
+            return None
+        work_tree = parent
+
+
+def read_git_config(filename: str) -> Dict[str, str]:
+    """Read the "section.key" (or "section.subsection.key") settings we use.
+
+    This understands just enough of git's config syntax to find settings
+    like core.filemode. Keys are lowercased, the last value wins.
+    """
+    config: Dict[str, str] = {}
+    section = ""
+    try:
+        with open(filename) as fobj:
+            for line in fobj:
+                line = line.strip()
+                mo = re.match(r'\[\s*([\w.-]+)(?:\s+"(.*)")?\s*\]', line)
+                if mo:
+                    section = mo.group(1).lower()
+                    if mo.group(2) is not None:
+                        section += "." + mo.group(2)
+                    continue
+                if not line or line[0] in "#;" or not section:
+                    continue
+                key, _, value = line.partition("=")
+                value = value.split(" #")[0].split(" ;")[0].strip().strip('"')
+                config[section + "." + key.strip().lower()] = value or "true"
+    except OSError:
+        pass
+    return config
+
+
+def read_git_configs(git_dir: str) -> Dict[str, str]:
+    """Read the settings that apply to git_dir, like read_git_config().
+
+    The system, user and repository config files are read in git's order,
+    so later ones win, and GIT_CONFIG_COUNT settings in the environment
+    override them all. Include directives are not followed.
+    """
+    home = os.path.expanduser("~")
+    xdg = os.environ.get("XDG_CONFIG_HOME") or os.path.join(home, ".config")
+    filenames = []
+    if not os.environ.get("GIT_CONFIG_NOSYSTEM"):
+        filenames.append(os.environ.get("GIT_CONFIG_SYSTEM", "/etc/gitconfig"))
+    if "GIT_CONFIG_GLOBAL" in os.environ:
+        filenames.append(os.environ["GIT_CONFIG_GLOBAL"])
+    else:
+        filenames += [os.path.join(xdg, "git", "config"),
+                      os.path.join(home, ".gitconfig")]
+    filenames.append(os.path.join(git_dir, "config"))
+    config: Dict[str, str] = {}
+    for filename in filenames:
+        config.update(read_git_config(filename))
+    try:
+        count = int(os.environ.get("GIT_CONFIG_COUNT", "0"))
+    except ValueError:
+        count = 0
+    for i in range(count):
+        key = os.environ.get("GIT_CONFIG_KEY_%d" % i, "")
+        section, _, name = key.rpartition(".")
+        first, dot, subsection = section.partition(".")
+        if section:
+            key = first.lower() + dot + subsection + "." + name.lower()
+            config[key] = os.environ.get("GIT_CONFIG_VALUE_%d" % i) or "true"
+    return config
+
+
+TRUE_VALUES = ("true", "yes", "on", "1")
+FALSE_VALUES = ("false", "no", "off", "0")
+
+# attributes that make git convert files between the index and the work tree
+CONVERTING_ATTRIBUTES = ("text", "eol", "crlf", "filter", "ident",
+                         "working-tree-encoding")
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Decode one of git's "offset" varints, returning (value, new_pos)."""
+    c = data[pos]
+    value = c & 0x7f
+    pos += 1
+    while c & 0x80:
+        c = data[pos]
+        value = ((value + 1) << 7) | (c & 0x7f)
+        pos += 1
+    return value, pos
+
+
+class IndexEntry(NamedTuple):
+    """One entry of the .git/index file."""
+
+    path: bytes
+    mode: int
+    sha: str
+    stage: int
+    skip: bool  # assume-valid or skip-worktree: don't look at the file
+    ctime: int
+    mtime: int
+    mtime_ns: int
+    size: int
+
+
+def read_git_index(filename: str) -> Tuple[List[IndexEntry], Optional[str]]:
+    """Parse a .git/index file.
+
+    Returns the entries and the tree id recorded for the whole index by the
+    cache-tree extension (None if that is missing or invalidated).
+    """
+    import struct
+    with open(filename, "rb") as fobj:
+        data = fobj.read()
+    signature, version, count = struct.unpack(">4sII", data[:12])
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise NotThisMethod("unsupported index format")
+    entries = []
+    pos = 12
+    path = b""
+    for _ in range(count):
+        (ctime, _, mtime, mtime_ns, _, _, mode, _, _, size, sha,
+         flags) = struct.unpack(">10I20sH", data[pos:pos + 62])
+        start = pos
+        pos += 62
+        skip = bool(flags & 0x8000)
+        if flags & 0x4000 and version >= 3:
+            extended, = struct.unpack(">H", data[pos:pos + 2])
+            skip = skip or bool(extended & 0x4000)
+            pos += 2
+        if version == 4:
+            # paths are prefix-compressed against the previous entry
+            strip, pos = decode_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = path[:len(path) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            pos = start + ((end - start + 8) & ~7)
+        entries.append(IndexEntry(path, mode, sha.hex(), (flags >> 12) & 3,
+                                  skip, ctime, mtime, mtime_ns, size))
+    tree = None
+    while pos + 8 <= len(data) - 20:
+        ext, ext_size = struct.unpack(">4sI", data[pos:pos + 8])
+        ext_data = data[pos + 8:pos + 8 + ext_size]
+        pos += 8 + ext_size
+        if ext in (b"link", b"sdir"):
+            raise NotThisMethod("split and sparse indexes are not supported")
+        if ext == b"TREE":
+            # the first record describes the root: "\0COUNT SUBTREES\nSHA"
+            header, _, rest = ext_data[1:].partition(b"\n")
+            if int(header.split()[0]) >= 0:
+                tree = rest[:20].hex()
+    return entries, tree
+
+
+def blob_sha(data: bytes) -> str:
+    """Compute the id git would give to a blob with the given contents."""
+    import hashlib
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+# the number of index entries is_dirty() checks per task of its thread pool
+DIRTY_CHUNK_SIZE = 256
+
+
+class DirtyCheck(NamedTuple):
+    """The checked-out files to compare with an index that matches HEAD."""
+
+    entries: List[IndexEntry]
+    index_mtime_ns: int
+    converting: bool
+
+
+def git_index_stat(git_dir: str) -> Optional[List[int]]:
+    """Get the inode, mtime and size of the index, or None if it's missing.
+
+    Git replaces the index (by renaming a new one into place) whenever it
+    changes, so this changes with it.
+    """
+    try:
+        st = os.stat(os.path.join(git_dir, "index"))
+    except OSError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+class GitCheckout:
+    """Read-only access to the refs, objects and index of a .git directory.
+
+    This is the part of GitDir that the version cache and the dirty check
+    of _version.py need. Anything it doesn't support raises NotThisMethod,
+    so the caller can fall back to running git.
+    """
+
+    def __init__(self, git_dir: str, work_tree: str) -> None:
+        """Check that we can read git_dir and set up the lookups."""
+        self.git_dir = git_dir
+        self.work_tree = work_tree
+        if os.path.exists(os.path.join(git_dir, "commondir")):
+            raise NotThisMethod("linked worktrees are not supported")
+        self.config = read_git_configs(git_dir)
+        if self.config.get("extensions.objectformat", "sha1") != "sha1":
+            raise NotThisMethod("only sha1 repositories are supported")
+        if self.config.get("extensions.refstorage", "files") != "files":
+            raise NotThisMethod("only the 'files' ref storage is supported")
+        if "core.worktree" in self.config:
+            raise NotThisMethod("core.worktree is not supported")
+        objects = os.path.join(git_dir, "objects")
+        self.object_dirs = [objects]
+        try:
+            with open(os.path.join(objects, "info", "alternates")) as fobj:
+                self.object_dirs += [os.path.join(objects, line.strip())
+                                     for line in fobj if line.strip()]
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(git_dir, "shallow")) as fobj:
+                self.shallow = {line.strip() for line in fobj}
+        except OSError:
+            self.shallow = set()
+        self.commits: Dict[str, Tuple[str, List[str], int, str]] = {}
+        self.packs: Optional[List[PackFile]] = None
+        self.packed: Optional[Dict[str, Tuple[str, Optional[str]]]] = None
+
+    def packed_refs(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Map refnames in packed-refs to (sha, peeled sha or None)."""
+        if self.packed is None:
+            self.packed = {}
+            try:
+                with open(os.path.join(self.git_dir, "packed-refs")) as fobj:
+                    lines = fobj.read().splitlines()
+            except OSError:
+                lines = []
+            if lines and lines[0].startswith("#") and " peeled" not in lines[0]:
+                raise NotThisMethod("packed-refs without peeled tags")
+            name = None
+            for line in lines:
+                if line.startswith("^") and name is not None:
+                    self.packed[name] = (self.packed[name][0], line[1:])
+                elif line and not line.startswith("#"):
+                    sha, name = line.split(" ", 1)
+                    self.packed[name] = (sha, None)
+        return self.packed
+
+    def resolve_ref(self, name: str) -> Optional[str]:
+        """Return the sha a (possibly symbolic) ref points to, or None."""
+        for _ in range(5):
+            try:
+                with open(os.path.join(self.git_dir, name)) as fobj:
+                    value = fobj.read().strip()
+            except OSError:
+                packed = self.packed_refs().get(name)
+                return packed[0] if packed else None
+            if not value.startswith("ref: "):
+                return value
+            name = value[len("ref: "):]
+        return None
+
+    def refs(self, prefix: str) -> Dict[str, str]:
+        """Map the names of all refs under prefix (e.g. refs/tags/) to shas."""
+        refs = {name: sha for name, (sha, _) in self.packed_refs().items()
+                if name.startswith(prefix)}
+        top = os.path.join(self.git_dir, prefix)
+        for dirpath, _, filenames in os.walk(top):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = prefix + os.path.relpath(path, top).replace(os.sep, "/")
+                sha = self.resolve_ref(name)
+                if sha:
+                    refs[name] = sha
+        return refs
+
+    def find_packs(self) -> List[PackFile]:
+        """List the packs of all object directories."""
+        if self.packs is None:
+            self.packs = find_packs(self.object_dirs)
+        return self.packs
+
+    def find_packed(self, sha: str) -> Optional[Tuple[PackFile, int]]:
+        """Look up the (pack, offset) of an object in the pack indexes."""
+        for pack in self.find_packs():
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack, offset
+        return None
+
+    def read_object(self, sha: str) -> Tuple[str, bytes]:
+        """Return the (type, contents) of an object."""
+        import zlib
+        for objects in self.object_dirs:
+            try:
+                with open(os.path.join(objects, sha[:2], sha[2:]), "rb") as fobj:
+                    raw = zlib.decompress(fobj.read())
+            except OSError:
+                continue
+            header, _, body = raw.partition(b"\0")
+            return header.split(b" ")[0].decode(), body
+        found = self.find_packed(sha)
+        if found is None:
+            raise NotThisMethod("object %s not found" % sha)
+        pack, offset = found
+        return pack.read(offset, self.read_object)
+
+    def read_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Return the (tree, parents, timestamp, timezone) of a commit."""
+        if sha not in self.commits:
+            self.commits[sha] = self.parse_commit(sha)
+        return self.commits[sha]
+
+    def parse_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Read the (tree, parents, timestamp, timezone) from a commit object."""
+        kind, body = self.read_object(sha)
+        if kind != "commit":
+            raise NotThisMethod("%s is a %s, not a commit" % (sha, kind))
+        headers = body.split(b"\n\n", 1)[0].decode("utf-8", "replace")
+        tree, when, tz = "", 0, "+0000"
+        parents: List[str] = []
+        for line in headers.splitlines():
+            key, _, value = line.partition(" ")
+            if key == "tree":
+                tree = value
+            elif key == "parent" and sha not in self.shallow:
+                parents.append(value)
+            elif key == "committer":
+                when_s, tz = value.rsplit(" ", 2)[1:]
+                when = int(when_s)
+        return tree, parents, when, tz
+
+    def tree_entries(self, sha: str,
+                     prefix: bytes = b"") -> Dict[bytes, Tuple[int, str]]:
+        """Recursively list a tree object as {path: (mode, sha)}."""
+        kind, data = self.read_object(sha)
+        entries = {}
+        pos = 0
+        while pos < len(data):
+            space = data.index(b" ", pos)
+            nul = data.index(b"\0", space)
+            mode = int(data[pos:space], 8)
+            path = prefix + data[space + 1:nul]
+            entry_sha = data[nul + 1:nul + 21].hex()
+            pos = nul + 21
+            if mode == 0o40000:
+                entries.update(self.tree_entries(entry_sha, path + b"/"))
+            else:
+                if stat.S_ISREG(mode):
+                    mode = 0o100755 if mode & 0o111 else 0o100644
+                entries[path] = (mode, entry_sha)
+        return entries
+
+    def converts_files(self, entries: List[IndexEntry]) -> bool:
+        """Tell whether git may convert files between the index and work tree.
+
+        With end-of-line conversion (core.autocrlf, core.eol) or one of the
+        CONVERTING_ATTRIBUTES in a .gitattributes file (among entries), in
+        .git/info/attributes or in core.attributesFile, git compares the
+        converted contents of a file with the index. Attributes that turn
+        conversion off ("-text", "!eol") don't count.
+        """
+        if (self.config.get("core.autocrlf", "false").lower() not in FALSE_VALUES
+                or "core.eol" in self.config):
+            return True
+        xdg = (os.environ.get("XDG_CONFIG_HOME")
+               or os.path.join(os.path.expanduser("~"), ".config"))
+        filenames = [
+            os.path.join(self.git_dir, "info", "attributes"),
+            os.path.expanduser(self.config.get(
+                "core.attributesfile", os.path.join(xdg, "git", "attributes"))),
+        ]
+        filenames += [os.path.join(self.work_tree, os.fsdecode(entry.path))
+                      for entry in entries if entry.path == b".gitattributes"
+                      or entry.path.endswith(b"/.gitattributes")]
+        for filename in filenames:
+            try:
+                with open(filename, "rb") as fobj:
+                    lines = fobj.read().decode("utf-8", "replace").splitlines()
+            except FileNotFoundError:
+                continue
+            for line in lines:
+                words = line.split()
+                if not words or words[0].startswith("#"):
+                    continue
+                for attr in words[1:]:
+                    if (attr[0] not in "-!"
+                            and attr.split("=")[0] in CONVERTING_ATTRIBUTES):
+                        return True
+        return False
+
+    def is_modified(self, entry: IndexEntry, index_mtime_ns: int,
+                    converting: bool = False) -> bool:
+        """Tell whether the checked-out file differs from its index entry.
+
+        With converting (see converts_files()), files that would have to
+        be compared by content raise NotThisMethod instead.
+        """
+        path = os.path.join(self.work_tree, os.fsdecode(entry.path))
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return True
+        if entry.mode == 0o120000:
+            if not stat.S_ISLNK(st.st_mode):
+                return True
+        elif not stat.S_ISREG(st.st_mode):
+            return True
+        elif (self.config.get("core.filemode", "true").lower() in TRUE_VALUES
+              and (st.st_mode ^ entry.mode) & 0o100):
+            return True
+        if st.st_size & 0xffffffff != entry.size:
+            return True
+        entry_mtime_ns = entry.mtime * 10**9 + entry.mtime_ns
+        if (st.st_mtime_ns == entry_mtime_ns and int(st.st_ctime) == entry.ctime
+                and entry_mtime_ns < index_mtime_ns):
+            return False
+        # The stat data differs, or the file was modified too close to the
+        # index being written to trust it ("racy git"): compare contents.
+        if entry.mode == 0o120000:
+            return blob_sha(os.fsencode(os.readlink(path))) != entry.sha
+        if converting:
+            raise NotThisMethod("%s may be converted by git" % path)
+        with open(path, "rb") as fobj:
+            return blob_sha(fobj.read()) != entry.sha
+
+    def index_check(self, head: str, scope: Optional[List[bytes]] = None
+                    ) -> Optional[DirtyCheck]:
+        """Compare the index with the HEAD commit, the first half of is_dirty().
+
+        Returns None if they differ (so the checkout is dirty), else what
+        files_modified() needs to compare the checked-out files. This only
+        depends on HEAD and the index, so it can be reused while neither
+        changes (see git_index_stat()).
+        """
+        index = os.path.join(self.git_dir, "index")
+        try:
+            entries, tree = read_git_index(index)
+            index_mtime_ns = os.stat(index).st_mtime_ns
+        except OSError:
+            raise NotThisMethod("unable to read %s" % index)
+        converting = self.converts_files(entries)
+
+        def in_scope(path: bytes) -> bool:
+            return scope is None or any(
+                path == prefix or path.startswith(prefix + b"/")
+                for prefix in scope)
+
+        if scope is not None:
+            entries = [entry for entry in entries if in_scope(entry.path)]
+        if any(entry.mode == 0o160000 for entry in entries):
+            raise NotThisMethod("submodules are not supported")
+        if any(entry.stage for entry in entries):
+            return None
+        head_tree = self.read_commit(head)[0]
+        if tree != head_tree:
+            indexed = {entry.path: (entry.mode, entry.sha) for entry in entries}
+            committed = {path: entry for path, entry
+                         in self.tree_entries(head_tree).items()
+                         if in_scope(path)}
+            if indexed != committed:
+                return None
+        return DirtyCheck([entry for entry in entries if not entry.skip],
+                          index_mtime_ns, converting)
+
+    def files_modified(self, check: DirtyCheck,
+                       max_workers: Optional[int] = None) -> bool:
+        """Compare the checked-out files, the second half of is_dirty().
+
+        The files of large trees are stat()ed on a pool of up to
+        max_workers threads.
+        """
+        def any_modified(chunk: List[IndexEntry]) -> bool:
+            return any(self.is_modified(entry, check.index_mtime_ns,
+                                        check.converting)
+                       for entry in chunk)
+
+        checked = check.entries
+        chunks = [checked[i:i + DIRTY_CHUNK_SIZE]
+                  for i in range(0, len(checked), DIRTY_CHUNK_SIZE)]
+        if len(chunks) <= 1 or max_workers == 1:
+            return any_modified(checked)
+        # only large trees get here, and concurrent.futures is slow to import
+        from concurrent.futures import ThreadPoolExecutor
+        # lstat() releases the GIL, so threads overlap the waits for the
+        # filesystem (which add up on network or cold filesystems)
+        pool = ThreadPoolExecutor(max_workers)
+        try:
+            return any(pool.map(any_modified, chunks))
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def is_dirty(self, head: str, scope: Optional[List[bytes]] = None,
+                 max_workers: Optional[int] = None) -> bool:
+        """Tell whether the index or work tree differ from the HEAD commit.
+
+        Files whose stat data doesn't match the index are compared by
+        content. If git would convert them first (see converts_files()),
+        this raises NotThisMethod instead, so that git decides. With
+        scope, a list of paths relative to the work tree, only files below
+        those paths are compared. The checked-out files of large trees are
+        stat()ed on a pool of up to max_workers threads.
+        """
+        check = self.index_check(head, scope)
+        return check is None or self.files_modified(check, max_workers)
+
+
+@register_vcs_handler("git", "dirty_from_index")
+def git_dirty_from_index(
+    root: str,
+    head: str,
+    scope: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    runner: Callable = run_command,
+) -> bool:
+    """Tell whether the checkout of root differs from head.
+
+    This answers like 'git describe --dirty', by comparing the stat data
+    cached in .git/index with the checked-out files instead of starting
+    git. With scope, a list of paths relative to root, only files below
+    those paths count, so that a project in a subdirectory isn't dirty
+    because of changes elsewhere in the repository. Repositories that
+    GitCheckout can't read are handed over to 'git status'.
+    """
+    import struct
+    import zlib
+    found = find_git_dir(root)
+    if found is None:
+        raise NotThisMethod("no .git directory found")
+    prefixes: Optional[List[bytes]] = None
+    if scope:
+        prefixes = []
+        for path in scope:
+            rel = os.path.relpath(os.path.join(os.path.abspath(root), path),
+                                  found[1])
+            if rel == os.curdir:
+                prefixes = None
+                break
+            prefixes.append(os.fsencode(rel.replace(os.sep, "/")))
+    try:
+        return GitCheckout(*found).is_dirty(head, prefixes, max_workers)
+    except (NotThisMethod, OSError, ValueError, IndexError, struct.error,
+            zlib.error) as e:
+        trace("fallback", name="dirty_from_index", root=root,
+              exception=type(e).__name__, message=str(e))
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+    env = os.environ.copy()
+    env.pop("GIT_DIR", None)
+    out, rc = runner(GITS, ["status", "--porcelain", "--untracked-files=no",
+                            "--"] + (scope or []), cwd=root, env=env)
+    if rc != 0 or out is None:
+        raise NotThisMethod("'git status' returned error")
+    return bool(out.strip())
+
+
+def format_git_date(when: int, tz: str) -> str:
+    """Format a timestamp and "+HHMM" timezone like git's %ci does."""
+    minutes = int(tz[1:3]) * 60 + int(tz[3:5])
+    offset = timedelta(minutes=-minutes if tz[0] == "-" else minutes)
+    date = datetime.fromtimestamp(when, timezone(offset))
+    return date.strftime("%Y-%m-%d %H:%M:%S ") + tz
+
+
+TAG_INDEX_FILE = "versioneer-tags.json"
+# like git describe --candidates
+DESCRIBE_CANDIDATES = 10
+# how far GitDir.describe_linear() follows first parents
+FIRST_PARENT_BOUND = 1000
+
+
+def read_tag_index(git_dir: str) -> Dict[str, Any]:
+    """Read the tag index entries stored in git_dir, or {} if there are none."""
+    try:
+        with open(os.path.join(git_dir, TAG_INDEX_FILE)) as fobj:
+            index = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("version") != 1:
+        return {}
+    return index.get("entries", {})
+
+
+def write_tag_index(git_dir: str, entries: Dict[str, Any]) -> None:
+    """Atomically replace the tag index in git_dir."""
+    filename = os.path.join(git_dir, TAG_INDEX_FILE)
+    tmp = "%s.%d.%d.tmp" % (filename, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp, "w") as fobj:
+            json.dump({"version": 1, "entries": entries}, fobj)
+        os.replace(tmp, filename)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+# parent positions in the CDAT chunk of a commit-graph
+GRAPH_PARENT_NONE = 0x70000000
+GRAPH_EXTRA_EDGES = 0x80000000
+
+
+class CommitGraph:
+    """Read-only access to a commit-graph file (objects/info/commit-graph).
+
+    The file is mmap()ed, so looking up a commit costs a binary search and
+    a few slices instead of inflating its object. Split commit-graph chains
+    are not supported.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """Map filename and find its chunks."""
+        with open(filename, "rb") as fobj:
+            self.data = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.data
+        if data[:4] != b"CGPH" or data[4] != 1 or data[5] != 1:
+            raise NotThisMethod("unsupported commit-graph %s" % filename)
+        if data[7] != 0:
+            raise NotThisMethod("split commit-graphs are not supported")
+        chunks: Dict[bytes, int] = {}
+        for i in range(data[6]):
+            pos = 8 + 12 * i
+            chunks[data[pos:pos + 4]] = struct.unpack(">Q", data[pos + 4:pos + 12])[0]
+        if not {b"OIDF", b"OIDL", b"CDAT"} <= set(chunks):
+            raise NotThisMethod("incomplete commit-graph %s" % filename)
+        self.oidl = chunks[b"OIDL"]
+        self.cdat = chunks[b"CDAT"]
+        self.edge = chunks.get(b"EDGE")
+        self.fanout = struct.unpack(">256I",
+                                    data[chunks[b"OIDF"]:chunks[b"OIDF"] + 1024])
+
+    def position(self, sha: str) -> Optional[int]:
+        """Find the position of a commit in the graph, or None."""
+        binsha = bytes.fromhex(sha)
+        lo = self.fanout[binsha[0] - 1] if binsha[0] else 0
+        hi = self.fanout[binsha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self.data[self.oidl + 20 * mid:self.oidl + 20 * mid + 20]
+            if found < binsha:
+                lo = mid + 1
+            elif found > binsha:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def commit(self, pos: int) -> Tuple[str, List[str], int, int]:
+        """Return the (tree, parents, timestamp, generation) at pos.
+
+        The generation is the commit's topological level: 1 for root
+        commits, and one more than the largest one of its parents otherwise
+        (or 0 if the graph was written without them).
+        """
+        start = self.cdat + 36 * pos
+        tree = self.data[start:start + 20].hex()
+        parent1, parent2, high, low = struct.unpack(
+            ">IIII", self.data[start + 20:start + 36])
+        positions = [] if parent1 == GRAPH_PARENT_NONE else [parent1]
+        if parent2 & GRAPH_EXTRA_EDGES:
+            if self.edge is None:
+                raise NotThisMethod("commit-graph without EDGE chunk")
+            edge = self.edge + 4 * (parent2 & ~GRAPH_EXTRA_EDGES)
+            while True:
+                value, = struct.unpack(">I", self.data[edge:edge + 4])
+                positions.append(value & ~GRAPH_EXTRA_EDGES)
+                if value & GRAPH_EXTRA_EDGES:
+                    break
+                edge += 4
+        elif parent2 != GRAPH_PARENT_NONE:
+            positions.append(parent2)
+        parents = [self.data[self.oidl + 20 * p:self.oidl + 20 * p + 20].hex()
+                   for p in positions]
+        return tree, parents, ((high & 3) << 32) | low, high >> 2
+
+
+class GitDir(GitCheckout):
+    """Read-only access to the refs, objects and history of a .git directory.
+
+    Only the parts of the repository format needed to compute version
+    pieces are supported. Everything else raises NotThisMethod, so the
+    caller can fall back to running git.
+    """
+
+    def __init__(self, git_dir: str, work_tree: str) -> None:
+        """Check that we can read git_dir and open its commit-graph."""
+        super().__init__(git_dir, work_tree)
+        self.generations: Dict[str, int] = {}
+        self.levels: Dict[str, int] = {}
+        self.graph: Optional[CommitGraph] = None
+        # git doesn't use (or write) commit-graphs in shallow repositories
+        if (not self.shallow and self.config.get("core.commitgraph", "true")
+                .lower() in TRUE_VALUES):
+            try:
+                self.graph = CommitGraph(os.path.join(
+                    self.object_dirs[0], "info", "commit-graph"))
+            except (NotThisMethod, OSError, ValueError, IndexError,
+                    struct.error):
+                pass
+
+    def read_commit(self, sha: str) -> Tuple[str, List[str], int, str]:
+        """Return the (tree, parents, timestamp, timezone) of a commit.
+
+        Commits found in the commit-graph come without their timezone ("").
+        """
+        if sha not in self.commits:
+            pos = self.graph.position(sha) if self.graph is not None else None
+            if pos is not None:
+                assert self.graph is not None
+                tree, parents, when, generation = self.graph.commit(pos)
+                self.commits[sha] = (tree, parents, when, "")
+                self.generations[sha] = generation
+            else:
+                self.commits[sha] = self.parse_commit(sha)
+        return self.commits[sha]
+
+    def generation(self, sha: str) -> float:
+        """Return the generation of a commit, for pruning history walks.
+
+        A commit can only be reached from commits with a larger generation.
+        Commits missing from the commit-graph (or all of them, without one)
+        get infinity: the graph contains all ancestors of its commits, so
+        those can't reach them either.
+        """
+        self.read_commit(sha)
+        return self.generations.get(sha, float("inf"))
+
+    def level(self, sha: str) -> int:
+        """Return the topological level of a commit: 1 for root commits.
+
+        This is the generation from the commit-graph; commits missing from
+        it get one more than the highest level of their parents. 0 means
+        that the commit-graph was written without generation numbers.
+        """
+        todo = [sha]
+        while todo:
+            c = todo[-1]
+            if c in self.levels:
+                todo.pop()
+                continue
+            generation = self.generation(c)
+            if generation != float("inf"):
+                self.levels[c] = int(generation)
+                todo.pop()
+                continue
+            parents = self.read_commit(c)[1]
+            missing = [p for p in parents if p not in self.levels]
+            if missing:
+                todo.extend(missing)
+                continue
+            levels = [self.levels[p] for p in parents]
+            self.levels[c] = 0 if 0 in levels else max(levels, default=0) + 1
+            todo.pop()
+        return self.levels[sha]
+
+    def peel_tag(self, sha: str) -> Tuple[Optional[str], int]:
+        """Follow an annotated tag to its commit: (commit or None, tag date)."""
+        when = 0
+        kind, body = self.read_object(sha)
+        while kind == "tag":
+            target, when = "", 0
+            for line in body.split(b"\n\n", 1)[0].decode().splitlines():
+                key, _, value = line.partition(" ")
+                if key == "object":
+                    target = value
+                elif key == "tagger":
+                    when = int(value.rsplit(" ", 2)[1])
+            sha = target
+            kind, body = self.read_object(sha)
+        return (sha if kind == "commit" else None), when
+
+    def tags_stamp(self) -> List[Any]:
+        """Get the stat data of packed-refs and of the refs/tags/ directories.
+
+        Tags are created and deleted by renaming or removing files in these
+        directories (or by rewriting packed-refs), so this changes whenever
+        a tag does.
+        """
+        stamp: List[Any] = []
+        try:
+            st = os.stat(os.path.join(self.git_dir, "packed-refs"))
+            stamp.append(["packed-refs", st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamp.append(["packed-refs", None, None])
+        for dirpath, _, _ in os.walk(os.path.join(self.git_dir, "refs", "tags")):
+            st = os.stat(dirpath)
+            stamp.append([os.path.relpath(dirpath, self.git_dir),
+                          st.st_mtime_ns, st.st_size])
+        return stamp
+
+    def tag_names(self, tag_prefix: str,
+                  use_index: bool = False) -> Dict[str, Tuple[int, str]]:
+        """Map commits to the (priority, name) of the tag that describes them.
+
+        This mirrors 'git describe --tags --match PREFIX[[:digit:]]*': an
+        annotated tag (priority 2) beats a lightweight one (priority 1), the
+        newest of several annotated tags wins, and otherwise the first tag
+        in refname order is used.
+
+        With use_index, the result is kept in .git/versioneer-tags.json. It
+        is reused as long as tags_stamp() doesn't change, and otherwise
+        updated by peeling only the tags that are new or were moved.
+        """
+        known: Dict[str, List[Any]] = {}
+        stamp = None
+        if use_index:
+            stamp = self.tags_stamp()
+            entry = read_tag_index(self.git_dir).get(tag_prefix, {})
+            if entry.get("stamp") == stamp:
+                return {commit: (prio, name)
+                        for commit, (prio, name) in entry["names"].items()}
+            known = entry.get("refs", {})
+
+        names: Dict[str, Tuple[int, str]] = {}
+        # refname -> [sha, peeled commit or None, tag date (-1: not read)]
+        records: Dict[str, List[Any]] = {}
+        packed = self.packed_refs()
+        pattern = "%s[0-9]*" % tag_prefix
+        for ref, sha in sorted(self.refs("refs/tags/").items()):
+            name = ref[len("refs/tags/"):]
+            if not fnmatch.fnmatchcase(name, pattern):
+                continue
+            peeled: Optional[str]
+            if ref in known and known[ref][0] == sha:
+                peeled, when = known[ref][1], known[ref][2]
+            elif ref in packed and packed[ref][0] == sha:
+                peeled, when = packed[ref][1] or sha, 0
+                if packed[ref][1] is not None:
+                    when = -1  # annotated; read the tag date only if needed
+            else:
+                peeled, when = self.peel_tag(sha)
+                if peeled == sha:
+                    when = 0
+            records[ref] = [sha, peeled, when]
+            if peeled is None:
+                continue
+            prio = 2 if peeled != sha else 1
+            old = names.get(peeled)
+            if old is not None and (old[0] > prio or (old[0] == prio == 1)):
+                continue
+            if old is not None and old[0] == prio == 2:
+                old_record = records["refs/tags/" + old[1]]
+                if old_record[2] < 0:
+                    old_record[2] = self.peel_tag(old_record[0])[1]
+                if when < 0:
+                    when = records[ref][2] = self.peel_tag(sha)[1]
+                if old_record[2] >= when:
+                    continue
+            names[peeled] = (prio, name)
+
+        if use_index:
+            entries = read_tag_index(self.git_dir)
+            entries[tag_prefix] = {"stamp": stamp, "refs": records,
+                                   "names": names}
+            write_tag_index(self.git_dir, entries)
+        return names
+
+    def describe(self, head: str,
+                 names: Dict[str, Tuple[int, str]]) -> Tuple[Optional[str], int]:
+        """Find the closest tag and distance the way 'git describe' does.
+
+        Returns (None, number of commits) if no tag is reachable from head.
+        """
+        if head in names:
+            return names[head][1], 0
+        found = self.describe_linear(head, names)
+        if found is not None:
+            return found
+        if self.graph is not None and self.level(head):
+            found = self.describe_by_level(head, names)
+            if found is not None:
+                return found
+        max_candidates = DESCRIBE_CANDIDATES
+        # each candidate: [depth, flag, found order, name]
+        matches: List[List[Any]] = []
+        flags: Dict[str, int] = {head: 0}
+        queue: List[Tuple[int, int, str]] = []
+        counter = 0
+        heapq.heappush(queue, (-self.read_commit(head)[2], counter, head))
+        annotated = 0
+        gave_up_on = None
+        seen_commits = 0
+        while queue:
+            c = heapq.heappop(queue)[2]
+            seen_commits += 1
+            if c in names:
+                if len(matches) < max_candidates:
+                    flag = 1 << (len(matches) + 1)
+                    matches.append([seen_commits - 1, flag, len(matches), names[c][1]])
+                    flags[c] |= flag
+                    if names[c][0] == 2:
+                        annotated += 1
+                else:
+                    gave_up_on = c
+                    break
+            for t in matches:
+                if not flags[c] & t[1]:
+                    t[0] += 1
+            if annotated and not queue:
+                # stop if the last remaining path is covered by the best match
+                best_depth = min(t[0] for t in matches)
+                best_within = 0
+                for t in matches:
+                    if t[0] == best_depth:
+                        best_within |= t[1]
+                if (flags[c] & best_within) == best_within:
+                    break
+            for p in self.read_commit(c)[1]:
+                if p not in flags:
+                    flags[p] = 0
+                    counter += 1
+                    heapq.heappush(queue, (-self.read_commit(p)[2], counter, p))
+                flags[p] |= flags[c]
+        if not matches:
+            return None, seen_commits
+        matches.sort(key=lambda t: (t[0], t[2]))
+        best = matches[0]
+        if gave_up_on is not None:
+            counter += 1
+            heapq.heappush(queue, (-self.read_commit(gave_up_on)[2], counter,
+                                   gave_up_on))
+        # finish the depth computation for the best candidate
+        while queue:
+            c = heapq.heappop(queue)[2]
+            if flags[c] & best[1]:
+                if all(flags[i[2]] & best[1] for i in queue):
+                    break
+            else:
+                best[0] += 1
+            for p in self.read_commit(c)[1]:
+                if p not in flags:
+                    flags[p] = 0
+                    counter += 1
+                    heapq.heappush(queue, (-self.read_commit(p)[2], counter, p))
+                flags[p] |= flags[c]
+        return best[3], best[0]
+
+    def describe_linear(
+        self, head: str, names: Dict[str, Tuple[int, str]],
+    ) -> Optional[Tuple[Optional[str], int]]:
+        """Look up the first parents of head in names, up to a bound.
+
+        Without merges on the way, every other tag is behind the first one
+        found, so that's the one 'git describe' picks, and the distance is
+        the number of steps. Returns None on reaching a merge, or after
+        FIRST_PARENT_BOUND commits, to leave the rest to a full walk.
+        """
+        c = head
+        for distance in range(1, FIRST_PARENT_BOUND + 1):
+            parents = self.read_commit(c)[1]
+            if not parents:
+                return None, distance  # no tags at all
+            if len(parents) > 1:
+                return None
+            c = parents[0]
+            if c in names:
+                return names[c][1], distance
+        return None
+
+    def describe_by_level(
+        self, head: str, names: Dict[str, Tuple[int, str]],
+    ) -> Optional[Tuple[Optional[str], int]]:
+        """Find the closest tag by walking the history in level order.
+
+        'git describe' walks all of the history unless it finds more than
+        DESCRIBE_CANDIDATES tags, because dates can't tell it when the
+        closest tag has been found. With topological levels, a tag that
+        wasn't reached yet is further away than every commit visited at a
+        higher level, so the walk stops after the closest tag plus about
+        as many commits again. The distance of each tag is counted with a
+        walk that stops expanding commits below the tag's level as soon
+        as they are all reachable from it.
+
+        Returns None when 'git describe' might disagree: with clock skew
+        (it walks by date) or when it would give up before reaching the
+        closest tag.
+        """
+        skewed = False
+
+        def exclusive(base: str) -> Tuple[int, int]:
+            # (commits reachable from head but not from base, tags among them)
+            nonlocal skewed
+            flags = {head: 1, base: 2}  # 1: from head, 2: from base
+            queue = [(-self.level(c), c) for c in flags]
+            heapq.heapify(queue)
+            pending = 1  # queued commits only reachable from head
+            count = tags = 0
+            while pending:
+                c = heapq.heappop(queue)[1]
+                flag = flags[c]
+                if flag == 1:
+                    pending -= 1
+                    count += 1
+                    tags += c in names
+                when = self.read_commit(c)[2]
+                for p in self.read_commit(c)[1]:
+                    skewed = skewed or self.read_commit(p)[2] > when
+                    old = flags.get(p)
+                    if old is None:
+                        flags[p] = flag
+                        pending += flag == 1
+                        heapq.heappush(queue, (-self.level(p), p))
+                    elif old == 1 and flag != 1:
+                        flags[p] = 3
+                        pending -= 1
+                    else:
+                        flags[p] = old | flag
+            return count, tags
+
+        # each candidate: (distance, -date, found order, name, tags in between)
+        best: Optional[Tuple[int, int, int, str, int]] = None
+        counter = 0
+        queue = [(-self.level(head), -self.read_commit(head)[2], counter, head)]
+        seen = {head}
+        popped = 0
+        at_level: Dict[int, int] = {}
+        while queue:
+            level = -queue[0][0]
+            # the tags left can't reach the commits visited above this
+            # level, so they are at least that many commits away
+            if best is not None and best[0] < popped - at_level.get(level, 0):
+                break
+            _, date, order, c = heapq.heappop(queue)
+            if c in names and (best is None or
+                               popped - at_level.get(level, 0) <= best[0]):
+                distance, tags = exclusive(c)
+                found = (distance, date, order, names[c][1], tags)
+                if best is None or found[:3] < best[:3]:
+                    best = found
+            popped += 1
+            at_level[level] = at_level.get(level, 0) + 1
+            when = self.read_commit(c)[2]
+            for p in self.read_commit(c)[1]:
+                if p not in seen:
+                    seen.add(p)
+                    skewed = skewed or self.read_commit(p)[2] > when
+                    counter += 1
+                    heapq.heappush(queue, (-self.level(p),
+                                           -self.read_commit(p)[2], counter, p))
+        if skewed or (best is not None and best[4] >= DESCRIBE_CANDIDATES):
+            return None
+        if best is None:
+            return None, popped
+        return best[3], best[0]
+
+    def contains(self, tip: str, commit: str) -> bool:
+        """Tell whether commit is reachable from tip."""
+        target = self.generation(commit)
+        seen = {tip}
+        todo = [tip] if self.generation(tip) >= target else []
+        while todo:
+            c = todo.pop()
+            if c == commit:
+                return True
+            for p in self.read_commit(c)[1]:
+                # commits of a lower generation than commit can't reach it
+                if p not in seen and self.generation(p) >= target:
+                    seen.add(p)
+                    todo.append(p)
+        return False
+
+    def branch(self, head: str) -> Optional[str]:
+        """Find the branch HEAD is on, like git_pieces_from_vcs() does.
+
+        When HEAD is detached, only the branches whose tip isn't HEAD but
+        which could still be picked over those that are get their history
+        walked (see git_branches_to_check()).
+        """
+        with open(os.path.join(self.git_dir, "HEAD")) as fobj:
+            value = fobj.read().strip()
+        if value.startswith("ref: refs/heads/"):
+            return value[len("ref: refs/heads/"):]
+        heads = {ref[len("refs/heads/"):]: sha
+                 for ref, sha in self.refs("refs/heads/").items()}
+        tips = [name for name, sha in heads.items() if sha == head]
+        check = git_branches_to_check(list(heads), tips)
+        branches = tips + [name for name in sorted(heads if check is None
+                                                   else check)
+                           if self.contains(heads[name], head)]
+        return git_pick_branch(sorted(set(branches)))
+
+    def abbrev(self, sha: str) -> str:
+        """Shorten sha the way git does by default: 7+ unambiguous digits."""
+        count = sum(pack.count for pack in self.find_packs())
+        length = max(7, (count.bit_length() + 1) // 2)
+        while length < len(sha) and self.is_ambiguous(sha[:length]):
+            length += 1
+        return sha[:length]
+
+    def is_ambiguous(self, prefix: str) -> bool:
+        """Tell whether more than one object id starts with prefix."""
+        found: Set[str] = set()
+        for objects in self.object_dirs:
+            try:
+                names = os.listdir(os.path.join(objects, prefix[:2]))
+            except OSError:
+                continue
+            found.update(prefix[:2] + name for name in names
+                         if name.startswith(prefix[2:]))
+        first = bytes.fromhex(prefix[:2])[0]
+        for pack in self.find_packs():
+            found.update(name for name in pack.shas(first)
+                         if name.startswith(prefix))
+        return len(found) > 1
+
+    def commit_date(self, sha: str) -> str:
+        """Format a commit's date like git's %ci does."""
+        _, _, when, tz = self.read_commit(sha)
+        if not tz:
+            _, _, when, tz = self.parse_commit(sha)
+        return format_git_date(when, tz)
+
+
+@register_vcs_handler("git", "pieces_from_gitdir")
+def git_pieces_from_gitdir(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    runner: Callable = run_command,
+    combine_queries: bool = False,
+    fields: Optional[AbstractSet[str]] = None,
+    dirty_from: Optional[Callable[[str], bool]] = None,
+    scope: Optional[List[str]] = None,
+    tag_index: bool = False,
+) -> Pieces:
+    """Get version pieces by reading the .git directory directly.
+
+    This produces the same pieces as git_pieces_from_vcs() without starting
+    any git process. Repositories using features this reader doesn't
+    support (linked worktrees, submodules, SHA-256, ...), and
+    distances over a path scope, are handed over to git_pieces_from_vcs().
+    With tag_index, the tags are looked up in the index kept by
+    GitDir.tag_names().
+    """
+    found = find_git_dir(root)
+    if found is None:
+        if verbose:
+            print("Directory %s not under git control" % root)
+        raise NotThisMethod("no .git directory found")
+
+    try:
+        if scope is not None:
+            raise NotThisMethod("path scopes are not supported")
+        repo = GitDir(*found)
+        full = repo.resolve_ref("HEAD")
+        if full is None:
+            raise NotThisMethod("HEAD does not point at a commit")
+        names = repo.tag_names(tag_prefix, tag_index)
+        tag, distance = repo.describe(full, names)
+        pieces = Pieces()
+        pieces["long"] = full
+        pieces["short"] = repo.abbrev(full)
+        pieces["error"] = None
+        pieces["branch"] = None
+        if fields is None or "branch" in fields:
+            pieces["branch"] = repo.branch(full)
+        pieces["dirty"] = (dirty_from or repo.is_dirty)(full)
+        if tag is not None and not tag.startswith(tag_prefix):
+            if verbose:
+                fmt = "tag '%s' doesn't start with prefix '%s'"
+                print(fmt % (tag, tag_prefix))
+            pieces["error"] = ("tag '%s' doesn't start with prefix '%s'"
+                               % (tag, tag_prefix))
+            return pieces
+        if tag is None:
+            pieces["short"] = full[:7]
+        pieces["closest-tag"] = tag[len(tag_prefix):] if tag is not None else None
+        pieces["distance"] = distance
+        date = repo.commit_date(full)
+    except (NotThisMethod, OSError, ValueError, IndexError, struct.error,
+            zlib.error) as e:
+        # anything unexpected is left to git, too
+        trace("fallback", name="pieces_from_gitdir", root=root,
+              exception=type(e).__name__, message=str(e))
+        if verbose:
+            print("unable to read %s directly (%s), running git" % (found[0], e))
+        return git_pieces_from_vcs(tag_prefix, root, verbose, runner=runner,
+                                   combine_queries=combine_queries,
+                                   fields=fields, dirty_from=dirty_from,
+                                   scope=scope)
+    # commit date: see ISO-8601 comment in git_versions_from_keywords()
+    pieces["date"] = date.strip().replace(" ", "T", 1).replace(" ", "", 1)
+    return pieces
+
+
+class GitBatch:
+    """A 'git cat-file --batch' process kept running for one source tree.
+
+    Object and ref lookups are written to its stdin and answered on its
+    stdout, so they don't cost a git process each. The git directory is
+    looked up once, when the process starts.
+    """
+
+    def __init__(self, commands: List[str], root: str,
+                 env: Optional[Dict[str, str]] = None,
+                 timeout: Optional[float] = None) -> None:
+        """Start 'git cat-file --batch' in root. Raises OSError on failure."""
+        git_dir, rc = run_command(commands, ["rev-parse", "--git-dir"],
+                                  cwd=root, hide_stderr=True, env=env,
+                                  timeout=timeout)
+        if rc != 0 or git_dir is None:
+            raise OSError("%s is not in a git repository" % root)
+        self.git_dir = git_dir
+        self.git_path = os.path.join(root, git_dir)
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.process: Optional[subprocess.Popen] = None
+        for command in commands:
+            try:
+                self.process = subprocess.Popen(
+                    [command, "cat-file", "--batch"], cwd=root, env=env,
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL)
+                break
+            except FileNotFoundError:
+                continue
+        if self.process is None:
+            raise OSError("unable to find command, tried %s" % (commands,))
+        trace("subprocess", argv=[command, "cat-file", "--batch"], cwd=root,
+              coprocess=True)
+
+    def is_usable(self) -> bool:
+        """Tell whether this process can answer queries in this process.
+
+        After a fork, the child must not share the parent's pipes; it
+        starts its own coprocess instead.
+        """
+        return (self.pid == os.getpid() and self.process is not None
+                and self.process.poll() is None)
+
+    def query(self, *names: str, timeout: Optional[float] = None,
+              ) -> List[Optional[Tuple[str, str, bytes]]]:
+        """Look up objects by name (e.g. "HEAD" or "v1.0^{commit}").
+
+        All names are sent before reading the answers, so the lookups are
+        pipelined. Each answer is (id, type, contents), or None if the name
+        doesn't resolve. Like run_command(), a query that takes longer than
+        timeout seconds, or than what is left of the time_budget(), kills
+        the process. Raises OSError if the process died or was killed.
+        """
+        process = self.process
+        assert process is not None
+        assert process.stdin is not None
+        assert process.stdout is not None
+        timeout = command_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            trace("coprocess", names=list(names), duration=0, timed_out=True)
+            raise OSError("no time left to query git cat-file")
+        start = time.perf_counter()
+        answers: List[Optional[Tuple[str, str, bytes]]] = []
+        # reading blocks, so the timeout is enforced from another thread
+        expired = threading.Event()
+
+        def expire() -> None:
+            expired.set()
+            process.kill()
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+        with self.lock:
+            if timer is not None:
+                timer.start()
+            try:
+                process.stdin.write(
+                    b"".join(name.encode() + b"\n" for name in names))
+                process.stdin.flush()
+                for _ in names:
+                    header = process.stdout.readline().split()
+                    if not header:
+                        raise OSError("git cat-file %s" % (
+                            "timed out" if expired.is_set() else "exited"))
+                    if len(header) != 3:  # "NAME missing" or "NAME ambiguous"
+                        answers.append(None)
+                        continue
+                    body = process.stdout.read(int(header[2]) + 1)[:-1]
+                    answers.append((header[0].decode(), header[1].decode(),
+                                    body))
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                trace("coprocess", names=list(names),
+                      duration=time.perf_counter() - start,
+                      timed_out=expired.is_set())
+        if expired.is_set():
+            # the answers may be cut short
+            raise OSError("git cat-file timed out")
+        return answers
+
+    def read_head(self) -> Optional[str]:
+        """Read what HEAD points at: a ref name, or a commit id if detached.
+
+        Returns None if HEAD isn't a plain file we understand.
+        """
+        try:
+            with open(os.path.join(self.git_path, "HEAD")) as fobj:
+                value = fobj.read().strip()
+        except OSError:
+            return None
+        if value.startswith("ref: "):
+            value = value[len("ref: "):]
+            # HEAD of a repository with the reftable ref storage
+            return None if value == "refs/heads/.invalid" else value
+        return value if re.fullmatch(r"[0-9a-f]{40}", value) else None
+
+    def branch_names(self) -> Optional[List[str]]:
+        """List the local branches, from the loose refs and packed-refs.
+
+        Only their names are read: cat-file resolves them. Returns None if
+        the refs aren't stored as files.
+        """
+        common_dir = self.git_path
+        try:
+            with open(os.path.join(self.git_path, "commondir")) as fobj:
+                common_dir = os.path.join(self.git_path, fobj.read().strip())
+        except OSError:
+            pass
+        heads = os.path.join(common_dir, "refs", "heads")
+        if not os.path.isdir(heads):
+            return None
+        names: Set[str] = set()
+        for dirpath, _, filenames in os.walk(heads):
+            for filename in filenames:
+                if not filename.endswith(".lock"):
+                    path = os.path.relpath(os.path.join(dirpath, filename),
+                                           heads)
+                    names.add(path.replace(os.sep, "/"))
+        try:
+            with open(os.path.join(common_dir, "packed-refs")) as fobj:
+                for line in fobj:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1].startswith("refs/heads/"):
+                        names.add(parts[1][len("refs/heads/"):])
+        except OSError:
+            pass
+        return sorted(names)
+
+    def detach(self) -> None:
+        """Let go of a process started before a fork, in the child.
+
+        The child's copies of the pipes are closed, so the process still
+        sees its stdin close when the parent stops it.
+        """
+        if self.process is None:
+            return
+        for pipe in (self.process.stdin, self.process.stdout):
+            if pipe is not None:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+        self.process = None
+
+    def close(self) -> None:
+        """Stop the process, if it belongs to this process."""
+        if self.process is None or self.pid != os.getpid():
+            return
+        try:
+            assert self.process.stdin is not None
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        if self.process.stdout is not None:
+            self.process.stdout.close()
+        self.process = None
+
+
+# the running coprocesses, by source tree, git commands and environment
+GIT_BATCHES: Dict[Tuple[str, Tuple[str, ...],
+                        Optional[Tuple[Tuple[str, str], ...]]],
+                  GitBatch] = {}
+GIT_BATCHES_LOCK = threading.Lock()
+
+
+def git_batch(commands: List[str], root: str,
+              env: Optional[Dict[str, str]] = None,
+              timeout: Optional[float] = None) -> GitBatch:
+    """Get the coprocess of root, starting one if needed.
+
+    Callers running git differently (another command, or another
+    environment, e.g. GIT_DIR) get a coprocess of their own.
+    """
+    key = (os.path.realpath(root), tuple(commands),
+           None if env is None else tuple(sorted(env.items())))
+    with GIT_BATCHES_LOCK:
+        batch = GIT_BATCHES.get(key)
+        if batch is None or not batch.is_usable():
+            batch = GIT_BATCHES[key] = GitBatch(commands, root, env, timeout)
+    return batch
+
+
+@atexit.register
+def close_git_batches() -> None:
+    """Stop all coprocesses."""
+    with GIT_BATCHES_LOCK:
+        for batch in GIT_BATCHES.values():
+            batch.close()
+        GIT_BATCHES.clear()
+
+
+def forget_git_batches() -> None:
+    """Drop the coprocesses of the parent, in a forked child.
+
+    They keep serving the parent; the child starts its own when it needs
+    one. The lock is replaced, as another thread may have held it during
+    the fork.
+    """
+    global GIT_BATCHES_LOCK
+    GIT_BATCHES_LOCK = threading.Lock()
+    for batch in GIT_BATCHES.values():
+        batch.detach()
+    GIT_BATCHES.clear()
+
+
+if hasattr(os, "register_at_fork"):  # not on Windows
+    os.register_at_fork(after_in_child=forget_git_batches)
+
+
+@register_vcs_handler("git", "batch_runner")
+def git_batch_runner(
+    commands: List[str],
+    args: List[str],
+    cwd: Optional[str] = None,
+    verbose: bool = False,
+    hide_stderr: bool = False,
+    env: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[int]]:
+    """Run git like run_command(), answering what it can from a GitBatch.
+
+    This is a runner for git_pieces_from_vcs(): the queries in
+    BATCH_QUERIES are answered by the coprocess of cwd, each with a single
+    pipelined query. The ref lookups resolve the names read from HEAD and
+    the refs directory there, so 'rev-parse --abbrev-ref HEAD' and the
+    list of branches (for a detached HEAD) cost no git process either.
+    'describe', 'branch --contains' and 'rev-list --count' still start one
+    each, since 'git cat-file' can't answer them (and describe abbreviates
+    the revision id the way 'git cat-file' can't tell). So does every
+    query if the coprocess can't be started, can't answer it, fails or runs
+    out of time (the timeout, and the time_budget(), apply to the coprocess
+    as they do to run_command()).
+    """
+    if cwd is not None and args in BATCH_QUERIES:
+        try:
+            batch = git_batch(commands, cwd, env, timeout)
+            out = git_batch_answer(batch, args, timeout)
+        except OSError as e:
+            if verbose:
+                print("unable to use git cat-file --batch: %s" % e)
+            out = None
+        if out is not None:
+            return out, 0
+    return run_command(commands, args, cwd=cwd, verbose=verbose,
+                       hide_stderr=hide_stderr, env=env, timeout=timeout)
+
+
+# the queries of git_pieces_from_vcs() that git_batch_answer() knows
+BATCH_QUERIES = [
+    ["rev-parse", "--git-dir"],
+    ["rev-parse", "HEAD"],
+    ["show", "-s", "--format=%H%n%ci", "HEAD"],
+    ["rev-parse", "--abbrev-ref", "HEAD"],
+    ["for-each-ref", "--format=%(objectname) %(refname)", "refs/heads/"],
+]
+
+
+def git_batch_answer(batch: GitBatch, args: List[str],
+                     timeout: Optional[float] = None) -> Optional[str]:
+    """Answer one of BATCH_QUERIES like git would, or return None."""
+    if args[1] == "--git-dir":
+        return batch.git_dir
+    if args[0] == "for-each-ref":
+        names = batch.branch_names()
+        if names is None:
+            return None
+        refs = ["refs/heads/" + name for name in sorted(names)]
+        if not refs:
+            return ""
+        return "\n".join("%s %s" % (tip[0], ref) for ref, tip
+                         in zip(refs, batch.query(*refs, timeout=timeout))
+                         if tip is not None)
+    if args[1] == "--abbrev-ref":
+        target = batch.read_head()
+        if target is None:
+            return None
+        if not target.startswith("refs/heads/"):
+            # detached, if HEAD holds a commit id
+            head = batch.query("HEAD", timeout=timeout)[0]
+            return "HEAD" if head is not None and head[0] == target else None
+        branch = target[len("refs/heads/"):]
+        # git abbreviates to "heads/BRANCH" if a tag or remote has the name
+        head, tag, remote = batch.query("HEAD", "refs/tags/" + branch,
+                                        "refs/remotes/" + branch,
+                                        timeout=timeout)
+        if head is None or tag is not None or remote is not None:
+            return None
+        return branch
+    head = batch.query("HEAD", timeout=timeout)[0]
+    if head is None or head[1] != "commit":
+        return None
+    sha, _, body = head
+    if args[0] == "rev-parse":
+        return sha
+    headers = body.split(b"\n\n", 1)[0].decode("utf-8", "replace")
+    for line in headers.splitlines():
+        if line.startswith("committer "):
+            when, tz = line.rsplit(" ", 2)[1:]
+            return "%s\n%s" % (sha, format_git_date(int(when), tz))
+    return None
+
+
+VERSION_CACHE_FILE = "versioneer-cache.json"
+# version 2 stores pieces as Pieces.to_json() lists
+VERSION_CACHE_FORMAT = 2
+
+
+def git_fingerprint(repo: GitCheckout) -> List[Any]:
+    """Describe the state of a repository that version pieces depend on.
+
+    This is the target of HEAD and the stat data of the files and
+    directories holding branches and tags, i.e. a few stat() calls. The
+    index and the checked-out files only matter for the dirty flag, which
+    git_pieces_from_cache() handles separately ('git describe --dirty'
+    rewrites the index anyway).
+    """
+    with open(os.path.join(repo.git_dir, "HEAD")) as fobj:
+        fingerprint: List[Any] = [fobj.read().strip(), repo.resolve_ref("HEAD")]
+    for name in ["packed-refs", "shallow"]:
+        try:
+            st = os.stat(os.path.join(repo.git_dir, name))
+            fingerprint.append([name, st.st_mtime_ns, st.st_size])
+        except OSError:
+            fingerprint.append([name, None, None])
+    # Refs are updated by renaming a lockfile into place, which also changes
+    # the mtime of the directory they are in.
+    for top in ["refs/heads", "refs/tags"]:
+        for dirpath, _, _ in os.walk(os.path.join(repo.git_dir, top)):
+            st = os.stat(dirpath)
+            fingerprint.append([os.path.relpath(dirpath, repo.git_dir),
+                                st.st_mtime_ns, st.st_size])
+    return fingerprint
+
+
+def read_version_cache(git_dir: str) -> Dict[str, Any]:
+    """Read the cache entries stored in git_dir, or {} if there are none."""
+    import json
+    try:
+        with open(os.path.join(git_dir, VERSION_CACHE_FILE)) as fobj:
+            cache = json.load(fobj)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != VERSION_CACHE_FORMAT:
+        return {}
+    return cache.get("entries", {})
+
+
+def write_version_cache(git_dir: str, entries: Dict[str, Any]) -> None:
+    """Atomically replace the cache file in git_dir."""
+    import json
+    import threading
+    filename = os.path.join(git_dir, VERSION_CACHE_FILE)
+    # unique per thread, too: the cache is written from worker threads
+    tmp = "%s.%d.%d.tmp" % (filename, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp, "w") as fobj:
+            json.dump({"version": VERSION_CACHE_FORMAT, "entries": entries},
+                      fobj)
+        os.replace(tmp, filename)
+    except OSError:
+        # a read-only checkout just doesn't get a cache
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+@register_vcs_handler("git", "pieces_from_cache")
+def git_pieces_from_cache(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    pieces_from: Callable,
+    check_dirty: bool = True,
+    dirty_scope: Optional[List[str]] = None,
+    **kwargs: Any,
+) -> Pieces:
+    """Get version pieces from the cache in .git, or compute and store them.
+
+    pieces_from (e.g. git_pieces_from_vcs) is called with the remaining
+    arguments when the cached pieces are missing or out of date. Entries
+    remember which fields (see render.style_fields()) they were computed
+    for, and only answer calls that need no more than that.
+
+    The dirty flag of cached pieces is rechecked (and stored if it changed)
+    unless check_dirty is false, in which case a hit costs only the stat()
+    calls of git_fingerprint() and of the index, and the dirty flag is the
+    one last stored. Entries are then also out of date when the index
+    changed since they were stored, e.g. after 'git add' or 'git status'.
+    The recheck uses the dirty_from argument for pieces_from, if given;
+    dirty_scope names the paths that dirty_from limits itself to. Pieces
+    computed for a path scope or dirty scope are stored separately for each
+    root and scope.
+    """
+    import json
+    fields = kwargs.get("fields")
+    dirty_from = kwargs.get("dirty_from")
+    key = tag_prefix
+    if kwargs.get("scope") is not None or dirty_scope is not None:
+        key = json.dumps([tag_prefix, os.path.abspath(root), kwargs.get("scope"),
+                          dirty_scope])
+    found = find_git_dir(root)
+    repo: Optional[GitCheckout] = None
+    fingerprint = None
+    if found is not None:
+        try:
+            repo = GitCheckout(*found)
+            fingerprint = git_fingerprint(repo)
+        except (NotThisMethod, OSError):
+            repo = None
+
+    if repo is not None:
+        entry = read_version_cache(repo.git_dir).get(key)
+        if (entry and entry.get("fingerprint") == fingerprint
+                and (check_dirty
+                     or entry.get("index") == git_index_stat(repo.git_dir))
+                and (entry.get("fields") is None
+                     or (fields is not None
+                         and set(fields) <= set(entry["fields"])))):
+            try:
+                pieces = Pieces.from_json(entry["pieces"])
+                if check_dirty and not pieces["error"]:
+                    dirty = pieces["dirty"]
+                    pieces["dirty"] = (dirty_from or repo.is_dirty)(
+                        pieces["long"])
+                    if pieces["dirty"] != dirty:
+                        entry["pieces"] = pieces.to_json()
+                        entry["index"] = git_index_stat(repo.git_dir)
+                        entries = read_version_cache(repo.git_dir)
+                        entries[key] = entry
+                        write_version_cache(repo.git_dir, entries)
+                if verbose:
+                    print("got pieces from %s" % VERSION_CACHE_FILE)
+                return pieces
+            except (NotThisMethod, OSError, ValueError):
+                pass
+
+    pieces = pieces_from(tag_prefix, root, verbose, **kwargs)
+    if repo is not None:
+        # This uses the fingerprint taken before computing the pieces, so
+        # changes made meanwhile make the entry stale rather than wrong.
+        entries = read_version_cache(repo.git_dir)
+        # The index is stat()ed afterwards, though: 'git describe --dirty'
+        # may have refreshed it.
+        entries[key] = {
+            "fingerprint": fingerprint, "pieces": pieces.to_json(),
+            "fields": None if fields is None else sorted(fields),
+            "index": git_index_stat(repo.git_dir)}
+        write_version_cache(repo.git_dir, entries)
+    return pieces
+
+
+# the Unix socket 'versioneer serve' listens on, inside the .git directory
+VERSION_DAEMON_SOCKET = "versioneer.sock"
+
+
+@register_vcs_handler("git", "pieces_from_daemon")
+def git_pieces_from_daemon(
+    tag_prefix: str,
+    root: str,
+    verbose: bool,
+    fields: Optional[AbstractSet[str]] = None,
+    timeout: float = 2.0,
+) -> Pieces:
+    """Get version pieces from a running 'versioneer serve'.
+
+    Raises NotThisMethod (quickly, when there is no socket) if no daemon
+    answers for the repository of root.
+    """
+    # _version.py only needs these when the daemon is asked
+    import json
+    import socket
+    found = find_git_dir(root)
+    if found is None or not hasattr(socket, "AF_UNIX"):
+        raise NotThisMethod("no version daemon")
+    timeout = command_timeout(timeout) or 0.0
+    if timeout <= 0:
+        raise NotThisMethod("time budget exceeded")
+    request = {"root": os.path.abspath(root), "tag_prefix": tag_prefix,
+               "fields": None if fields is None else sorted(fields)}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(os.path.join(found[0], VERSION_DAEMON_SOCKET))
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            with sock.makefile("rb") as fobj:
+                reply = json.loads(fobj.readline())
+    except (OSError, ValueError) as e:
+        raise NotThisMethod("no version daemon (%s)" % e)
+    if not isinstance(reply, dict) or "pieces" not in reply:
+        raise NotThisMethod("version daemon failed: %s" % (reply,))
+    try:
+        pieces = Pieces.from_json(reply["pieces"])
+    except ValueError as e:
+        raise NotThisMethod("version daemon failed: %s" % e)
+    if verbose:
+        print("got pieces from the version daemon")
+    return pieces
+
+
+def git_common_dir(git_dir: str) -> str:
+    """Get the directory with the refs shared by the worktrees of git_dir."""
+    try:
+        with open(os.path.join(git_dir, "commondir")) as fobj:
+            return os.path.normpath(os.path.join(git_dir, fobj.read().strip()))
+    except OSError:
+        return git_dir
+
+
+def git_watch_state(git_dir: str) -> List[Any]:
+    """Get the stat data of the files that version pieces depend on.
+
+    These are HEAD, packed-refs and every directory below refs/ (refs are
+    updated by renaming a lockfile into place, which changes the mtime of
+    the directory they are in). The index is left out: it only matters to
+    the dirty flag, which VersionDaemon.dirty() checks separately, and
+    'git describe --dirty' (or 'git status') rewrites the index without
+    changing any version piece.
+    """
+    common_dir = git_common_dir(git_dir)
+    paths = [os.path.join(git_dir, "HEAD")]
+    paths += [os.path.join(common_dir, name) for name in GIT_WATCHED_NAMES
+              if name != "HEAD"]
+    for dirpath, _, _ in os.walk(os.path.join(common_dir, "refs")):
+        paths.append(dirpath)
+    state: List[Any] = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            state.append([path, st.st_ino, st.st_mtime_ns, st.st_size])
+        except OSError:
+            state.append([path, None, None, None])
+    return state
+
+
+# the files outside refs/ that version pieces depend on
+GIT_WATCHED_NAMES = ["HEAD", "packed-refs", "shallow"]
+
+# inotify(7) event masks
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+                | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+                | IN_MOVE_SELF | IN_ONLYDIR)
+
+
+class InotifyWatcher:
+    """Watch directories for changes with Linux's inotify(7).
+
+    create() returns None where inotify isn't available, and VersionDaemon
+    then polls stat data instead.
+    """
+
+    def __init__(self, libc: Any, fd: int) -> None:
+        """Use the inotify instance fd, created with libc."""
+        self.libc = libc
+        self.fd = fd
+        # watch descriptor -> watched directory
+        self.paths: Dict[int, str] = {}
+
+    @classmethod
+    def create(cls) -> Optional["InotifyWatcher"]:
+        """Create an inotify instance, or return None if we can't."""
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def watch(self, path: str) -> bool:
+        """Watch the directory path, returning False if we can't.
+
+        Watching a directory again is cheap (and keeps its watch), so this
+        can be called again for everything after directories were replaced.
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         INOTIFY_MASK)
+        if wd < 0:
+            return False
+        self.paths[wd] = path
+        return True
+
+    def changes(self) -> Optional[List[Tuple[str, str]]]:
+        """Read the pending events, as (directory, name) pairs.
+
+        Returns None if events were lost because too many were pending, in
+        which case anything may have changed.
+        """
+        changes: List[Tuple[str, str]] = []
+        lost = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+                offset += 16 + length
+                if mask & IN_Q_OVERFLOW:
+                    lost = True
+                elif mask & IN_IGNORED:
+                    self.paths.pop(wd, None)
+                elif wd in self.paths:
+                    changes.append((self.paths[wd], os.fsdecode(name)))
+        return None if lost else changes
+
+    def close(self) -> None:
+        """Stop watching."""
+        os.close(self.fd)
+
+
+class VersionEntry(NamedTuple):
+    """Version pieces remembered by a VersionDaemon."""
+
+    state: Any  # VersionDaemon.watch_state() when they were computed
+    pieces: Pieces
+
+
+class DirtyEntry(NamedTuple):
+    """A dirty flag remembered by a VersionDaemon."""
+
+    head: str
+    index_stat: Optional[List[int]]
+    check: Optional[DirtyCheck]  # None if the index differs from HEAD
+    generation: int  # VersionDaemon.tree_generation when it was checked
+    dirty: bool
+
+
+class VersionDaemon:
+    """Remember the version pieces of one repository, and serve them.
+
+    Requests are answered on a Unix socket in the .git directory, see
+    git_pieces_from_daemon(). Where inotify is available, it tells when
+    remembered pieces are out of date, and when checked-out files changed
+    since the dirty flag was last checked. Elsewhere, pieces are out of
+    date when git_watch_state() changes, and the checked-out files are
+    compared for each request. Either way, the index is only compared with
+    HEAD again after it changed.
+    """
+
+    def __init__(self, git_dir: str, work_tree: str,
+                 verbose: bool = False) -> None:
+        """Listen on the socket in git_dir."""
+        self.git_dir = git_dir
+        self.common_dir = git_common_dir(git_dir)
+        self.work_tree = work_tree
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        # (tag_prefix, root, fields) -> pieces
+        self.entries: Dict[Tuple[str, str, Optional[Tuple[str, ...]]],
+                           VersionEntry] = {}
+        self.dirty_entry: Optional[DirtyEntry] = None
+        # bumped by the inotify events for refs and for checked-out files
+        self.git_generation = 0
+        self.tree_generation = 0
+        self.tree_watched = False
+        self.watcher = InotifyWatcher.create()
+        if self.watcher is not None and not self.watch_git_dir():
+            self.watcher.close()
+            self.watcher = None
+        self.socket_path = os.path.join(git_dir, VERSION_DAEMON_SOCKET)
+        self.server = socketserver.ThreadingUnixStreamServer(
+            self.socket_path, VersionDaemonHandler)
+        self.server.daemon_threads = True
+        cast(Any, self.server).versions = self
+
+    def watch_git_dir(self) -> bool:
+        """Watch the directories of git_watch_state() with inotify."""
+        assert self.watcher is not None
+        paths = [self.git_dir, self.common_dir]
+        paths += [dirpath for dirpath, _, _
+                  in os.walk(os.path.join(self.common_dir, "refs"))]
+        return all(self.watcher.watch(path) for path in paths)
+
+    def watch_tree(self, check: DirtyCheck) -> bool:
+        """Watch the directories of the checked-out files with inotify."""
+        if self.watcher is None:
+            return False
+        dirs = {b""}
+        for entry in check.entries:
+            path = os.path.dirname(entry.path)
+            while path not in dirs:
+                dirs.add(path)
+                path = os.path.dirname(path)
+        return all(self.watcher.watch(os.path.join(self.work_tree,
+                                                   os.fsdecode(path)))
+                   for path in sorted(dirs))
+
+    def read_events(self) -> None:
+        """Bump the generations for the pending inotify events."""
+        assert self.watcher is not None
+        changes = self.watcher.changes()
+        if changes is None:
+            self.git_generation += 1
+            self.tree_generation += 1
+            self.watch_git_dir()
+            return
+        refs = os.path.join(self.common_dir, "refs")
+        for directory, name in changes:
+            if directory == refs or directory.startswith(refs + os.sep):
+                self.git_generation += 1
+                path = os.path.join(directory, name)
+                if os.path.isdir(path):
+                    self.watch_git_dir()
+            elif directory in (self.git_dir, self.common_dir):
+                if name in GIT_WATCHED_NAMES:
+                    self.git_generation += 1
+            elif name != ".git":
+                self.tree_generation += 1
+
+    def watch_state(self) -> Any:
+        """Get what changes when remembered pieces are out of date."""
+        if self.watcher is None:
+            return git_watch_state(self.git_dir)
+        self.read_events()
+        return self.git_generation
+
+    def compute(self, tag_prefix: str, root: str,
+                fields: Optional[Tuple[str, ...]]) -> Pieces:
+        """Compute and remember the pieces. Call with self.lock held."""
+        key = (tag_prefix, root, fields)
+        state = self.watch_state()
+        try:
+            pieces = git_pieces_from_vcs(
+                tag_prefix, root, self.verbose,
+                fields=None if fields is None else set(fields))
+        except NotThisMethod:
+            self.entries.pop(key, None)
+            raise
+        self.entries[key] = VersionEntry(state, pieces)
+        return pieces.copy()
+
+    def dirty(self, head: str) -> bool:
+        """Tell whether the checkout is dirty. Call with self.lock held.
+
+        The index is only compared with HEAD when either changed, and the
+        checked-out files only when inotify can't tell that none changed.
+        """
+        index_stat = git_index_stat(self.git_dir)
+        repo = GitCheckout(self.git_dir, self.work_tree)
+        entry = self.dirty_entry
+        if (entry is not None and entry.head == head
+                and entry.index_stat == index_stat):
+            if self.tree_watched and entry.generation == self.tree_generation:
+                return entry.dirty
+            check = entry.check
+        else:
+            check = repo.index_check(head)
+            self.tree_watched = check is not None and self.watch_tree(check)
+        # files changed while they are compared bump this, so they are
+        # compared again for the next request
+        generation = self.tree_generation
+        dirty = check is None or repo.files_modified(check)
+        self.dirty_entry = DirtyEntry(head, index_stat, check, generation,
+                                      dirty)
+        return dirty
+
+    def pieces(self, tag_prefix: str, root: str,
+               fields: Optional[Tuple[str, ...]]) -> Pieces:
+        """Get the pieces for a request, computing them if needed."""
+        root = os.path.realpath(root)
+        with self.lock:
+            entry = self.entries.get((tag_prefix, root, fields))
+            if entry is not None and entry.state == self.watch_state():
+                pieces = entry.pieces.copy()
+                if pieces["error"]:
+                    return pieces
+                try:
+                    pieces["dirty"] = self.dirty(pieces["long"])
+                    return pieces
+                except (NotThisMethod, OSError, ValueError):
+                    self.dirty_entry = None
+            return self.compute(tag_prefix, root, fields)
+
+    def refresh(self) -> None:
+        """Recompute the remembered pieces that are out of date."""
+        with self.lock:
+            state = self.watch_state()
+            for key, entry in list(self.entries.items()):
+                if entry.state != state:
+                    try:
+                        self.compute(*key)
+                    except NotThisMethod:
+                        pass
+
+    def close(self) -> None:
+        """Stop listening and remove the socket."""
+        self.server.server_close()
+        if self.watcher is not None:
+            self.watcher.close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+class VersionDaemonHandler(socketserver.StreamRequestHandler):
+    """Answer one JSON request for version pieces."""
+
+    def handle(self) -> None:
+        """Read the request line and write the reply line."""
+        versions: VersionDaemon = cast(Any, self.server).versions
+        reply: Dict[str, Any]
+        try:
+            request = json.loads(self.rfile.readline())
+            fields = request["fields"]
+            reply = {"pieces": versions.pieces(
+                request["tag_prefix"], request["root"],
+                None if fields is None else tuple(fields)).to_json()}
+        except (NotThisMethod, ValueError, KeyError, TypeError) as e:
+            reply = {"error": str(e)}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+def serve_versions(roots: List[str], interval: float = 1.0,
+                   verbose: bool = False) -> None:
+    """Serve the version pieces of the repositories of roots until interrupted.
+
+    Remembered pieces are recomputed when inotify reports a change in their
+    repository (or, without inotify, every interval seconds if it changed),
+    so requests rarely have to wait for git.
+    """
+    daemons: List[VersionDaemon] = []
+    for root in roots:
+        found = find_git_dir(root)
+        if found is None:
+            print("%s is not in a git repository" % root)
+            continue
+        if any(daemon.git_dir == found[0] for daemon in daemons):
+            continue
+        path = os.path.join(found[0], VERSION_DAEMON_SOCKET)
+        if os.path.exists(path):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.connect(path)
+                print("%s is already being served" % found[1])
+                continue
+            except OSError:
+                # left behind by a daemon that didn't exit cleanly
+                os.unlink(path)
+        daemons.append(VersionDaemon(found[0], found[1], verbose))
+        print("serving versions of %s on %s" % (found[1], path))
+
+    for daemon in daemons:
+        threading.Thread(target=daemon.server.serve_forever,
+                         daemon=True).start()
+    fds = [daemon.watcher.fd for daemon in daemons
+           if daemon.watcher is not None]
+    try:
+        while daemons:
+            if fds:
+                select.select(fds, [], [], interval)
+            else:
+                time.sleep(interval)
+            for daemon in daemons:
+                daemon.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for daemon in daemons:
+            daemon.server.shutdown()
+            daemon.close()
+
+
+GIT_HOOK_MARKER = "# installed by versioneer"
+
+GIT_HOOKS = ["post-commit", "post-checkout", "post-merge", "post-rewrite"]
+
+GIT_HOOK_SCRIPT = """#!/bin/sh
+%(MARKER)s, see git_hooks in setup.cfg
+# store the project's version in .git/versioneer-cache.json
+%(SKIP)sunset GIT_DIR GIT_INDEX_FILE GIT_WORK_TREE
+# the interpreter that installed the hook may be gone (e.g. a deleted venv)
+for python in %(PYTHON)s python3 python; do
+    if command -v "$python" >/dev/null 2>&1; then
+        cd ./%(PREFIX)s && "$python" -m versioneer refresh >/dev/null
+        break
+    fi
+done
+# a failed refresh only leaves the cache stale, so don't fail the git command
+exit 0
+"""
+
+
+def do_vcs_install(versionfile_source: str, ipy: Optional[str],
+                   hooks: bool = False) -> None:
+    """Git-specific installation logic for Versioneer.
+
+    For Git, this means creating/changing .gitattributes to mark _version.py
+    for export-subst keyword substitution, and with hooks, installing the
+    git hooks that keep the version cache up to date.
+    """
+    GITS = ["git"]
+    if sys.platform == "win32":
+        GITS = ["git.cmd", "git.exe"]
+    files = [versionfile_source]
+    if ipy:
+        files.append(ipy)
+    if "VERSIONEER_PEP518" not in globals():
+        try:
+            my_path = __file__
+            if my_path.endswith((".pyc", ".pyo")):
+                my_path = os.path.splitext(my_path)[0] + ".py"
+            versioneer_file = os.path.relpath(my_path)
+        except NameError:
+            versioneer_file = "versioneer.py"
+        files.append(versioneer_file)
+    present = False
+    try:
+        with open(".gitattributes", "r") as fobj:
+            for line in fobj:
+                if line.strip().startswith(versionfile_source):
+                    if "export-subst" in line.strip().split()[1:]:
+                        present = True
+                        break
+    except OSError:
+        pass
+    if not present:
+        with open(".gitattributes", "a+") as fobj:
+            fobj.write(f"{versionfile_source} export-subst\n")
+        files.append(".gitattributes")
+    run_command(GITS, ["add", "--"] + files)
+    if hooks:
+        install_git_hooks(GITS)
+
+
+def install_git_hooks(GITS: List[str]) -> None:
+    """Install hooks that refresh the version cache when HEAD moves.
+
+    Hooks that weren't installed by Versioneer are left alone.
+    """
+    hooks_dir, rc = run_command(GITS, ["rev-parse", "--git-path", "hooks"])
+    prefix, _ = run_command(GITS, ["rev-parse", "--show-prefix"])
+    if rc != 0 or hooks_dir is None or prefix is None:
+        print(" unable to find the git hooks directory, not installing hooks")
+        return
+    os.makedirs(hooks_dir, exist_ok=True)
+    for name in GIT_HOOKS:
+        hook = os.path.join(hooks_dir, name)
+        try:
+            with open(hook, "r") as fobj:
+                if GIT_HOOK_MARKER not in fobj.read():
+                    print(" %s exists, not replacing it" % hook)
+                    continue
+        except OSError:
+            pass
+        # post-checkout also runs when checking out files rather than a
+        # branch, which doesn't move HEAD
+        skip = 'test "$3" = 0 && exit 0\n' if name == "post-checkout" else ""
+        print(" installing %s" % hook)
+        with open(hook, "w") as fobj:
+            fobj.write(GIT_HOOK_SCRIPT % {
+                "MARKER": GIT_HOOK_MARKER,
+                "PREFIX": shlex.quote(prefix) if prefix else "",
+                "SKIP": skip,
+                "PYTHON": shlex.quote(sys.executable),
+            })
+        os.chmod(hook, 0o755)
+
+
+def versions_from_parentdir(
+    parentdir_prefix: str,
+    root: str,
+    verbose: bool,
+) -> Dict[str, Any]:
+    """Try to determine the version from the parent directory name.
+
+    Source tarballs conventionally unpack into a directory that includes both
+    the project name and a version string. We will also support searching up
+    two directory levels for an appropriately named parent directory
+    """
+    rootdirs = []
+
+    for _ in range(3):
+        dirname = os.path.basename(root)
+        if dirname.startswith(parentdir_prefix):
+            return {"version": dirname[len(parentdir_prefix):],
+                    "full-revisionid": None,
+                    "dirty": False, "error": None, "date": None}
+        rootdirs.append(root)
+        root = os.path.dirname(root)  # up a level
+
+    if verbose:
+        print("Tried directories %s but none started with prefix %s" %
+              (str(rootdirs), parentdir_prefix))
+    raise NotThisMethod("rootdir doesn't start with parentdir_prefix")
+
+
+SHORT_VERSION_PY = """
+# This file was generated by 'versioneer.py' (0+untagged.65.gfa90933.dirty) from
+# revision-control system data, or from the parent directory name of an
+# unpacked source archive. Distribution tarballs contain a pre-generated copy
+# of this file.
+
+import json
+
+version_json = '''
+%s
+'''  # END VERSION_JSON
+
+
+def get_versions():
+    return json.loads(version_json)
+"""
+
+
+def versions_from_file(filename: str) -> Dict[str, Any]:
+    """Try to determine the version from _version.py if present."""
+    try:
+        with open(filename) as f:
+            contents = f.read()
+    except OSError:
+        raise NotThisMethod("unable to read _version.py")
+    mo = re.search(r"version_json = '''\n(.*)'''  # END VERSION_JSON",
+                   contents, re.M | re.S)
+    if not mo:
+        mo = re.search(r"version_json = '''\r\n(.*)'''  # END VERSION_JSON",
+                       contents, re.M | re.S)
+    if not mo:
+        raise NotThisMethod("no version_json in _version.py")
+    return json.loads(mo.group(1))
+
+
+def write_to_version_file(filename: str, versions: Dict[str, Any]) -> None:
+    """Write the given version number to the given _version.py file."""
+    contents = json.dumps(versions, sort_keys=True,
+                          indent=1, separators=(",", ": "))
+    with open(filename, "w") as f:
+        f.write(SHORT_VERSION_PY % contents)
+
+    print("set %s to '%s'" % (filename, versions["version"]))
+
+
+def plus_or_dot(pieces: Mapping[str, Any]) -> str:
+    """Return a + if we don't already have one, else return a ."""
+    pieces = as_pieces(pieces)
+    if "+" in pieces.closest_tag:
+        return "."
+    return "+"
+
+
+def render_pep440(pieces: Mapping[str, Any]) -> str:
+    """Build up version string, with post-release "local version identifier".
+
+    Our goal: TAG[+DISTANCE.gHEX[.dirty]] . Note that if you
+    get a tagged build and then dirty it, you'll get TAG+0.gHEX.dirty
+
+    Exceptions:
+    1: no tags. git_describe was just HEX. 0+untagged.DISTANCE.gHEX[.dirty]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += plus_or_dot(pieces)
+            rendered += "%d.g%s" % (pieces.distance, pieces.short)
+            if pieces.dirty:
+                rendered += ".dirty"
+    else:
+        # exception #1
+        rendered = "0+untagged.%d.g%s" % (pieces.distance,
+                                          pieces.short)
+        if pieces.dirty:
+            rendered += ".dirty"
+    return rendered
+
+
+def render_pep440_branch(pieces: Mapping[str, Any]) -> str:
+    """TAG[[.dev0]+DISTANCE.gHEX[.dirty]] .
+
+    The ".dev0" means not master branch. Note that .dev0 sorts backwards
+    (a feature branch will appear "older" than the master branch).
+
+    Exceptions:
+    1: no tags. 0[.dev0]+untagged.DISTANCE.gHEX[.dirty]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            if pieces.branch != "master":
+                rendered += ".dev0"
+            rendered += plus_or_dot(pieces)
+            rendered += "%d.g%s" % (pieces.distance, pieces.short)
+            if pieces.dirty:
+                rendered += ".dirty"
+    else:
+        # exception #1
+        rendered = "0"
+        if pieces.branch != "master":
+            rendered += ".dev0"
+        rendered += "+untagged.%d.g%s" % (pieces.distance,
+                                          pieces.short)
+        if pieces.dirty:
+            rendered += ".dirty"
+    return rendered
+
+
+def pep440_split_post(ver: str) -> Tuple[str, Optional[int]]:
+    """Split pep440 version string at the post-release segment.
+
+    Returns the release segments before the post-release and the
+    post-release version number (or -1 if no post-release segment is present).
+    """
+    vc = str.split(ver, ".post")
+    return vc[0], int(vc[1] or 0) if len(vc) == 2 else None
+
+
+def render_pep440_pre(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postN.devDISTANCE] -- No -dirty.
+
+    Exceptions:
+    1: no tags. 0.post0.devDISTANCE
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        if pieces.distance:
+            # update the post release segment
+            tag_version, post_version = pep440_split_post(pieces.closest_tag)
+            rendered = tag_version
+            if post_version is not None:
+                rendered += ".post%d.dev%d" % (post_version + 1, pieces.distance)
+            else:
+                rendered += ".post0.dev%d" % (pieces.distance)
+        else:
+            # no commits, use the tag as the version
+            rendered = pieces.closest_tag
+    else:
+        # exception #1
+        rendered = "0.post0.dev%d" % pieces.distance
+    return rendered
+
+
+def render_pep440_post(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postDISTANCE[.dev0]+gHEX] .
+
+    The ".dev0" means dirty. Note that .dev0 sorts backwards
+    (a dirty tree will appear "older" than the corresponding clean one),
+    but you shouldn't be releasing software with -dirty anyways.
+
+    Exceptions:
+    1: no tags. 0.postDISTANCE[.dev0]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%d" % pieces.distance
+            if pieces.dirty:
+                rendered += ".dev0"
+            rendered += plus_or_dot(pieces)
+            rendered += "g%s" % pieces.short
+    else:
+        # exception #1
+        rendered = "0.post%d" % pieces.distance
+        if pieces.dirty:
+            rendered += ".dev0"
+        rendered += "+g%s" % pieces.short
+    return rendered
+
+
+def render_pep440_post_branch(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postDISTANCE[.dev0]+gHEX[.dirty]] .
+
+    The ".dev0" means not master branch.
+
+    Exceptions:
+    1: no tags. 0.postDISTANCE[.dev0]+gHEX[.dirty]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%d" % pieces.distance
+            if pieces.branch != "master":
+                rendered += ".dev0"
+            rendered += plus_or_dot(pieces)
+            rendered += "g%s" % pieces.short
+            if pieces.dirty:
+                rendered += ".dirty"
+    else:
+        # exception #1
+        rendered = "0.post%d" % pieces.distance
+        if pieces.branch != "master":
+            rendered += ".dev0"
+        rendered += "+g%s" % pieces.short
+        if pieces.dirty:
+            rendered += ".dirty"
+    return rendered
+
+
+def render_pep440_old(pieces: Mapping[str, Any]) -> str:
+    """TAG[.postDISTANCE[.dev0]] .
+
+    The ".dev0" means dirty.
+
+    Exceptions:
+    1: no tags. 0.postDISTANCE[.dev0]
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance or pieces.dirty:
+            rendered += ".post%d" % pieces.distance
+            if pieces.dirty:
+                rendered += ".dev0"
+    else:
+        # exception #1
+        rendered = "0.post%d" % pieces.distance
+        if pieces.dirty:
+            rendered += ".dev0"
+    return rendered
+
+
+def render_git_describe(pieces: Mapping[str, Any]) -> str:
+    """TAG[-DISTANCE-gHEX][-dirty].
+
+    Like 'git describe --tags --dirty --always'.
+
+    Exceptions:
+    1: no tags. HEX[-dirty]  (note: no 'g' prefix)
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        if pieces.distance:
+            rendered += "-%d-g%s" % (pieces.distance, pieces.short)
+    else:
+        # exception #1
+        rendered = pieces.short
+    if pieces.dirty:
+        rendered += "-dirty"
+    return rendered
+
+
+def render_git_describe_long(pieces: Mapping[str, Any]) -> str:
+    """TAG-DISTANCE-gHEX[-dirty].
+
+    Like 'git describe --tags --dirty --always -long'.
+    The distance/hash is unconditional.
+
+    Exceptions:
+    1: no tags. HEX[-dirty]  (note: no 'g' prefix)
+    """
+    pieces = as_pieces(pieces)
+    if pieces.closest_tag:
+        rendered = pieces.closest_tag
+        rendered += "-%d-g%s" % (pieces.distance, pieces.short)
+    else:
+        # exception #1
+        rendered = pieces.short
+    if pieces.dirty:
+        rendered += "-dirty"
+    return rendered
+
+
+# The renderer of each style. register_style() adds more.
+RENDERERS: Dict[str, Callable[[Pieces], str]] = {
+    "pep440": render_pep440,
+    "pep440-branch": render_pep440_branch,
+    "pep440-pre": render_pep440_pre,
+    "pep440-post": render_pep440_post,
+    "pep440-post-branch": render_pep440_post_branch,
+    "pep440-old": render_pep440_old,
+    "git-describe": render_git_describe,
+    "git-describe-long": render_git_describe_long,
+}
+
+# The pieces each style is rendered from. render() also reports "long",
+# "dirty", "error" and "date" for every style.
+STYLE_FIELDS: Dict[str, FrozenSet[str]] = {
+    "pep440": frozenset(["closest-tag", "distance", "short"]),
+    "pep440-branch": frozenset(["closest-tag", "distance", "short", "branch"]),
+    "pep440-pre": frozenset(["closest-tag", "distance"]),
+    "pep440-post": frozenset(["closest-tag", "distance", "short"]),
+    "pep440-post-branch": frozenset(["closest-tag", "distance", "short",
+                                     "branch"]),
+    "pep440-old": frozenset(["closest-tag", "distance"]),
+    "git-describe": frozenset(["closest-tag", "distance", "short"]),
+    "git-describe-long": frozenset(["closest-tag", "distance", "short"]),
+}
+
+# the pieces style templates can refer to
+TEMPLATE_FIELDS = frozenset(["closest-tag", "distance", "short", "long",
+                             "branch", "dirty", "date"])
+
+# compiled style templates, by template
+STYLE_TEMPLATE_MEMO: Dict[str, Tuple[Callable[[Mapping[str, Any]], str],
+                                     FrozenSet[str]]] = {}
+
+
+def register_style(name: str, renderer: Callable[[Pieces], str],
+                   fields: Optional[Iterable[str]] = None) -> None:
+    """Make render() support a style, rendered by renderer(pieces).
+
+    fields names the pieces renderer uses (see style_fields()); None means
+    it may use any of them.
+    """
+    RENDERERS[name] = renderer
+    if fields is None:
+        STYLE_FIELDS.pop(name, None)
+    else:
+        STYLE_FIELDS[name] = frozenset(fields)
+
+
+def is_style_template(style: str) -> bool:
+    """Tell whether a style is a template rather than the name of a style."""
+    return "{" in style
+
+
+def compile_style_template(
+    template: str,
+) -> Tuple[Callable[[Mapping[str, Any]], str], FrozenSet[str]]:
+    """Compile a style template into a renderer, and the pieces it uses.
+
+    In the template, {FIELD} is replaced by the piece FIELD (one of
+    TEMPLATE_FIELDS; None and False become ""), and a [...] group is only
+    included if each FIELD it contains is true, i.e. neither empty, zero,
+    None nor False. {?FIELD} and {!FIELD} add nothing to the text, but
+    require FIELD to be true or false, respectively, so they are only
+    allowed in a group. For example,
+    "[{closest-tag}][0{!closest-tag}][+{distance}.g{short}][.dirty{?dirty}]"
+    is close to the pep440 style. Compiled templates are remembered, so
+    compiling the same template again costs a dict lookup.
+
+    Raises ValueError if the template is malformed.
+    """
+    if template in STYLE_TEMPLATE_MEMO:
+        return STYLE_TEMPLATE_MEMO[template]
+    Part = Callable[[Pieces], str]
+    Condition = Callable[[Pieces], bool]
+    fields: Set[str] = set()
+
+    def literal(text: str) -> Part:
+        return lambda pieces: text
+
+    def field(name: str) -> Part:
+        slot = PIECES_SLOTS[name]
+
+        def render_field(pieces: Pieces) -> str:
+            value = getattr(pieces, slot, None)
+            return "" if value is None or value is False else str(value)
+        return render_field
+
+    def condition(name: str, wanted: bool) -> Condition:
+        slot = PIECES_SLOTS[name]
+        return lambda pieces: bool(getattr(pieces, slot, None)) is wanted
+
+    def group(parts: List[Part], conditions: List[Condition]) -> Part:
+        def render_group(pieces: Pieces) -> str:
+            for check in conditions:
+                if not check(pieces):
+                    return ""
+            return "".join([part(pieces) for part in parts])
+        return render_group
+
+    def parse(pos: int, in_group: bool) -> Tuple[Part, int]:
+        parts: List[Part] = []
+        conditions: List[Condition] = []
+        text: List[str] = []
+        while pos < len(template):
+            char = template[pos]
+            pos += 1
+            if char not in "{}[]":
+                text.append(char)
+                continue
+            if text:
+                parts.append(literal("".join(text)))
+                text = []
+            if char == "{":
+                end = template.find("}", pos)
+                if end < 0:
+                    raise ValueError("unclosed '{' in style template %r"
+                                     % template)
+                spec = template[pos:end]
+                pos = end + 1
+                name = spec.lstrip("?!")
+                if name not in TEMPLATE_FIELDS or len(spec) - len(name) > 1:
+                    raise ValueError("unknown field {%s} in style template %r"
+                                     % (spec, template))
+                if name != spec and not in_group:
+                    raise ValueError("{%s} outside [...] in style template %r"
+                                     % (spec, template))
+                fields.add(name)
+                conditions.append(condition(name, not spec.startswith("!")))
+                if name == spec:
+                    parts.append(field(name))
+            elif char == "[":
+                part, pos = parse(pos, True)
+                parts.append(part)
+            elif char == "]" and in_group:
+                return group(parts, conditions), pos
+            else:
+                raise ValueError("unbalanced %r in style template %r"
+                                 % (char, template))
+        if in_group:
+            raise ValueError("unclosed '[' in style template %r" % template)
+        if text:
+            parts.append(literal("".join(text)))
+        return group(parts, []), pos
+
+    render_template = parse(0, False)[0]
+
+    def renderer(pieces: Mapping[str, Any]) -> str:
+        return render_template(as_pieces(pieces))
+    STYLE_TEMPLATE_MEMO[template] = (renderer, frozenset(fields))
+    return STYLE_TEMPLATE_MEMO[template]
+
+
+def style_fields(style: str) -> Optional[FrozenSet[str]]:
+    """Return the names of the pieces render() needs for the given style.
+
+    None means all of them (for styles render() doesn't know).
+    """
+    if not style or style == "default":
+        style = "pep440"  # the default
+    if style in STYLE_FIELDS:
+        fields = STYLE_FIELDS[style]
+    elif style not in RENDERERS and is_style_template(style):
+        try:
+            fields = compile_style_template(style)[1]
+        except ValueError:
+            return None
+    else:
+        return None
+    return fields | {"long", "dirty", "error", "date"}
+
+
+def render(pieces: Mapping[str, Any], style: str) -> Dict[str, Any]:
+    """Render the given version pieces into the requested style.
+
+    The style is the name of a style in RENDERERS, or a style template (see
+    compile_style_template()). Renderers are given Pieces, so a dict of
+    pieces is copied into one first.
+    """
+    pieces = as_pieces(pieces)
+    if pieces.error:
+        return {"version": "unknown",
+                "full-revisionid": getattr(pieces, "long", None),
+                "dirty": None,
+                "error": pieces.error,
+                "date": None}
+
+    if not style or style == "default":
+        style = "pep440"  # the default
+
+    renderer = RENDERERS.get(style)
+    if renderer is None:
+        if not is_style_template(style):
+            raise ValueError("unknown style '%s'" % style)
+        renderer = compile_style_template(style)[0]
+    rendered = renderer(pieces)
+
+    return {"version": rendered, "full-revisionid": pieces.long,
+            "dirty": pieces.dirty, "error": None,
+            "date": getattr(pieces, "date", None)}
+
+
+class VersioneerBadRootError(Exception):
+    """The project root directory is unknown or missing key files."""
+
+
+# versions computed by get_versions(), by (root, repr of the config)
+VERSIONS_MEMO: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+def invalidate_versions(root: Optional[str] = None) -> None:
+    """Forget the versions (and configs) remembered by get_versions().
+
+    Tools that change the source tree (commit, tag, rewrite setup.cfg) while
+    setup.py is running should call this, for one root or for all of them.
+    """
+    for memo in (VERSIONS_MEMO, CONFIG_MEMO):
+        for key in list(memo):
+            if root is None or key[0] == root:
+                del memo[key]
+
+
+def get_versions(verbose: bool = False) -> Dict[str, Any]:
+    """Get the project version from whatever source is available.
+
+    Returns dict with two keys: 'version' and 'full'.
+
+    The result is remembered for the rest of the process, so all setup.py
+    commands share a single computation; see invalidate_versions(). Verbose
+    calls always recompute, to show where the version comes from.
+    """
+    if "versioneer" in sys.modules:
+        # see the discussion in cmdclass.py:get_cmdclass()
+        del sys.modules["versioneer"]
+
+    root = get_root()
+    cfg = get_config_from_root(root)
+    key = (root, repr(sorted(vars(cfg).items())))
+    if key in VERSIONS_MEMO and not (verbose or cfg.verbose):
+        return dict(VERSIONS_MEMO[key])
+    ver = versions_from_root(root, cfg, verbose)
+    VERSIONS_MEMO[key] = ver
+    return dict(ver)
+
+
+async def get_versions_async(root: Optional[str] = None,
+                             verbose: bool = False) -> Dict[str, Any]:
+    """Get the project version like get_versions(), without blocking.
+
+    This is for tools that run inside an event loop. The git commands run
+    as asyncio subprocesses, concurrently where they don't depend on each
+    other. root defaults to get_root(). Such tools usually outlive commits
+    and tags, so unlike get_versions() this always computes the version
+    (and then shares it with get_versions()).
+    """
+    if root is None:
+        root = get_root()
+    cfg = get_config_from_root(root)
+    key = (root, repr(sorted(vars(cfg).items())))
+    ver = await versions_from_root_async(root, cfg, verbose)
+    VERSIONS_MEMO[key] = ver
+    return dict(ver)
+
+
+def get_versions_many(
+    roots: Iterable[str],
+    verbose: bool = False,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Get the versions of many projects, like get_versions() for each root.
+
+    Returns a dict mapping each of roots to its version dict. Projects in
+    the same repository which use the same tag_prefix (and git options)
+    share a single computation of the pieces, each rendered in its own
+    style. The VCS queries of the different repositories run on a pool of
+    up to max_workers threads. Like get_versions_async(), this always
+    computes the versions, and then shares them with get_versions().
+    """
+    roots = list(roots)
+    configs: Dict[str, VersioneerConfig] = {}
+    versions: Dict[str, Dict[str, Any]] = {}
+    groups: Dict[Tuple[Any, ...], List[str]] = {}
+    # realpath(), like get_root(), so that each project is computed once
+    for root in set(map(os.path.realpath, roots)):
+        cfg = configs[root] = get_config_from_root(root)
+        key = (root, repr(sorted(vars(cfg).items())))
+        ver = versions_from_version_file(root, cfg,
+                                         verbose or bool(cfg.verbose))
+        if ver is not None:
+            versions[root] = VERSIONS_MEMO[key] = ver
+            continue
+        find_repo_f = HANDLERS[cast(str, cfg.VCS)].get("find_repo")
+        repo = find_repo_f(root) if find_repo_f else None
+        group = (cfg.VCS, repo or root, cfg.tag_prefix,
+                 cfg.combine_git_queries, cfg.git_coprocess,
+                 cfg.pure_python_git, cfg.tag_index,
+                 cfg.version_cache or cfg.static_version_py,
+                 cfg.version_daemon, cfg.dirty_check,
+                 # scopes are relative to each project
+                 root if cfg.dirty_scope or cfg.path_scope else None)
+        groups.setdefault(group, []).append(root)
+
+    def group_pieces(members: List[str]) -> Tuple[Optional[Pieces], str]:
+        # compute the pieces that any of the members' styles needs, or
+        # explain why that failed
+        fields: Optional[Set[str]] = set()
+        for root in members:
+            needed = style_fields(configs[root].style)
+            fields = None if needed is None or fields is None \
+                else fields | needed
+        cfg = configs[members[0]]
+        with time_budget(cfg.time_budget):
+            try:
+                with trace_span("strategy", name="vcs", root=members[0],
+                                shared_with=members[1:]):
+                    return pieces_from_root(members[0], cfg,
+                                            verbose or bool(cfg.verbose),
+                                            fields), ""
+            except NotThisMethod:
+                return None, unknown_version_error(cfg)
+
+    with ThreadPoolExecutor(max_workers) as pool:
+        # each in a copy of this context, for any enclosing time_budget()
+        futures = {group: pool.submit(contextvars.copy_context().run,
+                                      group_pieces, members)
+                   for group, members in groups.items()}
+        for group, members in groups.items():
+            pieces, error = futures[group].result()
+            for root in members:
+                cfg = configs[root]
+                root_verbose = verbose or bool(cfg.verbose)
+                if pieces is not None:
+                    ver = render(pieces, cfg.style)
+                    if root_verbose:
+                        print("got version from VCS %s" % ver)
+                else:
+                    ver = versions_from_fallbacks(root, cfg, root_verbose,
+                                                  error)
+                key = (root, repr(sorted(vars(cfg).items())))
+                versions[root] = VERSIONS_MEMO[key] = ver
+
+    return {root: dict(versions[os.path.realpath(root)]) for root in roots}
+
+
+def versions_from_root(root: str, cfg: VersioneerConfig,
+                       verbose: bool = False) -> Dict[str, Any]:
+    """Compute the version of the project in root, configured by cfg."""
+    verbose = verbose or bool(cfg.verbose)  # `bool()` used to avoid `None`
+
+    # extract version from first of: _version.py, VCS command (e.g. 'git
+    # describe'), parentdir. This is meant to work for developers using a
+    # source checkout, for users of a tarball created by 'setup.py sdist',
+    # and for users of a tarball/zipball created by 'git archive' or github's
+    # download-from-tag feature or the equivalent in other VCSes.
+    with time_budget(cfg.time_budget):
+        ver = versions_from_version_file(root, cfg, verbose)
+        if ver is None:
+            ver = versions_from_vcs(root, cfg, verbose)
+        if ver is None:
+            ver = versions_from_fallbacks(root, cfg, verbose,
+                                          unknown_version_error(cfg))
+    return ver
+
+
+async def versions_from_root_async(root: str, cfg: VersioneerConfig,
+                                   verbose: bool = False) -> Dict[str, Any]:
+    """Compute the version like versions_from_root(), without blocking.
+
+    The version cache, the pure-python git reader, the git coprocess,
+    combined git queries, the index dirty check and path scopes have no
+    asyncio variant, so when they are enabled the VCS step runs in a thread.
+    """
+    verbose = verbose or bool(cfg.verbose)  # `bool()` used to avoid `None`
+    with time_budget(cfg.time_budget):
+        ver = versions_from_version_file(root, cfg, verbose)
+        if ver is None:
+            handlers = HANDLERS[cast(str, cfg.VCS)]
+            from_vcs_f = handlers.get("pieces_from_vcs_async")
+            if from_vcs_f and not (cfg.version_cache or cfg.static_version_py
+                                   or cfg.pure_python_git or cfg.tag_index
+                                   or cfg.git_coprocess
+                                   or cfg.combine_git_queries
+                                   or cfg.version_daemon
+                                   or cfg.dirty_check == "index"
+                                   or cfg.path_scope):
+                try:
+                    with trace_span("strategy", name="vcs", root=root):
+                        pieces = await from_vcs_f(cfg.tag_prefix, root, verbose,
+                                                  fields=style_fields(cfg.style))
+                    ver = render(pieces, cfg.style)
+                    if verbose:
+                        print("got version from VCS %s" % ver)
+                except NotThisMethod:
+                    pass
+            else:
+                ver = await asyncio.to_thread(versions_from_vcs, root, cfg,
+                                              verbose)
+        if ver is None:
+            ver = versions_from_fallbacks(root, cfg, verbose,
+                                          unknown_version_error(cfg))
+        return ver
+
+
+def versions_from_version_file(root: str, cfg: VersioneerConfig,
+                               verbose: bool) -> Optional[Dict[str, Any]]:
+    """Get the version from the keywords or contents of _version.py."""
+    assert cfg.VCS is not None, "please set [versioneer]VCS= in setup.cfg"
+    handlers = HANDLERS.get(cfg.VCS)
+    assert handlers, "unrecognized VCS '%s'" % cfg.VCS
+    assert cfg.versionfile_source is not None, \
+        "please set versioneer.versionfile_source"
+    assert cfg.tag_prefix is not None, "please set versioneer.tag_prefix"
+
+    versionfile_abs = os.path.join(root, cfg.versionfile_source)
+
+    get_keywords_f = handlers.get("get_keywords")
+    from_keywords_f = handlers.get("keywords")
+    if get_keywords_f and from_keywords_f:
+        try:
+            with trace_span("strategy", name="keywords", root=root):
+                keywords = get_keywords_f(versionfile_abs)
+                ver = from_keywords_f(keywords, cfg.tag_prefix, verbose)
+            if verbose:
+                print("got version from expanded keyword %s" % ver)
+            return ver
+        except NotThisMethod:
+            pass
+
+    try:
+        with trace_span("strategy", name="file", root=root):
+            ver = versions_from_file(versionfile_abs)
+        if verbose:
+            print("got version from file %s %s" % (versionfile_abs, ver))
+        return ver
+    except NotThisMethod:
+        pass
+
+    return None
+
+
+def versions_from_vcs(root: str, cfg: VersioneerConfig,
+                      verbose: bool) -> Optional[Dict[str, Any]]:
+    """Get the version from the VCS command (e.g. 'git describe')."""
+    try:
+        with trace_span("strategy", name="vcs", root=root):
+            pieces = pieces_from_root(root, cfg, verbose,
+                                      style_fields(cfg.style))
+    except NotThisMethod:
+        return None
+    ver = render(pieces, cfg.style)
+    if verbose:
+        print("got version from VCS %s" % ver)
+    return ver
+
+
+def pieces_from_root(root: str, cfg: VersioneerConfig, verbose: bool,
+                     fields: Optional[AbstractSet[str]]) -> Pieces:
+    """Get the version pieces of root from the VCS command.
+
+    Raises NotThisMethod if the VCS can't provide them.
+    """
+    handlers = HANDLERS[cast(str, cfg.VCS)]
+    from_vcs_f = handlers.get("pieces_from_vcs")
+    if cfg.pure_python_git or cfg.tag_index:
+        from_vcs_f = handlers.get("pieces_from_gitdir", from_vcs_f)
+    from_cache_f = handlers.get("pieces_from_cache")
+    from_daemon_f = handlers.get("pieces_from_daemon")
+    if not from_vcs_f:
+        raise NotThisMethod("no pieces_from_vcs handler")
+    scope = cfg.path_scope.split() if cfg.path_scope else None
+    # the daemon only knows versions (and dirty flags) of whole repositories
+    if (cfg.version_daemon and from_daemon_f and scope is None
+            and not cfg.dirty_scope):
+        try:
+            return from_daemon_f(cfg.tag_prefix, root, verbose, fields=fields)
+        except NotThisMethod:
+            pass
+    kwargs: Dict[str, Any] = {
+        "combine_queries": bool(cfg.combine_git_queries), "fields": fields}
+    if scope is not None:
+        kwargs["scope"] = scope
+    batch_runner_f = handlers.get("batch_runner")
+    if cfg.git_coprocess and batch_runner_f:
+        kwargs["runner"] = batch_runner_f
+    if cfg.tag_index and from_vcs_f is handlers.get("pieces_from_gitdir"):
+        kwargs["tag_index"] = True
+    dirty_f = handlers.get("dirty_from_index")
+    dirty_scope = None
+    if (cfg.dirty_check == "index" or scope is not None) and dirty_f:
+        # 'git describe --dirty' can't be limited to a path scope
+        dirty_scope = cfg.dirty_scope.split() if cfg.dirty_scope else scope
+        kwargs["dirty_from"] = functools.partial(dirty_f, root,
+                                                 scope=dirty_scope)
+    if (cfg.version_cache or cfg.static_version_py) and from_cache_f:
+        return from_cache_f(cfg.tag_prefix, root, verbose, from_vcs_f,
+                            dirty_scope=dirty_scope, **kwargs)
+    return from_vcs_f(cfg.tag_prefix, root, verbose, **kwargs)
+
+
+def unknown_version_error(cfg: VersioneerConfig) -> str:
+    """Explain why the VCS didn't provide a version."""
+    if budget_exceeded():
+        return ("unable to compute version within time_budget (%gs)"
+                % cast(float, cfg.time_budget))
+    return "unable to compute version"
+
+
+def versions_from_fallbacks(
+    root: str,
+    cfg: VersioneerConfig,
+    verbose: bool,
+    error: str = "unable to compute version",
+) -> Dict[str, Any]:
+    """Get the version from parentdir, or give up with error."""
+    try:
+        if cfg.parentdir_prefix:
+            with trace_span("strategy", name="parentdir", root=root):
+                ver = versions_from_parentdir(cfg.parentdir_prefix, root,
+                                              verbose)
+            if verbose:
+                print("got version from parentdir %s" % ver)
+            return ver
+    except NotThisMethod:
+        pass
+
+    if verbose:
+        print(error)
+
+    return {"version": "0+unknown", "full-revisionid": None,
+            "dirty": None, "error": error, "date": None}
+
+
+def get_version() -> str:
+    """Get the short version string for this project."""
+    return get_versions()["version"]
+
+
+def get_cmdclass(cmdclass: Optional[Dict[str, Any]] = None):
+    """Get the custom setuptools subclasses used by Versioneer.
+
+    If the package uses a different cmdclass (e.g. one from numpy), it
+    should be provide as an argument.
+    """
+    if "versioneer" in sys.modules:
+        del sys.modules["versioneer"]
+        # this fixes the "python setup.py develop" case (also 'install' and
+        # 'easy_install .'), in which subdependencies of the main project are
+        # built (using setup.py bdist_egg) in the same python process. Assume
+        # a main project A and a dependency B, which use different versions
+        # of Versioneer. A's setup.py imports A's Versioneer, leaving it in
+        # sys.modules by the time B's setup.py is executed, causing B to run
+        # with the wrong versioneer. Setuptools wraps the sub-dep builds in a
+        # sandbox that restores sys.modules to it's pre-build state, so the
+        # parent is protected against the child's "import versioneer". By
+        # removing ourselves from sys.modules here, before the child build
+        # happens, we protect the child from the parent's versioneer too.
+        # Also see https://github.com/python-versioneer/python-versioneer/issues/52
+
+    cmds = {} if cmdclass is None else cmdclass.copy()
+
+    # we add "version" to setuptools
+    from setuptools import Command
+
+    class cmd_version(Command):
+        description = "report generated version string"
+        user_options: ClassVar[List[Tuple[str, str, str]]] = []
+        boolean_options: List[str] = []
+
+        def initialize_options(self) -> None:
+            pass
+
+        def finalize_options(self) -> None:
+            pass
+
+        def run(self) -> None:
+            vers = get_versions(verbose=True)
+            print("Version: %s" % vers["version"])
+            print(" full-revisionid: %s" % vers.get("full-revisionid"))
+            print(" dirty: %s" % vers.get("dirty"))
+            print(" date: %s" % vers.get("date"))
+            if vers["error"]:
+                print(" error: %s" % vers["error"])
+    cmds["version"] = cmd_version
+
+    # we override "build_py" in setuptools
+    #
+    # most invocation pathways end up running build_py:
+    #  distutils/build -> build_py
+    #  distutils/install -> distutils/build ->..
+    #  setuptools/bdist_wheel -> distutils/install ->..
+    #  setuptools/bdist_egg -> distutils/install_lib -> build_py
+    #  setuptools/install -> bdist_egg ->..
+    #  setuptools/develop -> ?
+    #  pip install:
+    #   copies source tree to a tempdir before running egg_info/etc
+    #   if .git isn't copied too, 'git describe' will fail
+    #   then does setup.py bdist_wheel, or sometimes setup.py install
+    #  setup.py egg_info -> ?
+
+    # pip install -e . and setuptool/editable_wheel will invoke build_py
+    # but the build_py command is not expected to copy any files.
+
+    # we override different "build_py" commands for both environments
+    if 'build_py' in cmds:
+        _build_py: Any = cmds['build_py']
+    else:
+        from setuptools.command.build_py import build_py as _build_py
+
+    class cmd_build_py(_build_py):
+        def run(self) -> None:
+            root = get_root()
+            cfg = get_config_from_root(root)
+            versions = get_versions()
+            _build_py.run(self)
+            if getattr(self, "editable_mode", False):
+                # During editable installs `.py` and data files are
+                # not copied to build_lib
+                return
+            # now locate _version.py in the new build/ directory and replace
+            # it with an updated value
+            if cfg.versionfile_build:
+                target_versionfile = os.path.join(self.build_lib,
+                                                  cfg.versionfile_build)
+                print("UPDATING %s" % target_versionfile)
+                write_to_version_file(target_versionfile, versions)
+    cmds["build_py"] = cmd_build_py
+
+    if 'build_ext' in cmds:
+        _build_ext: Any = cmds['build_ext']
+    else:
+        from setuptools.command.build_ext import build_ext as _build_ext
+
+    class cmd_build_ext(_build_ext):
+        def run(self) -> None:
+            root = get_root()
+            cfg = get_config_from_root(root)
+            versions = get_versions()
+            _build_ext.run(self)
+            if self.inplace:
+                # build_ext --inplace will only build extensions in
+                # build/lib<..> dir with no _version.py to write to.
+                # As in place builds will already have a _version.py
+                # in the module dir, we do not need to write one.
+                return
+            # now locate _version.py in the new build/ directory and replace
+            # it with an updated value
+            if not cfg.versionfile_build:
+                return
+            target_versionfile = os.path.join(self.build_lib,
+                                              cfg.versionfile_build)
+            if not os.path.exists(target_versionfile):
+                print(f"Warning: {target_versionfile} does not exist, skipping "
+                      "version update. This can happen if you are running build_ext "
+                      "without first running build_py.")
+                return
+            print("UPDATING %s" % target_versionfile)
+            write_to_version_file(target_versionfile, versions)
+    cmds["build_ext"] = cmd_build_ext
+
+    if "cx_Freeze" in sys.modules:  # cx_freeze enabled?
+        try:
+            from cx_Freeze.command.build_exe import (  # type: ignore
+                BuildEXE as _build_exe
+            )
+        except ImportError:  # cx_Freeze < 6.11
+            from cx_Freeze.dist import build_exe as _build_exe  # type: ignore
+        # nczeczulin reports that py2exe won't like the pep440-style string
+        # as FILEVERSION, but it can be used for PRODUCTVERSION, e.g.
+        # setup(console=[{
+        #   "version": versioneer.get_version().split("+", 1)[0], # FILEVERSION
+        #   "product_version": versioneer.get_version(),
+        #   ...
+
+        class cmd_build_exe(_build_exe):
+            def run(self) -> None:
+                root = get_root()
+                cfg = get_config_from_root(root)
+                versions = get_versions()
+                target_versionfile = cfg.versionfile_source
+                print("UPDATING %s" % target_versionfile)
+                write_to_version_file(target_versionfile, versions)
+
+                _build_exe.run(self)
+                os.unlink(target_versionfile)
+                with open(cfg.versionfile_source, "w") as f:
+                    LONG = LONG_VERSION_PY[cfg.VCS]
+                    f.write(LONG %
+                            {"DOLLAR": "$",
+                             "STYLE": json.dumps(cfg.style)[1:-1],
+                             "TAG_PREFIX": cfg.tag_prefix,
+                             "PARENTDIR_PREFIX": cfg.parentdir_prefix,
+                             "VERSIONFILE_SOURCE": cfg.versionfile_source,
+                             "COMBINE_GIT_QUERIES": bool(cfg.combine_git_queries),
+                             "VERSION_DAEMON": bool(cfg.version_daemon),
+                             "VERSION_CACHE": bool(cfg.version_cache),
+                             "STATIC_VERSION_PY": bool(cfg.static_version_py),
+                             "DIRTY_CHECK": cfg.dirty_check or "git",
+                             "DIRTY_SCOPE": cfg.dirty_scope or "",
+                             "PATH_SCOPE": cfg.path_scope or "",
+                             "TIME_BUDGET": cfg.time_budget or 0,
+                             })
+        cmds["build_exe"] = cmd_build_exe
+        del cmds["build_py"]
+
+    if 'py2exe' in sys.modules:  # py2exe enabled?
+        try:
+            from py2exe.setuptools_buildexe import py2exe as _py2exe  # type: ignore
+        except ImportError:
+            from py2exe.distutils_buildexe import py2exe as _py2exe  # type: ignore
+
+        class cmd_py2exe(_py2exe):
+            def run(self) -> None:
+                root = get_root()
+                cfg = get_config_from_root(root)
+                versions = get_versions()
+                target_versionfile = cfg.versionfile_source
+                print("UPDATING %s" % target_versionfile)
+                write_to_version_file(target_versionfile, versions)
+
+                _py2exe.run(self)
+                os.unlink(target_versionfile)
+                with open(cfg.versionfile_source, "w") as f:
+                    LONG = LONG_VERSION_PY[cfg.VCS]
+                    f.write(LONG %
+                            {"DOLLAR": "$",
+                             "STYLE": json.dumps(cfg.style)[1:-1],
+                             "TAG_PREFIX": cfg.tag_prefix,
+                             "PARENTDIR_PREFIX": cfg.parentdir_prefix,
+                             "VERSIONFILE_SOURCE": cfg.versionfile_source,
+                             "COMBINE_GIT_QUERIES": bool(cfg.combine_git_queries),
+                             "VERSION_DAEMON": bool(cfg.version_daemon),
+                             "VERSION_CACHE": bool(cfg.version_cache),
+                             "STATIC_VERSION_PY": bool(cfg.static_version_py),
+                             "DIRTY_CHECK": cfg.dirty_check or "git",
+                             "DIRTY_SCOPE": cfg.dirty_scope or "",
+                             "PATH_SCOPE": cfg.path_scope or "",
+                             "TIME_BUDGET": cfg.time_budget or 0,
+                             })
+        cmds["py2exe"] = cmd_py2exe
+
+    # sdist farms its file list building out to egg_info
+    if 'egg_info' in cmds:
+        _egg_info: Any = cmds['egg_info']
+    else:
+        from setuptools.command.egg_info import egg_info as _egg_info
+
+    class cmd_egg_info(_egg_info):
+        def find_sources(self) -> None:
+            # egg_info.find_sources builds the manifest list and writes it
+            # in one shot
+            super().find_sources()
+
+            # Modify the filelist and normalize it
+            root = get_root()
+            cfg = get_config_from_root(root)
+            self.filelist.append('versioneer.py')
+            if cfg.versionfile_source:
+                # There are rare cases where versionfile_source might not be
+                # included by default, so we must be explicit
+                self.filelist.append(cfg.versionfile_source)
+            self.filelist.sort()
+            self.filelist.remove_duplicates()
+
+            # The write method is hidden in the manifest_maker instance that
+            # generated the filelist and was thrown away
+            # We will instead replicate their final normalization (to unicode,
+            # and POSIX-style paths)
+            from setuptools import unicode_utils
+            normalized = [unicode_utils.filesys_decode(f).replace(os.sep, '/')
+                          for f in self.filelist.files]
+
+            manifest_filename = os.path.join(self.egg_info, 'SOURCES.txt')
+            with open(manifest_filename, 'w') as fobj:
+                fobj.write('\n'.join(normalized))
+
+    cmds['egg_info'] = cmd_egg_info
+
+    # we override different "sdist" commands for both environments
+    if 'sdist' in cmds:
+        _sdist: Any = cmds['sdist']
+    else:
+        from setuptools.command.sdist import sdist as _sdist
+
+    class cmd_sdist(_sdist):
+        def run(self) -> None:
+            versions = get_versions()
+            self._versioneer_generated_versions = versions
+            # unless we update this, the command will keep using the old
+            # version
+            self.distribution.metadata.version = versions["version"]
+            return _sdist.run(self)
+
+        def make_release_tree(self, base_dir: str, files: List[str]) -> None:
+            root = get_root()
+            cfg = get_config_from_root(root)
+            _sdist.make_release_tree(self, base_dir, files)
+            # now locate _version.py in the new base_dir directory
+            # (remembering that it may be a hardlink) and replace it with an
+            # updated value
+            target_versionfile = os.path.join(base_dir, cfg.versionfile_source)
+            print("UPDATING %s" % target_versionfile)
+            write_to_version_file(target_versionfile,
+                                  self._versioneer_generated_versions)
+    cmds["sdist"] = cmd_sdist
+
+    return cmds
+
+
+CONFIG_ERROR = """
+setup.cfg is missing the necessary Versioneer configuration. You need
+a section like:
+
+ [versioneer]
+ VCS = git
+ style = pep440
+ versionfile_source = src/myproject/_version.py
+ versionfile_build = myproject/_version.py
+ tag_prefix =
+ parentdir_prefix = myproject-
+
+You will also need to edit your setup.py to use the results:
+
+ import versioneer
+ setup(version=versioneer.get_version(),
+       cmdclass=versioneer.get_cmdclass(), ...)
+
+Please read the docstring in ./versioneer.py for configuration instructions,
+edit setup.cfg, and re-run the installer or 'python versioneer.py setup'.
+"""
+
+SAMPLE_CONFIG = """
+# See the docstring in versioneer.py for instructions. Note that you must
+# re-run 'versioneer.py setup' after changing this section, and commit the
+# resulting files.
+
+[versioneer]
+#VCS = git
+#style = pep440
+#versionfile_source =
+#versionfile_build =
+#tag_prefix =
+#parentdir_prefix =
+
+"""
+
+OLD_SNIPPET = """
+from ._version import get_versions
+__version__ = get_versions()['version']
+del get_versions
+"""
+
+INIT_PY_SNIPPET = """
+from . import {0}
+__version__ = {0}.get_versions()['version']
+"""
+
+# with lazy_version: computed on first access, see PEP 562
+LAZY_INIT_PY_SNIPPET = """
+def __getattr__(name):
+    if name == "__version__":
+        global __version__
+        from . import {0}
+        __version__ = {0}.get_versions()['version']
+        return __version__
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+"""
+
+
+def do_setup() -> int:
+    """Do main VCS-independent setup function for installing Versioneer."""
+    root = get_root()
+    try:
+        cfg = get_config_from_root(root)
+    except (OSError, configparser.NoSectionError,
+            configparser.NoOptionError) as e:
+        if isinstance(e, (OSError, configparser.NoSectionError)):
+            print("Adding sample versioneer config to setup.cfg",
+                  file=sys.stderr)
+            with open(os.path.join(root, "setup.cfg"), "a") as f:
+                f.write(SAMPLE_CONFIG)
+        print(CONFIG_ERROR, file=sys.stderr)
+        return 1
+
+    print(" creating %s" % cfg.versionfile_source)
+    with open(cfg.versionfile_source, "w") as f:
+        LONG = LONG_VERSION_PY[cfg.VCS]
+        f.write(LONG % {"DOLLAR": "$",
+                        # escaped for the "..." string in _version.py
+                        "STYLE": json.dumps(cfg.style)[1:-1],
+                        "TAG_PREFIX": cfg.tag_prefix,
+                        "PARENTDIR_PREFIX": cfg.parentdir_prefix,
+                        "VERSIONFILE_SOURCE": cfg.versionfile_source,
+                        "COMBINE_GIT_QUERIES": bool(cfg.combine_git_queries),
+                        "VERSION_DAEMON": bool(cfg.version_daemon),
+                        "VERSION_CACHE": bool(cfg.version_cache),
+                        "STATIC_VERSION_PY": bool(cfg.static_version_py),
+                        "DIRTY_CHECK": cfg.dirty_check or "git",
+                        "DIRTY_SCOPE": cfg.dirty_scope or "",
+                        "PATH_SCOPE": cfg.path_scope or "",
+                        "TIME_BUDGET": cfg.time_budget or 0,
+                        })
+
+    ipy = os.path.join(os.path.dirname(cfg.versionfile_source),
+                       "__init__.py")
+    maybe_ipy: Optional[str] = ipy
+    if os.path.exists(ipy):
+        try:
+            with open(ipy, "r") as f:
+                old = f.read()
+        except OSError:
+            old = ""
+        module = os.path.splitext(os.path.basename(cfg.versionfile_source))[0]
+        snippet = INIT_PY_SNIPPET.format(module)
+        other = LAZY_INIT_PY_SNIPPET.format(module)
+        if cfg.lazy_version:
+            snippet, other = other, snippet
+        if OLD_SNIPPET in old or other in old:
+            print(" replacing boilerplate in %s" % ipy)
+            with open(ipy, "w") as f:
+                f.write(old.replace(OLD_SNIPPET, snippet)
+                        .replace(other, snippet))
+        elif snippet not in old:
+            print(" appending to %s" % ipy)
+            with open(ipy, "a") as f:
+                f.write(snippet)
+        else:
+            print(" %s unmodified" % ipy)
+    else:
+        print(" %s doesn't exist, ok" % ipy)
+        maybe_ipy = None
+
+    # Make VCS-specific changes. For git, this means creating/changing
+    # .gitattributes to mark _version.py for export-subst keyword
+    # substitution.
+    do_vcs_install(cfg.versionfile_source, maybe_ipy, bool(cfg.git_hooks))
+    if cfg.git_hooks and not (cfg.version_cache or cfg.static_version_py):
+        print(" git_hooks only help with version_cache or static_version_py",
+              file=sys.stderr)
+    return 0
+
+
+def scan_setup_py() -> int:
+    """Validate the contents of setup.py against Versioneer's expectations."""
+    found = set()
+    setters = False
+    errors = 0
+    with open("setup.py", "r") as f:
+        for line in f.readlines():
+            if "import versioneer" in line:
+                found.add("import")
+            if "versioneer.get_cmdclass()" in line:
+                found.add("cmdclass")
+            if "versioneer.get_version()" in line:
+                found.add("get_version")
+            if "versioneer.VCS" in line:
+                setters = True
+            if "versioneer.versionfile_source" in line:
+                setters = True
+    if len(found) != 3:
+        print("")
+        print("Your setup.py appears to be missing some important items")
+        print("(but I might be wrong). Please make sure it has something")
+        print("roughly like the following:")
+        print("")
+        print(" import versioneer")
+        print(" setup( version=versioneer.get_version(),")
+        print("        cmdclass=versioneer.get_cmdclass(),  ...)")
+        print("")
+        errors += 1
+    if setters:
+        print("You should remove lines like 'versioneer.VCS = ' and")
+        print("'versioneer.versionfile_source = ' . This configuration")
+        print("now lives in setup.cfg, and should be removed from setup.py")
+        print("")
+        errors += 1
+    return errors
+
+
+def setup_command() -> NoReturn:
+    """Set up Versioneer and exit with appropriate error code."""
+    errors = do_setup()
+    errors += scan_setup_py()
+    sys.exit(1 if errors else 0)
+
+
+def refresh_command() -> NoReturn:
+    """Store the current version pieces in the version cache.
+
+    This is run by the git hooks installed with git_hooks, so reading the
+    version later needs no git command.
+    """
+    root = get_root()
+    cfg = get_config_from_root(root)
+    cfg.version_cache = True
+    try:
+        pieces_from_root(root, cfg, False, style_fields(cfg.style))
+    except NotThisMethod:
+        sys.exit(1)
+    sys.exit(0)
+
+
+def serve_command() -> NoReturn:
+    """Run the version daemon for the roots given as arguments."""
+    serve_versions(sys.argv[2:] or [get_root()])
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1]
+    if cmd == "setup":
+        setup_command()
+    elif cmd == "refresh":
+        refresh_command()
+    elif cmd == "serve":
+        serve_command()